@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import h5py
+import numpy as np
+
+from disorder.material.structure import SuperCell
+from disorder.diffuse import scattering, experimental
+from disorder.diffuse.refinement import parallelism, set_num_threads
+
+logger = logging.getLogger('rmc-discord')
+
+_paths = ['cif', 'data', 'cache', 'output']
+
+def load(filename):
+    """
+    Load job description.
+
+    ============== ====================================================
+    Key            Description
+    ============== ====================================================
+    cif            CIF file of the average structure (required)
+    supercell      Supercell extents, e.g. ``[8, 8, 8]``
+    output         HDF5 file of results (required)
+    threads        Number of threads
+    seed           Seed of the first refinement run
+    data           Intensity data file of a refinement
+    cache          Directory of persisted preprocessed intensity data and
+                   interaction matrices
+    crop           Extents of cropped data along each dimension
+    rebin          Bins of rebinned data along each dimension
+    punch          Keyword arguments of the Bragg peak punch
+    refinement     Magnetic refinement settings
+    simulation     Magnetic or structural simulation settings
+    intensity      List of single crystal intensity recalculations
+    ============== ====================================================
+
+    Relative paths are resolved with respect to the job file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of JSON job file.
+
+    Returns
+    -------
+    job : dict
+        Job description.
+
+    """
+
+    with open(filename, 'r') as f:
+        job = json.load(f)
+
+    for key in ['cif', 'output']:
+        if key not in job:
+            raise KeyError('job file missing \'{}\''.format(key))
+
+    if 'refinement' in job and 'simulation' in job:
+        raise ValueError('job combines a refinement with a simulation')
+
+    if 'refinement' in job and 'data' not in job:
+        raise KeyError('refinement job missing \'data\'')
+
+    folder = os.path.dirname(os.path.abspath(filename))
+
+    for key in _paths:
+        if key in job:
+            job[key] = os.path.join(folder, job[key])
+
+    job.setdefault('supercell', [1,1,1])
+    job.setdefault('seed', 0)
+
+    job['name'] = os.path.splitext(os.path.basename(filename))[0]
+
+    return job
+
+def refine(sc, job, scratch=None):
+    """
+    Perform a magnetic refinement job.
+
+    The refinement schedule is a list of stages, each with ``cycles`` and the
+    filter size ``sigma``, which continue from the previous stage.
+
+    Parameters
+    ----------
+    sc : supercell
+        Supercell for refinement.
+    job : dict
+        Job description.
+    scratch : str, optional
+        Directory of intermediate files. Default is ``None``, which uses the
+        current working directory.
+
+    Returns
+    -------
+    ref : refinement
+        Completed refinement.
+
+    """
+
+    settings = job['refinement']
+
+    pipeline = experimental.Pipeline(directory=job.get('cache'))
+
+    ref = scattering.Refinement(sc, job['data'], pipeline, scratch)
+
+    if 'crop' in job:
+        ref.crop(job['crop'])
+    if 'rebin' in job:
+        ref.rebin(job['rebin'])
+    if 'punch' in job:
+        ref.punch(**job['punch'])
+
+    ref.initialize_refinement(settings.get('temperature', 1),
+                              settings.get('constant', 0))
+
+    batch = settings.get('batch', 1)
+    recheck = settings.get('recheck', 0)
+    workers = settings.get('workers', 1)
+
+    schedule = settings.get('schedule', [])
+
+    for i, stage in enumerate(schedule):
+
+        ref.magnetic_refinement(stage['cycles'], stage['sigma'], batch=batch,
+                                recheck=recheck, workers=workers,
+                                threads=job.get('threads'),
+                                seed=job['seed']+i*batch, reset=i == 0,
+                                recursive=settings.get('recursive', False))
+
+        chi_sq, temperature, scale, acc, rej = ref.get_statistics()
+
+        b = np.argmin(chi_sq[:,-1])
+
+        logger.info('%s: stage %d/%d chi-squared %.6g temperature %.4g '
+                    'accepted %d rejected %d', job['name'], i+1,
+                    len(schedule), chi_sq[b,-1], temperature[b,-1],
+                    acc.sum(), rej.sum())
+
+    return ref
+
+def simulate(sc, job):
+    """
+    Perform a magnetic or structural simulation job.
+
+    Parameters
+    ----------
+    sc : supercell
+        Supercell for simulation.
+    job : dict
+        Job description.
+
+    Returns
+    -------
+    sim : simulation
+        Completed simulation.
+    H : 1d array
+        Hamiltonian of each replica.
+    T : 1d array
+        Temperature of each replica.
+
+    """
+
+    settings = job['simulation']
+
+    sim = scattering.Simulation(sc, extend=settings.get('extend', False),
+                                cache=job.get('cache'))
+
+    T0, T1 = settings.get('temperature', [1,1])
+
+    sim.initialize_parallel_tempering(T0, T1, settings.get('replicas', 1),
+                                      settings.get('spacing', 'log2'))
+
+    if 'sampling' in settings:
+        sim.initialize_sampling(**settings['sampling'])
+
+    cycles = settings['cycles']
+    batch = settings.get('batch', 1)
+    parallel = settings.get('parallel', False)
+
+    kind = settings.get('type', 'magnetic')
+
+    if kind == 'magnetic':
+
+        if 'exchange' in settings:
+            J = sim.get_magnetic_exchange_interaction_matrices()
+            J[...] = _matrices(settings['exchange'], J.shape)
+            sim.set_magnetic_exchange_interaction_matrices(J)
+
+        if 'anisotropy' in settings:
+            K = sim.get_magnetic_single_ion_anisotropy_matrices()
+            K[...] = _matrices(settings['anisotropy'], K.shape)
+            sim.set_magnetic_single_ion_anisotropy_matrices(K)
+
+        if 'field' in settings:
+            sim.set_magnetic_field(np.array(settings['field'], dtype=float))
+
+        if 'dipole' in settings:
+            const = settings['dipole']
+            sim.set_magnetic_dipole_dipole_coupling_strength(const)
+
+        H, T = sim.magnetic_simulation(cycles, batch=batch,
+                                       cluster=settings.get('cluster', False),
+                                       parallel=parallel,
+                                       n_over=settings.get('n_over', 0))
+
+    elif kind == 'structural':
+
+        if 'occupational' in settings:
+            J = sim.get_occupational_interaction_constants()
+            J[...] = settings['occupational']
+            sim.set_occupational_interaction_constants(J)
+
+        if 'site' in settings:
+            H = sim.get_occupational_single_site_constant()
+            H[...] = settings['site']
+            sim.set_occupational_single_site_constant(H)
+
+        if 'stiffness' in settings:
+            K = sim.get_displacive_stiffness_constants()
+            K[...] = settings['stiffness']
+            sim.set_displacive_stiffness_constants(K)
+
+        if 'distortion' in settings:
+            eta = sim.get_displacive_distortion_constants()
+            eta[...] = settings['distortion']
+            sim.set_displacive_distortion_constants(eta)
+
+        H, T = sim.structural_simulation(cycles, batch=batch,
+                                         parallel=parallel)
+
+    else:
+
+        raise ValueError('unknown simulation type \'{}\''.format(kind))
+
+    i = np.argmin(T)
+
+    logger.info('%s: %s simulation of %d cycles energy %.6g at %.4g K',
+                job['name'], kind, cycles, H[i], T[i])
+
+    return sim, H, T
+
+def _matrices(values, shape):
+
+    values = np.asarray(values, dtype=float)
+
+    if values.ndim <= 1:
+        values = values[...,np.newaxis,np.newaxis]*np.eye(3)
+
+    return np.broadcast_to(values, shape)
+
+def recalculate(sc, job):
+    """
+    Calculate single crystal intensities of a job.
+
+    Each recalculation may bound the memory of its evaluation in bytes with
+    ``memory``.
+
+    Parameters
+    ----------
+    sc : supercell
+        Supercell with refined or simulated disorder.
+    job : dict
+        Job description.
+
+    Returns
+    -------
+    intensities : list of tuples
+        Settings, intensity, and variance of each recalculation.
+
+    """
+
+    intensities = []
+
+    for settings in job.get('intensity', []):
+
+        kind = settings.get('type', 'magnetic')
+
+        extents, bins = settings['extents'], settings['bins']
+
+        W = settings.get('W', np.eye(3))
+        laue = settings.get('laue')
+
+        memory = settings.get('memory')
+
+        if kind == 'magnetic':
+            I, sigma_sq = sc.magnetic_single_crystal_intensity(extents, bins,
+                                                               W, laue,
+                                                               memory)
+        elif kind == 'occupational':
+            I, sigma_sq = sc.occupational_single_crystal_intensity(extents,
+                                                                   bins,
+                                                                   W, laue,
+                                                                   memory)
+        elif kind == 'displacive':
+            order = settings.get('order', 2)
+            centering = settings.get('centering', 'P')
+            I, sigma_sq = sc.displacive_single_crystal_intensity(extents,
+                                                                 bins,
+                                                                 W, laue,
+                                                                 order,
+                                                                 centering,
+                                                                 memory)
+        else:
+            raise ValueError('unknown intensity type \'{}\''.format(kind))
+
+        logger.info('%s: %s intensity on %dx%dx%d grid',
+                    job['name'], kind, *bins)
+
+        intensities.append((settings, I, sigma_sq))
+
+    return intensities
+
+def execute(job):
+    """
+    Perform a job and write its results to one HDF5 file.
+
+    Intermediate files of the job are written to a temporary directory so
+    that concurrent jobs do not share them.
+
+    Parameters
+    ----------
+    job : dict
+        Job description.
+
+    """
+
+    start = time.time()
+
+    if job.get('threads') is not None:
+        set_num_threads(job['threads'])
+
+    sc = SuperCell(job['cif'], *job['supercell'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        if 'refinement' in job:
+
+            ref = refine(sc, job, tmp)
+
+            intensities = recalculate(sc, job)
+
+            ref.save(job['output'])
+
+            with h5py.File(job['output'], 'a') as f:
+
+                group = f.create_group('disorder/batch/refinement')
+
+                chi_sq, temperature, scale, *_ = ref.get_statistics()
+
+                group.create_dataset('chi_sq', data=chi_sq)
+                group.create_dataset('temperature', data=temperature)
+                group.create_dataset('scale', data=scale)
+
+        elif 'simulation' in job:
+
+            sim, H, T = simulate(sc, job)
+
+            intensities = recalculate(sc, job)
+
+            sim.save(job['output'])
+
+            with h5py.File(job['output'], 'a') as f:
+
+                group = f.create_group('disorder/batch/simulation')
+
+                group.create_dataset('H', data=H)
+                group.create_dataset('T', data=T)
+
+                if 'sampling' in job['simulation']:
+
+                    kinds = ['magnetic'] \
+                            if job['simulation'].get('type') != 'structural' \
+                            else ['occupational', 'displacive']
+
+                    for kind in kinds:
+                        I, sigma_sq, n = sim.get_sampled_intensity(kind)
+                        sample = group.create_group('sampled/'+kind)
+                        sample.create_dataset('I', data=I)
+                        sample.create_dataset('sigma_sq', data=sigma_sq)
+                        sample.attrs['n'] = n
+
+        else:
+
+            intensities = recalculate(sc, job)
+
+            sc.save(job['output'])
+
+    with h5py.File(job['output'], 'a') as f:
+
+        batch = f.require_group('disorder/batch')
+
+        for i, (settings, I, sigma_sq) in enumerate(intensities):
+
+            group = batch.create_group('intensity/{}'.format(i))
+
+            group.create_dataset('I', data=I)
+            group.create_dataset('sigma_sq', data=sigma_sq)
+
+            group.attrs['type'] = settings.get('type', 'magnetic')
+            group.attrs['extents'] = np.array(settings['extents'], dtype=float)
+            group.attrs['bins'] = settings['bins']
+
+        batch.attrs['job'] = json.dumps(job)
+        batch.attrs['elapsed'] = time.time()-start
+
+    logger.info('%s: wrote %s in %.1f s', job['name'], job['output'],
+                time.time()-start)
+
+def run(argv=None):
+    """
+    Command-line entry point of headless batch jobs.
+
+    Parameters
+    ----------
+    argv : list, str, optional
+        Command-line arguments. Default is ``None``, which uses ``sys.argv``.
+
+    """
+
+    parser = argparse.ArgumentParser(prog='rmc-discord-batch',
+                                     description='Run refinements, '
+                                                 'simulations, and '
+                                                 'recalculations without '
+                                                 'the graphical interface.')
+
+    parser.add_argument('jobs', nargs='+', help='JSON job description files')
+    parser.add_argument('-t', '--threads', type=int,
+                        help='threads of each job, overriding job files')
+    parser.add_argument('-l', '--log', help='log file besides stdout')
+
+    args = parser.parse_args(argv)
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if args.log is not None:
+        handlers.append(logging.FileHandler(args.log))
+
+    logging.basicConfig(level=logging.INFO, handlers=handlers,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.threads is not None:
+        set_num_threads(args.threads)
+    else:
+        parallelism(app=False)
+
+    failed = 0
+
+    for filename in args.jobs:
+
+        try:
+
+            job = load(filename)
+
+            if args.threads is not None:
+                job['threads'] = args.threads
+
+            logger.info('%s: started', job['name'])
+
+            execute(job)
+
+        except Exception:
+
+            logger.exception('%s: failed', filename)
+
+            failed += 1
+
+    sys.exit(1 if failed > 0 else 0)
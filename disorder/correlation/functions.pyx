@@ -10,7 +10,7 @@ cimport cython
 
 from libc.math cimport sqrt, fabs
 
-from disorder.material import crystal, symmetry
+from disorder.material import crystal, symmetry, neighbor
 
 cdef bint sign(double a) nogil:
 
@@ -347,86 +347,10 @@ def pairs1d(rx, ry, rz, ion, nu, nv, nw, A, fract=0.25, tol=1e-4):
 
     """
 
-    n_atm = ion.shape[0] // (nu*nv*nw)
-
-    mu = (nu+1) // 2
-    mv = (nv+1) // 2
-    mw = (nw+1) // 2
-
-    m_uvw = mu*mv*mw
-    n_uvw = nu*nv*nw
-
-    m_xyz = mu*mv*mw*n_atm
-    n_xyz = nu*nv*nw*n_atm
-
-    c_uvw = np.arange(n_uvw, dtype=int)
-
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
-
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
-
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
-
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
-
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
-
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
-
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
-
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
-
-    i_atm, j_atm = np.triu_indices(n_atm, k=1)
-
-    i_atms = np.concatenate((i_atm,j_atm))
-    j_atms = np.concatenate((j_atm,i_atm))
-
-    i_atms = np.concatenate((i_atms,np.arange(n_atm)))
-    j_atms = np.concatenate((j_atms,np.arange(n_atm)))
-
-    i = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm)).flatten()
-    j = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm)).flatten()
-
-    ic = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm)).flatten()
-    jc = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm)).flatten()
-
-    i, j = np.concatenate((i,ic)), np.concatenate((j,jc))
-
-    dx = rx[j]-rx[i]
-    dy = ry[j]-ry[i]
-    dz = rz[j]-rz[i]
-
-    du, dv, dw = crystal.transform(dx, dy, dz, np.linalg.inv(A))
-
-    du[du < -mu] += nu
-    dv[dv < -mv] += nv
-    dw[dw < -mw] += nw
-
-    du[du > mu] -= nu
-    dv[dv > mv] -= nv
-    dw[dw > mw] -= nw
-
-    dx, dy, dz = crystal.transform(du, dv, dw, A)
+    dx, dy, dz, i, j = neighbor.pairs(rx, ry, rz, nu, nv, nw, A, fract)
 
     d = np.sqrt(dx**2+dy**2+dz**2)
 
-    mask = d <= d.max()*fract
-
-    dx = dx[mask]
-    dy = dy[mask]
-    dz = dz[mask]
-    d = d[mask]
-
-    i = i[mask]
-    j = j[mask]
-
     coordinate = np.column_stack((i,j))
 
     atms = np.sort(np.stack((ion[j],ion[i])), axis=0)
@@ -501,86 +425,10 @@ def pairs3d(rx, ry, rz, ion, nu, nv, nw, A, fract=0.25, tol=1e-4):
 
     """
 
-    n_atm = ion.shape[0] // (nu*nv*nw)
-
-    mu = (nu+1) // 2
-    mv = (nv+1) // 2
-    mw = (nw+1) // 2
-
-    m_uvw = mu*mv*mw
-    n_uvw = nu*nv*nw
-
-    m_xyz = mu*mv*mw*n_atm
-    n_xyz = nu*nv*nw*n_atm
+    dx, dy, dz, i, j = neighbor.pairs(rx, ry, rz, nu, nv, nw, A, fract)
 
-    c_uvw = np.arange(n_uvw, dtype=int)
-
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
-
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
-
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
-
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
-
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
-
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
-
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
-
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
-
-    i_atm, j_atm = np.triu_indices(n_atm, k=1)
-
-    i_atms = np.concatenate((i_atm,j_atm))
-    j_atms = np.concatenate((j_atm,i_atm))
-
-    i_atms = np.concatenate((i_atms,np.arange(n_atm)))
-    j_atms = np.concatenate((j_atms,np.arange(n_atm)))
-
-    i = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm)).flatten()
-    j = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm)).flatten()
-
-    ic = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm)).flatten()
-    jc = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm)).flatten()
-
-    i, j = np.concatenate((i,ic)), np.concatenate((j,jc))
-
-    dx = rx[j]-rx[i]
-    dy = ry[j]-ry[i]
-    dz = rz[j]-rz[i]
-
-    du, dv, dw = crystal.transform(dx, dy, dz, np.linalg.inv(A))
-
-    du[du < -mu] += nu
-    dv[dv < -mv] += nv
-    dw[dw < -mw] += nw
-
-    du[du > mu] -= nu
-    dv[dv > mv] -= nv
-    dw[dw > mw] -= nw
-
-    dx, dy, dz = crystal.transform(du, dv, dw, A)
-
-    d = np.sqrt(dx**2+dy**2+dz**2)
-
-    mask = d <= d.max()*fract
-
-    dx = dx[mask]
-    dy = dy[mask]
-    dz = dz[mask]
     d = np.stack((dx,dy,dz)).T
 
-    i = i[mask]
-    j = j[mask]
-
     coordinate = np.column_stack((i,j))
 
     atms = np.sort(np.stack((ion[j],ion[i])), axis=0)
@@ -986,21 +834,15 @@ def symmetrize(arrays, dx, dy, dz, pairs, A, laue, tol=1e-4):
 
     unique, labels = np.unique(pairs, return_inverse=True)
 
-    for n in range(N):
-
-        x = A_inv[0,0]*dx[n]+A_inv[0,1]*dy[n]+A_inv[0,2]*dz[n]
-        y = A_inv[1,0]*dx[n]+A_inv[1,1]*dy[n]+A_inv[1,2]*dz[n]
-        z = A_inv[2,0]*dx[n]+A_inv[2,1]*dy[n]+A_inv[2,2]*dz[n]
+    x = A_inv[0,0]*dx+A_inv[0,1]*dy+A_inv[0,2]*dz
+    y = A_inv[1,0]*dx+A_inv[1,1]*dy+A_inv[1,2]*dz
+    z = A_inv[2,0]*dx+A_inv[2,1]*dy+A_inv[2,2]*dz
 
-        displacement = []
+    displacement = symmetry.evaluate(symops, [x,y,z], translate=False)
 
-        for symop in symops:
-
-            transformed = symmetry.evaluate([symop], [x,y,z], translate=False)
-
-            displacement.append(transformed)
+    for n in range(N):
 
-        symmetries = np.unique(np.vstack(displacement), axis=0)
+        symmetries = np.unique(displacement[:,:,n], axis=0)
 
         total.append(symmetries)
 
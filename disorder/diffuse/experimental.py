@@ -1,5 +1,11 @@
 #!/usr/bin/env python3
 
+import os
+import copy
+import json
+import hashlib
+import tempfile
+
 import numpy as np
 
 np.bool = bool
@@ -8,64 +14,581 @@ import h5py
 import pyvista as pv
 
 from functools import reduce
+from collections import OrderedDict
 
 from disorder.diffuse import filters
 
 def data(filename):
 
-    f = h5py.File(filename, 'r')
+    dataset = Dataset(filename)
 
-    if 'MDHistoWorkspace' in f.keys():
-        data = f['MDHistoWorkspace/data/']
-    else:
-        data = f['disorder/data']
-
-    signal = data['signal'][...].T
-    error_sq = data['errors_squared'][...].T
-
-    if 'Q1' in data.keys():
-        h = data['Q1'][...]
-        k = data['Q2'][...]
-        l = data['Q3'][...]
-    elif 'D0' in data.keys():
-        h = data['D0'][...]
-        k = data['D1'][...]
-        l = data['D2'][...]
-    elif '[H,0,0]'in data.keys():
-        h = data['[H,0,0]'][...]
-        k = data['[0,K,0]'][...]
-        l = data['[0,0,L]'][...]
-    else:
-        h = data['h'][...]
-        k = data['k'][...]
-        l = data['l'][...]
+    signal, error_sq = dataset.read()
+
+    h_range, k_range, l_range = dataset.extents
+    nh, nk, nl = dataset.bins
+
+    return signal, error_sq, h_range, k_range, l_range, nh, nk, nl
+
+class Dataset:
+    """
+    Intensity data of an HDF5 file read on demand.
 
-    f.close()
+    The signal and errors squared are stored with the reversed axis order
+    :math:`(l,k,h)`. Only the crop window is read from the file, in slabs of
+    planes along :math:`l`, which are rebinned one slab at a time.
 
-    h_min, k_min, l_min = h.min(), k.min(), l.min()
-    h_max, k_max, l_max = h.max(), k.max(), l.max()
+    Parameters
+    ----------
+    filename : str
+        Name of file with ``MDHistoWorkspace/data`` or ``disorder/data``.
+    planes : int, optional
+        Planes along :math:`l` of each slab. Default is ``None``, which limits
+        slabs to about 32 MB.
 
-    mh, mk, ml = h.size, k.size, l.size
+    """
 
-    nh = mh-1
-    nk = mk-1
-    nl = ml-1
+    def __init__(self, filename, planes=None):
 
-    step_h = (h_max-h_min)/nh
-    step_k = (k_max-k_min)/nk
-    step_l = (l_max-l_min)/nl
+        self.filename = filename
 
-    min_h = np.round(h_min+step_h/2, 4)
-    min_k = np.round(k_min+step_k/2, 4)
-    min_l = np.round(l_min+step_l/2, 4)
+        with h5py.File(filename, 'r') as f:
 
-    max_h = np.round(h_max-step_h/2, 4)
-    max_k = np.round(k_max-step_k/2, 4)
-    max_l = np.round(l_max-step_l/2, 4)
+            if 'MDHistoWorkspace' in f.keys():
+                self.__group = 'MDHistoWorkspace/data'
+            else:
+                self.__group = 'disorder/data'
 
-    h_range, k_range, l_range = [min_h, max_h], [min_k, max_k], [min_l, max_l]
+            data = f[self.__group]
 
-    return signal, error_sq, h_range, k_range, l_range, nh, nk, nl
+            if 'Q1' in data.keys():
+                axes = ['Q1', 'Q2', 'Q3']
+            elif 'D0' in data.keys():
+                axes = ['D0', 'D1', 'D2']
+            elif '[H,0,0]'in data.keys():
+                axes = ['[H,0,0]', '[0,K,0]', '[0,0,L]']
+            else:
+                axes = ['h', 'k', 'l']
+
+            edges = [data[axis][...] for axis in axes]
+
+            chunks = data['signal'].chunks
+
+        self.__ranges = []
+
+        for x in edges:
+
+            n = x.size-1
+
+            step = (x.max()-x.min())/n
+
+            self.__ranges.append([np.round(x.min()+step/2, 4),
+                                  np.round(x.max()-step/2, 4),
+                                  n])
+
+        self.__window = [[0, n] for *_, n in self.__ranges]
+
+        if planes is None:
+            nh, nk, nl = self.bins
+            planes = max(1, 2**22//(nh*nk))
+            if chunks is not None and planes > chunks[0]:
+                planes = planes//chunks[0]*chunks[0]
+
+        self.planes = planes
+
+    def __repr__(self):
+
+        return 'Dataset({!r}, bins={})'.format(self.filename, self.bins)
+
+    @property
+    def bins(self):
+        """
+        Bins of the crop window along each dimension.
+
+        """
+
+        return [stop-start for start, stop in self.__window]
+
+    @property
+    def shape(self):
+        """
+        Shape of the crop window.
+
+        """
+
+        return tuple(self.bins)
+
+    @property
+    def extents(self):
+        """
+        Extents of the crop window along each dimension.
+
+        """
+
+        extents = []
+        for (vmin, vmax, size), (start, stop) in zip(self.__ranges,
+                                                     self.__window):
+            step = (vmax-vmin)/(size-1) if size > 1 else 0
+            extents.append([np.round(vmin+step*start, 4),
+                            np.round(vmin+step*(stop-1), 4)])
+
+        return extents
+
+    def crop(self, h_slice, k_slice, l_slice):
+        """
+        Crop window without reading data.
+
+        Parameters
+        ----------
+        h_slice, k_slice, l_slice : list, int
+            Start and stop indices relative to the current window.
+
+        Returns
+        -------
+        dataset : Dataset
+            Cropped dataset.
+
+        """
+
+        dataset = copy.copy(self)
+
+        window = []
+        for (start, stop), indices in zip(self.__window,
+                                          [h_slice, k_slice, l_slice]):
+            i0, i1 = np.clip(indices, 0, stop-start)
+            window.append([start+i0, start+max(i0+1, i1)])
+
+        dataset.__window = window
+
+        return dataset
+
+    def slabs(self):
+        """
+        Iterate over the crop window in slabs of planes along :math:`l`.
+
+        Yields
+        ------
+        l_slice : list, int
+            Start and stop indices of the slab relative to the window.
+        signal, error_sq : 3d array
+            Signal and errors squared of the slab.
+
+        """
+
+        (h0, h1), (k0, k1), (l0, l1) = self.__window
+
+        with h5py.File(self.filename, 'r') as f:
+
+            data = f[self.__group]
+
+            for start in range(l0, l1, self.planes):
+
+                stop = min(start+self.planes, l1)
+
+                signal = data['signal'][start:stop,k0:k1,h0:h1]
+                error_sq = data['errors_squared'][start:stop,k0:k1,h0:h1]
+
+                signal = np.ascontiguousarray(signal.T, dtype=float)
+                error_sq = np.ascontiguousarray(error_sq.T, dtype=float)
+
+                yield [start-l0, stop-l0], signal, error_sq
+
+    def read(self, binsize=None):
+        """
+        Read crop window, optionally rebinned.
+
+        Parameters
+        ----------
+        binsize : list, int, optional
+            Bins along each dimension. Default is ``None``, which keeps the
+            bins of the window.
+
+        Returns
+        -------
+        signal, error_sq : 3d array
+            Signal and errors squared.
+
+        """
+
+        nh, nk, nl = self.bins
+
+        if binsize is None:
+            binsize = nh, nk, nl
+
+        mh, mk, ml = binsize
+
+        signal = np.zeros((mh,mk,ml))
+        error_sq = np.zeros((mh,mk,ml))
+
+        if list(binsize) == [nh, nk, nl]:
+
+            for (start, stop), *values in self.slabs():
+
+                signal[:,:,start:stop] = values[0]
+                error_sq[:,:,start:stop] = values[1]
+
+            return signal, error_sq
+
+        operators = [operator(old, new) for old, new in zip(self.bins, binsize)]
+
+        indptr, indices, data = operators[2]
+
+        row = np.repeat(np.arange(ml), np.diff(indptr))
+
+        for (start, stop), *values in self.slabs():
+
+            keep = (indices >= start) & (indices < stop)
+
+            rows = row[keep]
+            i0, i1 = rows[0], rows[-1]+1
+
+            ptr = np.zeros(i1-i0+1, dtype=np.intp)
+            ptr[1:] = np.cumsum(np.bincount(rows-i0, minlength=i1-i0))
+
+            slab = ptr, indices[keep]-start, data[keep]
+
+            values = filters.rebin(values[0], [*operators[:2], slab], values[1])
+
+            signal[:,:,i0:i1] += values[0]
+            error_sq[:,:,i0:i1] += values[1]
+
+        return signal, error_sq
+
+class Pipeline:
+    """
+    Preprocessing of intensity data with cached intermediate results.
+
+    Each result is addressed by a digest of its source and every stage that
+    was applied to it, so repeating a crop, rebin, or punch with identical
+    settings returns the earlier result. The least recently used results are
+    evicted once the cache exceeds its capacity. Results are also kept in a
+    directory if one is given, which persists them between sessions.
+
+    Data are either a dataset or a tuple of signal and errors squared arrays.
+    Cached arrays are shared and therefore read-only.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Bytes of results kept in memory. Default is 2 GiB.
+    directory : str, optional
+        Directory of persisted results. Default is ``None``, which keeps
+        results only in memory.
+
+    """
+
+    def __init__(self, capacity=2**31, directory=None):
+
+        self.capacity, self.directory = capacity, directory
+
+        self.__results = OrderedDict()
+
+    def __len__(self):
+
+        return len(self.__results)
+
+    @property
+    def size(self):
+        """
+        Bytes of results kept in memory.
+
+        """
+
+        return sum(self.__nbytes(result) for result in self.__results.values())
+
+    def clear(self):
+        """
+        Remove results kept in memory.
+
+        """
+
+        self.__results.clear()
+
+    def source(self, data):
+        """
+        Content address of source data.
+
+        Datasets are identified by the file, its size and modification time,
+        and the crop window. Arrays are identified by their contents.
+
+        Parameters
+        ----------
+        data : Dataset or tuple
+            Source data.
+
+        Returns
+        -------
+        key : str
+            Hexadecimal digest.
+
+        """
+
+        digest = hashlib.sha256()
+
+        if isinstance(data, Dataset):
+
+            stat = os.stat(data.filename)
+
+            params = [os.path.abspath(data.filename), stat.st_size,
+                      stat.st_mtime_ns, data.extents, data.bins]
+
+            digest.update(self.__params(params).encode())
+
+        else:
+
+            for array in data:
+                array = np.ascontiguousarray(array, dtype=float)
+                digest.update(self.__params(array.shape).encode())
+                digest.update(array.data)
+
+        return digest.hexdigest()
+
+    def crop(self, key, data, h_slice, k_slice, l_slice):
+        """
+        Crop data.
+
+        Cropping a dataset narrows its window without reading it.
+
+        Parameters
+        ----------
+        key : str
+            Address of data.
+        data : Dataset or tuple
+            Data to crop.
+        h_slice, k_slice, l_slice : list, int
+            Start and stop indices along each dimension.
+
+        Returns
+        -------
+        key : str
+            Address of cropped data.
+        data : Dataset or tuple
+            Cropped data.
+
+        """
+
+        params = h_slice, k_slice, l_slice
+
+        if isinstance(data, Dataset):
+            return self.__key(key, 'crop', params), data.crop(*params)
+
+        return self.__stage(key, 'crop', params, data,
+                            lambda *x: tuple(crop(y, *params) for y in x))
+
+    def rebin(self, key, data, binsize):
+        """
+        Rebin data.
+
+        Datasets are rebinned as they are read.
+
+        Parameters
+        ----------
+        key : str
+            Address of data.
+        data : Dataset or tuple
+            Data to rebin.
+        binsize : list, int
+            Bins along each dimension.
+
+        Returns
+        -------
+        key : str
+            Address of rebinned data.
+        data : tuple
+            Rebinned signal and errors squared.
+
+        """
+
+        if isinstance(data, Dataset):
+
+            key = self.__key(key, 'rebin', binsize)
+
+            result = self.__lookup(key)
+
+            if result is None:
+                result = data.read(binsize)
+                result = self.__store(key, result)
+
+            return key, result
+
+        return self.__stage(key, 'rebin', binsize, data,
+                            lambda *x: rebin(x[0], binsize, x[1]))
+
+    def punch(self, key, data, radius_h, radius_k, radius_l,
+              h_range, k_range, l_range, centering='P', outlier=1.5,
+              ptype='cuboid', errors=True):
+        """
+        Punch Bragg peaks from data.
+
+        Parameters
+        ----------
+        key : str
+            Address of data.
+        data : Dataset or tuple
+            Data to punch.
+        radius_h, radius_k, radius_l : int
+            Punch radii along each dimension.
+        h_range, k_range, l_range : list
+            Extents along each dimension.
+        centering : str, optional
+            Reflection condition lattice centering. The default is ``'P'``.
+        outlier : float, optional
+            Multiplier of interquartile range. The default is ``1.5``.
+        ptype : str, optional
+            Punch type, either ``'cuboid'`` or ``'ellipsoid'``. The default is
+            ``'cuboid'``.
+        errors : bool, optional
+            Whether to punch the errors squared too. The default is ``True``.
+
+        Returns
+        -------
+        key : str
+            Address of punched data.
+        data : tuple
+            Punched signal and errors squared.
+
+        """
+
+        params = radius_h, radius_k, radius_l, h_range, k_range, l_range, \
+                 centering, outlier, ptype
+
+        key = self.__key(key, 'punch', [*params, errors])
+
+        result = self.__lookup(key)
+
+        if result is None:
+            if isinstance(data, Dataset):
+                data = data.read()
+            signal, error_sq = data
+            signal = punch(signal.copy(), *params)
+            if errors:
+                error_sq = punch(error_sq.copy(), *params)
+            result = signal, error_sq
+            result = self.__store(key, result)
+
+        return key, result
+
+    def mask(self, key, data):
+        """
+        Mask of invalid values of data.
+
+        Parameters
+        ----------
+        key : str
+            Address of data.
+        data : Dataset or tuple
+            Data to mask.
+
+        Returns
+        -------
+        mask : 3d array, bool
+            Mask of invalid values.
+
+        """
+
+        key = self.__key(key, 'mask', [])
+
+        result = self.__lookup(key)
+
+        if result is None:
+            if isinstance(data, Dataset):
+                data = data.read()
+            result = mask(*data),
+            result = self.__store(key, result)
+
+        return result[0]
+
+    def __stage(self, key, name, params, data, function):
+
+        key = self.__key(key, name, params)
+
+        result = self.__lookup(key)
+
+        if result is None:
+            result = function(*data)
+            result = self.__store(key, result)
+
+        return key, result
+
+    def __params(self, params):
+
+        return json.dumps(params, default=lambda x: np.asarray(x).tolist())
+
+    def __key(self, key, name, params):
+
+        digest = hashlib.sha256(key.encode())
+
+        digest.update(name.encode())
+        digest.update(self.__params(params).encode())
+
+        return digest.hexdigest()
+
+    def __nbytes(self, result):
+
+        return sum(array.nbytes for array in result)
+
+    def __lookup(self, key):
+
+        if key in self.__results:
+
+            self.__results.move_to_end(key)
+
+            return self.__results[key]
+
+        if self.directory is not None:
+
+            filename = os.path.join(self.directory, key+'.npz')
+
+            if os.path.exists(filename):
+
+                with np.load(filename) as f:
+                    result = tuple(f[name] for name in f.files)
+
+                result = self.__freeze(result)
+
+                self.__evict(result)
+
+                self.__results[key] = result
+
+                return result
+
+    def __store(self, key, result):
+
+        if self.directory is not None:
+
+            os.makedirs(self.directory, exist_ok=True)
+
+            filename = os.path.join(self.directory, key+'.npz')
+
+            fd, temporary = tempfile.mkstemp(suffix='.npz', dir=self.directory)
+
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, *result)
+
+            os.replace(temporary, filename)
+
+        result = self.__freeze(result)
+
+        self.__evict(result)
+
+        self.__results[key] = result
+
+        return result
+
+    def __freeze(self, result):
+
+        views = tuple(array.view() for array in result)
+
+        for view in views:
+            view.flags.writeable = False
+
+        return views
+
+    def __evict(self, result):
+
+        size = self.__nbytes(result)
+
+        while self.__results and self.size+size > self.capacity:
+            self.__results.popitem(last=False)
 
 def mask(signal, error_sq):
     """
@@ -94,82 +617,105 @@ def mask(signal, error_sq):
 
     return mask
 
-def rebin(a, binsize):
-
-    changed = np.array(binsize) != np.array(a.shape)
-
-    if changed[0] and changed[1] and changed[2]:
-        comp0 = weights(a.shape[0], binsize[0])
-        comp1 = weights(a.shape[1], binsize[1])
-        comp2 = weights(a.shape[2], binsize[2])
-        b = filters.rebin0(a, comp0)
-        c = filters.rebin1(b, comp1)
-        d = filters.rebin2(c, comp2)
-        return d
-    elif changed[0] and changed[1]:
-        comp0 = weights(a.shape[0], binsize[0])
-        comp1 = weights(a.shape[1], binsize[1])
-        b = filters.rebin0(a, comp0)
-        c = filters.rebin1(b, comp1)
-        return c
-    elif changed[1] and changed[2]:
-        comp1 = weights(a.shape[1], binsize[1])
-        comp2 = weights(a.shape[2], binsize[2])
-        b = filters.rebin1(a, comp1)
-        c = filters.rebin2(b, comp2)
-        return c
-    elif changed[2] and changed[0]:
-        comp2 = weights(a.shape[2], binsize[2])
-        comp0 = weights(a.shape[0], binsize[0])
-        b = filters.rebin2(a, comp2)
-        c = filters.rebin0(b, comp0)
-        return c
-    elif changed[0]:
-        comp0 = weights(a.shape[0], binsize[0])
-        b = filters.rebin0(a, comp0)
-        return b
-    elif changed[1]:
-        comp1 = weights(a.shape[1], binsize[1])
-        b = filters.rebin1(a, comp1)
-        return b
-    elif changed[2]:
-        comp2 = weights(a.shape[2], binsize[2])
-        b = filters.rebin2(a, comp2)
-        return b
-    else:
-        return a
+def rebin(a, binsize, b=None):
+    """
+    Rebin data to new bin sizes.
 
-def weights(old, new):
+    Parameters
+    ----------
+    a : 3d array
+        Data to rebin.
+    binsize : list, int
+        Bins along each dimension.
+    b : 3d array, optional
+        Second array, such as the errors squared, rebinned in the same pass.
+        Default is ``None``.
 
-    weights = np.zeros((new,old))
+    Returns
+    -------
+    c : 3d array
+        Rebinned data.
+    d : 3d array
+        Rebinned second array if given.
 
-    binning = old/new
-    interval = binning
+    """
 
-    row, col = 0, 0
+    if list(binsize) == list(a.shape):
+        return a if b is None else (a, b)
 
-    while row < weights.shape[0] and col < weights.shape[1]:
+    operators = [operator(old, new) for old, new in zip(a.shape, binsize)]
 
-        if np.round(interval-col, 1) >= 1:
+    return filters.rebin(a, operators, b)
 
-            weights[row,col] = 1
-            col += 1
+def operator(old, new):
+    """
+    Sparse rebinning operator.
 
-        elif interval == col:
+    Each new bin averages the old bins it overlaps, weighted by the overlap.
+    The overlaps are exact since bin edges are compared in units of
+    ``1/(old*new)``.
 
-            row += 1
-            interval += binning
+    Parameters
+    ----------
+    old : int
+        Number of old bins.
+    new : int
+        Number of new bins.
 
-        else:
+    Returns
+    -------
+    indptr : 1d array, int
+        Compressed sparse row pointers of each new bin.
+    indices : 1d array, int
+        Old bins of each nonzero weight.
+    data : 1d array
+        Nonzero weights.
 
-            partial = interval-col
-            weights[row,col] = partial
-            row += 1
-            weights[row,col] = 1-partial
-            col += 1
-            interval += binning
+    """
 
-    weights /= binning
+    i = np.arange(new, dtype=np.intp)
+
+    start = i*old//new
+    stop = -(-(i+1)*old//new)
+
+    counts = stop-start
+
+    indptr = np.zeros(new+1, dtype=np.intp)
+    indptr[1:] = np.cumsum(counts)
+
+    row = np.repeat(i, counts)
+
+    indices = np.arange(indptr[-1], dtype=np.intp)
+    indices += np.repeat(start-indptr[:-1], counts)
+
+    overlap = np.minimum((indices+1)*new, (row+1)*old) \
+            - np.maximum(indices*new, row*old)
+
+    return indptr, indices, overlap/old
+
+def weights(old, new):
+    """
+    Dense rebinning weights.
+
+    Parameters
+    ----------
+    old : int
+        Number of old bins.
+    new : int
+        Number of new bins.
+
+    Returns
+    -------
+    weights : 2d array
+        Weights of each old bin in each new bin.
+
+    """
+
+    indptr, indices, data = operator(old, new)
+
+    weights = np.zeros((new,old))
+
+    weights[np.repeat(np.arange(new), np.diff(indptr)), indices] = data
 
     return weights
 
@@ -209,61 +755,49 @@ def punch(data, radius_h, radius_k, radius_l, h_range, k_range, l_range,
     k_range = [int(round(min_k)), int(round(max_k))]
     l_range = [int(round(min_l)), int(round(max_l))]
 
-    for h in range(h_range[0], h_range[1]+1):
-        for k in range(k_range[0], k_range[1]+1):
-            for l in range(l_range[0], l_range[1]+1):
-
-                if reflections(h, k, l, centering=centering):
+    h = np.arange(h_range[0], h_range[1]+1)
+    k = np.arange(k_range[0], k_range[1]+1)
+    l = np.arange(l_range[0], l_range[1]+1)
 
-                    i_hkl = [int(np.round((h-h_range[0])/step_h,4)),\
-                             int(np.round((k-k_range[0])/step_k,4)),\
-                             int(np.round((l-l_range[0])/step_l,4))]
+    i_h = np.round((h-h_range[0])/step_h,4).astype(int)
+    i_k = np.round((k-k_range[0])/step_k,4).astype(int)
+    i_l = np.round((l-l_range[0])/step_l,4).astype(int)
 
-                    h0, h1 = i_hkl[0]-box[0], i_hkl[0]+box[0]+1
-                    k0, k1 = i_hkl[1]-box[1], i_hkl[1]+box[1]+1
-                    l0, l1 = i_hkl[2]-box[2], i_hkl[2]+box[2]+1
+    h, k, l = np.meshgrid(h, k, l, indexing='ij')
 
-                    if (h0 < 0): h0 = 0
-                    if (k0 < 0): k0 = 0
-                    if (l0 < 0): l0 = 0
+    allow = reflections(h, k, l, centering=centering) == 1
 
-                    if (h1 >= data.shape[0]): h1 = data.shape[0]
-                    if (k1 >= data.shape[1]): k1 = data.shape[1]
-                    if (l1 >= data.shape[2]): l1 = data.shape[2]
+    i_hkl = np.meshgrid(i_h, i_k, i_l, indexing='ij')
 
-                    values = data[h0:h1,k0:k1,l0:l1].copy()
+    centers = np.stack([i[allow] for i in i_hkl], axis=1).astype(int)
 
-                    if ptype == 'ellipsoid':
-                        values_outside = values.copy()
-                        x, y, z = np.meshgrid(np.arange(h0,h1)-i_hkl[0],
-                                              np.arange(k0,k1)-i_hkl[1],
-                                              np.arange(l0,l1)-i_hkl[2],
-                                              indexing='ij')
-                        mask = (x/box[0])**2+(y/box[1])**2+(z/box[2])**2 > 1
-                        values[mask] = np.nan
+    x, y, z = np.meshgrid(np.arange(-box[0],box[0]+1),
+                          np.arange(-box[1],box[1]+1),
+                          np.arange(-box[2],box[2]+1), indexing='ij')
 
-                    Q3 = np.nanpercentile(values.data,75)
-                    Q1 = np.nanpercentile(values.data,25)
+    if ptype == 'ellipsoid':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stencil = ~((x/box[0])**2+(y/box[1])**2+(z/box[2])**2 > 1)
+    else:
+        stencil = np.ones_like(x, dtype=bool)
 
-                    interquartile = Q3-Q1
+    gaps = [np.diff(i_h), np.diff(i_k), np.diff(i_l)]
 
-                    reject = (values >= Q3+outlier*interquartile) | \
-                             (values <  Q1-outlier*interquartile)
+    disjoint = all(gap.min() > 2*b for gap, b in zip(gaps, box) if gap.size)
 
-                    values[reject] = np.nan
+    values = np.ascontiguousarray(data, dtype=float)
 
-                    if ptype == 'ellipsoid':
-                        values[mask] = values_outside[mask].copy()
+    filters.punch(values, centers, stencil.astype(np.uint8), outlier,
+                  parallel=disjoint)
 
-                    data[h0:h1,k0:k1,l0:l1] = values.copy()
+    if values is not data:
+        data[...] = values
 
     return data
 
 def outlier(signal, size):
 
-    median = filters.median(signal, size)
-
-    mad = filters.median(np.abs(signal-median), size=size)
+    median, mad = filters.median_deviation(signal, size)
 
     asigma = np.abs(mad*3*1.4826)
 
@@ -274,46 +808,39 @@ def outlier(signal, size):
 
 def reflections(h, k, l, centering='P'):
 
+    h, k, l = np.asarray(h), np.asarray(k), np.asarray(l)
+
     # centering == 'P', 'R (rhombohedral axes, primitive cell)'
-    allow = 1
+    allow = np.ones(np.broadcast(h, k, l).shape, dtype=bool)
 
     if centering == 'I':
-        if (h+k+l) % 2 != 0:
-            allow = 0
+        allow = (h+k+l) % 2 == 0
 
     elif centering == 'F':
-        if (h+k) % 2 != 0 or (k+l) % 2 != 0 or (l+h) % 2 != 0:
-            allow = 0
+        allow = ((h+k) % 2 == 0) & ((k+l) % 2 == 0) & ((l+h) % 2 == 0)
 
     elif centering == 'A':
-        if (k+l) % 2 != 0:
-            allow = 0
+        allow = (k+l) % 2 == 0
 
     elif centering == 'B':
-        if (l+h) % 2 != 0:
-            allow = 0
+        allow = (l+h) % 2 == 0
 
     elif centering == 'C':
-        if (h+k) % 2 != 0:
-            allow = 0
+        allow = (h+k) % 2 == 0
 
     elif centering == 'R(obv)': # (hexagonal axes, triple obverse cell)
-        if (-h+k+l) % 3 != 0:
-            allow = 0
+        allow = (-h+k+l) % 3 == 0
 
     elif centering == 'R(rev)': # (hexagonal axes, triple reverse cell)
-        if (h-k+l) % 3 != 0:
-            allow = 0
+        allow = (h-k+l) % 3 == 0
 
     elif centering == 'H': # (hexagonal axes, triple hexagonal cell)
-        if (h-k) % 3 != 0:
-            allow = 0
+        allow = (h-k) % 3 == 0
 
     elif centering == 'D': # (rhombohedral axes, triple rhombohedral cell)
-        if (h+k+l) % 3 != 0:
-            allow = 0
+        allow = (h+k+l) % 3 == 0
 
-    return allow
+    return allow.astype(int)[()]
 
 def correlations(fname, data, label):
 
@@ -3,27 +3,87 @@
 
 cimport cython
 
+cdef void contract(const double [:,:,::1] a,
+                   const double [:,:,::1] b,
+                   double [:,:,::1] c,
+                   double [:,:,::1] d,
+                   double [:,:,:,::1] scratch,
+                   Py_ssize_t [::1] indptr0,
+                   Py_ssize_t [::1] indices0,
+                   double [::1] data0,
+                   Py_ssize_t [::1] indptr1,
+                   Py_ssize_t [::1] indices1,
+                   double [::1] data1,
+                   Py_ssize_t [::1] indptr2,
+                   Py_ssize_t [::1] indices2,
+                   double [::1] data2,
+                   bint pair) nogil
+
+cdef Py_ssize_t extent(Py_ssize_t sigma, Py_ssize_t n) nogil
+
 cdef void blur0(double [::1] target,
                 double [::1] source,
-                Py_ssize_t sigma,
+                Py_ssize_t s,
                 Py_ssize_t nh,
                 Py_ssize_t nk,
                 Py_ssize_t nl) nogil
 
 cdef void blur1(double [::1] target,
                 double [::1] source,
-                Py_ssize_t sigma,
-                Py_ssize_t nh,
+                Py_ssize_t s,
+                Py_ssize_t i,
                 Py_ssize_t nk,
                 Py_ssize_t nl) nogil
 
 cdef void blur2(double [::1] target,
                 double [::1] source,
-                Py_ssize_t sigma,
-                Py_ssize_t nh,
+                double [::1] weights,
+                bint weighted,
+                Py_ssize_t s,
+                Py_ssize_t i,
                 Py_ssize_t nk,
                 Py_ssize_t nl) nogil
 
+cdef void box(double [::1] target,
+              double [::1] source,
+              double [::1] work,
+              double [::1] weights,
+              bint weighted,
+              Py_ssize_t s0,
+              Py_ssize_t s1,
+              Py_ssize_t s2,
+              Py_ssize_t nh,
+              Py_ssize_t nk,
+              Py_ssize_t nl) nogil
+
+cdef void convolve(double [::1] target,
+                   double [::1] source,
+                   double [::1] a,
+                   double [::1] b,
+                   double [::1] weights,
+                   bint weighted,
+                   long [::1] boxes,
+                   Py_ssize_t nh,
+                   Py_ssize_t nk,
+                   Py_ssize_t nl) nogil
+
+cdef void iir(double [::1] target,
+              double [::1] source,
+              double [:,::1] coeffs,
+              Py_ssize_t axis,
+              Py_ssize_t offset,
+              Py_ssize_t stride,
+              Py_ssize_t n) nogil
+
+cdef void recurse(double [::1] target,
+                  double [::1] source,
+                  double [:,::1] coeffs,
+                  double [::1] weights,
+                  bint weighted,
+                  Py_ssize_t nh,
+                  Py_ssize_t nk,
+                  Py_ssize_t nl) nogil
+
 cdef void weight(double [::1] w, double [::1] u, double [::1] v) nogil
 
 cpdef void gauss(double [::1] v,
@@ -31,16 +91,17 @@ cpdef void gauss(double [::1] v,
                  long [::1] boxes,
                  double [::1] a,
                  double [::1] b,
-                 double [::1] c,
-                 double [::1] d,
-                 double [::1] e,
-                 double [::1] f,
-                 double [::1] g,
-                 double [::1] h,
                  Py_ssize_t nh,
                  Py_ssize_t nk,
                  Py_ssize_t nl) nogil
 
+cpdef void gauss_recursive(double [::1] v,
+                           double [::1] u,
+                           double [:,::1] coeffs,
+                           Py_ssize_t nh,
+                           Py_ssize_t nk,
+                           Py_ssize_t nl) nogil
+
 cpdef void blur(double [::1] v,
                 double [::1] u,
                 long [::1] boxes,
@@ -52,28 +113,41 @@ cpdef void filtering(double [::1] t,
                      double [::1] s,
                      double [::1] v_inv,
                      long [::1] boxes,
+                     double [:,::1] coeffs,
                      double [::1] a,
                      double [::1] b,
-                     double [::1] c,
-                     double [::1] d,
-                     double [::1] e,
-                     double [::1] f,
-                     double [::1] g,
-                     double [::1] h,
-                     double [::1] i,
                      Py_ssize_t nh,
                      Py_ssize_t nk,
                      Py_ssize_t nl) nogil
 
-cdef void sort(double [:,::1] data,
-               long long [:,::1] order,
-               int n,
-               Py_ssize_t thread_id) nogil
-
-cdef void copysort(double [:,::1] data,
-                   double [:,::1] copy_data,
-                   long long [:,::1] order,
-                   long long [:,::1] copy_order,
-                   long long [:,::1] temp_order,
-                   int n,
-                   Py_ssize_t thread_id) nogil
+cdef int ascending(const void *a, const void *b) nogil
+
+cdef void insertion(double *data, Py_ssize_t n) nogil
+
+cdef void update(double *window,
+                 double *work,
+                 double *outgoing,
+                 double *incoming,
+                 Py_ssize_t n,
+                 Py_ssize_t m) nogil
+
+cdef double deviation(double *window, Py_ssize_t n) nogil
+
+cdef void sliding(double [:,:,::1] A,
+                  double [:,:,::1] b,
+                  double [:,:,::1] c,
+                  double [:,::1] windows,
+                  double [:,::1] planes,
+                  double [:,::1] columns,
+                  bint mad,
+                  Py_ssize_t size) nogil
+
+cdef double quantile(double *values, Py_ssize_t n, double q) nogil
+
+cdef void reject(double [:,:,::1] data,
+                 unsigned char [:,:,::1] stencil,
+                 double *values,
+                 Py_ssize_t i,
+                 Py_ssize_t j,
+                 Py_ssize_t k,
+                 double outlier) nogil
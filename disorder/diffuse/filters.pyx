@@ -9,261 +9,357 @@ from cython.parallel import prange
 cimport cython
 cimport openmp
 
-from libc.math cimport M_PI, cos, sin, exp, sqrt, acos, fabs
+from libc.math cimport M_PI, cos, sin, exp, sqrt, acos, fabs, floor
+from libc.math cimport isnan, NAN
+from libc.stdlib cimport qsort
 
 import os, sys
 
-def rebin0(double [:,:,::1] a, double [:,::1] comp):
+cdef void contract(const double [:,:,::1] a,
+                   const double [:,:,::1] b,
+                   double [:,:,::1] c,
+                   double [:,:,::1] d,
+                   double [:,:,:,::1] scratch,
+                   Py_ssize_t [::1] indptr0,
+                   Py_ssize_t [::1] indices0,
+                   double [::1] data0,
+                   Py_ssize_t [::1] indptr1,
+                   Py_ssize_t [::1] indices1,
+                   double [::1] data1,
+                   Py_ssize_t [::1] indptr2,
+                   Py_ssize_t [::1] indices2,
+                   double [::1] data2,
+                   bint pair) nogil:
+
+    cdef Py_ssize_t n0 = c.shape[0]
+    cdef Py_ssize_t n1 = c.shape[1]
+    cdef Py_ssize_t n2 = c.shape[2]
 
     cdef Py_ssize_t m1 = a.shape[1]
-    cdef Py_ssize_t m2 = a.shape[2]
 
-    cdef Py_ssize_t n0 = comp.shape[0]
+    cdef Py_ssize_t thread_id, i, j, k, l, m, n, p, q
 
-    ind_i_np, ind_l_np = np.ma.nonzero(comp)
+    cdef double u, w, s, t
 
-    cdef Py_ssize_t [::] ind_i = ind_i_np
-    cdef Py_ssize_t [::] ind_l = ind_l_np
+    for i in prange(n0):
 
-    cdef Py_ssize_t n = ind_l.shape[0]
+        thread_id = openmp.omp_get_thread_num()
 
-    b_np = np.zeros((n0,m1,m2), dtype=np.double)
+        for p in range(indptr0[i], indptr0[i+1]):
 
-    cdef double [:,:,::1] b = b_np
+            l = indices0[p]
+            u = data0[p]
 
-    cdef double weight
+            for m in range(m1):
+                for k in range(n2):
+                    s = 0
+                    t = 0
+                    for q in range(indptr2[k], indptr2[k+1]):
+                        n = indices2[q]
+                        w = data2[q]
+                        s = s+w*a[l,m,n]
+                        if pair:
+                            t = t+w*b[l,m,n]
+                    scratch[thread_id,0,m,k] = s
+                    scratch[thread_id,1,m,k] = t
 
-    cdef Py_ssize_t i, j, k, l, m
+            for j in range(n1):
+                for q in range(indptr1[j], indptr1[j+1]):
+                    m = indices1[q]
+                    w = u*data1[q]
+                    for k in range(n2):
+                        c[i,j,k] += w*scratch[thread_id,0,m,k]
+                        if pair:
+                            d[i,j,k] += w*scratch[thread_id,1,m,k]
+
+def rebin(a, operators, b=None):
+    """
+    Rebin data with sparse operators along each dimension.
 
-    with nogil:
-        for m in range(n):
-            i = ind_i[m]
-            l = ind_l[m]
-            weight = comp[i,l]
-            for j in range(m1):
-                for k in prange(m2):
-                    b[i,j,k] += weight*a[l,j,k]
+    The last dimension is contracted first, one input plane at a time, so
+    the input is read in a single pass. A second array, such as the errors
+    squared, is rebinned with the same weights in the same pass.
 
-    return b_np
+    Parameters
+    ----------
+    a : 3d array
+        Data to rebin.
+    operators : list of tuples
+        Compressed sparse row pointers, indices, and weights along each
+        dimension.
+    b : 3d array, optional
+        Second array to rebin. Default is ``None``.
 
-def rebin1(double [:,:,::1] a, double [:,::1] comp):
+    Returns
+    -------
+    c : 3d array
+        Rebinned data.
+    d : 3d array
+        Rebinned second array if given.
 
-    cdef Py_ssize_t m0 = a.shape[0]
-    cdef Py_ssize_t m2 = a.shape[2]
+    """
 
-    cdef Py_ssize_t n1 = comp.shape[0]
+    cdef Py_ssize_t num_threads = openmp.omp_get_max_threads()
 
-    ind_j_np, ind_l_np = np.ma.nonzero(comp)
+    cdef bint pair = b is not None
 
-    cdef Py_ssize_t [::] ind_j = ind_j_np
-    cdef Py_ssize_t [::] ind_l = ind_l_np
+    a = np.ascontiguousarray(a, dtype=float)
+    b = np.ascontiguousarray(b, dtype=float) if pair else a
 
-    cdef Py_ssize_t n = ind_l.shape[0]
+    (indptr0, indices0, data0), \
+    (indptr1, indices1, data1), \
+    (indptr2, indices2, data2) = operators
 
-    b_np = np.zeros((m0,n1,m2), dtype=np.double)
+    shape = indptr0.size-1, indptr1.size-1, indptr2.size-1
 
-    cdef double [:,:,::1] b = b_np
+    c = np.zeros(shape)
+    d = np.zeros(shape) if pair else c
 
-    cdef double weight
+    scratch = np.zeros((num_threads,2,a.shape[1],shape[2]))
 
-    cdef Py_ssize_t i, j, k, l, m
+    contract(a, b, c, d, scratch,
+             indptr0, indices0, data0,
+             indptr1, indices1, data1,
+             indptr2, indices2, data2, pair)
 
-    with nogil:
-        for m in range(n):
-            j = ind_j[m]
-            l = ind_l[m]
-            for i in range(m0):
-                weight = comp[j,l]
-                for k in prange(m2):
-                    b[i,j,k] += weight*a[i,l,k]
+    if pair:
+        return c, d
+    else:
+        return c
 
-    return b_np
+cdef Py_ssize_t extent(Py_ssize_t sigma, Py_ssize_t n) nogil:
 
-def rebin2(double [:,:,::1] a, double [:,::1] comp):
+    if (n-sigma > 0):
+        return sigma
+    else:
+        return 0
 
-    cdef Py_ssize_t m0 = a.shape[0]
-    cdef Py_ssize_t m1 = a.shape[1]
+cdef void blur0(double [::1] target,
+                double [::1] source,
+                Py_ssize_t s,
+                Py_ssize_t nh,
+                Py_ssize_t nk,
+                Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t n2 = comp.shape[0]
+    cdef double normal = 1./(2*s+1)
 
-    ind_k_np, ind_l_np = np.ma.nonzero(comp)
+    cdef Py_ssize_t u, j, k
 
-    cdef Py_ssize_t [::] ind_k = ind_k_np
-    cdef Py_ssize_t [::] ind_l = ind_l_np
+    cdef Py_ssize_t i_j, i_u, i_p, i_m
 
-    cdef Py_ssize_t n = ind_l.shape[0]
+    cdef Py_ssize_t nkl = nk*nl
 
-    b_np = np.zeros((m0,m1,n2), dtype=np.double)
+    for j in prange(nk):
 
-    cdef double [:,:,::1] b = b_np
+        i_j = nl*j
 
-    cdef double weight
+        for k in range(nl):
+            target[i_j+k] = s*source[i_j+k]
 
-    cdef Py_ssize_t i, j, k, l, m
+        for u in range(0,s+1,1):
+            i_p = i_j+nkl*min(u,nh-1)
+            for k in range(nl):
+                target[i_j+k] = target[i_j+k]+source[i_p+k]
 
-    with nogil:
-        for m in range(n):
-            k = ind_k[m]
-            l = ind_l[m]
-            for i in range(m0):
-                for j in prange(m1):
-                    weight = comp[k,l]
-                    b[i,j,k] += weight*a[i,j,l]
+        for k in range(nl):
+            target[i_j+k] = target[i_j+k]*normal
 
-    return b_np
+        for u in range(1,nh,1):
+            i_u = i_j+nkl*u
+            i_p = i_j+nkl*min(u+s,nh-1)
+            i_m = i_j+nkl*max(u-s-1,0)
+            for k in range(nl):
+                target[i_u+k] = target[i_u-nkl+k]\
+                              + (source[i_p+k]-source[i_m+k])*normal
 
-cdef void blur0(double [::1] target,
+cdef void blur1(double [::1] target,
                 double [::1] source,
-                Py_ssize_t sigma,
-                Py_ssize_t nh,
+                Py_ssize_t s,
+                Py_ssize_t i,
                 Py_ssize_t nk,
                 Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t s
-
-    if (nh-sigma > 0):
-        s = sigma
-    else:
-        s = 0
-
     cdef double normal = 1./(2*s+1)
 
-    cdef double value, f, g
+    cdef Py_ssize_t v, k
 
-    cdef Py_ssize_t u, j, k
+    cdef Py_ssize_t i_i = nk*nl*i
 
-    cdef Py_ssize_t i_j, i_jk
+    cdef Py_ssize_t i_v, i_p, i_m
 
-    cdef Py_ssize_t nkl = nk*nl
+    for k in range(nl):
+        target[i_i+k] = s*source[i_i+k]
 
-    for j in prange(nk):
+    for v in range(0,s+1,1):
+        i_p = i_i+nl*min(v,nk-1)
+        for k in range(nl):
+            target[i_i+k] = target[i_i+k]+source[i_p+k]
 
-        i_j = nl*j
+    for k in range(nl):
+        target[i_i+k] = target[i_i+k]*normal
 
+    for v in range(1,nk,1):
+        i_v = i_i+nl*v
+        i_p = i_i+nl*min(v+s,nk-1)
+        i_m = i_i+nl*max(v-s-1,0)
         for k in range(nl):
+            target[i_v+k] = target[i_v-nl+k]\
+                          + (source[i_p+k]-source[i_m+k])*normal
 
-            i_jk = k+i_j
+cdef void blur2(double [::1] target,
+                double [::1] source,
+                double [::1] weights,
+                bint weighted,
+                Py_ssize_t s,
+                Py_ssize_t i,
+                Py_ssize_t nk,
+                Py_ssize_t nl) nogil:
 
-            f = source[i_jk]
-            g = source[i_jk+nkl*(nh-1)]
+    cdef double normal = 1./(2*s+1)
 
-            value = (s+1)*f
-            for u in range(0,s,1):
-                value = value+source[i_jk+nkl*u]
+    cdef double value
 
-            for u in range(0,s+1,1):
-                value = value+source[i_jk+nkl*(u+s)]-f
-                target[i_jk+nkl*u] = value*normal
+    cdef Py_ssize_t j, w
 
-            for u in range(s+1,nh-s,1):
-                value = value+source[i_jk+nkl*(u+s)]-source[i_jk+nkl*(u-s-1)]
-                target[i_jk+nkl*u] = value*normal
+    cdef Py_ssize_t i_ij
 
-            for u in range(nh-s,nh,1):
-                value = value+g-source[i_jk+nkl*(u-s-1)]
-                target[i_jk+nkl*u] = value*normal
+    for j in range(nk):
 
-cdef void blur1(double [::1] target,
-                double [::1] source,
-                Py_ssize_t sigma,
-                Py_ssize_t nh,
-                Py_ssize_t nk,
-                Py_ssize_t nl) nogil:
+        i_ij = nl*(j+nk*i)
 
-    cdef Py_ssize_t s
+        value = s*source[i_ij]
+        for w in range(0,s+1,1):
+            value = value+source[i_ij+min(w,nl-1)]
 
-    if (nk-sigma > 0):
-        s = sigma
-    else:
-        s = 0
+        target[i_ij] = value*normal
 
-    cdef double normal = 1./(2*s+1)
+        for w in range(1,nl,1):
+            value = value+source[i_ij+min(w+s,nl-1)]\
+                         -source[i_ij+max(w-s-1,0)]
+            target[i_ij+w] = value*normal
 
-    cdef double value, f, g
+        if weighted:
+            for w in range(nl):
+                target[i_ij+w] = target[i_ij+w]*weights[i_ij+w]
 
-    cdef Py_ssize_t i, v, k
+cdef void box(double [::1] target,
+              double [::1] source,
+              double [::1] work,
+              double [::1] weights,
+              bint weighted,
+              Py_ssize_t s0,
+              Py_ssize_t s1,
+              Py_ssize_t s2,
+              Py_ssize_t nh,
+              Py_ssize_t nk,
+              Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t i_i, i_ik
+    cdef Py_ssize_t i
 
-    cdef Py_ssize_t nkl = nk*nl
+    blur0(target, source, extent(s0, nh), nh, nk, nl)
+
+    s1, s2 = extent(s1, nk), extent(s2, nl)
 
     for i in prange(nh):
 
-        i_i = nkl*i
+        blur1(work, target, s1, i, nk, nl)
+        blur2(target, work, weights, weighted, s2, i, nk, nl)
 
-        for k in range(nl):
+cdef void convolve(double [::1] target,
+                   double [::1] source,
+                   double [::1] a,
+                   double [::1] b,
+                   double [::1] weights,
+                   bint weighted,
+                   long [::1] boxes,
+                   Py_ssize_t nh,
+                   Py_ssize_t nk,
+                   Py_ssize_t nl) nogil:
 
-            i_ik = k+i_i
+    cdef Py_ssize_t m = boxes.shape[0] // 3, p = m // 3
 
-            f = source[i_ik]
-            g = source[i_ik+nl*(nk-1)]
+    box(a, source, b, weights, False,
+        boxes[0], boxes[p], boxes[2*p], nh, nk, nl)
 
-            value = (s+1)*f
-            for v in range(0,s,1):
-                value = value+source[i_ik+nl*v]
+    box(b, a, a, weights, False,
+        boxes[m], boxes[m+p], boxes[m+2*p], nh, nk, nl)
 
-            for v in range(0,s+1,1):
-                value = value+source[i_ik+nl*(v+s)]-f
-                target[i_ik+nl*v] = value*normal
+    box(target, b, b, weights, weighted,
+        boxes[2*m], boxes[2*m+p], boxes[2*m+2*p], nh, nk, nl)
 
-            for v in range(s+1,nk-s,1):
-                value = value+source[i_ik+nl*(v+s)]-source[i_ik+nl*(v-s-1)]
-                target[i_ik+nl*v] = value*normal
+cdef void iir(double [::1] target,
+              double [::1] source,
+              double [:,::1] coeffs,
+              Py_ssize_t axis,
+              Py_ssize_t offset,
+              Py_ssize_t stride,
+              Py_ssize_t n) nogil:
 
-            for v in range(nk-s,nk,1):
-                value = value+g-source[i_ik+nl*(v-s-1)]
-                target[i_ik+nl*v] = value*normal
+    cdef double B = coeffs[axis,0]
 
-cdef void blur2(double [::1] target,
-                double [::1] source,
-                Py_ssize_t sigma,
-                Py_ssize_t nh,
-                Py_ssize_t nk,
-                Py_ssize_t nl) nogil:
+    cdef double a1 = coeffs[axis,1], a2 = coeffs[axis,2], a3 = coeffs[axis,3]
 
-    cdef Py_ssize_t s
+    cdef double first = source[offset], last = source[offset+stride*(n-1)]
 
-    if (nl-sigma > 0):
-        s = sigma
-    else:
-        s = 0
+    cdef double w, w1, w2, w3, y1, y2, y3
 
-    cdef double normal = 1./(2*s+1)
+    cdef Py_ssize_t u, i_u
 
-    cdef double value, f, g
+    w1, w2, w3 = first, first, first
 
-    cdef Py_ssize_t i, j, w
+    for u in range(n):
+        i_u = offset+stride*u
+        w = B*source[i_u]+a1*w1+a2*w2+a3*w3
+        target[i_u] = w
+        w1, w2, w3 = w, w1, w2
 
-    cdef Py_ssize_t i_i, i_ij
+    w1, w2, w3 = w1-last, w2-last, w3-last
 
-    cdef Py_ssize_t nkl = nk*nl
+    y1 = coeffs[axis,4]*w1+coeffs[axis,5]*w2+coeffs[axis,6]*w3+last
+    y2 = coeffs[axis,7]*w1+coeffs[axis,8]*w2+coeffs[axis,9]*w3+last
+    y3 = coeffs[axis,10]*w1+coeffs[axis,11]*w2+coeffs[axis,12]*w3+last
 
-    for i in prange(nh):
+    target[offset+stride*(n-1)] = y1
 
-        i_i = nkl*i
+    for u in range(n-2,-1,-1):
+        i_u = offset+stride*u
+        w = B*target[i_u]+a1*y1+a2*y2+a3*y3
+        target[i_u] = w
+        y1, y2, y3 = w, y1, y2
 
-        for j in range(nk):
+cdef void recurse(double [::1] target,
+                  double [::1] source,
+                  double [:,::1] coeffs,
+                  double [::1] weights,
+                  bint weighted,
+                  Py_ssize_t nh,
+                  Py_ssize_t nk,
+                  Py_ssize_t nl) nogil:
 
-            i_ij = nl*j+i_i
+    cdef Py_ssize_t i, j, k, w
 
-            f = source[i_ij]
-            g = source[i_ij+nl-1]
+    cdef Py_ssize_t i_ij
 
-            value = (s+1)*f
-            for w in range(0,s,1):
-                value = value+source[i_ij+w]
+    cdef Py_ssize_t nkl = nk*nl
+
+    for j in prange(nk):
+        for k in range(nl):
+            iir(target, source, coeffs, 0, nl*j+k, nkl, nh)
+
+    for i in prange(nh):
+
+        for k in range(nl):
+            iir(target, target, coeffs, 1, nkl*i+k, nl, nk)
 
-            for w in range(0,s+1,1):
-                value = value+source[i_ij+w+s]-f
-                target[i_ij+w] = value*normal
+        for j in range(nk):
+
+            i_ij = nl*j+nkl*i
 
-            for w in range(s+1,nl-s,1):
-                value = value+source[i_ij+w+s]-source[i_ij+w-s-1]
-                target[i_ij+w] = value*normal
+            iir(target, target, coeffs, 2, i_ij, 1, nl)
 
-            for w in range(nl-s,nl,1):
-                value = value+g-source[i_ij+w-s-1]
-                target[i_ij+w] = value*normal
+            if weighted:
+                for w in range(nl):
+                    target[i_ij+w] = target[i_ij+w]*weights[i_ij+w]
 
 cdef void weight(double [::1] w, double [::1] u, double [::1] v) nogil:
 
@@ -279,45 +375,20 @@ cpdef void gauss(double [::1] v,
                  long [::1] boxes,
                  double [::1] a,
                  double [::1] b,
-                 double [::1] c,
-                 double [::1] d,
-                 double [::1] e,
-                 double [::1] f,
-                 double [::1] g,
-                 double [::1] h,
                  Py_ssize_t nh,
                  Py_ssize_t nk,
                  Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t n = boxes.shape[0]
-
-    if (n == 3):
-
-        blur0(a, u, boxes[0], nh, nk, nl)
-        blur1(b, a, boxes[0], nh, nk, nl)
-        blur2(c, b, boxes[0], nh, nk, nl)
-
-        blur0(d, c, boxes[1], nh, nk, nl)
-        blur1(e, d, boxes[1], nh, nk, nl)
-        blur2(f, e, boxes[1], nh, nk, nl)
-
-        blur0(g, f, boxes[2], nh, nk, nl)
-        blur1(h, g, boxes[2], nh, nk, nl)
-        blur2(v, h, boxes[2], nh, nk, nl)
-
-    else:
-
-        blur0(a, u, boxes[0], nh, nk, nl)
-        blur1(b, a, boxes[1], nh, nk, nl)
-        blur2(c, b, boxes[2], nh, nk, nl)
+    convolve(v, u, a, b, v, False, boxes, nh, nk, nl)
 
-        blur0(d, c, boxes[3], nh, nk, nl)
-        blur1(e, d, boxes[4], nh, nk, nl)
-        blur2(f, e, boxes[5], nh, nk, nl)
+cpdef void gauss_recursive(double [::1] v,
+                           double [::1] u,
+                           double [:,::1] coeffs,
+                           Py_ssize_t nh,
+                           Py_ssize_t nk,
+                           Py_ssize_t nl) nogil:
 
-        blur0(g, f, boxes[6], nh, nk, nl)
-        blur1(h, g, boxes[7], nh, nk, nl)
-        blur2(v, h, boxes[8], nh, nk, nl)
+    recurse(v, u, coeffs, v, False, nh, nk, nl)
 
 cpdef void blur(double [::1] v,
                 double [::1] u,
@@ -326,84 +397,23 @@ cpdef void blur(double [::1] v,
                 Py_ssize_t nk,
                 Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t n = boxes.shape[0]
-
-    if (n == 3):
-
-        blur0(v, u, boxes[0], nh, nk, nl)
-        blur1(u, v, boxes[0], nh, nk, nl)
-        blur2(v, u, boxes[0], nh, nk, nl)
-
-        blur0(u, v, boxes[1], nh, nk, nl)
-        blur1(v, u, boxes[1], nh, nk, nl)
-        blur2(u, v, boxes[1], nh, nk, nl)
-
-        blur0(v, u, boxes[2], nh, nk, nl)
-        blur1(u, v, boxes[2], nh, nk, nl)
-        blur2(v, u, boxes[2], nh, nk, nl)
-
-    else:
-
-        blur0(v, u, boxes[0], nh, nk, nl)
-        blur1(u, v, boxes[1], nh, nk, nl)
-        blur2(v, u, boxes[2], nh, nk, nl)
-
-        blur0(u, v, boxes[3], nh, nk, nl)
-        blur1(v, u, boxes[4], nh, nk, nl)
-        blur2(u, v, boxes[5], nh, nk, nl)
-
-        blur0(v, u, boxes[6], nh, nk, nl)
-        blur1(u, v, boxes[7], nh, nk, nl)
-        blur2(v, u, boxes[8], nh, nk, nl)
+    convolve(v, u, v, u, v, False, boxes, nh, nk, nl)
 
 cpdef void filtering(double [::1] t,
                      double [::1] s,
                      double [::1] v_inv,
                      long [::1] boxes,
+                     double [:,::1] coeffs,
                      double [::1] a,
                      double [::1] b,
-                     double [::1] c,
-                     double [::1] d,
-                     double [::1] e,
-                     double [::1] f,
-                     double [::1] g,
-                     double [::1] h,
-                     double [::1] i,
                      Py_ssize_t nh,
                      Py_ssize_t nk,
                      Py_ssize_t nl) nogil:
 
-    cdef Py_ssize_t n = boxes.shape[0]
-
-    if (n == 3):
-
-        blur0(a, s, boxes[0], nh, nk, nl)
-        blur1(b, a, boxes[0], nh, nk, nl)
-        blur2(c, b, boxes[0], nh, nk, nl)
-
-        blur0(d, c, boxes[1], nh, nk, nl)
-        blur1(e, d, boxes[1], nh, nk, nl)
-        blur2(f, e, boxes[1], nh, nk, nl)
-
-        blur0(g, f, boxes[2], nh, nk, nl)
-        blur1(h, g, boxes[2], nh, nk, nl)
-        blur2(i, h, boxes[2], nh, nk, nl)
-
+    if (coeffs.shape[0] > 0):
+        recurse(t, s, coeffs, v_inv, True, nh, nk, nl)
     else:
-
-        blur0(a, s, boxes[0], nh, nk, nl)
-        blur1(b, a, boxes[1], nh, nk, nl)
-        blur2(c, b, boxes[2], nh, nk, nl)
-
-        blur0(d, c, boxes[3], nh, nk, nl)
-        blur1(e, d, boxes[4], nh, nk, nl)
-        blur2(f, e, boxes[5], nh, nk, nl)
-
-        blur0(g, f, boxes[6], nh, nk, nl)
-        blur1(h, g, boxes[7], nh, nk, nl)
-        blur2(i, h, boxes[8], nh, nk, nl)
-
-    weight(t, i, v_inv)
+        convolve(t, s, a, b, v_inv, True, boxes, nh, nk, nl)
 
 def boxblur(sigma, n):
 
@@ -447,45 +457,132 @@ def boxblur(sigma, n):
 
     return ((np.array(sizes)-1)/2).astype(int).flatten()
 
-def gaussian(mask, sigma):
+def recursion(sigma):
+    """
+    Recursive Gaussian filter coefficients.
 
-    v = np.ones(mask.shape)
-    v[mask] = 0
+    Young and van Vliet third-order recursion applied forward and backward
+    along each dimension. The backward pass is initialized for a constant
+    extension of the boundary, consistent with the box filter.
 
-    v = v.flatten()
+    Parameters
+    ----------
+    sigma : tuple, float
+        Standard deviation along each dimension.
 
-    a = np.zeros(mask.size)
-    b = np.zeros(mask.size)
-    c = np.zeros(mask.size)
-    d = np.zeros(mask.size)
-    e = np.zeros(mask.size)
-    f = np.zeros(mask.size)
-    g = np.zeros(mask.size)
-    h = np.zeros(mask.size)
+    Returns
+    -------
+    coeffs : 2d array
+        Gain, feedback coefficients, and boundary matrix of each dimension.
 
-    w = np.zeros(mask.size)
+    """
 
-    boxes = boxblur(sigma, 3)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (3,))
 
-    nh, nk, nl = mask.shape[0], mask.shape[1], mask.shape[2]
+    coeffs = np.zeros((3,13))
 
-    if np.isclose(sigma, 0).all():
+    for axis, s in enumerate(sigma):
 
-        return v
+        if (s < 0.5):
+
+            b = np.zeros(3)
+
+        else:
+
+            if (s >= 2.5):
+                q = 0.98711*s-0.96330
+            else:
+                q = 3.97156-4.14554*np.sqrt(1-0.26891*s)
+
+            b0 = 1.57825+2.44413*q+1.4281*q**2+0.422205*q**3
+
+            b = np.array([2.44413*q+2.85619*q**2+1.26661*q**3,
+                          -1.4281*q**2-1.26661*q**3,
+                          0.422205*q**3])/b0
+
+        B = 1-b.sum()
+
+        n = int(np.ceil(20*(1+s)))
+
+        M = np.zeros((3,3))
+
+        for j in range(3):
+
+            w = np.zeros(n+3)
+            w[2-j] = 1
+
+            for u in range(3,n+3):
+                w[u] = b[0]*w[u-1]+b[1]*w[u-2]+b[2]*w[u-3]
+
+            y = np.zeros(n+4)
+
+            for u in range(n,-1,-1):
+                y[u] = B*w[u+2]+b[0]*y[u+1]+b[1]*y[u+2]+b[2]*y[u+3]
+
+            M[:,j] = y[0:3]
+
+        coeffs[axis,0] = B
+        coeffs[axis,1:4] = b
+        coeffs[axis,4:] = M.flatten()
+
+    return coeffs
+
+def smooth(u, sigma, shape, recursive=False):
+    """
+    Gaussian smoothing of a flattened array.
+
+    Parameters
+    ----------
+    u : 1d array
+        Flattened array to filter. Not modified.
+    sigma : tuple, float
+        Window size.
+    shape : tuple, int
+        Dimensions of the array.
+    recursive : bool, optional
+        Use the recursive filter instead of successive box filters. Default
+        is ``False``.
+
+    Returns
+    -------
+    v : 1d array
+        Filtered array.
+
+    """
+
+    nh, nk, nl = shape
+
+    u = np.ascontiguousarray(u, dtype=float)
+
+    v = np.zeros(u.size)
+
+    if recursive:
+
+        gauss_recursive(v, u, recursion(sigma), nh, nk, nl)
 
     else:
 
-        gauss(w, v, boxes, a, b, c, d, e, f, g, h, nh, nk, nl)
+        a = np.zeros(u.size)
+        b = np.zeros(u.size)
 
-        veil = np.isclose(w,0)
+        gauss(v, u, boxblur(sigma, 3), a, b, nh, nk, nl)
+
+    return v
+
+def gaussian(mask, sigma, recursive=False):
+
+    v = np.ones(mask.shape)
+    v[mask] = 0
+
+    v = v.flatten()
 
-        if (np.sum(veil) > 0):
+    if np.isclose(sigma, 0).all():
 
-            x = np.zeros(mask.size)
+        return v
 
-            gauss(x, v, boxes, a, b, c, d, e, f, g, h, nh, nk, nl)
+    else:
 
-            w[veil] = x[veil].copy()
+        w = smooth(v, sigma, mask.shape, recursive)
 
         veil = np.isclose(w,0)
 
@@ -494,20 +591,7 @@ def gaussian(mask, sigma):
 
         return w_inv
 
-def boxfilter(I, mask, sigma, v_inv):
-
-    a = np.zeros(mask.size)
-    b = np.zeros(mask.size)
-    c = np.zeros(mask.size)
-    d = np.zeros(mask.size)
-    e = np.zeros(mask.size)
-    f = np.zeros(mask.size)
-    g = np.zeros(mask.size)
-    h = np.zeros(mask.size)
-
-    i = np.zeros(mask.size)
-
-    boxes = boxblur(sigma, 3)
+def boxfilter(I, mask, sigma, v_inv, recursive=False):
 
     nh, nk, nl = mask.shape[0], mask.shape[1], mask.shape[2]
 
@@ -520,11 +604,11 @@ def boxfilter(I, mask, sigma, v_inv):
         u = I.copy()
         u[mask] = 0
 
-        gauss(i, u.flatten(), boxes, a, b, c, d, e, f, g, h, nh, nk, nl)
+        i = smooth(u.flatten(), sigma, mask.shape, recursive)
 
         return (v_inv*i).reshape(nh,nk,nl)
 
-def blurring(a, sigma):
+def blurring(a, sigma, recursive=False):
     """
     Gaussian blur.
 
@@ -534,6 +618,9 @@ def blurring(a, sigma):
         Array to filter.
     sigma : tuple, float
         Window size.
+    recursive : bool, optional
+        Use the recursive filter, whose cost does not depend on the window
+        size, instead of successive box filters. Default is ``False``.
 
     Returns
     -------
@@ -546,263 +633,403 @@ def blurring(a, sigma):
 
     sigma = np.asarray(sigma)
 
-    b = np.zeros(a.size)
-
-    boxes = boxblur(sigma, 3)
-
-    nh, nk, nl = a.shape[0], a.shape[1], a.shape[2]
-
     if np.isclose(sigma, 0).all():
 
         return a
 
     else:
 
-        blur(b, a.flatten(), boxes, nh, nk, nl)
-
-        return b.reshape(nh,nk,nl)
-
-cdef void sort(double [:,::1] data,
-               long long [:,::1] order,
-               int n,
-               Py_ssize_t thread_id) nogil:
-
-    cdef double temp
-
-    cdef Py_ssize_t temp_ind, i, j, k
-
-    i = 1
-    while (i < n):
-        temp = data[thread_id,i]
-        temp_ind = order[thread_id,i]
-        j = i-1
-        while (j >= 0 and data[thread_id,j] > temp):
-            k = j+1
-            data[thread_id,k] = data[thread_id,j]
-            order[thread_id,k] = order[thread_id,j]
-            j = j-1
-        k = j+1
-        data[thread_id,k] = temp
-        order[thread_id,k] = temp_ind
-        i = i+1
-
-cdef void copysort(double [:,::1] data,
-                   double [:,::1] copy_data,
-                   long long [:,::1] order,
-                   long long [:,::1] copy_order,
-                   long long [:,::1] temp_order,
-                   int n,
-                   Py_ssize_t thread_id) nogil:
-
-    cdef double temp
-
-    cdef Py_ssize_t temp_ind, temp_temp_ind, i, j, k
-
-    i = 1
-    while (i < n):
-        temp = data[thread_id,i]
-        temp_ind = order[thread_id,i]
-        temp_temp_ind = temp_order[thread_id,i]
-        j = i-1
-        while j >= 0 and data[thread_id,j] > temp:
-            k = j+1
-            data[thread_id,k] = data[thread_id,j]
-            order[thread_id,k] = order[thread_id,j]
-            copy_data[thread_id,k] = copy_data[thread_id,j]
-            copy_order[thread_id,k] = copy_order[thread_id,j]
-            temp_order[thread_id,k] = temp_order[thread_id,j]
-            j = j-1
-        k = j+1
-        data[thread_id,k] = temp
-        order[thread_id,k] = temp_ind
-        copy_data[thread_id,k] = temp
-        copy_order[thread_id,k] = temp_ind
-        temp_order[thread_id,k] = temp_temp_ind
-        i = i+1
+        b = smooth(a.flatten(), sigma, a.shape, recursive)
+
+        return b.reshape(a.shape)
+
+cdef int ascending(const void *a, const void *b) nogil:
+
+    cdef double x = (<double *>a)[0], y = (<double *>b)[0]
+
+    return (x > y)-(x < y)
+
+cdef void insertion(double *data, Py_ssize_t n) nogil:
+
+    cdef Py_ssize_t p, q
+
+    cdef double x
+
+    for p in range(1,n):
+        x = data[p]
+        q = p-1
+        while (q >= 0 and data[q] > x):
+            data[q+1] = data[q]
+            q = q-1
+        data[q+1] = x
+
+cdef void update(double *window,
+                 double *work,
+                 double *outgoing,
+                 double *incoming,
+                 Py_ssize_t n,
+                 Py_ssize_t m) nogil:
+
+    cdef Py_ssize_t p = 0, q = 0, r = 0, t = 0
+
+    cdef double x
+
+    while (p < n):
+        x = window[p]
+        if (q < m and x == outgoing[q]):
+            q = q+1
+        else:
+            while (r < m and incoming[r] < x):
+                work[t] = incoming[r]
+                t = t+1
+                r = r+1
+            work[t] = x
+            t = t+1
+        p = p+1
+
+    while (r < m):
+        work[t] = incoming[r]
+        t = t+1
+        r = r+1
+
+cdef double deviation(double *window, Py_ssize_t n) nogil:
+
+    cdef Py_ssize_t med = n // 2
+
+    cdef Py_ssize_t lo = 0, hi = med, p, q
+
+    cdef double x = window[med], d = 0
+
+    while (lo < hi):
+        p = (lo+hi) // 2
+        q = med-p
+        if (x-window[med-p-1] < window[med+q]-x):
+            lo = p+1
+        else:
+            hi = p
+
+    p, q = lo, med-lo
+
+    if (p > 0):
+        d = x-window[med-p]
+    if (q > 0 and window[med+q]-x > d):
+        d = window[med+q]-x
+
+    return d
+
+cdef void sliding(double [:,:,::1] A,
+                  double [:,:,::1] b,
+                  double [:,:,::1] c,
+                  double [:,::1] windows,
+                  double [:,::1] planes,
+                  double [:,::1] columns,
+                  bint mad,
+                  Py_ssize_t size) nogil:
+
+    cdef Py_ssize_t n0 = b.shape[0]
+    cdef Py_ssize_t n1 = b.shape[1]
+    cdef Py_ssize_t n2 = b.shape[2]
+
+    cdef Py_ssize_t size_sq = size*size
+
+    cdef Py_ssize_t window_size = size_sq*size
+
+    cdef Py_ssize_t med = window_size // 2
+
+    cdef Py_ssize_t m2 = A.shape[2]
+
+    cdef Py_ssize_t thread_id, i, j, k, l, m, n, t, step
+
+    cdef double *S
+    cdef double *T
+    cdef double *U
+    cdef double *outgoing
+    cdef double *incoming
+    cdef double *column
+
+    for i in prange(n0):
+
+        thread_id = openmp.omp_get_thread_num()
+
+        S = &windows[thread_id,0]
+        T = &windows[thread_id,window_size]
+
+        outgoing = &planes[thread_id,0]
+        incoming = &planes[thread_id,size_sq]
+
+        column = &columns[thread_id,0]
+
+        t = 0
+        for l in range(size):
+            for m in range(size):
+                for n in range(size):
+                    S[t] = A[i+l,m,n]
+                    t = t+1
+
+        qsort(S, window_size, sizeof(double), ascending)
+
+        k = 0
+
+        for j in range(n1):
+
+            if (j > 0):
+
+                t = 0
+                for l in range(size):
+                    for n in range(size):
+                        outgoing[t] = A[i+l,j-1,k+n]
+                        incoming[t] = A[i+l,j-1+size,k+n]
+                        t = t+1
+
+                insertion(outgoing, size_sq)
+                insertion(incoming, size_sq)
+
+                update(S, T, outgoing, incoming, window_size, size_sq)
+                U = S
+                S = T
+                T = U
+
+            b[i,j,k] = S[med]
+            if mad:
+                c[i,j,k] = deviation(S, window_size)
+
+            for n in range(m2):
+                if (j == 0):
+                    t = size_sq*n
+                    for l in range(size):
+                        for m in range(size):
+                            column[t] = A[i+l,m,n]
+                            t = t+1
+                    insertion(&column[size_sq*n], size_sq)
+                else:
+                    for l in range(size):
+                        outgoing[l] = A[i+l,j-1,n]
+                        incoming[l] = A[i+l,j-1+size,n]
+                    insertion(outgoing, size)
+                    insertion(incoming, size)
+                    update(&column[size_sq*n], T, outgoing, incoming,
+                           size_sq, size)
+                    for t in range(size_sq):
+                        column[size_sq*n+t] = T[t]
+
+            for step in range(n2-1):
+
+                if (j % 2 == 0):
+                    outgoing = &column[size_sq*k]
+                    incoming = &column[size_sq*(k+size)]
+                    k = k+1
+                else:
+                    outgoing = &column[size_sq*(k+size-1)]
+                    incoming = &column[size_sq*(k-1)]
+                    k = k-1
+
+                update(S, T, outgoing, incoming, window_size, size_sq)
+                U = S
+                S = T
+                T = U
+
+                b[i,j,k] = S[med]
+                if mad:
+                    c[i,j,k] = deviation(S, window_size)
+
+            outgoing = &planes[thread_id,0]
+            incoming = &planes[thread_id,size_sq]
 
 def padding(data, rank):
-    n0, n1, n2 = data.shape
-    for _ in range(rank):
-        data = np.concatenate((data[:1,:,:],data,data[-1:,:,:]), axis=0)
-        data = np.concatenate((data[:,:1,:],data,data[:,-1:,:]), axis=1)
-        data = np.concatenate((data[:,:,:1],data,data[:,:,-1:]), axis=2)
-    return data
-
-def median(double [:,:,::1] a, Py_ssize_t size):
+
+    return np.pad(data, rank, mode='edge')
+
+def _sliding(a, size, mad):
+
+    cdef Py_ssize_t num_threads = openmp.omp_get_max_threads()
+
+    a = np.asarray(a, dtype=float)
+
+    nan = np.isnan(a)
+
+    A = padding(np.where(nan, np.inf, a), size // 2)
+
+    b = np.zeros(a.shape)
+    c = np.zeros(a.shape)
+
+    windows = np.zeros((num_threads,2*size**3))
+    planes = np.zeros((num_threads,2*size**2))
+    columns = np.zeros((num_threads,A.shape[2]*size**2))
+
+    sliding(A, b, c, windows, planes, columns, mad, size)
+
+    if nan.any():
+        veil = np.isposinf(b)
+        b[veil] = np.nan
+        c[veil | ~np.isfinite(c)] = np.nan
+
+    return b, c
+
+def median(a, size):
     """
     Median filter.
 
+    Sorted windows slide along rows in alternating directions. Each step
+    merges the presorted outgoing and incoming columns of the row into the
+    window in a single pass, and the sorted columns are likewise updated
+    from one row to the next.
+
     Parameters
     ----------
-    a : 1d array
+    a : 3d array
         Array to filter.
     size : int
         Window size.
 
     Returns
     -------
-    b : 1d array
+    b : 3d array
         Filtered array.
 
     """
 
-    cdef Py_ssize_t thread_id, num_threads = openmp.omp_get_max_threads()
-
-    cdef Py_ssize_t n0 = a.shape[0]
-    cdef Py_ssize_t n1 = a.shape[1]
-    cdef Py_ssize_t n2 = a.shape[2]
-
-    b_np = np.zeros((n0,n1,n2), dtype=np.double)
+    b, _ = _sliding(a, size, False)
 
-    cdef double [:,:,::1] b = b_np
+    return b
 
-    cdef Py_ssize_t rank = size // 2
-
-    cdef Py_ssize_t window_size = size**3
-
-    cdef Py_ssize_t size_sq = size**2
+def median_deviation(a, size):
+    """
+    Median and median absolute deviation filter.
 
-    cdef Py_ssize_t med = window_size // 2
+    Both statistics are evaluated in one pass over the same windows.
 
-    a_np = np.copy(a, order='c')
+    Parameters
+    ----------
+    a : 3d array
+        Array to filter.
+    size : int
+        Window size.
 
-    cdef double [:,:,::1] A = padding(a_np, rank)
+    Returns
+    -------
+    b : 3d array
+        Median of each window.
+    c : 3d array
+        Median absolute deviation of each window from its median.
 
-    window_np = np.zeros((num_threads,window_size), dtype=np.double)
+    """
 
-    temp_wind_np = window_np.copy()
+    return _sliding(a, size, True)
 
-    cdef double [:,::1] window = window_np
-    cdef double [:,::1] temp_wind = temp_wind_np
+cdef double quantile(double *values, Py_ssize_t n, double q) nogil:
 
-    order = np.arange(window_size)
+    cdef double virtual = (n-1)*q, gamma, diff
 
-    dim = (size,size,size)
+    cdef Py_ssize_t prev, nxt
 
-    order_i_np, order_j_np, order_k_np = np.unravel_index(order, dim)
+    if (virtual >= n-1):
+        prev, nxt = n-1, n-1
+        gamma = virtual+1
+    else:
+        prev = <Py_ssize_t>floor(virtual)
+        nxt = prev+1
+        gamma = virtual-prev
 
-    order_j_np = np.tile(order_j_np, num_threads)
-    order_k_np = np.tile(order_k_np, num_threads)
+    diff = values[nxt]-values[prev]
 
-    order_j_np = order_j_np.reshape(num_threads,window_size)
-    order_k_np = order_k_np.reshape(num_threads,window_size)
+    if (gamma >= 0.5):
+        return values[nxt]-diff*(1-gamma)
+    else:
+        return values[prev]+diff*gamma
+
+cdef void reject(double [:,:,::1] data,
+                 unsigned char [:,:,::1] stencil,
+                 double *values,
+                 Py_ssize_t i,
+                 Py_ssize_t j,
+                 Py_ssize_t k,
+                 double outlier) nogil:
+
+    cdef Py_ssize_t b0 = stencil.shape[0] // 2
+    cdef Py_ssize_t b1 = stencil.shape[1] // 2
+    cdef Py_ssize_t b2 = stencil.shape[2] // 2
+
+    cdef Py_ssize_t h0 = max(i-b0,0), h1 = min(i+b0+1,data.shape[0])
+    cdef Py_ssize_t k0 = max(j-b1,0), k1 = min(j+b1+1,data.shape[1])
+    cdef Py_ssize_t l0 = max(k-b2,0), l1 = min(k+b2+1,data.shape[2])
+
+    cdef Py_ssize_t u, v, w, n = 0
+
+    cdef double x, Q1, Q3, interquartile, lower, upper
+
+    for u in range(h0,h1):
+        for v in range(k0,k1):
+            for w in range(l0,l1):
+                x = data[u,v,w]
+                if (stencil[u-i+b0,v-j+b1,w-k+b2] and not isnan(x)):
+                    values[n] = x
+                    n = n+1
+
+    if (n == 0):
+        return
+
+    qsort(values, n, sizeof(double), ascending)
+
+    Q3 = quantile(values, n, 0.75)
+    Q1 = quantile(values, n, 0.25)
+
+    interquartile = Q3-Q1
+
+    upper = Q3+outlier*interquartile
+    lower = Q1-outlier*interquartile
+
+    for u in range(h0,h1):
+        for v in range(k0,k1):
+            for w in range(l0,l1):
+                x = data[u,v,w]
+                if (stencil[u-i+b0,v-j+b1,w-k+b2]):
+                    if (x >= upper or x < lower):
+                        data[u,v,w] = NAN
+
+def punch(double [:,:,::1] data,
+          long [:,::1] centers,
+          unsigned char [:,:,::1] stencil,
+          double outlier,
+          bint parallel=True):
+    """
+    Reject outliers around reflections.
 
-    temp_ord_j_np = order_j_np.copy()
-    temp_ord_k_np = order_k_np.copy()
+    Voxels of the stencil centered on each reflection are rejected beyond
+    the interquartile range of the remaining values scaled by the outlier
+    multiplier. Reflections are processed concurrently when their stencils
+    are disjoint.
 
-    cdef long long [:,::1] order_k = order_k_np
+    Parameters
+    ----------
+    data : 3d array
+        Array to punch. Modified in place.
+    centers : 2d array, int
+        Voxel indices of each reflection.
+    stencil : 3d array, uint8
+        Voxels of the punch about the center.
+    outlier : float
+        Multiplier of interquartile range.
+    parallel : bool, optional
+        Process reflections concurrently. Default is ``True``. Otherwise the
+        reflections are processed in order.
 
-    cdef long long [:,::1] temp_ord_j = temp_ord_j_np
-    cdef long long [:,::1] temp_ord_k = temp_ord_k_np
+    """
 
-    cdef Py_ssize_t i, j, k, l, m, n, p, q, r
+    cdef Py_ssize_t num_threads = openmp.omp_get_max_threads()
 
-    cdef Py_ssize_t sliding_size = window_size-size_sq
+    if not parallel:
+        num_threads = 1
 
-    cdef Py_ssize_t j_l, j_lm, j_lmn
+    cdef Py_ssize_t n = centers.shape[0]
 
-    cdef Py_ssize_t i_l, j_m, k_n
+    values_np = np.zeros((num_threads,stencil.size))
 
-    cdef Py_ssize_t m_max = 2*rank
-    cdef Py_ssize_t n_max = 2*rank
+    cdef double [:,::1] values = values_np
 
-    cdef Py_ssize_t wind_indx
+    cdef Py_ssize_t r, thread_id
 
     with nogil:
-        for i in prange(n0):
+        for r in prange(n, num_threads=num_threads):
             thread_id = openmp.omp_get_thread_num()
-            for j in range(n1):
-                for k in range(n2):
-
-                    if (j == 0 and k == 0):
-
-                        for l in range(size):
-                            i_l = i+l
-                            j_l = size_sq*l
-                            for m in range(size):
-                                j_m = j+m
-                                j_lm = j_l+size*m
-                                for n in range(size):
-                                    k_n = k+n
-                                    j_lmn = j_lm+n
-                                    window[thread_id,j_lmn] = A[i_l,j_m,k_n]
-                                    temp_wind[thread_id,j_lmn] = A[i_l,j_m,k_n]
-                                    order_k[thread_id,j_lmn] = n
-                                    temp_ord_k[thread_id,j_lmn] = n
-                                    temp_ord_j[thread_id,j_lmn] = m
-
-                        copysort(window,
-                                 temp_wind,
-                                 order_k,
-                                 temp_ord_k,
-                                 temp_ord_j,
-                                 window_size,
-                                 thread_id)
-
-                    elif k == 0:
-
-                        p = 0
-                        q = 0
-                        while (p < window_size):
-                            if (temp_ord_j[thread_id,p] != 0):
-                                window[thread_id,q] = temp_wind[thread_id,p]
-                                temp_wind[thread_id,q] = temp_wind[thread_id,p]
-                                order_k[thread_id,q] = temp_ord_k[thread_id,p]
-                                temp_ord_k[thread_id,q] = \
-                                temp_ord_k[thread_id,p]
-                                temp_ord_j[thread_id,q] = \
-                                temp_ord_j[thread_id,p]-1
-                                q = q+1
-                            p = p+1
-
-                        p = 0
-                        m = m_max
-                        j_m = j+m
-                        for l in range(size):
-                            i_l = i+l
-                            for n in range(size):
-                                k_n = k+n
-                                wind_indx = sliding_size+p
-                                window[thread_id,wind_indx] = A[i_l,j_m,k_n]
-                                temp_wind[thread_id,wind_indx] = A[i_l,j_m,k_n]
-                                order_k[thread_id,wind_indx] = n
-                                temp_ord_k[thread_id,wind_indx] = n
-                                temp_ord_j[thread_id,wind_indx] = m
-                                p = p+1
-
-                        copysort(window,
-                                 temp_wind,
-                                 order_k,
-                                 temp_ord_k,
-                                 temp_ord_j,
-                                 window_size,
-                                 thread_id)
-
-                    else:
-
-                        p = 0
-                        q = 0
-                        while (p < window_size):
-                            if (order_k[thread_id,p] != 0):
-                                window[thread_id,q] = window[thread_id,p]
-                                order_k[thread_id,q] = order_k[thread_id,p]-1
-                                q = q+1
-                            p = p+1
-
-                        p = 0
-                        n = n_max
-                        k_n = k+n
-                        for l in range(size):
-                            i_l = i+l
-                            for m in range(size):
-                                j_m = j+m
-                                wind_indx = sliding_size+p
-                                window[thread_id,wind_indx] = A[i_l,j_m,k_n]
-                                order_k[thread_id,wind_indx] = n
-                                p = p+1
-
-                        sort(window, order_k, window_size, thread_id)
-
-                    b[i,j,k] = window[thread_id,med]
-
-    return b_np
+            reject(data, stencil, &values[thread_id,0],
+                   centers[r,0], centers[r,1], centers[r,2], outlier)
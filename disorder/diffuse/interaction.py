@@ -4,7 +4,7 @@ import numpy as np
 
 from scipy.special import erfc
 
-from disorder.material import crystal, symmetry
+from disorder.material import crystal, symmetry, neighbor
 
 def __A(alpha,r):
 
@@ -58,36 +58,11 @@ def atom_pairs_distance(rx, ry, rz, nu, nv, nw, n_atm, A, tol=1e-3):
     mv = (nv+1)//2
     mw = (nw+1)//2
 
-    m_uvw = mu*mv*mw
     n_uvw = nu*nv*nw
 
     c_uvw = np.arange(n_uvw, dtype=int)
 
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
-
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
-
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
-
-    iu = np.mod(iu+cu[:,None], nu).flatten()
-    iv = np.mod(iv+cv[:,None], nv).flatten()
-    iw = np.mod(iw+cw[:,None], nw).flatten()
-
-    ju = np.mod(ju+cu[:,None], nu).flatten()
-    jv = np.mod(jv+cv[:,None], nv).flatten()
-    jw = np.mod(jw+cw[:,None], nw).flatten()
-
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
-
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
-
-    pairs.sort(axis=0)
-
-    uni, _, _ = symmetry.unique(pairs)
-
-    i_lat, j_lat = uni
+    i_lat, j_lat = neighbor.lattice(nu, nv, nw)
 
     # ---
 
@@ -460,6 +435,126 @@ def dipole_dipole_matrix(rx, ry, rz, nu, nv, nw, n_atm, A, B, R, tol=1e-3):
 
     return Qijkl
 
+def dipole_dipole_kernel(rx, ry, rz, nu, nv, nw, n_atm, A, B, R):
+    """
+    Dipole-dipole interaction kernel.
+
+    Translationally invariant form of the dipole-dipole matrix. Each entry
+    couples an atom of the origin cell to an atom of another cell, so the
+    interaction between any pair of atoms is found from the separation of
+    their cells. The reciprocal-space sum is evaluated on the supercell mesh
+    by fast Fourier transform.
+
+    Parameters
+    ----------
+    rx, ry, rz : 1d array
+        Atomic positions.
+    nu, nv, nw : int
+        Supercell size.
+    n_atm : int
+        Number of unit cell atoms.
+    A : 2d array, 3x3
+        Real space crystal axis to Cartesian transformation matrix.
+    B : 2d array, 3x3
+        Reciprocal-space crystal axis to Cartesian transformation matrix.
+    R : 2d array, 3x3
+        Rotation matrix between real and reciprocal-space Cartesian axes.
+
+    Returns
+    -------
+    Kijkl : 4d array
+        Dipole-dipole kernel. Array of shape ``n_atm`` x ``n_atm`` x
+        ``nu*nv*nw`` x6.
+
+    """
+
+    mu = (nu+1)//2
+    mv = (nv+1)//2
+    mw = (nw+1)//2
+
+    n_uvw = nu*nv*nw
+
+    cu, cv, cw = np.unravel_index(np.arange(n_uvw), (nu,nv,nw))
+
+    du, dv, dw = np.where(cu < mu, cu, cu-nu), \
+                 np.where(cv < mv, cv, cv-nv), \
+                 np.where(cw < mw, cw, cw-nw)
+
+    box = (np.abs(du) < mu) & (np.abs(dv) < mv) & (np.abs(dw) < mw)
+
+    ux = rx.reshape(nu,nv,nw,n_atm)[0,0,0,:]
+    uy = ry.reshape(nu,nv,nw,n_atm)[0,0,0,:]
+    uz = rz.reshape(nu,nv,nw,n_atm)[0,0,0,:]
+
+    delta_x = ux[np.newaxis,:]-ux[:,np.newaxis]
+    delta_y = uy[np.newaxis,:]-uy[:,np.newaxis]
+    delta_z = uz[np.newaxis,:]-uz[:,np.newaxis]
+
+    cx, cy, cz = crystal.transform(du, dv, dw, A)
+
+    dx = cx+delta_x[:,:,np.newaxis]
+    dy = cy+delta_y[:,:,np.newaxis]
+    dz = cz+delta_z[:,:,np.newaxis]
+
+    d = np.sqrt(dx**2+dy**2+dz**2)
+
+    diag = np.isclose(d, 0)
+
+    d[diag] = 1
+
+    u, v, w = np.dot(A, [nu,0,0]), np.dot(A, [0,nv,0]), np.dot(A, [0,0,nw])
+
+    V = np.dot(u, np.cross(v, w))
+
+    alpha = np.sqrt(2*np.pi*np.min([nu/np.linalg.norm(u)**2,
+                                    nv/np.linalg.norm(v)**2,
+                                    nw/np.linalg.norm(w)**2]))
+
+    b, c = __B(alpha, d), __C(alpha, d)
+
+    Kijkl = np.stack((b-dx*dx*c, b-dy*dy*c, b-dz*dz*c,
+                      -dy*dz*c, -dx*dz*c, -dx*dy*c), axis=-1)
+
+    Gx, Gy, Gz = spatial_wavevector(nu, nv, nw, n_atm, B, R)
+
+    G_sq = Gx**2+Gy**2+Gz**2
+
+    mu_, mv_, mw_ = np.meshgrid(np.arange(mu),
+                                np.concatenate((np.arange(mv),
+                                                np.arange(-mv+1,0))),
+                                np.concatenate((np.arange(mw),
+                                                np.arange(-mw+1,0))),
+                                indexing='ij')
+
+    mesh = np.ravel_multi_index((np.mod(mu_.flatten()[1:], nu),
+                                 np.mod(mv_.flatten()[1:], nv),
+                                 np.mod(mw_.flatten()[1:], nw)), (nu,nv,nw))
+
+    factors = 4*np.pi/V*np.exp(-np.pi**2*G_sq/alpha**2)/G_sq
+
+    G_G = np.stack((Gx*Gx, Gy*Gy, Gz*Gz, Gy*Gz, Gx*Gz, Gx*Gy))
+
+    phase = np.exp(1j*(np.multiply.outer(delta_x, Gx)+
+                       np.multiply.outer(delta_y, Gy)+
+                       np.multiply.outer(delta_z, Gz)))
+
+    Y = np.zeros((n_atm,n_atm,6,n_uvw), dtype=complex)
+
+    Y[...,mesh] = (factors*phase)[:,:,np.newaxis,:]*G_G
+
+    Y = Y.reshape(n_atm,n_atm,6,nu,nv,nw)
+
+    recip = np.fft.ifftn(Y, axes=(3,4,5)).real*n_uvw
+
+    Kijkl += np.moveaxis(recip.reshape(n_atm,n_atm,6,n_uvw), 2, -1)
+
+    Kijkl[~np.broadcast_to(box, d.shape)] = 0
+
+    Kijkl[diag] = 0
+    Kijkl[diag,0:3] = -4*alpha**3/(3*np.sqrt(np.pi))
+
+    return np.ascontiguousarray(Kijkl)
+
 def pairs(u, v, w, atm, A, extend=False):
     """
     Generate pairs.
@@ -4,9 +4,12 @@
 import numpy as np
 cimport numpy as np
 
+from scipy import fft
+
 from cython.parallel import prange
 
 cimport cython
+cimport openmp
 
 from disorder.material import tables
 
@@ -261,10 +264,26 @@ cdef bint nuclear(double h, double k, double l, int centering) nogil:
 
     return cond
 
+cdef (double, double) moments(double [:,::1] I_r, Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t r, n_runs = I_r.shape[1]
+
+    cdef double mean = 0, var = 0
+
+    for r in range(n_runs):
+        mean = mean+I_r[t,r]
+
+    mean = mean/n_runs
+
+    for r in range(n_runs):
+        var = var+(I_r[t,r]-mean)*(I_r[t,r]-mean)
+
+    return mean, var/n_runs
+
 @cython.binding(True)
-def magnetic(double [::1] Sx,
-             double [::1] Sy,
-             double [::1] Sz,
+def magnetic(Sx,
+             Sy,
+             Sz,
              double [::1] occupancy,
              double [::1] U11,
              double [::1] U22,
@@ -302,8 +321,10 @@ def magnetic(double [::1] Sx,
 
     Parameters
     ----------
-    Sx, Sy, Sz : 1d array
-        Magnetic spin vector components.
+    Sx, Sy, Sz : 1d or 2d array
+        Magnetic spin vector components or their transforms from
+        ``reciprocal``. Configurations of several runs are stacked along the
+        first axis.
     occupancy : 1d array
         Unit cell site occupancies.
     U11, U22, U33, U23, U13, U12 : 1d array
@@ -343,10 +364,16 @@ def magnetic(double [::1] Sx,
     Returns
     -------
     I : 1d array
-        Magnetic scattering intensity.
+        Magnetic scattering intensity. Mean over runs of stacked
+        configurations.
+    sigma_sq : 1d array
+        Variance of magnetic scattering intensity over runs. Only returned
+        for stacked configurations.
 
     """
 
+    cdef bint stacked = np.ndim(Sx) > 1
+
     cdef Py_ssize_t n_atm = len(ions)
 
     cdef Py_ssize_t n_hkl = indices.shape[0]
@@ -377,7 +404,7 @@ def magnetic(double [::1] Sx,
 
     cdef double Qx_norm, Qy_norm, Qz_norm, Q
 
-    cdef double complex phase_factor, factors, dw_factors
+    cdef double complex phase_factor, dw_factors
 
     cdef double [::1] Uxx = np.zeros(n_atm, dtype=float)
     cdef double [::1] Uyy = np.zeros(n_atm, dtype=float)
@@ -412,13 +439,20 @@ def magnetic(double [::1] Sx,
 
     cdef double [::1] I = I_np
 
-    Sx_np = np.copy(Sx, order='C')
-    Sy_np = np.copy(Sy, order='C')
-    Sz_np = np.copy(Sz, order='C')
+    sigma_sq_np = np.zeros(n_hkl, dtype=float)
+
+    cdef double [::1] sigma_sq = sigma_sq_np
+
+    cdef double complex [:,::1] Sx_k, Sy_k, Sz_k
+
+    if np.iscomplexobj(Sx):
+        Sx_k, Sy_k, Sz_k = [np.ascontiguousarray(S).reshape(-1,n)
+                            for S in (Sx,Sy,Sz)]
+    else:
+        Sx_k, Sy_k, Sz_k = reciprocal([Sx,Sy,Sz],
+                                      nu, nv, nw, n_atm).reshape(3,-1,n)
 
-    Sx_np = Sx_np.reshape(nu,nv,nw,n_atm)
-    Sy_np = Sy_np.reshape(nu,nv,nw,n_atm)
-    Sz_np = Sz_np.reshape(nu,nv,nw,n_atm)
+    cdef Py_ssize_t n_runs = Sx_k.shape[0]
 
     cdef double h_min_, k_min_, l_min_
     cdef double h_max_, k_max_, l_max_
@@ -458,16 +492,14 @@ def magnetic(double [::1] Sx,
     cdef double f_Nv = float(Nv)
     cdef double f_Nw = float(Nw)
 
-    Sx_k_np = idft(Sx_np, Nu, Nv, Nw).flatten()*n_uvw
-    Sy_k_np = idft(Sy_np, Nu, Nv, Nw).flatten()*n_uvw
-    Sz_k_np = idft(Sz_np, Nu, Nv, Nw).flatten()*n_uvw
+    cdef Py_ssize_t thread_id, num_threads = openmp.omp_get_max_threads()
+
+    cdef double complex [:,::1] factors = np.zeros((num_threads,n_atm),
+                                                   dtype=complex)
 
-    cdef double complex [::1] Sx_k = Sx_k_np
-    cdef double complex [::1] Sy_k = Sy_k_np
-    cdef double complex [::1] Sz_k = Sz_k_np
+    cdef double [:,::1] I_r = np.zeros((num_threads,n_runs))
 
     cdef Py_ssize_t F_uvw = Fu*Fv*Fw
-    cdef Py_ssize_t N_uvw = Nu*Nv*Nw
 
     cdef double complex prod_x, prod_y, prod_z
     cdef double complex Fx, Fy, Fz
@@ -482,7 +514,7 @@ def magnetic(double [::1] Sx,
     cdef Py_ssize_t i_dft, i_ind, j_dft
 
     cdef Py_ssize_t op, var
-    cdef Py_ssize_t i, j
+    cdef Py_ssize_t i, j, r
     cdef Py_ssize_t u, v, w
 
     cdef double M_TAU = 2*np.pi
@@ -528,6 +560,8 @@ def magnetic(double [::1] Sx,
 
     for i in prange(n_hkl, nogil=True):
 
+        thread_id = openmp.omp_get_thread_num()
+
         i_ind = indices[i]
 
         w = i_ind % nl
@@ -542,6 +576,9 @@ def magnetic(double [::1] Sx,
         y = W[1,0]*h_+W[1,1]*k_+W[1,2]*l_
         z = W[2,0]*h_+W[2,1]*k_+W[2,2]*l_
 
+        for r in range(n_runs):
+            I_r[thread_id,r] = 0
+
         for var in range(n_vars):
 
             x_ = T[var,0,0]*x+T[var,0,1]*y+T[var,0,2]*z
@@ -569,7 +606,7 @@ def magnetic(double [::1] Sx,
                 if (iL < Fw and not iszero(fmod(f_L, f_Nw)) and Nw-iL > Fw):
                     iL = iL+Fw
 
-                i_dft = iL+Nw*(iK+Nv*iH)
+                i_dft = iL // Fw+nw*(iK // Fv+nv*(iH // Fu))
 
                 Qh = M_TAU*(B[0,0]*h+B[0,1]*k+B[0,2]*l)
                 Qk = M_TAU*(B[1,0]*h+B[1,1]*k+B[1,2]*l)
@@ -589,10 +626,6 @@ def magnetic(double [::1] Sx,
                 s_ = Q*inv_M_SP
                 s_sq = s_*s_
 
-                prod_x = 0
-                prod_y = 0
-                prod_z = 0
-
                 for j in range(n_atm):
 
                     occ = occupancy[j]
@@ -621,37 +654,54 @@ def magnetic(double [::1] Sx,
                                            Uxz[j]*Qx*Qz+\
                                            Uxy[j]*Qx*Qy))
 
-                    factors = occ*form_factor*phase_factor*dw_factors
+                    factors[thread_id,j] = occ*form_factor\
+                                         * phase_factor*dw_factors
 
-                    j_dft = j+n_atm*i_dft
+                for r in range(n_runs):
 
-                    prod_x = prod_x+factors*Sx_k[j_dft]
-                    prod_y = prod_y+factors*Sy_k[j_dft]
-                    prod_z = prod_z+factors*Sz_k[j_dft]
+                    prod_x = 0
+                    prod_y = 0
+                    prod_z = 0
 
-                Fx = prod_x
-                Fy = prod_y
-                Fz = prod_z
+                    for j in range(n_atm):
 
-                Q_norm_dot_F = Qx_norm*Fx+Qy_norm*Fy+Qz_norm*Fz
+                        j_dft = j+n_atm*i_dft
 
-                Fx_perp = Fx-Q_norm_dot_F*Qx_norm
-                Fy_perp = Fy-Q_norm_dot_F*Qy_norm
-                Fz_perp = Fz-Q_norm_dot_F*Qz_norm
+                        prod_x = prod_x+factors[thread_id,j]*Sx_k[r,j_dft]
+                        prod_y = prod_y+factors[thread_id,j]*Sy_k[r,j_dft]
+                        prod_z = prod_z+factors[thread_id,j]*Sz_k[r,j_dft]
 
-                Fx_perp_real, Fx_perp_imag = Fx_perp.real, Fx_perp.imag
-                Fy_perp_real, Fy_perp_imag = Fy_perp.real, Fy_perp.imag
-                Fz_perp_real, Fz_perp_imag = Fz_perp.real, Fz_perp.imag
+                    Fx = prod_x
+                    Fy = prod_y
+                    Fz = prod_z
 
-                I[i] += (Fx_perp_real*Fx_perp_real+Fx_perp_imag*Fx_perp_imag\
-                     +   Fy_perp_real*Fy_perp_real+Fy_perp_imag*Fy_perp_imag\
-                     +   Fz_perp_real*Fz_perp_real+Fz_perp_imag*Fz_perp_imag)\
-                     *   factor*weights[var]
+                    Q_norm_dot_F = Qx_norm*Fx+Qy_norm*Fy+Qz_norm*Fz
+
+                    Fx_perp = Fx-Q_norm_dot_F*Qx_norm
+                    Fy_perp = Fy-Q_norm_dot_F*Qy_norm
+                    Fz_perp = Fz-Q_norm_dot_F*Qz_norm
+
+                    Fx_perp_real, Fx_perp_imag = Fx_perp.real, Fx_perp.imag
+                    Fy_perp_real, Fy_perp_imag = Fy_perp.real, Fy_perp.imag
+                    Fz_perp_real, Fz_perp_imag = Fz_perp.real, Fz_perp.imag
+
+                    I_r[thread_id,r] += (Fx_perp_real*Fx_perp_real\
+                                     +   Fx_perp_imag*Fx_perp_imag\
+                                     +   Fy_perp_real*Fy_perp_real\
+                                     +   Fy_perp_imag*Fy_perp_imag\
+                                     +   Fz_perp_real*Fz_perp_real\
+                                     +   Fz_perp_imag*Fz_perp_imag)\
+                                     *   factor*weights[var]
+
+        I[i], sigma_sq[i] = moments(I_r, thread_id)
+
+    if stacked:
+        return I_np, sigma_sq_np
 
     return I_np
 
 @cython.binding(True)
-def occupational(double [::1] A_r,
+def occupational(A_r,
                  double [::1] occupancy,
                  double [::1] U11,
                  double [::1] U22,
@@ -689,8 +739,9 @@ def occupational(double [::1] A_r,
 
     Parameters
     ----------
-    A_r : 1d array
-        Relative occupancy parameter.
+    A_r : 1d or 2d array
+        Relative occupancy parameter or its transform from ``reciprocal``.
+        Configurations of several runs are stacked along the first axis.
     occupancy : 1d array
         Unit cell site occupancies.
     U11, U22, U33, U23, U13, U12 : 1d array
@@ -731,10 +782,16 @@ def occupational(double [::1] A_r,
     Returns
     -------
     I : 1d array
-        Occupational diffuse scattering intensity.
+        Occupational diffuse scattering intensity. Mean over runs of stacked
+        configurations.
+    sigma_sq : 1d array
+        Variance of occupational diffuse scattering intensity over runs. Only
+        returned for stacked configurations.
 
     """
 
+    cdef bint stacked = np.ndim(A_r) > 1
+
     cdef bint neutron = source == 'neutron'
 
     cdef Py_ssize_t n_atm = len(atms)
@@ -765,7 +822,7 @@ def occupational(double [::1] A_r,
     cdef double Qh, Qk, Ql
     cdef double Qx, Qy, Qz
 
-    cdef double complex phase_factor, factors, dw_factors
+    cdef double complex phase_factor, dw_factors
 
     cdef double [::1] Uxx = np.zeros(n_atm, dtype=float)
     cdef double [::1] Uyy = np.zeros(n_atm, dtype=float)
@@ -796,9 +853,18 @@ def occupational(double [::1] A_r,
 
     cdef double [::1] I = I_np
 
-    A_r_np = np.copy(A_r, order='C')
+    sigma_sq_np = np.zeros(n_hkl, dtype=float)
+
+    cdef double [::1] sigma_sq = sigma_sq_np
 
-    A_r_np = A_r_np.reshape(nu,nv,nw,n_atm)
+    cdef double complex [:,::1] A_k
+
+    if np.iscomplexobj(A_r):
+        A_k = np.ascontiguousarray(A_r).reshape(-1,n)
+    else:
+        A_k = reciprocal(A_r, nu, nv, nw, n_atm).reshape(-1,n)
+
+    cdef Py_ssize_t n_runs = A_k.shape[0]
 
     cdef double h_min_, k_min_, l_min_
     cdef double h_max_, k_max_, l_max_
@@ -838,12 +904,14 @@ def occupational(double [::1] A_r,
     cdef double f_Nv = float(Nv)
     cdef double f_Nw = float(Nw)
 
-    A_k_np = idft(A_r_np, Nu, Nv, Nw).flatten()*n_uvw
+    cdef Py_ssize_t thread_id, num_threads = openmp.omp_get_max_threads()
 
-    cdef double complex [::1] A_k = A_k_np
+    cdef double complex [:,::1] factors = np.zeros((num_threads,n_atm),
+                                                   dtype=complex)
+
+    cdef double [:,::1] I_r = np.zeros((num_threads,n_runs))
 
     cdef Py_ssize_t F_uvw = Fu*Fv*Fw
-    cdef Py_ssize_t N_uvw = Nu*Nv*Nw
 
     cdef double complex prod
     cdef double complex F
@@ -854,7 +922,7 @@ def occupational(double [::1] A_r,
     cdef Py_ssize_t i_dft, i_ind, j_dft
 
     cdef Py_ssize_t op, var
-    cdef Py_ssize_t i, j
+    cdef Py_ssize_t i, j, r
     cdef Py_ssize_t u, v, w
 
     cdef double M_TAU = 2*np.pi
@@ -890,6 +958,8 @@ def occupational(double [::1] A_r,
 
     for i in prange(n_hkl, nogil=True):
 
+        thread_id = openmp.omp_get_thread_num()
+
         i_ind = indices[i]
 
         w = i_ind % nl
@@ -904,6 +974,9 @@ def occupational(double [::1] A_r,
         y = W[1,0]*h_+W[1,1]*k_+W[1,2]*l_
         z = W[2,0]*h_+W[2,1]*k_+W[2,2]*l_
 
+        for r in range(n_runs):
+            I_r[thread_id,r] = 0
+
         for var in range(n_vars):
 
             x_ = T[var,0,0]*x+T[var,0,1]*y+T[var,0,2]*z
@@ -931,7 +1004,7 @@ def occupational(double [::1] A_r,
                 if (iL < Fw and not iszero(fmod(f_L, f_Nw)) and Nw-iL > Fw):
                     iL = iL+Fw
 
-                i_dft = iL+Nw*(iK+Nv*iH)
+                i_dft = iL // Fw+nw*(iK // Fv+nv*(iH // Fu))
 
                 Qh = M_TAU*(B[0,0]*h+B[0,1]*k+B[0,2]*l)
                 Qk = M_TAU*(B[1,0]*h+B[1,1]*k+B[1,2]*l)
@@ -941,8 +1014,6 @@ def occupational(double [::1] A_r,
                 Qy = R[1,0]*Qh+R[1,1]*Qk+R[1,2]*Ql
                 Qz = R[2,0]*Qh+R[2,1]*Qk+R[2,2]*Ql
 
-                prod = 0
-
                 for j in range(n_atm):
 
                     occ = occupancy[j]
@@ -973,22 +1044,35 @@ def occupational(double [::1] A_r,
                                            Uxz[j]*Qx*Qz+\
                                            Uxy[j]*Qx*Qy))
 
-                    factors = occ*scattering_length*phase_factor*dw_factors
+                    factors[thread_id,j] = occ*scattering_length\
+                                         * phase_factor*dw_factors
 
-                    j_dft = j+n_atm*i_dft
+                for r in range(n_runs):
 
-                    prod = prod+factors*A_k[j_dft]
+                    prod = 0
 
-                F = prod
+                    for j in range(n_atm):
 
-                F_real, F_imag = F.real, F.imag
+                        j_dft = j+n_atm*i_dft
 
-                I[i] += (F_real*F_real+F_imag*F_imag)*factor*weights[var]
+                        prod = prod+factors[thread_id,j]*A_k[r,j_dft]
+
+                    F = prod
+
+                    F_real, F_imag = F.real, F.imag
+
+                    I_r[thread_id,r] += (F_real*F_real+F_imag*F_imag)\
+                                     *  factor*weights[var]
+
+        I[i], sigma_sq[i] = moments(I_r, thread_id)
+
+    if stacked:
+        return I_np, sigma_sq_np
 
     return I_np
 
 @cython.binding(True)
-def displacive(double [::1] U_r,
+def displacive(U_r,
                double complex [::1] coeffs,
                double [::1] occupancy,
                double [::1] ux,
@@ -1023,8 +1107,9 @@ def displacive(double [::1] U_r,
 
     Parameters
     ----------
-    U_r : 1d array
-        Displacemet parameter.
+    U_r : 1d or 2d array
+        Displacemet parameter or its transform from ``reciprocal``.
+        Configurations of several runs are stacked along the first axis.
     coeffs : 1d array, complex
         Coefficients for Taylor expansion.
     occupancy : 1d array
@@ -1071,10 +1156,16 @@ def displacive(double [::1] U_r,
     Returns
     -------
     I : 1d array
-        Displacive diffuse scattering intensity.
+        Displacive diffuse scattering intensity. Mean over runs of stacked
+        configurations.
+    sigma_sq : 1d array
+        Variance of displacive diffuse scattering intensity over runs. Only
+        returned for stacked configurations.
 
     """
 
+    cdef bint stacked = np.ndim(U_r) > 1
+
     cdef bint neutron = source == 'neutron'
 
     cdef Py_ssize_t n_atm = len(atms)
@@ -1108,7 +1199,7 @@ def displacive(double [::1] U_r,
     cdef double Qh, Qk, Ql
     cdef double Qx, Qy, Qz
 
-    cdef double complex phase_factor, factors
+    cdef double complex phase_factor
 
     cdef double Q, s_, s_sq
 
@@ -1132,9 +1223,18 @@ def displacive(double [::1] U_r,
 
     cdef double [::1] I = I_np
 
-    U_r_np = np.copy(U_r, order='C')
+    sigma_sq_np = np.zeros(n_hkl, dtype=float)
+
+    cdef double [::1] sigma_sq = sigma_sq_np
+
+    cdef double complex [:,::1] U_k
 
-    U_r_np = U_r_np.reshape(n_prod,nu,nv,nw,n_atm)
+    if np.iscomplexobj(U_r):
+        U_k = np.ascontiguousarray(U_r).reshape(-1,n_prod*n)
+    else:
+        U_k = reciprocal(U_r, nu, nv, nw, n_atm).reshape(-1,n_prod*n)
+
+    cdef Py_ssize_t n_runs = U_k.shape[0]
 
     cdef double h_min_, k_min_, l_min_
     cdef double h_max_, k_max_, l_max_
@@ -1174,12 +1274,17 @@ def displacive(double [::1] U_r,
     cdef double f_Nv = float(Nv)
     cdef double f_Nw = float(Nw)
 
-    U_k_np = idft_many(U_r_np, Nu, Nv, Nw).flatten()*n_uvw
+    cdef Py_ssize_t thread_id, num_threads = openmp.omp_get_max_threads()
+
+    cdef double complex [:,::1] factors = np.zeros((num_threads,n_atm),
+                                                   dtype=complex)
+
+    cdef double complex [:,::1] expansion = np.zeros((num_threads,n_prod),
+                                                     dtype=complex)
 
-    cdef double complex [::1] U_k = U_k_np
+    cdef double [:,::1] I_r = np.zeros((num_threads,n_runs))
 
     cdef Py_ssize_t F_uvw = Fu*Fv*Fw
-    cdef Py_ssize_t N_uvw = Nu*Nv*Nw
 
     cdef double Q_k
 
@@ -1228,13 +1333,10 @@ def displacive(double [::1] U_r,
                         exponents[g,2] = t
                         g += 1
 
-    cdef long [::1] odd = np.setdiff1d(np.union1d(even, np.arange(n_prod)), \
-                                       np.intersect1d(even, np.arange(n_prod)))
-
-    cdef Py_ssize_t n_odd = odd.shape[0]
-
     for i in prange(n_hkl, nogil=True):
 
+        thread_id = openmp.omp_get_thread_num()
+
         i_ind = indices[i]
 
         w = i_ind % nl
@@ -1249,6 +1351,9 @@ def displacive(double [::1] U_r,
         y = W[1,0]*h_+W[1,1]*k_+W[1,2]*l_
         z = W[2,0]*h_+W[2,1]*k_+W[2,2]*l_
 
+        for r in range(n_runs):
+            I_r[thread_id,r] = 0
+
         for var in range(n_vars):
 
             x_ = T[var,0,0]*x+T[var,0,1]*y+T[var,0,2]*z
@@ -1276,7 +1381,7 @@ def displacive(double [::1] U_r,
                 if (iL < Fw and not iszero(fmod(f_L, f_Nw)) and Nw-iL > Fw):
                     iL = iL+Fw
 
-                i_dft = iL+Nw*(iK+Nv*iH)
+                i_dft = iL // Fw+nw*(iK // Fv+nv*(iH // Fu))
 
                 Qh = M_TAU*(B[0,0]*h+B[0,1]*k+B[0,2]*l)
                 Qk = M_TAU*(B[1,0]*h+B[1,1]*k+B[1,2]*l)
@@ -1286,7 +1391,20 @@ def displacive(double [::1] U_r,
                 Qy = R[1,0]*Qh+R[1,1]*Qk+R[1,2]*Ql
                 Qz = R[2,0]*Qh+R[2,1]*Qk+R[2,2]*Ql
 
-                prod = 0
+                for q in range(n_prod):
+
+                    Q_k = Qx**exponents[q,0]\
+                        * Qy**exponents[q,1]\
+                        * Qz**exponents[q,2]
+
+                    expansion[thread_id,q] = coeffs[q]*Q_k
+
+                if ((iH < Fu and iK < Fv and iL < Fw) and \
+                    nuclear(h, k, l, centering)):
+
+                    for g in range(n_even):
+
+                        expansion[thread_id,even[g]] = 0
 
                 for j in range(n_atm):
 
@@ -1311,40 +1429,32 @@ def displacive(double [::1] U_r,
 
                     phase_factor = iexp(Qx*ux[j]+Qy*uy[j]+Qz*uz[j])
 
-                    factors = occ*scattering_length*phase_factor
-
-                    if ((iH < Fu and iK < Fv and iL < Fw) and \
-                        nuclear(h, k, l, centering)):
-
-                        for g in range(n_odd):
-
-                            q = odd[g]
+                    factors[thread_id,j] = occ*scattering_length*phase_factor
 
-                            j_dft = j+n_atm*(i_dft+N_uvw*q)
+                for r in range(n_runs):
 
-                            Q_k = Qx**exponents[q,0]\
-                                * Qy**exponents[q,1]\
-                                * Qz**exponents[q,2]
+                    prod = 0
 
-                            prod = prod+factors*coeffs[q]*U_k[j_dft]*Q_k
-
-                    else:
+                    for j in range(n_atm):
 
                         for q in range(n_prod):
 
-                            j_dft = j+n_atm*(i_dft+N_uvw*q)
+                            j_dft = j+n_atm*(i_dft+n_uvw*q)
 
-                            Q_k = Qx**exponents[q,0]\
-                                * Qy**exponents[q,1]\
-                                * Qz**exponents[q,2]
+                            prod = prod+factors[thread_id,j]\
+                                 * expansion[thread_id,q]*U_k[r,j_dft]
 
-                            prod = prod+factors*coeffs[q]*U_k[j_dft]*Q_k
+                    F = prod
 
-                F = prod
+                    F_real, F_imag = F.real, F.imag
 
-                F_real, F_imag = F.real, F.imag
+                    I_r[thread_id,r] += (F_real*F_real+F_imag*F_imag)\
+                                     *  factor*weights[var]
 
-                I[i] += (F_real*F_real+F_imag*F_imag)*factor*weights[var]
+        I[i], sigma_sq[i] = moments(I_r, thread_id)
+
+    if stacked:
+        return I_np, sigma_sq_np
 
     return I_np
 
@@ -1531,12 +1641,11 @@ def average(double [::1] occupancy,
     cdef double f_Nv = float(Nv)
     cdef double f_Nw = float(Nw)
 
-    A_k_np = idft(A_r_np, Nu, Nv, Nw).flatten()
+    A_k_np = idft(A_r_np).flatten()
 
     cdef double complex [::1] A_k = A_k_np
 
     cdef Py_ssize_t F_uvw = Fu*Fv*Fw
-    cdef Py_ssize_t N_uvw = Nu*Nv*Nw
 
     cdef double complex prod
     cdef double complex F
@@ -1624,7 +1733,7 @@ def average(double [::1] occupancy,
                 if (iL < Fw and not iszero(fmod(f_L, f_Nw)) and Nw-iL > Fw):
                     iL = iL+Fw
 
-                i_dft = iL+Nw*(iK+Nv*iH)
+                i_dft = iL // Fw+nw*(iK // Fv+nv*(iH // Fu))
 
                 Qh = M_TAU*(B[0,0]*h+B[0,1]*k+B[0,2]*l)
                 Qk = M_TAU*(B[1,0]*h+B[1,1]*k+B[1,2]*l)
@@ -1680,88 +1789,88 @@ def average(double [::1] occupancy,
 
     return I_np
 
-def idft_many(X, Nu, Nv, Nw):
-
-    nc = X.shape[0]
-    nu = X.shape[1]
-    nv = X.shape[2]
-    nw = X.shape[3]
-    n_atm = X.shape[4]
-
-    U = np.zeros((nc,Nu,Nv,Nw,n_atm), dtype=complex)
-
-    for i in range(nc):
-        for j in range(n_atm):
-            V = X[i,:,:,:,j].copy()
-
-            W = V.copy()
-            for _ in range(Nu // nu-1):
-                W = np.concatenate((W,V*1),axis=0)
-            W = np.concatenate((W,V[:(Nu%nu),:,:]*1),axis=0)
-
-            V = W.copy()
-            for _ in range(Nv // nv-1):
-                W = np.concatenate((W,V*1),axis=1)
-            W = np.concatenate((W,V[:,:(Nv%nv),:]*1),axis=1)
-
-            V = W.copy()
-            for _ in range(Nw // nw-1):
-                W = np.concatenate((W,V*1),axis=2)
-            W = np.concatenate((W,V[:,:,:(Nw%nw)]*1),axis=2)
+def idft_many(X, workers=None):
+    """
+    Inverse discrete Fourier transform of supercell components.
 
-            U[i,:,:,:,j] = W.copy()
+    The supercell periodically tiled over the finer grid of reciprocal space
+    resolution has the same transform at every tile of the finer grid. So
+    grid index ``H`` maps onto index ``H // (Nu // nu)`` of the transform of
+    the supercell. All components are transformed with a single call to
+    ``scipy.fft``, which dispatches to the backend set with
+    ``scipy.fft.set_backend``.
 
-    x = np.fft.ifftn(U, axes=(1,2,3))
+    Parameters
+    ----------
+    X : 5d array
+        Components with supercell axes ``1``, ``2``, and ``3`` and last axis
+        of unit cell atoms.
+    workers : int, optional
+        Number of threads. Default is ``None``, which uses the number of
+        OpenMP threads.
 
-    for i in range(1, Nu // nu):
-        x[:,i::(Nu//nu),:,:,:] += x[:,0::(Nu//nu),:,:,:]#*(Nu//nu-i)/(Nu//nu)
+    Returns
+    -------
+    X_k : 5d array, complex
+        Inverse discrete Fourier transform of components.
 
-    for j in range(1, Nv // nv):
-        x[:,:,j::(Nv//nv),:,:] += x[:,:,0::(Nv//nv),:,:]#*(Nv//nv-j)/(Nv//nv)
+    """
 
-    for k in range(1, Nw // nw):
-        x[:,:,:,k::(Nw//nw),:] += x[:,:,:,0::(Nw//nw),:]#*(Nw//nw-k)/(Nw//nw)
+    if workers is None:
+        workers = openmp.omp_get_max_threads()
 
-    return x
+    return fft.ifftn(X, axes=(1,2,3), workers=workers)
 
-def idft(X, Nu, Nv, Nw):
+def reciprocal(X, Py_ssize_t nu, Py_ssize_t nv, Py_ssize_t nw,
+               Py_ssize_t n_atm):
+    """
+    Transform of configurations for the intensity calculations.
 
-    nu = X.shape[0]
-    nv = X.shape[1]
-    nw = X.shape[2]
-    n_atm = X.shape[3]
+    The intensity calculations accept the transform in place of the
+    configurations, so that several subsets of reciprocal space points are
+    evaluated with a single transform.
 
-    U = np.zeros((Nu,Nv,Nw,n_atm), dtype=complex)
+    Parameters
+    ----------
+    X : nd array
+        Flattened configurations with last axis of supercell and unit cell
+        atoms.
+    nu, nv, nw : int
+        Number of supercell grid points.
+    n_atm : int
+        Number of unit cell atoms.
 
-    for j in range(n_atm):
-        V = X[:,:,:,j].copy()
+    Returns
+    -------
+    X_k : nd array, complex
+        Transform scaled by the number of supercell grid points with the
+        shape of the configurations.
 
-        W = V.copy()
-        for _ in range(Nu // nu-1):
-            W = np.concatenate((W,V*1),axis=0)
-        W = np.concatenate((W,V[:(Nu%nu),:,:]*1),axis=0)
+    """
 
-        V = W.copy()
-        for _ in range(Nv // nv-1):
-            W = np.concatenate((W,V*1),axis=1)
-        W = np.concatenate((W,V[:,:(Nv%nv),:]*1),axis=1)
+    X_np = np.array(X, dtype=float)
 
-        V = W.copy()
-        for _ in range(Nw // nw-1):
-            W = np.concatenate((W,V*1),axis=2)
-        W = np.concatenate((W,V[:,:,:(Nw%nw)]*1),axis=2)
+    X_k = idft_many(X_np.reshape(-1,nu,nv,nw,n_atm))
 
-        U[:,:,:,j] = W.copy()
+    return X_k.reshape(X_np.shape)*(nu*nv*nw)
 
-    x = np.fft.ifftn(U, axes=(0,1,2))
+def idft(X, workers=None):
+    """
+    Inverse discrete Fourier transform of supercell.
 
-    for i in range(1, Nu // nu):
-        x[i::(Nu//nu),:,:,:] += x[0::(Nu//nu),:,:,:]#*(Nu//nu-i)/(Nu//nu)
+    Parameters
+    ----------
+    X : 4d array
+        Supercell with last axis of unit cell atoms.
+    workers : int, optional
+        Number of threads. Default is ``None``, which uses the number of
+        OpenMP threads.
 
-    for j in range(1, Nv // nv):
-        x[:,j::(Nv//nv),:,:] += x[:,0::(Nv//nv),:,:]#*(Nv//nv-j)/(Nv//nv)
+    Returns
+    -------
+    X_k : 4d array, complex
+        Inverse discrete Fourier transform of supercell.
 
-    for k in range(1, Nw // nw):
-        x[:,:,k::(Nw//nw),:] += x[:,:,0::(Nw//nw),:]#*(Nw//nw-k)/(Nw//nw)
+    """
 
-    return x
+    return idft_many(X[np.newaxis], workers)[0]
@@ -11,12 +11,256 @@ cimport openmp
 
 from scipy.special import factorial
 
-from libc.math cimport M_PI, cos, sin, exp, sqrt
+from libc.math cimport M_PI, cos, sin, exp, sqrt, fabs
 
-from disorder.material import crystal, tables
+from disorder.material import crystal, tables, neighbor
 
 import os
 
+@cython.binding(True)
+def histogram(double [::1] rx,
+              double [::1] ry,
+              double [::1] rz,
+              double [::1] Vx,
+              double [::1] Vy,
+              double [::1] Vz,
+              double [:,:] A,
+              Py_ssize_t nu,
+              Py_ssize_t nv,
+              Py_ssize_t nw,
+              Py_ssize_t n_atm,
+              double width,
+              disorder='occupational',
+              int order=0,
+              r_max=None):
+    """
+    Pair distance histogram weighted by pair correlations.
+
+    Pairs are enumerated by walking the neighboring cells of each unit cell
+    within the averaging box of the periodic supercell. Each pair is weighted
+    by its box multiplicity and accumulated into distance bins per pair type.
+    With a distance cutoff, only cells that can contain a pair within it are
+    visited so that cost scales with the number of neighbors.
+
+    =============== ================================================
+    Disorder        Weights
+    =============== ================================================
+    'magnetic'      :math:`S_i\cdot S_j-(S_i\cdot\hat{r})(S_j\cdot\hat{r})`,
+                    :math:`3(S_i\cdot\hat{r})(S_j\cdot\hat{r})-S_i\cdot S_j`
+    'occupational'  :math:`(1+A_i)(1+A_j)`
+    'displacive'    :math:`U^p(\hat{U}\cdot\hat{r})^{p-2q}`
+    =============== ================================================
+
+    Parameters
+    ----------
+    rx, ry, rz : 1d array
+        Supercell atom, ion, or isotope positions.
+    Vx, Vy, Vz : 1d array
+        Spin vectors, relative occupancy parameter (first component only),
+        or displacements.
+    A : 2d array, 3x3
+        Crystal to Cartesian axis transformation matrix.
+    nu, nv, nw : int
+        Number of supercell grid points.
+    n_atm : int
+        Number of atoms in the unit cell.
+    width : float
+        Bin width.
+    disorder : str, optional
+        Either ``'magnetic'``, ``'occupational'``, or ``'displacive'``.
+        Default ``'occupational'``.
+    order : int, optional
+        Order of the Taylor expansion for displacive disorder. Default ``0``.
+    r_max : float, optional
+        Distance cutoff. Default ``None``, which includes every pair of the
+        averaging box.
+
+    Returns
+    -------
+    r : 1d array
+        Centers of the occupied bins.
+    weights : 3d array
+        Weights with shape ``(channels,n_atm*n_atm,bins)``.
+
+    """
+
+    cdef bint mag = disorder == 'magnetic'
+    cdef bint dis = disorder == 'displacive'
+
+    cdef Py_ssize_t thread_id, num_threads = openmp.omp_get_max_threads()
+
+    cdef Py_ssize_t mu = (nu+1) // 2
+    cdef Py_ssize_t mv = (nv+1) // 2
+    cdef Py_ssize_t mw = (nw+1) // 2
+
+    cdef Py_ssize_t n_uvw = nu*nv*nw
+
+    cdef Py_ssize_t n_types = n_atm*n_atm
+
+    coeff_size = int(np.ceil(float(order+2)/2)*np.floor(float(order+2)/2))
+
+    cdef Py_ssize_t n_ch = 2 if mag else (coeff_size if dis else 1)
+
+    A_np = np.asarray(A, dtype=float)
+
+    A_inv_np = np.linalg.inv(A_np)
+
+    box = np.sum(np.linalg.norm(A_np, axis=0)*np.array([mu,mv,mw]))
+
+    if r_max is None or r_max > box:
+        r_max = box
+
+    cdef double cutoff = r_max
+
+    lu, lv, lw = np.floor(r_max*np.linalg.norm(A_inv_np, axis=1)).astype(int)
+
+    cdef Py_ssize_t su = min(lu+1, mu-1)
+    cdef Py_ssize_t sv = min(lv+1, mv-1)
+    cdef Py_ssize_t sw = min(lw+1, mw-1)
+
+    cdef Py_ssize_t n_bins = int(r_max/width)+2
+
+    cdef double [:,::1] T = np.ascontiguousarray(A_np)
+    cdef double [:,::1] T_inv = A_inv_np
+
+    hist_np = np.zeros((num_threads,n_ch,n_types,n_bins))
+
+    cdef double [:,:,:,::1] hist = hist_np
+
+    cdef double [:,::1] powers = np.zeros((num_threads,order+1))
+
+    cdef double inv_width = 1/width
+
+    cdef Py_ssize_t i, j, k, l, m, p, q, s, t, c, iu, iv, iw, du, dv, dw, b
+
+    cdef double dx, dy, dz, u, v, w, r, mult, weight
+
+    cdef double Si_dot_Sj, Si_dot_r, Sj_dot_r
+
+    cdef double Ux_ij, Uy_ij, Uz_ij, U, U_dot_r, cos_ij
+
+    for i in prange(n_uvw, nogil=True):
+
+        thread_id = openmp.omp_get_thread_num()
+
+        iw = i % nw
+        iv = (i // nw) % nv
+        iu = i // (nw*nv)
+
+        for du in range(-su, su+1):
+            for dv in range(-sv, sv+1):
+                for dw in range(-sw, sw+1):
+
+                    j = (dw+iw+nw) % nw+nw*((dv+iv+nv) % nv\
+                                        +nv*((du+iu+nu) % nu))
+
+                    mult = 0.5*(mu-(du if du > 0 else -du))\
+                              *(mv-(dv if dv > 0 else -dv))\
+                              *(mw-(dw if dw > 0 else -dw))
+
+                    for k in range(n_atm):
+                        for l in range(n_atm):
+
+                            if (j == i and k == l):
+                                continue
+
+                            p = k+n_atm*i
+                            q = l+n_atm*j
+
+                            dx = rx[q]-rx[p]
+                            dy = ry[q]-ry[p]
+                            dz = rz[q]-rz[p]
+
+                            u = T_inv[0,0]*dx+T_inv[0,1]*dy+T_inv[0,2]*dz
+                            v = T_inv[1,0]*dx+T_inv[1,1]*dy+T_inv[1,2]*dz
+                            w = T_inv[2,0]*dx+T_inv[2,1]*dy+T_inv[2,2]*dz
+
+                            if (u <= -mu):
+                                u = u+nu
+                            elif (u >= mu):
+                                u = u-nu
+
+                            if (v <= -mv):
+                                v = v+nv
+                            elif (v >= mv):
+                                v = v-nv
+
+                            if (w <= -mw):
+                                w = w+nw
+                            elif (w >= mw):
+                                w = w-nw
+
+                            dx = T[0,0]*u+T[0,1]*v+T[0,2]*w
+                            dy = T[1,0]*u+T[1,1]*v+T[1,2]*w
+                            dz = T[2,0]*u+T[2,1]*v+T[2,2]*w
+
+                            r = sqrt(dx*dx+dy*dy+dz*dz)
+
+                            if (r > cutoff):
+                                continue
+
+                            b = int(r*inv_width)
+                            if (b >= n_bins):
+                                b = n_bins-1
+
+                            t = l+n_atm*k
+
+                            if mag:
+
+                                Si_dot_Sj = Vx[p]*Vx[q]+Vy[p]*Vy[q]\
+                                          + Vz[p]*Vz[q]
+
+                                Si_dot_r = (Vx[p]*dx+Vy[p]*dy+Vz[p]*dz)/r
+                                Sj_dot_r = (Vx[q]*dx+Vy[q]*dy+Vz[q]*dz)/r
+
+                                hist[thread_id,0,t,b] += mult*(Si_dot_Sj\
+                                                      -Si_dot_r*Sj_dot_r)
+
+                                hist[thread_id,1,t,b] += mult*(3*Si_dot_r\
+                                                      *Sj_dot_r-Si_dot_Sj)
+
+                            elif dis:
+
+                                Ux_ij = Vx[q]-Vx[p]
+                                Uy_ij = Vy[q]-Vy[p]
+                                Uz_ij = Vz[q]-Vz[p]
+
+                                U = sqrt(Ux_ij*Ux_ij+Uy_ij*Uy_ij+Uz_ij*Uz_ij)
+
+                                U_dot_r = Ux_ij*dx+Uy_ij*dy+Uz_ij*dz
+
+                                if (fabs(U*r) <= 1e-8):
+                                    cos_ij = U_dot_r
+                                else:
+                                    cos_ij = U_dot_r/(U*r)
+
+                                powers[thread_id,0] = 1
+                                for s in range(1, order+1):
+                                    powers[thread_id,s] = \
+                                        powers[thread_id,s-1]*cos_ij
+
+                                weight = mult
+                                for s in range(order+1):
+                                    c = s
+                                    for m in range(s // 2+1):
+                                        hist[thread_id,c,t,b] += weight\
+                                            *powers[thread_id,s-2*m]
+                                        c = c+order-1-2*m
+                                    weight = weight*U
+
+                            else:
+
+                                hist[thread_id,0,t,b] += mult*(1+Vx[p])\
+                                                              *(1+Vx[q])
+
+    weights = hist_np.sum(axis=0)
+
+    occupied = np.any(weights != 0, axis=(0,1))
+
+    r_np = (np.arange(n_bins)[occupied]+0.5)*width
+
+    return r_np, np.ascontiguousarray(weights[:,:,occupied])
+
 @cython.binding(True)
 def magnetic(double [::1] Sx,
              double [::1] Sy,
@@ -38,7 +282,9 @@ def magnetic(double [::1] Sx,
              Py_ssize_t nu,
              Py_ssize_t nv,
              Py_ssize_t nw,
-             double [::1] g):
+             double [::1] g,
+             width=None,
+             r_max=None):
     """
     Magnetic scattering intensity.
 
@@ -65,6 +311,12 @@ def magnetic(double [::1] Sx,
         Number of supercell grid points.
     g : 1d array
         Magnetic g-factor.
+    width : float, optional
+        Bin width of the pair distance histogram. Default is ``None``, which
+        sums over all pairs exactly.
+    r_max : float, optional
+        Distance cutoff of the pair distance histogram. Default is ``None``,
+        which includes every pair of the averaging box.
 
     Returns
     -------
@@ -94,153 +346,163 @@ def magnetic(double [::1] Sx,
     Sy_np = np.copy(Sy, order='C')
     Sz_np = np.copy(Sz, order='C')
 
-    c_uvw = np.arange(n_uvw)
+    if width is None:
 
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+        c_uvw = np.arange(n_uvw)
 
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
+        i_lat, j_lat = neighbor.lattice(nu, nv, nw)
 
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
+        i_atm, j_atm = np.triu_indices(n_atm, k=1)
 
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atm,j_atm))
+        j_atms = np.concatenate((j_atm,i_atm))
 
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atms,np.arange(n_atm)))
+        j_atms = np.concatenate((j_atms,np.arange(n_atm)))
 
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
+        is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
+        js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
 
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
+        i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
+        j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
 
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
+        iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
+        ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
 
-    i_atm, j_atm = np.triu_indices(n_atm, k=1)
+        diff_u = ju-iu
+        diff_v = jv-iv
+        diff_w = jw-iw
 
-    i_atms = np.concatenate((i_atm,j_atm))
-    j_atms = np.concatenate((j_atm,i_atm))
+        diff_u[diff_u >= mu] -= nu
+        diff_v[diff_v >= mv] -= nv
+        diff_w[diff_w >= mw] -= nw
 
-    i_atms = np.concatenate((i_atms,np.arange(n_atm)))
-    j_atms = np.concatenate((j_atms,np.arange(n_atm)))
+        diff_u[diff_u <= -mu] += nu
+        diff_v[diff_v <= -mv] += nv
+        diff_w[diff_w <= -mw] += nw
 
-    is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
-    js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
+        mult_s_np = (mu-np.abs(diff_u))\
+                  * (mv-np.abs(diff_v))\
+                  * (mw-np.abs(diff_w))*1.
 
-    i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
-    j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
+        mult_np = np.full(n_uvw, m_uvw, dtype=float)
 
-    iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
-    ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
+        A_inv = np.linalg.inv(A)
 
-    diff_u = ju-iu
-    diff_v = jv-iv
-    diff_w = jw-iw
+        rx_np = np.copy(rx, order='C')
+        ry_np = np.copy(ry, order='C')
+        rz_np = np.copy(rz, order='C')
 
-    diff_u[diff_u >= mu] -= nu
-    diff_v[diff_v >= mv] -= nv
-    diff_w[diff_w >= mw] -= nw
+        rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
+        ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
+        rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
 
-    diff_u[diff_u <= -mu] += nu
-    diff_v[diff_v <= -mv] += nv
-    diff_w[diff_w <= -mw] += nw
+        u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
+                                                   ry_s_ij_np,
+                                                   rz_s_ij_np, A_inv)
 
-    mult_s_np = (mu-np.abs(diff_u))*(mv-np.abs(diff_v))*(mw-np.abs(diff_w))*1.
+        u_s_ij[u_s_ij <= -mu] += nu
+        v_s_ij[v_s_ij <= -mv] += nv
+        w_s_ij[w_s_ij <= -mw] += nw
 
-    cdef double [::1] mult_s = mult_s_np
-    cdef double [::1] mult = np.full(n_uvw, m_uvw, dtype=float)
+        u_s_ij[u_s_ij >= mu] -= nu
+        v_s_ij[v_s_ij >= mv] -= nv
+        w_s_ij[w_s_ij >= mw] -= nw
 
-    A_inv = np.linalg.inv(A)
+        rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
+                                                               v_s_ij,
+                                                               w_s_ij, A)
 
-    rx_np = np.copy(rx, order='C')
-    ry_np = np.copy(ry, order='C')
-    rz_np = np.copy(rz, order='C')
+        rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
 
-    rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
-    ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
-    rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
+        rx_ij_np = rx_np[j_np]-rx_np[i_np]
+        ry_ij_np = ry_np[j_np]-ry_np[i_np]
+        rz_ij_np = rz_np[j_np]-rz_np[i_np]
 
-    u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
-                                               ry_s_ij_np,
-                                               rz_s_ij_np, A_inv)
+        u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np,
+                                             A_inv)
 
-    u_s_ij[u_s_ij <= -mu] += nu
-    v_s_ij[v_s_ij <= -mv] += nv
-    w_s_ij[w_s_ij <= -mw] += nw
+        u_ij[u_ij <= -mu] += nu
+        v_ij[v_ij <= -mv] += nv
+        w_ij[w_ij <= -mw] += nw
 
-    u_s_ij[u_s_ij >= mu] -= nu
-    v_s_ij[v_s_ij >= mv] -= nv
-    w_s_ij[w_s_ij >= mw] -= nw
+        u_ij[u_ij >= mu] -= nu
+        v_ij[v_ij >= mv] -= nv
+        w_ij[w_ij >= mw] -= nw
 
-    rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
-                                                           v_s_ij,
-                                                           w_s_ij, A)
+        rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
 
-    rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
+        r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
 
-    rx_ij_np = rx_np[j_np]-rx_np[i_np]
-    ry_ij_np = ry_np[j_np]-ry_np[i_np]
-    rz_ij_np = rz_np[j_np]-rz_np[i_np]
+        ks_np = np.mod(is_np[:,0], n_atm)
+        ls_np = np.mod(js_np[:,0], n_atm)
 
-    u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np, A_inv)
+        k_np = np.mod(i_np[:,0], n_atm)
+        l_np = np.mod(j_np[:,0], n_atm)
 
-    u_ij[u_ij <= -mu] += nu
-    v_ij[v_ij <= -mv] += nv
-    w_ij[w_ij <= -mw] += nw
+        Ss_i_dot_Ss_j_np = Sx_np[is_np]*Sx_np[js_np]\
+                         + Sy_np[is_np]*Sy_np[js_np]\
+                         + Sz_np[is_np]*Sz_np[js_np]
 
-    u_ij[u_ij >= mu] -= nu
-    v_ij[v_ij >= mv] -= nv
-    w_ij[w_ij >= mw] -= nw
+        S_i_dot_S_j_np = Sx_np[i_np]*Sx_np[j_np]\
+                       + Sy_np[i_np]*Sy_np[j_np]\
+                       + Sz_np[i_np]*Sz_np[j_np]
 
-    rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
+        Ss_i_dot_rs_ij_np = ((Sx_np[is_np]*rx_s_ij_np+\
+                              Sy_np[is_np]*ry_s_ij_np+\
+                              Sz_np[is_np]*rz_s_ij_np)/rs_ij_np)
 
-    r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
+        S_i_dot_r_ij_np = ((Sx_np[i_np]*rx_ij_np+\
+                            Sy_np[i_np]*ry_ij_np+\
+                            Sz_np[i_np]*rz_ij_np)/r_ij_np)
 
-    ks_np = np.mod(is_np[:,0], n_atm)
-    ls_np = np.mod(js_np[:,0], n_atm)
+        Ss_j_dot_rs_ij_np = ((Sx_np[js_np]*rx_s_ij_np+\
+                              Sy_np[js_np]*ry_s_ij_np+\
+                              Sz_np[js_np]*rz_s_ij_np)/rs_ij_np)
 
-    k_np = np.mod(i_np[:,0], n_atm)
-    l_np = np.mod(j_np[:,0], n_atm)
+        S_j_dot_r_ij_np = ((Sx_np[j_np]*rx_ij_np+\
+                            Sy_np[j_np]*ry_ij_np+\
+                            Sz_np[j_np]*rz_ij_np)/r_ij_np)
+
+        Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np = Ss_i_dot_rs_ij_np*Ss_j_dot_rs_ij_np
+
+        S_i_dot_r_ij_S_j_dot_r_ij_np = S_i_dot_r_ij_np*S_j_dot_r_ij_np
 
-    Ss_i_dot_Ss_j_np = Sx_np[is_np]*Sx_np[js_np]\
-                     + Sy_np[is_np]*Sy_np[js_np]\
-                     + Sz_np[is_np]*Sz_np[js_np]
+        As_ij_np = Ss_i_dot_Ss_j_np-Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np
 
-    S_i_dot_S_j_np = Sx_np[i_np]*Sx_np[j_np]\
-                   + Sy_np[i_np]*Sy_np[j_np]\
-                   + Sz_np[i_np]*Sz_np[j_np]
+        A_ij_np = S_i_dot_S_j_np-S_i_dot_r_ij_S_j_dot_r_ij_np
 
-    Ss_i_dot_rs_ij_np = ((Sx_np[is_np]*rx_s_ij_np+\
-                          Sy_np[is_np]*ry_s_ij_np+\
-                          Sz_np[is_np]*rz_s_ij_np)/rs_ij_np)
+        Bs_ij_np = 3*Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np-Ss_i_dot_Ss_j_np
 
-    S_i_dot_r_ij_np = ((Sx_np[i_np]*rx_ij_np+\
-                        Sy_np[i_np]*ry_ij_np+\
-                        Sz_np[i_np]*rz_ij_np)/r_ij_np)
+        B_ij_np = 3*S_i_dot_r_ij_S_j_dot_r_ij_np-S_i_dot_S_j_np
 
-    Ss_j_dot_rs_ij_np = ((Sx_np[js_np]*rx_s_ij_np+\
-                          Sy_np[js_np]*ry_s_ij_np+\
-                          Sz_np[js_np]*rz_s_ij_np)/rs_ij_np)
+    else:
 
-    S_j_dot_r_ij_np = ((Sx_np[j_np]*rx_ij_np+\
-                        Sy_np[j_np]*ry_ij_np+\
-                        Sz_np[j_np]*rz_ij_np)/r_ij_np)
+        r_np, (As_ij_np, Bs_ij_np) = histogram(rx, ry, rz, Sx, Sy, Sz, A,
+                                               nu, nv, nw, n_atm, width,
+                                               'magnetic', r_max=r_max)
 
-    Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np = Ss_i_dot_rs_ij_np*Ss_j_dot_rs_ij_np
+        rs_ij_np = np.tile(r_np, (n_atm*n_atm,1))
 
-    S_i_dot_r_ij_S_j_dot_r_ij_np = S_i_dot_r_ij_np*S_j_dot_r_ij_np
+        mult_s_np = np.ones(r_np.size)
 
-    cdef double [:,::1] As_ij = Ss_i_dot_Ss_j_np\
-                              - Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np
+        ks_np, ls_np = np.divmod(np.arange(n_atm*n_atm), n_atm)
 
-    cdef double [:,::1] A_ij = S_i_dot_S_j_np-S_i_dot_r_ij_S_j_dot_r_ij_np
+        k_np, l_np = np.triu_indices(n_atm, k=1)
 
-    cdef double [:,::1] Bs_ij = 3*Ss_i_dot_rs_ij_Ss_j_dot_rs_ij_np\
-                                - Ss_i_dot_Ss_j_np
+        r_ij_np = np.zeros((k_np.size,0))
+        A_ij_np = B_ij_np = r_ij_np
 
-    cdef double [:,::1] B_ij = 3*S_i_dot_r_ij_S_j_dot_r_ij_np-S_i_dot_S_j_np
+        mult_np = np.zeros(0)
+
+    cdef double [::1] mult_s = mult_s_np
+    cdef double [::1] mult = mult_np
+
+    cdef double [:,::1] As_ij = As_ij_np
+    cdef double [:,::1] A_ij = A_ij_np
+
+    cdef double [:,::1] Bs_ij = Bs_ij_np
+    cdef double [:,::1] B_ij = B_ij_np
 
     cdef long [::1] ks = ks_np.astype(int)
     cdef long [::1] ls = ls_np.astype(int)
@@ -555,7 +817,9 @@ def occupational(double [::1] A_r,
                  Py_ssize_t nu,
                  Py_ssize_t nv,
                  Py_ssize_t nw,
-                 source='neutron'):
+                 source='neutron',
+                 width=None,
+                 r_max=None):
     """
     Occupational scattering intensity.
 
@@ -583,6 +847,12 @@ def occupational(double [::1] A_r,
     source : str
         Radiation source ``'neutron'``, ``'x-ray'``, or ``'electron'``.
         Default ``'neutron'``.
+    width : float, optional
+        Bin width of the pair distance histogram. Default is ``None``, which
+        sums over all pairs exactly.
+    r_max : float, optional
+        Distance cutoff of the pair distance histogram. Default is ``None``,
+        which includes every pair of the averaging box.
 
     Returns
     -------
@@ -612,120 +882,129 @@ def occupational(double [::1] A_r,
 
     A_r_np = np.copy(A_r, order='C')
 
-    c_uvw = np.arange(n_uvw)
+    if width is None:
 
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+        c_uvw = np.arange(n_uvw)
 
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
+        i_lat, j_lat = neighbor.lattice(nu, nv, nw)
 
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
+        i_atm, j_atm = np.triu_indices(n_atm, k=1)
 
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atm,j_atm))
+        j_atms = np.concatenate((j_atm,i_atm))
 
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atms,np.arange(n_atm)))
+        j_atms = np.concatenate((j_atms,np.arange(n_atm)))
 
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
+        is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
+        js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
 
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
+        i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
+        j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
 
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
+        iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
+        ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
 
-    i_atm, j_atm = np.triu_indices(n_atm, k=1)
+        diff_u = ju-iu
+        diff_v = jv-iv
+        diff_w = jw-iw
 
-    i_atms = np.concatenate((i_atm,j_atm))
-    j_atms = np.concatenate((j_atm,i_atm))
+        diff_u[diff_u >= mu] -= nu
+        diff_v[diff_v >= mv] -= nv
+        diff_w[diff_w >= mw] -= nw
 
-    i_atms = np.concatenate((i_atms,np.arange(n_atm)))
-    j_atms = np.concatenate((j_atms,np.arange(n_atm)))
+        diff_u[diff_u <= -mu] += nu
+        diff_v[diff_v <= -mv] += nv
+        diff_w[diff_w <= -mw] += nw
 
-    is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
-    js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
+        mult_s_np = (mu-np.abs(diff_u))\
+                  * (mv-np.abs(diff_v))\
+                  * (mw-np.abs(diff_w))*1.
 
-    i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
-    j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
+        mult_np = np.full(n_uvw, m_uvw, dtype=float)
 
-    iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
-    ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
+        A_inv = np.linalg.inv(A)
 
-    diff_u = ju-iu
-    diff_v = jv-iv
-    diff_w = jw-iw
+        rx_np = np.copy(rx, order='C')
+        ry_np = np.copy(ry, order='C')
+        rz_np = np.copy(rz, order='C')
 
-    diff_u[diff_u >= mu] -= nu
-    diff_v[diff_v >= mv] -= nv
-    diff_w[diff_w >= mw] -= nw
+        rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
+        ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
+        rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
 
-    diff_u[diff_u <= -mu] += nu
-    diff_v[diff_v <= -mv] += nv
-    diff_w[diff_w <= -mw] += nw
+        u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
+                                                   ry_s_ij_np,
+                                                   rz_s_ij_np, A_inv)
 
-    mult_s_np = (mu-np.abs(diff_u))*(mv-np.abs(diff_v))*(mw-np.abs(diff_w))*1.
+        u_s_ij[u_s_ij <= -mu] += nu
+        v_s_ij[v_s_ij <= -mv] += nv
+        w_s_ij[w_s_ij <= -mw] += nw
 
-    cdef double [::1] mult_s = mult_s_np
-    cdef double [::1] mult = np.full(n_uvw, m_uvw, dtype=float)
+        u_s_ij[u_s_ij >= mu] -= nu
+        v_s_ij[v_s_ij >= mv] -= nv
+        w_s_ij[w_s_ij >= mw] -= nw
 
-    A_inv = np.linalg.inv(A)
+        rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
+                                                               v_s_ij,
+                                                               w_s_ij, A)
 
-    rx_np = np.copy(rx, order='C')
-    ry_np = np.copy(ry, order='C')
-    rz_np = np.copy(rz, order='C')
+        rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
 
-    rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
-    ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
-    rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
+        rx_ij_np = rx_np[j_np]-rx_np[i_np]
+        ry_ij_np = ry_np[j_np]-ry_np[i_np]
+        rz_ij_np = rz_np[j_np]-rz_np[i_np]
 
-    u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
-                                               ry_s_ij_np,
-                                               rz_s_ij_np, A_inv)
+        u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np,
+                                             A_inv)
 
-    u_s_ij[u_s_ij <= -mu] += nu
-    v_s_ij[v_s_ij <= -mv] += nv
-    w_s_ij[w_s_ij <= -mw] += nw
+        u_ij[u_ij <= -mu] += nu
+        v_ij[v_ij <= -mv] += nv
+        w_ij[w_ij <= -mw] += nw
 
-    u_s_ij[u_s_ij >= mu] -= nu
-    v_s_ij[v_s_ij >= mv] -= nv
-    w_s_ij[w_s_ij >= mw] -= nw
+        u_ij[u_ij >= mu] -= nu
+        v_ij[v_ij >= mv] -= nv
+        w_ij[w_ij >= mw] -= nw
 
-    rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
-                                                           v_s_ij,
-                                                           w_s_ij, A)
+        rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
 
-    rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
+        r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
 
-    rx_ij_np = rx_np[j_np]-rx_np[i_np]
-    ry_ij_np = ry_np[j_np]-ry_np[i_np]
-    rz_ij_np = rz_np[j_np]-rz_np[i_np]
+        ks_np = np.mod(is_np[:,0], n_atm)
+        ls_np = np.mod(js_np[:,0], n_atm)
 
-    u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np, A_inv)
+        k_np = np.mod(i_np[:,0], n_atm)
+        l_np = np.mod(j_np[:,0], n_atm)
 
-    u_ij[u_ij <= -mu] += nu
-    v_ij[v_ij <= -mv] += nv
-    w_ij[w_ij <= -mw] += nw
+        delta_s_ij_np = (1+A_r_np[is_np])*(1+A_r_np[js_np])
+        delta_ij_np = (1+A_r_np[i_np])*(1+A_r_np[j_np])
 
-    u_ij[u_ij >= mu] -= nu
-    v_ij[v_ij >= mv] -= nv
-    w_ij[w_ij >= mw] -= nw
+    else:
 
-    rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
+        r_np, (delta_s_ij_np,) = histogram(rx, ry, rz, A_r, A_r, A_r, A,
+                                           nu, nv, nw, n_atm, width,
+                                           'occupational', r_max=r_max)
 
-    r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
+        rs_ij_np = np.tile(r_np, (n_atm*n_atm,1))
 
-    ks_np = np.mod(is_np[:,0], n_atm)
-    ls_np = np.mod(js_np[:,0], n_atm)
+        mult_s_np = np.ones(r_np.size)
 
-    k_np = np.mod(i_np[:,0], n_atm)
-    l_np = np.mod(j_np[:,0], n_atm)
+        ks_np, ls_np = np.divmod(np.arange(n_atm*n_atm), n_atm)
+
+        k_np, l_np = np.triu_indices(n_atm, k=1)
+
+        r_ij_np = np.zeros((k_np.size,0))
+        delta_ij_np = r_ij_np
+
+        mult_np = np.zeros(0)
+
+    cdef double [::1] mult_s = mult_s_np
+    cdef double [::1] mult = mult_np
 
     cdef double [::1] delta_ii = (1+A_r_np[m_np])**2
 
-    cdef double [:,::1] delta_s_ij = (1+A_r_np[is_np])*(1+A_r_np[js_np])
-    cdef double [:,::1] delta_ij = (1+A_r_np[i_np])*(1+A_r_np[j_np])
+    cdef double [:,::1] delta_s_ij = delta_s_ij_np
+    cdef double [:,::1] delta_ij = delta_ij_np
 
     cdef long [::1] ks = ks_np.astype(int)
     cdef long [::1] ls = ls_np.astype(int)
@@ -995,7 +1274,9 @@ def displacive(double [::1] Ux,
                Py_ssize_t nv,
                Py_ssize_t nw,
                int order,
-               source='neutron'):
+               source='neutron',
+               width=None,
+               r_max=None):
     """
     Displacive scattering intensity.
 
@@ -1023,6 +1304,12 @@ def displacive(double [::1] Ux,
     source : str
         Radiation source ``'neutron'``, ``'x-ray'``, or ``'electron'``.
         Default ``'neutron'``.
+    width : float, optional
+        Bin width of the pair distance histogram. Default is ``None``, which
+        sums over all pairs exactly.
+    r_max : float, optional
+        Distance cutoff of the pair distance histogram. Default is ``None``,
+        which includes every pair of the averaging box.
 
     Returns
     -------
@@ -1056,152 +1343,173 @@ def displacive(double [::1] Ux,
     Uy_np = np.copy(Uy, order='C')
     Uz_np = np.copy(Uz, order='C')
 
-    c_uvw = np.arange(n_uvw)
+    if width is None:
 
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+        c_uvw = np.arange(n_uvw)
 
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
+        i_lat, j_lat = neighbor.lattice(nu, nv, nw)
 
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
+        i_atm, j_atm = np.triu_indices(n_atm, k=1)
 
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atm,j_atm))
+        j_atms = np.concatenate((j_atm,i_atm))
 
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
+        i_atms = np.concatenate((i_atms,np.arange(n_atm)))
+        j_atms = np.concatenate((j_atms,np.arange(n_atm)))
 
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
+        is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
+        js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
 
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
+        i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
+        j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
 
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
+        iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
+        ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
 
-    i_atm, j_atm = np.triu_indices(n_atm, k=1)
+        diff_u = ju-iu
+        diff_v = jv-iv
+        diff_w = jw-iw
 
-    i_atms = np.concatenate((i_atm,j_atm))
-    j_atms = np.concatenate((j_atm,i_atm))
+        diff_u[diff_u >= mu] -= nu
+        diff_v[diff_v >= mv] -= nv
+        diff_w[diff_w >= mw] -= nw
 
-    i_atms = np.concatenate((i_atms,np.arange(n_atm)))
-    j_atms = np.concatenate((j_atms,np.arange(n_atm)))
+        diff_u[diff_u <= -mu] += nu
+        diff_v[diff_v <= -mv] += nv
+        diff_w[diff_w <= -mw] += nw
 
-    is_np = np.ravel_multi_index((i_lat,i_atms[:,None]), (n_uvw,n_atm))
-    js_np = np.ravel_multi_index((j_lat,j_atms[:,None]), (n_uvw,n_atm))
+        mult_s_np = (mu-np.abs(diff_u))\
+                  * (mv-np.abs(diff_v))\
+                  * (mw-np.abs(diff_w))*1.
 
-    i_np = np.ravel_multi_index((c_uvw,i_atm[:,None]), (n_uvw,n_atm))
-    j_np = np.ravel_multi_index((c_uvw,j_atm[:,None]), (n_uvw,n_atm))
+        mult_np = np.full(n_uvw, m_uvw, dtype=float)
 
-    iu, iv, iw = np.unravel_index(i_lat, (nu,nv,nw))
-    ju, jv, jw = np.unravel_index(j_lat, (nu,nv,nw))
+        A_inv = np.linalg.inv(A)
 
-    diff_u = ju-iu
-    diff_v = jv-iv
-    diff_w = jw-iw
+        ks_np = np.mod(is_np[:,0], n_atm)
+        ls_np = np.mod(js_np[:,0], n_atm)
 
-    diff_u[diff_u >= mu] -= nu
-    diff_v[diff_v >= mv] -= nv
-    diff_w[diff_w >= mw] -= nw
+        k_np = np.mod(i_np[:,0], n_atm)
+        l_np = np.mod(j_np[:,0], n_atm)
 
-    diff_u[diff_u <= -mu] += nu
-    diff_v[diff_v <= -mv] += nv
-    diff_w[diff_w <= -mw] += nw
+        rx_np = np.copy(rx, order='C')
+        ry_np = np.copy(ry, order='C')
+        rz_np = np.copy(rz, order='C')
 
-    mult_s_np = (mu-np.abs(diff_u))*(mv-np.abs(diff_v))*(mw-np.abs(diff_w))*1.
+        rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
+        ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
+        rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
 
-    cdef double [::1] mult_s = mult_s_np
-    cdef double [::1] mult = np.full(n_uvw, m_uvw, dtype=float)
+        u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
+                                                   ry_s_ij_np,
+                                                   rz_s_ij_np, A_inv)
 
-    A_inv = np.linalg.inv(A)
+        u_s_ij[u_s_ij <= -mu] += nu
+        v_s_ij[v_s_ij <= -mv] += nv
+        w_s_ij[w_s_ij <= -mw] += nw
 
-    ks_np = np.mod(is_np[:,0], n_atm)
-    ls_np = np.mod(js_np[:,0], n_atm)
+        u_s_ij[u_s_ij >= mu] -= nu
+        v_s_ij[v_s_ij >= mv] -= nv
+        w_s_ij[w_s_ij >= mw] -= nw
 
-    k_np = np.mod(i_np[:,0], n_atm)
-    l_np = np.mod(j_np[:,0], n_atm)
+        rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
+                                                               v_s_ij,
+                                                               w_s_ij, A)
 
-    rx_np = np.copy(rx, order='C')
-    ry_np = np.copy(ry, order='C')
-    rz_np = np.copy(rz, order='C')
+        rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
 
-    rx_s_ij_np = rx_np[js_np]-rx_np[is_np]
-    ry_s_ij_np = ry_np[js_np]-ry_np[is_np]
-    rz_s_ij_np = rz_np[js_np]-rz_np[is_np]
+        rx_ij_np = rx_np[j_np]-rx_np[i_np]
+        ry_ij_np = ry_np[j_np]-ry_np[i_np]
+        rz_ij_np = rz_np[j_np]-rz_np[i_np]
 
-    u_s_ij, v_s_ij, w_s_ij = crystal.transform(rx_s_ij_np,
-                                               ry_s_ij_np,
-                                               rz_s_ij_np, A_inv)
+        u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np,
+                                             A_inv)
 
-    u_s_ij[u_s_ij <= -mu] += nu
-    v_s_ij[v_s_ij <= -mv] += nv
-    w_s_ij[w_s_ij <= -mw] += nw
+        u_ij[u_ij <= -mu] += nu
+        v_ij[v_ij <= -mv] += nv
+        w_ij[w_ij <= -mw] += nw
 
-    u_s_ij[u_s_ij >= mu] -= nu
-    v_s_ij[v_s_ij >= mv] -= nv
-    w_s_ij[w_s_ij >= mw] -= nw
+        u_ij[u_ij >= mu] -= nu
+        v_ij[v_ij >= mv] -= nv
+        w_ij[w_ij >= mw] -= nw
 
-    rx_s_ij_np, ry_s_ij_np, rz_s_ij_np = crystal.transform(u_s_ij,
-                                                           v_s_ij,
-                                                           w_s_ij, A)
+        rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
 
-    rs_ij_np = np.sqrt(rx_s_ij_np**2+ry_s_ij_np**2+rz_s_ij_np**2)
+        r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
 
-    rx_ij_np = rx_np[j_np]-rx_np[i_np]
-    ry_ij_np = ry_np[j_np]-ry_np[i_np]
-    rz_ij_np = rz_np[j_np]-rz_np[i_np]
+        Ux_s_ij_np = Ux_np[js_np]-Ux_np[is_np]
+        Uy_s_ij_np = Uy_np[js_np]-Uy_np[is_np]
+        Uz_s_ij_np = Uz_np[js_np]-Uz_np[is_np]
 
-    u_ij, v_ij, w_ij = crystal.transform(rx_ij_np, ry_ij_np, rz_ij_np, A_inv)
+        Us_ij_np = np.sqrt(Ux_s_ij_np**2+Uy_s_ij_np**2+Uz_s_ij_np**2)
 
-    u_ij[u_ij <= -mu] += nu
-    v_ij[v_ij <= -mv] += nv
-    w_ij[w_ij <= -mw] += nw
+        Ux_ij_np = Ux_np[j_np]-Ux_np[i_np]
+        Uy_ij_np = Uy_np[j_np]-Uy_np[i_np]
+        Uz_ij_np = Uz_np[j_np]-Uz_np[i_np]
 
-    u_ij[u_ij >= mu] -= nu
-    v_ij[v_ij >= mv] -= nv
-    w_ij[w_ij >= mw] -= nw
+        U_ij_np = np.sqrt(Ux_ij_np**2+Uy_ij_np**2+Uz_ij_np**2)
 
-    rx_ij_np, ry_ij_np, rz_ij_np = crystal.transform(u_ij, v_ij, w_ij, A)
+        Us_ij_mul_rs_ij = Us_ij_np*rs_ij_np
 
-    r_ij_np = np.sqrt(rx_ij_np**2+ry_ij_np**2+rz_ij_np**2)
+        U_ij_mul_r_ij = U_ij_np*r_ij_np
 
-    Ux_s_ij_np = Ux_np[js_np]-Ux_np[is_np]
-    Uy_s_ij_np = Uy_np[js_np]-Uy_np[is_np]
-    Uz_s_ij_np = Uz_np[js_np]-Uz_np[is_np]
+        Us_ij_mul_rs_ij[np.isclose(Us_ij_mul_rs_ij, 0)] = 1
 
-    Us_ij_np = np.sqrt(Ux_s_ij_np**2+Uy_s_ij_np**2+Uz_s_ij_np**2)
+        U_ij_mul_r_ij[np.isclose(U_ij_mul_r_ij, 0)] = 1
 
-    Ux_ij_np = Ux_np[j_np]-Ux_np[i_np]
-    Uy_ij_np = Uy_np[j_np]-Uy_np[i_np]
-    Uz_ij_np = Uz_np[j_np]-Uz_np[i_np]
+        Us_hat_ij_dot_rs_hat_ij = (Ux_s_ij_np*rx_s_ij_np
+                                +  Uy_s_ij_np*ry_s_ij_np\
+                                +  Uz_s_ij_np*rz_s_ij_np)/Us_ij_mul_rs_ij
 
-    U_ij_np = np.sqrt(Ux_ij_np**2+Uy_ij_np**2+Uz_ij_np**2)
+        U_hat_ij_dot_r_hat_ij = (Ux_ij_np*rx_ij_np
+                              +  Uy_ij_np*ry_ij_np\
+                              +  Uz_ij_np*rz_ij_np)/U_ij_mul_r_ij
 
-    cdef double [:,::1] Us_ij = Us_ij_np
-    cdef double [:,::1] U_ij = U_ij_np
+        Us_hat_ij_dot_rs_hat_ij_pow_np = \
+            Us_hat_ij_dot_rs_hat_ij[:,:,None]**np.arange(order+1)
 
-    Us_ij_mul_rs_ij = Us_ij_np*rs_ij_np
+        U_hat_ij_dot_r_hat_ij_pow_np = \
+            U_hat_ij_dot_r_hat_ij[:,:,None]**np.arange(order+1)
 
-    U_ij_mul_r_ij = U_ij_np*r_ij_np
+        weights_np = np.zeros((1,1,1))
 
-    Us_ij_mul_rs_ij[np.isclose(Us_ij_mul_rs_ij, 0)] = 1
+    else:
 
-    U_ij_mul_r_ij[np.isclose(U_ij_mul_r_ij, 0)] = 1
+        r_np, weights_np = histogram(rx, ry, rz, Ux, Uy, Uz, A, nu, nv, nw,
+                                     n_atm, width, 'displacive', order,
+                                     r_max)
 
-    Us_hat_ij_dot_rs_hat_ij = (Ux_s_ij_np*rx_s_ij_np
-                            +  Uy_s_ij_np*ry_s_ij_np\
-                            +  Uz_s_ij_np*rz_s_ij_np)/Us_ij_mul_rs_ij
+        rs_ij_np = np.tile(r_np, (n_atm*n_atm,1))
+
+        mult_s_np = np.ones(r_np.size)
+
+        ks_np, ls_np = np.divmod(np.arange(n_atm*n_atm), n_atm)
+
+        k_np, l_np = np.triu_indices(n_atm, k=1)
+
+        r_ij_np = np.zeros((k_np.size,0))
+        U_ij_np = Us_ij_np = r_ij_np
+
+        mult_np = np.zeros(0)
+
+        U_hat_ij_dot_r_hat_ij_pow_np = np.zeros((k_np.size,0,order+1))
+        Us_hat_ij_dot_rs_hat_ij_pow_np = U_hat_ij_dot_r_hat_ij_pow_np
+
+    cdef bint binned = width is not None
+
+    cdef double [::1] mult_s = mult_s_np
+    cdef double [::1] mult = mult_np
 
-    U_hat_ij_dot_r_hat_ij = (Ux_ij_np*rx_ij_np
-                          +  Uy_ij_np*ry_ij_np\
-                          +  Uz_ij_np*rz_ij_np)/U_ij_mul_r_ij
+    cdef double [:,::1] Us_ij = Us_ij_np
+    cdef double [:,::1] U_ij = U_ij_np
 
     cdef double [:,:,::1] Us_hat_ij_dot_rs_hat_ij_pow = \
-        Us_hat_ij_dot_rs_hat_ij[:,:,None]**np.arange(order+1)
+        Us_hat_ij_dot_rs_hat_ij_pow_np
 
     cdef double [:,:,::1] U_hat_ij_dot_r_hat_ij_pow = \
-        U_hat_ij_dot_r_hat_ij[:,:,None]**np.arange(order+1)
+        U_hat_ij_dot_r_hat_ij_pow_np
+
+    cdef double [:,:,::1] weights = weights_np
 
     cdef long [::1] ks = ks_np.astype(int)
     cdef long [::1] ls = ls_np.astype(int)
@@ -1352,6 +1660,42 @@ def displacive(double [::1] Ux,
 
             factors = (f_k_real*f_l_real+f_k_imag*f_l_imag)/n_uvw
 
+            if binned:
+
+                for p in prange(n_pairs, nogil=True):
+
+                    Qr_ij = Q[q]*rs_ij[a,p]
+
+                    thread_id = openmp.omp_get_thread_num()
+
+                    for r in range(order+1):
+                        if (r == 0):
+                            a_ij[thread_id,0] = sin(Qr_ij)/Qr_ij
+                        elif (r == 1):
+                            a_ij[thread_id,1] = (a_ij[thread_id,0]\
+                                                 -cos(Qr_ij))/Qr_ij
+                        else:
+                            a_ij[thread_id,r] = (2*r-1)/Qr_ij\
+                                              * a_ij[thread_id,r-1]\
+                                              - a_ij[thread_id,r-2]
+
+                    Qu_ij_pow = 1
+
+                    values = 0
+                    for r in range(order+1):
+                        t = r
+                        Qr_ij_pow = 1
+                        for s in range(r // 2+1):
+                            values = values+coeff[t]*Qu_ij_pow/Qr_ij_pow\
+                                   * weights[t,a,p]*a_ij[thread_id,r-s]
+                            t = t+order-1-2*s
+                            Qr_ij_pow = Qr_ij_pow*Qr_ij
+                        Qu_ij_pow = Qu_ij_pow*Q[q]
+
+                    value += factors*values*mult_s[p]
+
+                continue
+
             for p in prange(n_pairs, nogil=True):
 
                 Qr_ij = Q[q]*rs_ij[a,p]
@@ -1584,27 +1928,7 @@ def average(double [::1] occupancy,
 
     c_uvw = np.arange(n_uvw)
 
-    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
-
-    i_lat, j_lat = np.triu_indices(m_uvw, k=1)
-
-    iu, iv, iw = np.unravel_index(i_lat, (mu,mv,mw))
-    ju, jv, jw = np.unravel_index(j_lat, (mu,mv,mw))
-
-    iu = np.mod(iu+cu[:,None], nu)
-    iv = np.mod(iv+cv[:,None], nv)
-    iw = np.mod(iw+cw[:,None], nw)
-
-    ju = np.mod(ju+cu[:,None], nu)
-    jv = np.mod(jv+cv[:,None], nv)
-    jw = np.mod(jw+cw[:,None], nw)
-
-    i_lat = np.ravel_multi_index((iu,iv,iw), (nu,nv,nw))
-    j_lat = np.ravel_multi_index((ju,jv,jw), (nu,nv,nw))
-
-    pairs = np.stack((i_lat,j_lat)).reshape(2,n_uvw*m_uvw*(m_uvw-1)//2)
-
-    i_lat, j_lat = np.unique(np.sort(pairs, axis=0), axis=1)
+    i_lat, j_lat = neighbor.lattice(nu, nv, nw)
 
     i_atm, j_atm = np.triu_indices(n_atm, k=1)
 
@@ -3,6 +3,8 @@
 
 cimport cython
 
+cdef Py_ssize_t random_integer() nogil
+
 cdef double random_uniform_nonzero() nogil
 
 cdef double random_uniform() nogil
@@ -11,11 +11,59 @@ from cython.parallel cimport prange, parallel
 cimport cython
 cimport openmp
 
-from libc.stdlib cimport rand, RAND_MAX
 from libc.math cimport M_PI, cos, sin, exp, sqrt, acos, fabs, log
 
 from disorder.diffuse cimport filters
 
+cdef extern from *:
+    """
+    #include <stdint.h>
+    #include <omp.h>
+
+    #if defined(_MSC_VER)
+    #include <process.h>
+    #define DISORDER_THREAD_LOCAL __declspec(thread)
+    #define DISORDER_PID _getpid()
+    #else
+    #include <unistd.h>
+    #define DISORDER_THREAD_LOCAL __thread
+    #define DISORDER_PID getpid()
+    #endif
+
+    #define DISORDER_GOLDEN 0x9e3779b97f4a7c15ULL
+
+    static DISORDER_THREAD_LOCAL uint64_t disorder_key = DISORDER_GOLDEN;
+    static DISORDER_THREAD_LOCAL uint64_t disorder_counter = 0;
+    static DISORDER_THREAD_LOCAL int disorder_seeded = 0;
+
+    static inline uint64_t disorder_mix(uint64_t z) {
+        z = (z^(z >> 30))*0xbf58476d1ce4e5b9ULL;
+        z = (z^(z >> 27))*0x94d049bb133111ebULL;
+        return z^(z >> 31);
+    }
+
+    static inline void disorder_seed(uint64_t seed) {
+        disorder_key = disorder_mix(seed+DISORDER_GOLDEN);
+        disorder_counter = 0;
+        disorder_seeded = 1;
+    }
+
+    /* unseeded threads and processes draw distinct streams */
+    static inline void disorder_default(void) {
+        uint64_t z = disorder_mix((uint64_t) DISORDER_PID+DISORDER_GOLDEN);
+        z = disorder_mix(z+(uint64_t) omp_get_thread_num());
+        disorder_seed(z+(uint64_t) (uintptr_t) &disorder_key);
+    }
+
+    static inline uint64_t disorder_random(void) {
+        if (!disorder_seeded) disorder_default();
+        disorder_counter += 1;
+        return disorder_mix(disorder_key+DISORDER_GOLDEN*disorder_counter);
+    }
+    """
+    void disorder_seed(unsigned long long seed) nogil
+    unsigned long long disorder_random() nogil
+
 def parallelism(app=True):
 
     threads = os.environ.get('OMP_NUM_THREADS')
@@ -40,6 +88,16 @@ def parallelism(app=True):
 
     print('threads:', num_threads)
 
+def set_num_threads(Py_ssize_t num_threads):
+
+    openmp.omp_set_num_threads(num_threads)
+
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+
+cpdef void set_seed(Py_ssize_t s) nogil:
+
+    disorder_seed(s)
+
 def threads():
 
     cdef Py_ssize_t i_thread, thread_id, num_threads
@@ -61,7 +119,7 @@ def threads():
 cpdef (double, Py_ssize_t) original_scalar(double [::1] A) nogil:
 
     cdef Py_ssize_t n = A.shape[0]
-    cdef Py_ssize_t i = rand() % n
+    cdef Py_ssize_t i = random_integer() % n
 
     return A[i], i
 
@@ -73,7 +131,7 @@ cpdef (double, \
                                    double [::1] C) nogil:
 
     cdef Py_ssize_t n = A.shape[0]
-    cdef Py_ssize_t i = rand() % n
+    cdef Py_ssize_t i = random_integer() % n
 
     return A[i], B[i], C[i], i
 
@@ -85,7 +143,7 @@ cpdef Py_ssize_t original_scalars(double [::1] B,
     cdef Py_ssize_t m = structure.shape[0]
     cdef Py_ssize_t n = structure.shape[1]
 
-    cdef Py_ssize_t k = rand() % m
+    cdef Py_ssize_t k = random_integer() % m
 
     i = structure[k,:]
 
@@ -108,7 +166,7 @@ cpdef Py_ssize_t original_vectors(double [::1] D,
     cdef Py_ssize_t m = structure.shape[0]
     cdef Py_ssize_t n = structure.shape[1]
 
-    cdef Py_ssize_t k = rand() % m
+    cdef Py_ssize_t k = random_integer() % m
 
     i = structure[k,:]
 
@@ -123,18 +181,24 @@ cpdef Py_ssize_t original_vectors(double [::1] D,
 
 cdef double M_EPS = np.finfo(float).eps
 
+cdef double M_INV_53 = 1.0/9007199254740992.0
+
+cdef Py_ssize_t random_integer() nogil:
+
+    return disorder_random() >> 1
+
 cdef double random_uniform_nonzero() nogil:
 
     cdef double u = 0
 
     while (u == 0):
-        u = float(rand())/RAND_MAX
+        u = random_uniform()
 
     return u
 
 cdef double random_uniform() nogil:
 
-    return float(rand())/RAND_MAX
+    return (disorder_random() >> 11)*M_INV_53
 
 cdef double random_gaussian() nogil:
 
@@ -219,6 +283,20 @@ cdef double complex iexp(double y) nogil:
 
     return cos(y)+1j*sin(y)
 
+cdef inline double complex phase(double complex [::1] space_factor,
+                                 Py_ssize_t i_u,
+                                 Py_ssize_t i_v,
+                                 Py_ssize_t i_w,
+                                 Py_ssize_t mu,
+                                 Py_ssize_t mv,
+                                 Py_ssize_t mw,
+                                 bint separable) nogil:
+
+    if separable:
+        return space_factor[i_u]*space_factor[mu+i_v]*space_factor[mu+mv+i_w]
+    else:
+        return space_factor[i_w+mw*(i_v+mv*i_u)]
+
 cpdef void extract_complex(double complex [::1] B,
                            double complex [::1] A,
                            Py_ssize_t j,
@@ -423,6 +501,69 @@ cpdef (double, double, double) reduced_chi_square(double [::1] calc,
 
     return chi_sq, scale, level
 
+cpdef (double, double) experimental_moments(double [::1] expt,
+                                            double [::1] weight) nogil:
+
+    cdef Py_ssize_t n_hkl = expt.shape[0]
+
+    cdef double sum_weight = 0, sum_expt = 0
+
+    cdef Py_ssize_t i_hkl
+
+    for i_hkl in prange(n_hkl):
+
+        sum_weight += weight[i_hkl]
+
+        sum_expt += expt[i_hkl]*weight[i_hkl]
+
+    return sum_weight, sum_expt
+
+cpdef (double, double, double) moment_chi_square(double [::1] I_flat,
+                                                 double [::1] calc,
+                                                 double [::1] expt,
+                                                 double [::1] weight,
+                                                 long [::1] i_unmask,
+                                                 double sum_weight,
+                                                 double sum_expt) nogil:
+
+    cdef Py_ssize_t n_hkl = i_unmask.shape[0]
+
+    cdef double chi_sq = 0
+
+    cdef double sum_calc = 0, sum_calc_calc = 0, sum_calc_expt = 0
+
+    cdef double value, inter_calc
+
+    cdef double scale, level, diff
+
+    cdef Py_ssize_t i_hkl
+
+    for i_hkl in prange(n_hkl):
+
+        value = I_flat[i_unmask[i_hkl]]
+
+        calc[i_hkl] = value
+
+        inter_calc = value*weight[i_hkl]
+
+        sum_calc += inter_calc
+
+        sum_calc_calc += inter_calc*value
+        sum_calc_expt += inter_calc*expt[i_hkl]
+
+    scale = (sum_weight*sum_calc_expt-sum_calc*sum_expt)\
+          / (sum_weight*sum_calc_calc-sum_calc*sum_calc)
+
+    level = (sum_expt-scale*sum_calc)/sum_weight
+
+    for i_hkl in prange(n_hkl):
+
+        diff = scale*calc[i_hkl]+level-expt[i_hkl]
+
+        chi_sq += weight[i_hkl]*diff*diff
+
+    return chi_sq, scale, level
+
 cpdef void products(double [::1] V,
                     double Vx,
                     double Vy,
@@ -571,15 +712,17 @@ cpdef void update_spin(double complex [::1] Sx_k_cand,
     cdef Py_ssize_t v = i // n_atm // nw % nv
     cdef Py_ssize_t u = i // n_atm // nw // nv % nu
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
@@ -592,21 +735,20 @@ cpdef void update_spin(double complex [::1] Sx_k_cand,
     for iu in prange(nu):
 
         i_u = nv*iu
-        i_f = mv*(u+iu*nu)
 
         for iv in range(nv):
 
             i_uv = nw*(iv+i_u)
-            i_fa = mw*(v+iv*nv+i_f)
 
             for iw in range(nw):
 
                 i_uvw = iw+i_uv
-                i_fac = w+iw*nw+i_fa
+                fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                            mu, mv, mw, separable)
 
-                Sx_k_cand[i_uvw] = Sx_k_orig[i_uvw]+dSx*space_factor[i_fac]
-                Sy_k_cand[i_uvw] = Sy_k_orig[i_uvw]+dSy*space_factor[i_fac]
-                Sz_k_cand[i_uvw] = Sz_k_orig[i_uvw]+dSz*space_factor[i_fac]
+                Sx_k_cand[i_uvw] = Sx_k_orig[i_uvw]+dSx*fac
+                Sy_k_cand[i_uvw] = Sy_k_orig[i_uvw]+dSy*fac
+                Sz_k_cand[i_uvw] = Sz_k_orig[i_uvw]+dSz*fac
 
 cpdef void update_composition(double complex [::1] A_k_cand,
                               double A_cand,
@@ -623,15 +765,17 @@ cpdef void update_composition(double complex [::1] A_k_cand,
     cdef Py_ssize_t v = i // n_atm // nw % nv
     cdef Py_ssize_t u = i // n_atm // nw // nv % nu
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef double dA = A_cand-A_orig
 
@@ -640,19 +784,18 @@ cpdef void update_composition(double complex [::1] A_k_cand,
     for iu in prange(nu):
 
         i_u = nv*iu
-        i_f = mv*(u+iu*nu)
 
         for iv in range(nv):
 
             i_uv = nw*(iv+i_u)
-            i_fa = mw*(v+iv*nv+i_f)
 
             for iw in range(nw):
 
                 i_uvw = iw+i_uv
-                i_fac = w+iw*nw+i_fa
+                fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                            mu, mv, mw, separable)
 
-                A_k_cand[i_uvw] = A_k_orig[i_uvw]+dA*space_factor[i_fac]
+                A_k_cand[i_uvw] = A_k_orig[i_uvw]+dA*fac
 
 cpdef void update_composition_molecule(double complex [::1] A_k_cand,
                                        double [::1] A_cand,
@@ -669,15 +812,17 @@ cpdef void update_composition_molecule(double complex [::1] A_k_cand,
 
     cdef Py_ssize_t u, v, w
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef double dA
 
@@ -696,20 +841,19 @@ cpdef void update_composition_molecule(double complex [::1] A_k_cand,
         for iu in prange(nu):
 
             i_u = nv*iu
-            i_f = mv*(u+iu*nu)
 
             for iv in range(nv):
 
                 i_uv = nw*(iv+i_u)
-                i_fa = mw*(v+iv*nv+i_f)
 
                 for iw in range(nw):
 
                     i_uvw = iw+i_uv
-                    i_fac = w+iw*nw+i_fa
+                    fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                mu, mv, mw, separable)
 
                     A_k_cand[i_ind+n_ind*i_uvw] = A_k_orig[i_ind+n_ind*i_uvw]\
-                                                + dA*space_factor[i_fac]
+                                                + dA*fac
 
 cpdef void update_expansion(double complex [::1] U_k_cand,
                             double [::1] U_cand,
@@ -728,17 +872,19 @@ cpdef void update_expansion(double complex [::1] U_k_cand,
     cdef Py_ssize_t v = i // n_atm // nw % nv
     cdef Py_ssize_t u = i // n_atm // nw // nv % nu
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -753,21 +899,20 @@ cpdef void update_expansion(double complex [::1] U_k_cand,
         for iu in prange(nu):
 
             i_u = nv*iu
-            i_f = mv*(u+iu*nu)
 
             for iv in range(nv):
 
                 i_uv = nw*(iv+i_u)
-                i_fa = mw*(v+iv*nv+i_f)
 
                 for iw in range(nw):
 
                     i_uvw = iw+i_uv
-                    i_fac = w+iw*nw+i_fa
+                    fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                mu, mv, mw, separable)
 
                     iU = i_uvw+n_uvw*i_prod
 
-                    U_k_cand[iU] = U_k_orig[iU]+dU*space_factor[i_fac]
+                    U_k_cand[iU] = U_k_orig[iU]+dU*fac
 
 cpdef void update_expansion_molecule(double complex [::1] U_k_cand,
                                      double [::1] U_cand,
@@ -786,17 +931,21 @@ cpdef void update_expansion_molecule(double complex [::1] U_k_cand,
 
     cdef Py_ssize_t u, v, w
 
-    cdef Py_ssize_t i_fac, i_ind, i
+    cdef Py_ssize_t i_ind, i
+
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -819,22 +968,21 @@ cpdef void update_expansion_molecule(double complex [::1] U_k_cand,
             for iu in prange(nu):
 
                 i_u = nv*iu
-                i_f = mv*(u+iu*nu)
 
                 for iv in range(nv):
 
                     i_uv = nw*(iv+i_u)
-                    i_fa = mw*(v+iv*nv+i_f)
 
                     for iw in range(nw):
 
                         i_uvw = iw+i_uv
-                        i_fac = w+iw*nw+i_fa
+                        fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                    mu, mv, mw, separable)
 
                         iU = i_uvw+n_uvw*i_prod
 
                         U_k_cand[i_ind+n_ind*iU] = U_k_orig[i_ind+n_ind*iU]\
-                                                 + dU*space_factor[i_fac]
+                                                 + dU*fac
 
 cpdef void update_relaxation(double complex [::1] A_k_cand,
                              double A_cand,
@@ -854,17 +1002,19 @@ cpdef void update_relaxation(double complex [::1] A_k_cand,
     cdef Py_ssize_t v = i // n_atm // nw % nv
     cdef Py_ssize_t u = i // n_atm // nw // nv % nu
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -881,21 +1031,20 @@ cpdef void update_relaxation(double complex [::1] A_k_cand,
         for iu in prange(nu):
 
             i_u = nv*iu
-            i_f = mv*(u+iu*nu)
 
             for iv in range(nv):
 
                 i_uv = nw*(iv+i_u)
-                i_fa = mw*(v+iv*nv+i_f)
 
                 for iw in range(nw):
 
                     i_uvw = iw+i_uv
-                    i_fac = w+iw*nw+i_fa
+                    fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                mu, mv, mw, separable)
 
                     iU = i_uvw+n_uvw*i_prod
 
-                    A_k_cand[iU] = A_k_orig[iU]+dU*space_factor[i_fac]
+                    A_k_cand[iU] = A_k_orig[iU]+dU*fac
 
 cpdef void update_relaxation_mol(double complex [::1] A_k_cand,
                                  double [::1] A_cand,
@@ -915,17 +1064,21 @@ cpdef void update_relaxation_mol(double complex [::1] A_k_cand,
 
     cdef Py_ssize_t u, v, w
 
-    cdef Py_ssize_t i_fac, i_ind, i
+    cdef Py_ssize_t i_ind, i
+
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -950,22 +1103,21 @@ cpdef void update_relaxation_mol(double complex [::1] A_k_cand,
             for iu in prange(nu):
 
                 i_u = nv*iu
-                i_f = mv*(u+iu*nu)
 
                 for iv in range(nv):
 
                     i_uv = nw*(iv+i_u)
-                    i_fa = mw*(v+iv*nv+i_f)
 
                     for iw in range(nw):
 
                         i_uvw = iw+i_uv
-                        i_fac = w+iw*nw+i_fa
+                        fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                    mu, mv, mw, separable)
 
                         iU = i_uvw+n_uvw*i_prod
 
                         A_k_cand[i_ind+n_ind*iU] = A_k_orig[i_ind+n_ind*iU]\
-                                                 + dU*space_factor[i_fac]
+                                                 + dU*fac
 
 cpdef void update_extension(double complex [::1] U_k_cand,
                             double complex [::1] A_k_cand,
@@ -987,17 +1139,19 @@ cpdef void update_extension(double complex [::1] U_k_cand,
     cdef Py_ssize_t v = i // n_atm // nw % nv
     cdef Py_ssize_t u = i // n_atm // nw // nv % nu
 
-    cdef Py_ssize_t i_fac
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -1013,22 +1167,21 @@ cpdef void update_extension(double complex [::1] U_k_cand,
         for iu in prange(nu):
 
             i_u = nv*iu
-            i_f = mv*(u+iu*nu)
 
             for iv in range(nv):
 
                 i_uv = nw*(iv+i_u)
-                i_fa = mw*(v+iv*nv+i_f)
 
                 for iw in range(nw):
 
                     i_uvw = iw+i_uv
-                    i_fac = w+iw*nw+i_fa
+                    fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                mu, mv, mw, separable)
 
                     iU = i_uvw+n_uvw*i_prod
 
-                    U_k_cand[iU] = U_k_orig[iU]+dU*space_factor[i_fac]
-                    A_k_cand[iU] = A_k_orig[iU]+dA*space_factor[i_fac]
+                    U_k_cand[iU] = U_k_orig[iU]+dU*fac
+                    A_k_cand[iU] = A_k_orig[iU]+dA*fac
 
 cpdef void update_extension_mol(double complex [::1] U_k_cand,
                                 double complex [::1] A_k_cand,
@@ -1050,17 +1203,21 @@ cpdef void update_extension_mol(double complex [::1] U_k_cand,
 
     cdef Py_ssize_t u, v, w
 
-    cdef Py_ssize_t i_fac, i_ind, i
+    cdef Py_ssize_t i_ind, i
+
+    cdef double complex fac
 
     cdef Py_ssize_t n_uvw = nu*nv*nw
 
+    cdef Py_ssize_t mu = nu**2
     cdef Py_ssize_t mv = nv**2
     cdef Py_ssize_t mw = nw**2
 
+    cdef bint separable = space_factor.shape[0] == mu+mv+mw
+
     cdef Py_ssize_t iu, iv, iw
 
     cdef Py_ssize_t i_u, i_uv
-    cdef Py_ssize_t i_f, i_fa
 
     cdef Py_ssize_t iU
 
@@ -1086,24 +1243,23 @@ cpdef void update_extension_mol(double complex [::1] U_k_cand,
             for iu in prange(nu):
 
                 i_u = nv*iu
-                i_f = mv*(u+iu*nu)
 
                 for iv in range(nv):
 
                     i_uv = nw*(iv+i_u)
-                    i_fa = mw*(v+iv*nv+i_f)
 
                     for iw in range(nw):
 
                         i_uvw = iw+i_uv
-                        i_fac = w+iw*nw+i_fa
+                        fac = phase(space_factor, u+iu*nu, v+iv*nv, w+iw*nw,
+                                    mu, mv, mw, separable)
 
                         iU = i_uvw+n_uvw*i_prod
 
                         U_k_cand[i_ind+n_ind*iU] = U_k_orig[i_ind+n_ind*iU]\
-                                                 + dU*space_factor[i_fac]
+                                                 + dU*fac
                         A_k_cand[i_ind+n_ind*iU] = A_k_orig[i_ind+n_ind*iU]\
-                                                 + dA*space_factor[i_fac]
+                                                 + dA*fac
 
 cpdef void magnetic_structure_factor(double complex [::1] Fx_cand,
                                      double complex [::1] Fy_cand,
@@ -1598,14 +1754,8 @@ cpdef void magnetic(double [::1] Sx,
                     double [::1] v_inv,
                     double [::1] a_filt,
                     double [::1] b_filt,
-                    double [::1] c_filt,
-                    double [::1] d_filt,
-                    double [::1] e_filt,
-                    double [::1] f_filt,
-                    double [::1] g_filt,
-                    double [::1] h_filt,
-                    double [::1] i_filt,
                     long [::1] boxes,
+                    double [:,::1] coeffs_filt,
                     long [::1] i_dft,
                     long [::1] inverses,
                     long [::1] i_mask,
@@ -1630,13 +1780,16 @@ cpdef void magnetic(double [::1] Sx,
                     Py_ssize_t nw,
                     Py_ssize_t n_atm,
                     Py_ssize_t n,
-                    Py_ssize_t N):
+                    Py_ssize_t N,
+                    Py_ssize_t recheck=0):
 
     cdef double temp, inv_temp
 
     cdef double delta_chi_sq, chi_sq_cand, chi_sq_orig
     cdef double scale_factor, background
 
+    cdef double sum_weight, sum_expt
+
     cdef double Sx_orig, Sy_orig, Sz_orig, Sx_cand, Sy_cand, Sz_cand, mu
 
     acc_moves_np = np.full(N, np.nan)
@@ -1664,6 +1817,8 @@ cpdef void magnetic(double [::1] Sx,
     chi_sq_orig = chi_sq[len(chi_sq)-1]
     temp = temperature[len(temperature)-1]
 
+    sum_weight, sum_expt = experimental_moments(I_expt, weight)
+
     with nogil:
 
         for s in range(N):
@@ -1763,24 +1918,32 @@ cpdef void magnetic(double [::1] Sx,
                               I_raw,
                               v_inv,
                               boxes,
+                              coeffs_filt,
                               a_filt,
                               b_filt,
-                              c_filt,
-                              d_filt,
-                              e_filt,
-                              f_filt,
-                              g_filt,
-                              h_filt,
-                              i_filt,
                               nh,
                               nk,
                               nl)
 
-            unmask_intensity(I_ref, I_flat, i_unmask)
+            if (recheck > 0 and (s+1) % recheck != 0):
 
-            chi_sq_cand, scale_factor, background = reduced_chi_square(I_ref, 
-                                                                       I_expt, 
-                                                                       weight)
+                chi_sq_cand, \
+                scale_factor, \
+                background = moment_chi_square(I_flat,
+                                               I_ref,
+                                               I_expt,
+                                               weight,
+                                               i_unmask,
+                                               sum_weight,
+                                               sum_expt)
+
+            else:
+
+                unmask_intensity(I_ref, I_flat, i_unmask)
+
+                chi_sq_cand, \
+                scale_factor, \
+                background = reduced_chi_square(I_ref, I_expt, weight)
 
             delta_chi_sq = chi_sq_cand-chi_sq_orig
 
@@ -1851,14 +2014,8 @@ cpdef void occupational(double [::1] A_r,
                         double [::1] v_inv,
                         double [::1] a_filt,
                         double [::1] b_filt,
-                        double [::1] c_filt,
-                        double [::1] d_filt,
-                        double [::1] e_filt,
-                        double [::1] f_filt,
-                        double [::1] g_filt,
-                        double [::1] h_filt,
-                        double [::1] i_filt,
                         long [::1] boxes,
+                        double [:,::1] coeffs_filt,
                         long [::1] i_dft,
                         long [::1] inverses,
                         long [::1] i_mask,
@@ -1882,13 +2039,16 @@ cpdef void occupational(double [::1] A_r,
                         Py_ssize_t nw,
                         Py_ssize_t n_atm,
                         Py_ssize_t n,
-                        Py_ssize_t N):
+                        Py_ssize_t N,
+                        Py_ssize_t recheck=0):
 
     cdef double temp, inv_temp
 
     cdef double delta_chi_sq, chi_sq_cand, chi_sq_orig
     cdef double scale_factor, background
 
+    cdef double sum_weight, sum_expt
+
     cdef double A_r_orig, A_r_cand, occ
 
     acc_moves_np = np.full(N, np.nan)
@@ -1916,6 +2076,8 @@ cpdef void occupational(double [::1] A_r,
     chi_sq_orig = chi_sq[len(chi_sq)-1]
     temp = temperature[len(temperature)-1]
 
+    sum_weight, sum_expt = experimental_moments(I_expt, weight)
+
     with nogil:
 
         for s in range(N):
@@ -1975,24 +2137,32 @@ cpdef void occupational(double [::1] A_r,
                               I_raw,
                               v_inv,
                               boxes,
+                              coeffs_filt,
                               a_filt,
                               b_filt,
-                              c_filt,
-                              d_filt,
-                              e_filt,
-                              f_filt,
-                              g_filt,
-                              h_filt,
-                              i_filt,
                               nh,
                               nk,
                               nl)
 
-            unmask_intensity(I_ref, I_flat, i_unmask)
+            if (recheck > 0 and (s+1) % recheck != 0):
 
-            chi_sq_cand, scale_factor, background = reduced_chi_square(I_ref, 
-                                                                       I_expt, 
-                                                                       weight)
+                chi_sq_cand, \
+                scale_factor, \
+                background = moment_chi_square(I_flat,
+                                               I_ref,
+                                               I_expt,
+                                               weight,
+                                               i_unmask,
+                                               sum_weight,
+                                               sum_expt)
+
+            else:
+
+                unmask_intensity(I_ref, I_flat, i_unmask)
+
+                chi_sq_cand, \
+                scale_factor, \
+                background = reduced_chi_square(I_ref, I_expt, weight)
 
             delta_chi_sq = chi_sq_cand-chi_sq_orig
 
@@ -2081,16 +2251,10 @@ cpdef void displacive(double [::1] Ux,
                       double [::1] v_inv,
                       double [::1] a_filt,
                       double [::1] b_filt,
-                      double [::1] c_filt,
-                      double [::1] d_filt,
-                      double [::1] e_filt,
-                      double [::1] f_filt,
-                      double [::1] g_filt,
-                      double [::1] h_filt,
-                      double [::1] i_filt,
                       long [::1] bragg,
                       long [::1] even,
                       long [::1] boxes,
+                      double [:,::1] coeffs_filt,
                       long [::1] i_dft,
                       long [::1] inverses,
                       long [::1] i_mask,
@@ -2116,13 +2280,16 @@ cpdef void displacive(double [::1] Ux,
                       Py_ssize_t nw,
                       Py_ssize_t n_atm,
                       Py_ssize_t n,
-                      Py_ssize_t N):
+                      Py_ssize_t N,
+                      Py_ssize_t recheck=0):
 
     cdef double temp, inv_temp
 
     cdef double delta_chi_sq, chi_sq_cand, chi_sq_orig
     cdef double scale_factor, background
 
+    cdef double sum_weight, sum_expt
+
     cdef double Ux_orig, Uy_orig, Uz_orig, Ux_cand, Uy_cand, Uz_cand
 
     cdef double lxx, lyy, lzz, lyz, lxz, lxy
@@ -2154,6 +2321,8 @@ cpdef void displacive(double [::1] Ux,
     chi_sq_orig = chi_sq[len(chi_sq)-1]
     temp = temperature[len(temperature)-1]
 
+    sum_weight, sum_expt = experimental_moments(I_expt, weight)
+
     with nogil:
 
         for s in range(N):
@@ -2249,24 +2418,32 @@ cpdef void displacive(double [::1] Ux,
                               I_raw,
                               v_inv,
                               boxes,
+                              coeffs_filt,
                               a_filt,
                               b_filt,
-                              c_filt,
-                              d_filt,
-                              e_filt,
-                              f_filt,
-                              g_filt,
-                              h_filt,
-                              i_filt,
                               nh,
                               nk,
                               nl)
 
-            unmask_intensity(I_ref, I_flat, i_unmask)
+            if (recheck > 0 and (s+1) % recheck != 0):
+
+                chi_sq_cand, \
+                scale_factor, \
+                background = moment_chi_square(I_flat,
+                                               I_ref,
+                                               I_expt,
+                                               weight,
+                                               i_unmask,
+                                               sum_weight,
+                                               sum_expt)
+
+            else:
+
+                unmask_intensity(I_ref, I_flat, i_unmask)
 
-            chi_sq_cand, scale_factor, background = reduced_chi_square(I_ref, 
-                                                                       I_expt, 
-                                                                       weight)
+                chi_sq_cand, \
+                scale_factor, \
+                background = reduced_chi_square(I_ref, I_expt, weight)
 
             delta_chi_sq = chi_sq_cand-chi_sq_orig
 
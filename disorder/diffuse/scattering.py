@@ -3,9 +3,15 @@
 import re
 import os
 import h5py
+import hashlib
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
 
 import numpy as np
 
+from disorder.version import __version__
 from disorder.diffuse import space, filters, magnetic
 from disorder.diffuse import interaction, simulation
 from disorder.diffuse import experimental, refinement
@@ -127,6 +133,188 @@ def phase(Qx, Qy, Qz, rx, ry, rz):
 
     return factor.flatten()
 
+_shared, _blocks = {}, []
+
+def _share(arrays):
+    """
+    Copy read-only arrays into shared memory blocks.
+
+    Parameters
+    ----------
+    arrays : dict
+        Arrays to share.
+
+    Returns
+    -------
+    blocks : list
+        Shared memory blocks to be released by the caller.
+    specs : dict
+        Block name, shape, and data type of each array.
+
+    """
+
+    blocks, specs = [], {}
+
+    for key, array in arrays.items():
+
+        array = np.ascontiguousarray(array)
+
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(array.nbytes, 1))
+
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+
+        blocks.append(block)
+        specs[key] = block.name, array.shape, array.dtype.str
+
+    return blocks, specs
+
+def _attach(specs, threads):
+
+    refinement.set_num_threads(threads)
+
+    for key, (name, shape, dtype) in specs.items():
+
+        block = shared_memory.SharedMemory(name=name)
+
+        _shared[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        _blocks.append(block)
+
+def _magnetic_run(shared, Sx, Sy, Sz, statistics, seed, params):
+    """
+    Single magnetic refinement run.
+
+    Parameters
+    ----------
+    shared : dict
+        Read-only arrays common to all runs.
+    Sx, Sy, Sz : 1d array
+        Initial spin vectors. Modified in place.
+    statistics : tuple
+        Initial statistics of the run.
+    seed : int
+        Seed of the random number stream.
+    params : tuple
+        Optimization, options, and dimensions.
+
+    Returns
+    -------
+    Sx, Sy, Sz : 1d array
+        Refined spin vectors.
+    statistics : tuple
+        Accepted and rejected moves, goodness of fit, energy, temperature,
+        scale, and level.
+
+    """
+
+    constant, opts, bins, dims, n_atm, n, N, recheck = params
+
+    points = shared['H'], shared['K'], shared['L']
+
+    dirs = shared['Qx_norm'], shared['Qy_norm'], shared['Qz_norm']
+
+    Sx_k, Sy_k, Sz_k, i_dft = magnetic.transform(Sx, Sy, Sz, *points,
+                                                 *dims, n_atm)
+
+    trans = Sx_k, Sy_k, Sz_k
+
+    struct_prod = magnetic.structure(*dirs, *trans, i_dft,
+                                     shared['mag_factors'])
+
+    n_hkl = shared['inverses'].size
+    n_uvw = np.prod(dims)
+
+    n_mask = shared['v_inv'].size
+    n_ref = shared['I_expt'].size
+
+    trans_orig = [np.zeros(n_uvw, dtype=complex) for _ in range(3)]
+    trans_cand = [np.zeros(n_uvw, dtype=complex) for _ in range(3)]
+
+    struct_orig = [np.zeros(n_hkl, dtype=complex) for _ in range(3)]
+    struct_cand = [np.zeros(n_hkl, dtype=complex) for _ in range(3)]
+
+    prod_orig = [np.zeros(n_hkl, dtype=complex) for _ in range(3)]
+    prod_cand = [np.zeros(n_hkl, dtype=complex) for _ in range(3)]
+
+    intensities = np.zeros(shared['Qx_norm'].size), shared['I_expt'], \
+                  shared['inv_sigma_sq'], np.zeros(n_mask), \
+                  np.zeros(n_mask), np.full(n_ref, np.nan)
+
+    filt = np.zeros((2,n_mask), dtype=float)
+
+    filters = shared['v_inv'], *filt, shared['boxes'], shared['coeffs']
+
+    indices = i_dft, shared['inverses'], shared['i_mask'], shared['i_unmask']
+
+    factors = shared['space_factor'], shared['mag_factors']
+
+    statistics = [list(stats) for stats in statistics]
+
+    args = Sx, Sy, Sz, *dirs, *trans, *trans_orig, *trans_cand, \
+           *struct_prod[:3], *struct_orig, *struct_cand, *struct_prod[3:], \
+           *prod_orig, *prod_cand, *factors, shared['mu'], *intensities, \
+           *filters, *indices, *statistics, constant, *opts, *bins, *dims, \
+           n_atm, n, N, recheck
+
+    refinement.set_seed(seed)
+
+    refinement.magnetic(*args)
+
+    return Sx, Sy, Sz, statistics
+
+def _magnetic_worker(Sx, Sy, Sz, statistics, seed, params):
+
+    return _magnetic_run(_shared, Sx, Sy, Sz, statistics, seed, params)
+
+def _cache():
+
+    home = os.environ.get('XDG_CACHE_HOME') or \
+           os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(home, 'rmc-discord')
+
+# increment when the Ewald kernels or the stored format change
+_ewald_format = 1
+
+def _ewald_key(name, constants, coords, dims, tol):
+    """
+    Content address of an Ewald interaction matrix.
+
+    The address includes the package version and format of the matrices so
+    that matrices of other versions are not reused.
+
+    Parameters
+    ----------
+    name : str
+        Name of the interaction.
+    constants : tuple
+        Lattice constants and angles.
+    coords : tuple
+        Fractional coordinates of the unit cell atoms.
+    dims : tuple
+        Supercell extents.
+    tol : float
+        Tolerance of distances for unique pairs.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal digest.
+
+    """
+
+    digest = hashlib.sha256(name.encode())
+
+    digest.update('{}:{}'.format(__version__, _ewald_format).encode())
+
+    digest.update(np.asarray(constants, dtype=float).tobytes())
+    digest.update(np.asarray(coords, dtype=float).tobytes())
+    digest.update(np.asarray(dims, dtype=int).tobytes())
+    digest.update(np.asarray(tol, dtype=float).tobytes())
+
+    return digest.hexdigest()
+
 class Simulation:
     """
     Simulation.
@@ -137,6 +325,10 @@ class Simulation:
         Supercell for simulation.
     extend : bool, optional
         Extend beyond one unit cell for neighbor bonds. Defualt is ``False``.
+    cache : str or bool, optional
+        Directory of cached Ewald interaction matrices. ``True`` uses
+        ``rmc-discord`` in ``$XDG_CACHE_HOME`` (``~/.cache`` if unset). Default
+        is ``None``, which disables the cache.
 
     Methods
     -------
@@ -156,6 +348,8 @@ class Simulation:
         Charge-dipole interaction matrix.
     get_dipole_dipole_matrix()
         Dipole-dipole interaction matrix.
+    get_dipole_dipole_kernel()
+        Dipole-dipole interaction kernel.
     get_easy_axes_matrices()
         Easy axes matrices.
     get_magnetic_exchange_interaction_matrices()
@@ -180,6 +374,10 @@ class Simulation:
         Update magnetic dipole-dipole coupling strength.
     initialize_parallel_tempering()
         Initialize parallel tempering simulation.
+    initialize_sampling()
+        Initialize thermal averaging of single crystal intensity.
+    get_sampled_intensity()
+        Thermally averaged single crystal intensity.
     magnetic_energy()
         Magnetic interaction energy.
     magnetic_dipole_dipole_interaction_energy()
@@ -189,26 +387,28 @@ class Simulation:
 
     """
 
-    def __init__(self, sc, filename=None, extend=False):
+    def __init__(self, sc, filename=None, extend=False, cache=None):
+
+        if cache is True:
+            cache = _cache()
+        elif cache is False:
+            cache = None
+
+        self.__cache, self.__tol = cache, 1e-3
+
+        self.__Qij, self.__Qijk, self.__Qijkl = None, None, None
+
+        self.__Kijkl = None
+
+        self.__sampling, self.__samples = None, {}
 
         if filename is None:
 
             self.sc = sc
 
-            dims = sc.get_super_cell_extents()
             n_atm = sc.get_number_atoms_per_unit_cell()
 
-            *coords, atms = sc.get_super_cell_cartesian_atomic_coordinates()
-
             A = sc.get_fractional_cartesian_transform()
-            B = sc.get_miller_cartesian_transform()
-            R = sc.get_cartesian_rotation()
-
-            args = *coords, *dims, n_atm, A, B, R
-
-            self.__Qij = interaction.charge_charge_matrix(*args)
-            self.__Qijk = interaction.charge_dipole_matrix(*args)
-            self.__Qijkl = interaction.dipole_dipole_matrix(*args)
 
             self.__mag_dd = 0.0
 
@@ -299,9 +499,13 @@ class Simulation:
 
             sim = f.create_group('disorder/simulation')
 
-            sim.create_dataset('charge_charge_matrix', data=self.__Qij)
-            sim.create_dataset('charge_dipole_matrix', data=self.__Qijk)
-            sim.create_dataset('dipole_dipole_matrix', data=self.__Qijkl)
+            matrices = {'charge_charge_matrix': self.__Qij,
+                        'charge_dipole_matrix': self.__Qijk,
+                        'dipole_dipole_matrix': self.__Qijkl}
+
+            for key, matrix in matrices.items():
+                if matrix is not None:
+                    sim.create_dataset(key, data=matrix)
 
             sim.create_dataset('img_i', data=self.__img_i)
             sim.create_dataset('img_j', data=self.__img_j)
@@ -332,8 +536,6 @@ class Simulation:
             mag.create_dataset('Sy', data=self.__Sy)
             mag.create_dataset('Sz', data=self.__Sz)
 
-            mag.attrs['const_cc'] = self.__mag_cc
-            mag.attrs['const_cd'] = self.__mag_cd
             mag.attrs['const_dd'] = self.__mag_dd
 
             occ = f.create_group('disorder/simulation/occupational')
@@ -369,9 +571,16 @@ class Simulation:
 
             sim = f['disorder/simulation']
 
-            self.__Qij = sim['charge_charge_matrix'][...]
-            self.__Qijk = sim['charge_dipole_matrix'][...]
-            self.__Qijkl = sim['dipole_dipole_matrix'][...]
+            self.__Qij, self.__Qijk, self.__Qijkl = None, None, None
+
+            self.__Kijkl = None
+
+            if 'charge_charge_matrix' in sim:
+                self.__Qij = sim['charge_charge_matrix'][...]
+            if 'charge_dipole_matrix' in sim:
+                self.__Qijk = sim['charge_dipole_matrix'][...]
+            if 'dipole_dipole_matrix' in sim:
+                self.__Qijkl = sim['dipole_dipole_matrix'][...]
 
             self.__img_i = sim['img_i'][...]
             self.__img_j = sim['img_j'][...]
@@ -421,6 +630,49 @@ class Simulation:
             self.__Uz = disp['Uz'][...]
 
 
+    def __ewald(self, function, **kwargs):
+
+        sc = self.sc
+
+        dims = sc.get_super_cell_extents()
+        n_atm = sc.get_number_atoms_per_unit_cell()
+
+        if self.__cache is not None:
+
+            constants = sc.get_all_lattice_constants()
+            coords = sc.get_fractional_coordinates()
+
+            key = _ewald_key(function.__name__, constants, coords, dims,
+                             kwargs.get('tol', self.__tol))
+
+            filename = os.path.join(self.__cache, key+'.npy')
+
+            if os.path.exists(filename):
+                return np.load(filename)
+
+        *coords, _ = sc.get_super_cell_cartesian_atomic_coordinates()
+
+        A = sc.get_fractional_cartesian_transform()
+        B = sc.get_miller_cartesian_transform()
+        R = sc.get_cartesian_rotation()
+
+        args = *coords, *dims, n_atm, A, B, R
+
+        matrix = function(*args, **kwargs)
+
+        if self.__cache is not None:
+
+            os.makedirs(self.__cache, exist_ok=True)
+
+            fd, temporary = tempfile.mkstemp(suffix='.npy', dir=self.__cache)
+
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, matrix)
+
+            os.replace(temporary, filename)
+
+        return matrix
+
     def __mask(self):
 
         indices = np.arange(self.__active.size)[self.__active]
@@ -527,6 +779,10 @@ class Simulation:
 
         """
 
+        if self.__Qij is None:
+            function = interaction.charge_charge_matrix
+            self.__Qij = self.__ewald(function, tol=self.__tol)
+
         return self.__Qij
 
     def get_charge_dipole_matrix(self):
@@ -541,6 +797,10 @@ class Simulation:
 
         """
 
+        if self.__Qijk is None:
+            function = interaction.charge_dipole_matrix
+            self.__Qijk = self.__ewald(function, tol=self.__tol)
+
         return self.__Qijk
 
     def get_dipole_dipole_matrix(self):
@@ -554,8 +814,42 @@ class Simulation:
 
         """
 
+        if self.__Qijkl is None:
+            function = interaction.dipole_dipole_matrix
+            self.__Qijkl = self.__ewald(function, tol=self.__tol)
+
         return self.__Qijkl
 
+    def get_dipole_dipole_kernel(self):
+        """
+        Dipole-dipole interaction kernel.
+
+        Translationally invariant form of the dipole-dipole matrix. Computed on
+        first use.
+
+        Returns
+        -------
+        Kijkl : 4d array
+            Kernel for calculating dipole-dipole interactions between moments.
+
+        """
+
+        if self.__Kijkl is None:
+            function = interaction.dipole_dipole_kernel
+            self.__Kijkl = self.__ewald(function)
+
+        return self.__Kijkl
+
+    def __get_dipole_dipole_fields(self):
+
+        if np.isclose(self.__mag_dd, 0):
+
+            n_uvw = np.prod(self.sc.get_super_cell_extents())
+
+            return np.zeros((self.__n_atm,self.__n_atm,n_uvw,6))
+
+        return self.__mag_dd*self.get_dipole_dipole_kernel()
+
     def get_easy_axes_matrices(self):
         """
         Easy axes matrices.
@@ -751,13 +1045,160 @@ class Simulation:
         self.__Uy = np.zeros((*dims,n_atm,replicas))
         self.__Uz = np.zeros((*dims,n_atm,replicas))
 
-    def magnetic_energy(self):
+    def initialize_sampling(self, extents, bins, W, laue=None, interval=1,
+                            order=2, centering='P'):
+        """
+        Initialize thermal averaging of single crystal intensity.
+
+        Subsequent simulations accumulate the intensity of the lowest
+        temperature replica every ``interval`` Monte Carlo cycles. A cycle of
+        a magnetic simulation is one Metropolis sweep and the over-relaxation
+        sweeps that follow it.
+
+        Parameters
+        ----------
+        extents : list of lists, float
+            Reciprocal space extents.
+        bins : list, int
+            Number of bins.
+        W : 2d array
+            Projection matrix.
+        laue : str, optional
+            Laue symmetry.
+        interval : int, optional
+            Monte Carlo cycles between samples. Default is ``1``.
+        order : int, optional
+            Order of displacive expansion. Default is ``2``.
+        centering : str, optional
+            Lattice centering of displacive intensity. Default is ``'P'``.
+
+        """
+
+        self.__sampling = extents, bins, W, laue, order, centering
+
+        self.__interval = interval
+
+        self.__samples = {}
+
+    def get_sampled_intensity(self, kind='magnetic'):
+        """
+        Thermally averaged single crystal intensity.
+
+        Parameters
+        ----------
+        kind : str, optional
+            Either ``'magnetic'``, ``'occupational'``, or ``'displacive'``.
+            Default is ``'magnetic'``.
+
+        Returns
+        -------
+        I : 3d array
+            Mean scattering intensity.
+        sigma_sq : 3d array
+            Variance of scattering intensity.
+        n : int
+            Number of samples.
+
+        """
+
+        n, mean, M2, inverses = self.__samples[kind]
+
+        bins = self.__sampling[1]
+
+        return mean[inverses].reshape(*bins), \
+               (M2/n)[inverses].reshape(*bins), n
+
+    def __accumulate(self, kind, I, inverses):
+
+        n, mean, M2, _ = self.__samples.get(kind, (0, 0, 0, inverses))
+
+        n += 1
+
+        delta = I-mean
+        mean = mean+delta/n
+        M2 = M2+delta*(I-mean)
+
+        self.__samples[kind] = n, mean, M2, inverses
+
+    def __magnetic_observer(self):
+
+        if self.__sampling is None:
+            return None, 1
+
+        extents, bins, W, laue, order, centering = self.__sampling
+
+        args = extents, bins, W, laue
+
+        transform, sample, _, inverses = \
+            self.sc.magnetic_single_crystal_sampler(*args)
+
+        def observer(H, T):
+
+            ind = np.argmin(T)
+
+            Sx = self.__Sx[...,ind].flatten()
+            Sy = self.__Sy[...,ind].flatten()
+            Sz = self.__Sz[...,ind].flatten()
+
+            I = sample(*transform(Sx, Sy, Sz))
+
+            self.__accumulate('magnetic', I, inverses)
+
+        return observer, self.__interval
+
+    def __structural_observer(self):
+
+        if self.__sampling is None:
+            return None, 1
+
+        extents, bins, W, laue, order, centering = self.__sampling
+
+        args = extents, bins, W, laue
+
+        sampler = self.sc.occupational_single_crystal_sampler
+        occ_transform, occ_sample, _, inverses = sampler(*args)
+
+        args = extents, bins, W, laue, order, centering
+
+        sampler = self.sc.displacive_single_crystal_sampler
+        disp_transform, disp_sample, _, inverses = sampler(*args)
+
+        def observer(H, T):
+
+            ind = np.argmin(T)
+
+            delta = 0.5*(self.__sigma[...,ind]+1)
+            c = delta.mean(axis=(0,1,2))
+
+            A_r = (delta/c-1).flatten()
+
+            Ux = self.__Ux[...,ind].flatten()
+            Uy = self.__Uy[...,ind].flatten()
+            Uz = self.__Uz[...,ind].flatten()
+
+            I_occ = occ_sample(*occ_transform(A_r))
+            I_disp = disp_sample(*disp_transform(Ux, Uy, Uz))
+
+            self.__accumulate('occupational', I_occ, inverses)
+            self.__accumulate('displacive', I_disp, inverses)
+
+        return observer, self.__interval
+
+    def magnetic_energy(self, partial=None):
         """
         Magnetic interaction energy.
 
+        Parameters
+        ----------
+        partial : str, optional
+            Partial sums of each replica. Either ``None`` for totals,
+            ``'pair'`` for each pair type followed by anisotropy and field
+            terms, ``'site'`` for each site, or ``'full'`` for every bond
+            term. Default is ``None``.
+
         Returns
         -------
-        E : 6d array
+        E : 1d, 2d, 5d or 6d array
             Magnetic interaction energies.
 
         """
@@ -768,11 +1209,14 @@ class Simulation:
 
         field = self.__mag_B
 
-        indices = self.___get_indices()
+        indices = self.__get_indices()
 
         args = *spins, *properties, field, *indices
 
-        return simulation.magnetic_energy(*args)
+        if partial == 'full':
+            return simulation.magnetic_energy(*args)
+
+        return simulation.magnetic_energy_reduced(*args, partial)
 
     def magnetic_dipole_dipole_interaction_energy(self):
         """
@@ -785,11 +1229,14 @@ class Simulation:
 
         """
 
-        args = self.__Sx, self.__Sy, self.__Sz, self.__mag_dd*self.__Qijkl
+        spins = self.__Sx, self.__Sy, self.__Sz
+
+        args = *spins, self.__get_dipole_dipole_fields()
 
-        return simulation.dipole_dipole_interaction_energy(*args)
+        return simulation.dipole_dipole_kernel_energy(*args)
 
-    def magnetic_simulation(self, N, batch=1, cluster=False):
+    def magnetic_simulation(self, N, batch=1, cluster=False, parallel=False,
+                            n_over=0):
         """
         Perform magnetic Heisenberg simulation.
 
@@ -797,6 +1244,14 @@ class Simulation:
         ----------
         N : int
             Number of Monte Carlo cycles.
+        parallel : bool, optional
+            Update non-interacting sublattices, or replicas when long-range
+            interactions are present, concurrently. Ignored for cluster
+            updates. Default is ``False``.
+        n_over : int, optional
+            Number of over-relaxation sweeps, which reflect each moment about
+            its local field, following each Monte Carlo cycle. Ignored for
+            cluster updates. Default is ``0``.
 
         Returns
         -------
@@ -817,13 +1272,15 @@ class Simulation:
 
         properties = self.__mag_J[self.__active], self.__mag_K, self.__mag_g
 
-        fields = self.__mag_B, self.__mag_dd*self.__Qijkl
+        fields = self.__mag_B, self.__get_dipole_dipole_fields()
 
         if cluster:
             indices = self.__get_cluster_indices()
         else:
             indices = self.__get_indices()
 
+        sampling = self.__magnetic_observer()
+
         dims = self.sc.get_super_cell_extents()
         n_atm = self.sc.get_number_atoms_per_unit_cell()
 
@@ -837,9 +1294,10 @@ class Simulation:
             args = *spins, *properties, *fields, *indices, self.__T, kB, N
 
             if cluster:
-                H, T = simulation.heisenberg_cluster(*args)
+                H, T = simulation.heisenberg_cluster(*args, *sampling)
             else:
-                H, T = simulation.heisenberg(*args)
+                H, T = simulation.heisenberg(*args, parallel, n_over,
+                                             *sampling)
 
             self.__T = T
 
@@ -955,13 +1413,21 @@ class Simulation:
 
         self.__disp_eta[:,self.__active] = eta
 
-    def structural_energy(self):
+    def structural_energy(self, partial=None):
         """
         Structural interaction energy.
 
+        Parameters
+        ----------
+        partial : str, optional
+            Partial sums of each replica. Either ``None`` for totals,
+            ``'pair'`` for occupational then displacive terms of each pair
+            type followed by the field term, ``'site'`` for each site, or
+            ``'full'`` for every bond term. Default is ``None``.
+
         Returns
         -------
-        E : 6d array
+        E : 1d, 2d, 5d or 6d array
             Structural interaction energies.
 
         """
@@ -979,9 +1445,12 @@ class Simulation:
 
         args = *parameters, *properties, *bonds, *indices
 
-        return simulation.structural_energy(*args)
+        if partial == 'full':
+            return simulation.structural_energy(*args)
 
-    def structural_simulation(self, N, batch=1):
+        return simulation.structural_energy_reduced(*args, partial)
+
+    def structural_simulation(self, N, batch=1, parallel=False):
         """
         Perform structural occupational/displacive simulation.
 
@@ -989,6 +1458,9 @@ class Simulation:
         ----------
         N : int
             Number of Monte Carlo cycles.
+        parallel : bool, optional
+            Update non-interacting sublattices concurrently. Default is
+            ``False``.
 
         Returns
         -------
@@ -1017,6 +1489,8 @@ class Simulation:
 
         bonds = *self.get_bond_vectors(), self.get_bond_lengths()
 
+        sampling = self.__structural_observer()
+
         dims = self.sc.get_super_cell_extents()
         n_atm = self.sc.get_number_atoms_per_unit_cell()
 
@@ -1033,7 +1507,7 @@ class Simulation:
             parameters = self.__sigma, self.__Ux, self.__Uy, self.__Uz
             args = *parameters, *properties, *bonds, *indices, self.__T, kB, N
 
-            H, T = simulation.size_effect(*args)
+            H, T = simulation.size_effect(*args, parallel, *sampling)
 
             self.__T = T
 
@@ -1058,8 +1532,14 @@ class Refinement:
     ----------
     sc : supercell
         Supercell for refinement.
-    filename : str
-        Name of file.
+    filename : str or Dataset
+        Name of file or lazily read intensity data.
+    pipeline : Pipeline, optional
+        Cache of preprocessed intensity data. Default is ``None``, which
+        creates a cache for this refinement only.
+    scratch : str, optional
+        Directory of intermediate files. Default is ``None``, which uses the
+        current working directory.
 
     Methods
     -------
@@ -1079,14 +1559,29 @@ class Refinement:
         Punch intensity data.
     initialize_refinement()
         Initialize refinement.
+    get_statistics()
+        Refinement statistics.
     magnetic_refinement()
         Perform magnetic refinement.
 
     """
 
-    def __init__(self, sc, filename):
+    def __init__(self, sc, filename, pipeline=None, scratch=None):
 
-        name, ext = os.path.splitext(filename)
+        if pipeline is None:
+            pipeline = experimental.Pipeline()
+
+        if scratch is None:
+            scratch = os.curdir
+
+        self.__pipeline = pipeline
+
+        self.__tmp = os.path.join(scratch, 'tmp.npy')
+
+        if isinstance(filename, experimental.Dataset):
+            ext = None
+        else:
+            name, ext = os.path.splitext(filename)
 
         if ext == '.h5':
 
@@ -1129,10 +1624,7 @@ class Refinement:
 
         self.sc.save(filename)
 
-        with open('tmp.npy', 'rb') as f:
-
-            signal = np.load(f)
-            sigma_sq = np.load(f)
+        self.__read()
 
         with h5py.File(filename, 'a') as f:
 
@@ -1141,8 +1633,24 @@ class Refinement:
             data.create_dataset('extents', data=self.extents)
             data.create_dataset('bins', data=self.bins)
 
-            data.create_dataset('signal', data=signal)
-            data.create_dataset('sigma_sq', data=sigma_sq)
+            if self.__dataset is None:
+
+                with open(self.__tmp, 'rb') as tmp:
+
+                    data.create_dataset('signal', data=np.load(tmp))
+                    data.create_dataset('sigma_sq', data=np.load(tmp))
+
+            else:
+
+                shape = self.__dataset.shape
+
+                signal = data.create_dataset('signal', shape, float)
+                sigma_sq = data.create_dataset('sigma_sq', shape, float)
+
+                for (start, stop), *values in self.__dataset.slabs():
+
+                    signal[:,:,start:stop] = values[0]
+                    sigma_sq[:,:,start:stop] = values[1]
 
             ref = f.create_group('disorder/refinement')
 
@@ -1165,6 +1673,8 @@ class Refinement:
 
         self.sc.load(filename)
 
+        self.__dataset = None
+
         with h5py.File(filename, 'r') as f:
 
             data = f['disorder/data']
@@ -1193,10 +1703,12 @@ class Refinement:
                 self.__signal = signal
                 self.__sigma_sq = sigma_sq
 
-        if os.path.exists('tmp.npy'):
-            os.remove('tmp.npy')
+        self.__key = self.__pipeline.source((self.__signal, self.__sigma_sq))
 
-        with open('tmp.npy', 'wb') as f:
+        if os.path.exists(self.__tmp):
+            os.remove(self.__tmp)
+
+        with open(self.__tmp, 'wb') as f:
 
              np.save(f, signal)
              np.save(f, sigma_sq)
@@ -1205,24 +1717,24 @@ class Refinement:
         """
         Load intensity data.
 
+        Only the extents and bins are read. The intensity is read from the
+        file once it is needed, which is after cropping and during rebinning.
+
         Parameters
         ----------
-        filename : str
-            Name of file.
+        filename : str or Dataset
+            Name of file or lazily read intensity data.
 
         """
 
-        self.__signal, self.__sigma_sq, *binning = experimental.data(filename)
-
-        self.extents, self.bins = binning[0:3], binning[3:6]
-
-        if os.path.exists('tmp.npy'):
-            os.remove('tmp.npy')
+        if isinstance(filename, experimental.Dataset):
+            self.__dataset = filename
+        else:
+            self.__dataset = experimental.Dataset(filename)
 
-        with open('tmp.npy', 'wb') as f:
+        self.extents, self.bins = self.__dataset.extents, self.__dataset.bins
 
-             np.save(f, self.__signal)
-             np.save(f, self.__sigma_sq)
+        self.__reset()
 
         self.__extents = self.extents
         self.__bins = self.bins
@@ -1233,10 +1745,17 @@ class Refinement:
 
         """
 
-        with open('tmp.npy', 'rb') as f:
+        if self.__dataset is None:
 
-            self.__signal = np.load(f)
-            self.__sigma_sq = np.load(f)
+            with open(self.__tmp, 'rb') as f:
+
+                data = np.load(f), np.load(f)
+
+            self.__update(self.__pipeline.source(data), data)
+
+        else:
+
+            self.__reset()
 
         self.__extents = self.extents
         self.__bins = self.bins
@@ -1257,8 +1776,8 @@ class Refinement:
             indices.append([self.__index(*extents,bins,values[0]),
                             self.__index(*extents,bins,values[1])+1])
 
-        self.__signal = experimental.crop(self.__signal, *indices)
-        self.__sigma_sq = experimental.crop(self.__sigma_sq, *indices)
+        self.__update(*self.__pipeline.crop(self.__key, self.__data(),
+                                            *indices))
 
         values = []
         for extents, bins, inds in zip(self.__extents, self.__bins, indices):
@@ -1266,7 +1785,7 @@ class Refinement:
                            self.__value(*extents,bins,inds[1]-1)])
 
         self.__extents = values
-        self.__bins = self.__signal.shape
+        self.__bins = [stop-start for start, stop in indices]
 
     def rebin(self, sizes):
         """
@@ -1282,8 +1801,7 @@ class Refinement:
         bins = [size if (0 < size < bins) else bins \
                 for size, bins in zip(sizes, self.__bins)]
 
-        self.__signal = experimental.rebin(self.__signal, bins)
-        self.__sigma_sq = experimental.rebin(self.__sigma_sq, bins)
+        self.__update(*self.__pipeline.rebin(self.__key, self.__data(), bins))
 
         self.__bins = self.__signal.shape
 
@@ -1322,8 +1840,34 @@ class Refinement:
 
         params = *radii, *self.__extents, centering, outlier, ptype
 
-        self.__signal = experimental.punch(self.__signal, *params)
-        self.__sigma_sq = experimental.punch(self.__sigma_sq, *params)
+        self.__update(*self.__pipeline.punch(self.__key, self.__data(),
+                                             *params))
+
+    def __update(self, key, data):
+
+        self.__key = key
+
+        if isinstance(data, experimental.Dataset):
+            self.__window = data
+            self.__signal, self.__sigma_sq = None, None
+        else:
+            self.__signal, self.__sigma_sq = data
+
+    def __data(self):
+
+        if self.__signal is None:
+            return self.__window
+        else:
+            return self.__signal, self.__sigma_sq
+
+    def __reset(self):
+
+        self.__update(self.__pipeline.source(self.__dataset), self.__dataset)
+
+    def __read(self):
+
+        if self.__signal is None:
+            self.__signal, self.__sigma_sq = self.__window.read()
 
     def __step(self, vmin, vmax, size):
 
@@ -1363,7 +1907,9 @@ class Refinement:
 
     def __mask(self):
 
-        return experimental.mask(self.__signal, self.__sigma_sq)
+        self.__read()
+
+        return self.__pipeline.mask(self.__key, self.__data())
 
     def __mask_indices(self):
 
@@ -1382,12 +1928,17 @@ class Refinement:
 
         """
 
-        self.__acc_moves, self.__acc_temps = [], []
-        self.__rej_moves, self.__rej_temps = [], []
+        acc_moves, acc_temps, rej_moves, rej_temps = [], [], [], []
+
+        energy, scale, level = [], [], []
+
+        chi_sq, temperature = [np.inf], [temp]
+
+        self.__initial = acc_moves, acc_temps, rej_moves, rej_temps, \
+                         chi_sq, energy, temperature, scale, level
 
-        self.__energy, self.__scale = [], []
+        self.__runs = []
 
-        self.__chi_sq, self.__temperature =  [np.inf], [temp]
         self.__constant = const
 
         dims = self.sc.get_super_cell_extents()
@@ -1420,7 +1971,7 @@ class Refinement:
 
         phase_factor = phase(Qx, Qy, Qz, ux, uy, uz)
 
-        self.__space_factor = space.factor(*dims)
+        self.__space_factor = space.factor(*dims, separable=True)
 
         isotopes = self.sc.get_unit_cell_isotopes()
         ions = self.sc.get_unit_cell_ions()
@@ -1442,100 +1993,116 @@ class Refinement:
 
         self.__factors = space.prefactors(scattering_length, phase_factor, occ)
 
-    def __initialize_magnetic(self):
-
-        dims = self.sc.get_super_cell_extents()
-        n_atm = self.sc.get_number_atoms_per_unit_cell()
-
-        spins = self.__Sx, self.__Sy, self.__Sz
-
-        points = self.__H, self.__K, self.__L
-
-        args = *spins, *points, *dims, n_atm
-
-        transform = magnetic.transform(*args)
-
-        dirs = self.__Qx_norm, self.__Qy_norm, self.__Qz_norm
-
-        structure = magnetic.structure(*dirs, *transform, self.__factors)
-
-        self.__Sx_k, self.__Sy_k, self.__Sz_k, self.__i_dft = transform
-
-        self.__Fx, self.__Fy, self.__Fz, \
-        self.__prod_x, self.__prod_y, self.__prod_z = structure
-
-        n_uvw = self.sc.get_super_cell_size()
-
-        self.__Fx_orig = np.zeros(self.__indices.size, dtype=complex)
-        self.__Fy_orig = np.zeros(self.__indices.size, dtype=complex)
-        self.__Fz_orig = np.zeros(self.__indices.size, dtype=complex)
-
-        self.__prod_x_orig = np.zeros(self.__indices.size, dtype=complex)
-        self.__prod_y_orig = np.zeros(self.__indices.size, dtype=complex)
-        self.__prod_z_orig = np.zeros(self.__indices.size, dtype=complex)
-
-        self.__Sx_k_orig = np.zeros(n_uvw, dtype=complex)
-        self.__Sy_k_orig = np.zeros(n_uvw, dtype=complex)
-        self.__Sz_k_orig = np.zeros(n_uvw, dtype=complex)
-
-        self.__Fx_cand = np.zeros(self.__indices.size, dtype=complex)
-        self.__Fy_cand = np.zeros(self.__indices.size, dtype=complex)
-        self.__Fz_cand = np.zeros(self.__indices.size, dtype=complex)
-
-        self.__prod_x_cand = np.zeros(self.__indices.size, dtype=complex)
-        self.__prod_y_cand = np.zeros(self.__indices.size, dtype=complex)
-        self.__prod_z_cand = np.zeros(self.__indices.size, dtype=complex)
-
-        self.__Sx_k_cand = np.zeros(n_uvw, dtype=complex)
-        self.__Sy_k_cand = np.zeros(n_uvw, dtype=complex)
-        self.__Sz_k_cand = np.zeros(n_uvw, dtype=complex)
+    def get_statistics(self):
+        """
+        Refinement statistics.
 
-    def __intensities(self):
+        Each row corresponds to one independent run.
 
-        mask = self.__mask()
-
-        I_obs = np.full(mask.shape, np.nan)
-        I_ref = I_obs[~mask]
+        Returns
+        -------
+        chi_sq : 2d array
+            Goodness of fit after each move.
+        temperature : 2d array
+            Annealing temperature after each move.
+        scale : 2d array
+            Scale factor after each move.
+        accepted : 1d array, int
+            Number of accepted moves.
+        rejected : 1d array, int
+            Number of rejected moves.
 
-        I_calc = np.zeros(self.__Q.size, dtype=float)
+        """
 
-        I_raw = np.zeros(mask.size, dtype=float)
-        I_flat = np.zeros(mask.size, dtype=float)
+        runs = self.__runs
 
-        I_expt, inv_sigma_sq = self.__signal[~mask], 1/self.__sigma_sq[~mask]
+        chi_sq = np.array([stats[4][1:] for stats in runs])
+        temperature = np.array([stats[6][1:] for stats in runs])
+        scale = np.array([stats[7] for stats in runs])
 
-        return I_calc, I_expt, inv_sigma_sq, I_raw, I_flat, I_ref
+        accepted = np.array([np.isfinite(stats[0]).sum() for stats in runs])
+        rejected = np.array([np.isfinite(stats[2]).sum() for stats in runs])
 
-    def __filters(self, sigma):
+        return chi_sq, temperature, scale, accepted, rejected
 
-        sigma = np.asarray(sigma)
+    def __shared_arrays(self, sigma, recursive=False):
 
         mask = self.__mask()
 
-        filt = np.zeros((9,mask.size), dtype=float)
+        i_mask, i_unmask = self.__mask_indices()
 
-        v_inv = filters.gaussian(mask, sigma)
+        v_inv = filters.gaussian(mask, np.asarray(sigma), recursive)
 
-        boxes = filters.boxblur(sigma, 3)
+        boxes = filters.boxblur(np.asarray(sigma), 3)
 
-        return (v_inv, *filt, boxes)
-
-    def magnetic_refinement(self, cycles, sigma, batch=1):
+        if recursive:
+            coeffs = filters.recursion(np.asarray(sigma))
+        else:
+            coeffs = np.zeros((0,13))
+
+        return { 'H': self.__H, 'K': self.__K, 'L': self.__L,
+                 'Qx_norm': self.__Qx_norm,
+                 'Qy_norm': self.__Qy_norm,
+                 'Qz_norm': self.__Qz_norm,
+                 'space_factor': self.__space_factor,
+                 'mag_factors': self.__mag_factors,
+                 'mu': self.sc.get_magnetic_moment_magnitude(),
+                 'I_expt': self.__signal[~mask],
+                 'inv_sigma_sq': 1/self.__sigma_sq[~mask],
+                 'v_inv': v_inv, 'boxes': boxes, 'coeffs': coeffs,
+                 'inverses': self.__inverses,
+                 'i_mask': i_mask, 'i_unmask': i_unmask }
+
+    def magnetic_refinement(self, cycles, sigma, batch=1, recheck=0,
+                            workers=1, threads=None, seed=None, reset=True,
+                            recursive=False):
         """
         Perform magnetic refinement.
 
+        Independent runs are executed concurrently when more than one worker
+        is requested. Common arrays are placed once in shared memory and the
+        refined spins of each run are gathered in order. Each run keeps its
+        own statistics, which a continued refinement resumes.
+
         Parameters
         ----------
         cycles : int
             Number of Monte Carlo cycles.
         sigma : list
             Pixel size of filter along each dimension.
-
-        """
-
-        fixed, heisenberg = True, True
-
-        mu = self.sc.get_magnetic_moment_magnitude()
+        batch : int, optional
+            Number of independent runs. Default is ``1``.
+        recheck : int, optional
+            Interval of moves between goodness-of-fit evaluations with the
+            reference routine. Intermediate moves use a fused evaluation with
+            precomputed experimental moments, which sums the same residuals.
+            Default is ``0``, which uses the reference routine at every move.
+        workers : int, optional
+            Number of processes. Default is ``1``, which performs the runs
+            sequentially in the current process.
+        threads : int, optional
+            Number of threads of each process. Default is ``None``, which
+            divides the available processors evenly among the workers.
+        seed : int, optional
+            Seed of the random number stream of the first run. Each subsequent
+            run is seeded with the next integer. Default is ``None``, which
+            draws a fresh seed from the operating system so that continued
+            refinements do not repeat moves.
+        reset : bool, optional
+            Start from random moments and the initial statistics. Otherwise
+            continue from the moments and statistics of the previous
+            refinement with the same batch size. Default is ``True``.
+        recursive : bool, optional
+            Use the recursive Gaussian filter, whose cost does not depend on
+            the filter size, instead of successive box filters. Default is
+            ``False``.
+
+        """
+
+        opts = True, True
+
+        if seed is None:
+            seed = np.random.SeedSequence().entropy % 2**62
 
         dims = self.sc.get_super_cell_extents()
         n_atm = self.sc.get_number_atoms_per_unit_cell()
@@ -1546,64 +2113,58 @@ class Refinement:
 
         bins = self.__bins
 
-        self.sc._Sx, self.sc._Sy, self.sc._Sz = [], [], []
+        params = self.__constant, opts, bins, dims, n_atm, n, N, recheck
 
-        for b in range(batch):
+        if reset or len(self.sc._Sx) != batch:
 
-            self.sc.randomize_magnetic_moments()
+            self.sc._Sx, self.sc._Sy, self.sc._Sz = [], [], []
 
-            self.__Sx = self.sc._Sx[b]
-            self.__Sy = self.sc._Sy[b]
-            self.__Sz = self.sc._Sz[b]
+            for b in range(batch):
+                self.sc.randomize_magnetic_moments()
 
-            self.__initialize_magnetic()
+        if reset or len(self.__runs) != batch:
 
-            spins = self.__Sx, self.__Sy, self.__Sz
+            self.__runs = [self.__initial]*batch
 
-            dirs = self.__Qx_norm, self.__Qy_norm, self.__Qz_norm
+        spins = zip(self.sc._Sx, self.sc._Sy, self.sc._Sz, self.__runs)
 
-            trans = self.__Sx_k, self.__Sy_k, self.__Sz_k
+        shared = self.__shared_arrays(sigma, recursive)
 
-            trans_orig = self.__Sx_k_orig, self.__Sy_k_orig, self.__Sz_k_orig
-            trans_cand = self.__Sx_k_cand, self.__Sy_k_cand, self.__Sz_k_cand
+        if (workers > 1):
 
-            struct = self.__Fx, self.__Fy, self.__Fz
+            if threads is None:
+                threads = max(os.cpu_count()//workers, 1)
 
-            struct_orig = self.__Fx_orig, self.__Fy_orig, self.__Fz_orig
-            struct_cand = self.__Fx_cand, self.__Fy_cand, self.__Fz_cand
+            blocks, specs = _share(shared)
 
-            prod = self.__prod_x, self.__prod_y, self.__prod_z
+            try:
 
-            prod_orig = self.__prod_x_orig, \
-                        self.__prod_y_orig, \
-                        self.__prod_z_orig
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=get_context('spawn'),
+                                         initializer=_attach,
+                                         initargs=(specs, threads)) as pool:
 
-            prod_cand = self.__prod_x_cand, \
-                        self.__prod_y_cand, \
-                        self.__prod_z_cand
+                    futures = [pool.submit(_magnetic_worker, *S, seed+b,
+                                           params) \
+                               for b, S in enumerate(spins)]
 
-            indices = self.__i_dft, self.__inverses, *self.__mask_indices()
+                    results = [future.result() for future in futures]
 
-            accepted = self.__acc_moves, self.__acc_temps
-            rejected = self.__rej_moves, self.__rej_temps
-            statistics = self.__chi_sq, self.__energy
-            optimization = self.__temperature, self.__scale, self.__constant
+            finally:
 
-            factors = self.__space_factor, self.__mag_factors
+                for block in blocks:
+                    block.close()
+                    block.unlink()
 
-            intensities = self.__intensities()
-            filters = self.__filters(sigma)
+        else:
 
-            opts = fixed, heisenberg
+            results = [_magnetic_run(shared, *S, seed+b, params) \
+                       for b, S in enumerate(spins)]
 
-            args = *spins, *dirs, *trans, *trans_orig, *trans_cand, *struct, \
-                   *struct_orig, *struct_cand, *prod, *prod_orig, *prod_cand, \
-                   *factors, mu, *intensities, *filters, *indices, \
-                   *accepted, *rejected, *statistics, *optimization, \
-                   *opts, *bins, *dims, n_atm, n, N
+        for b, (Sx, Sy, Sz, stats) in enumerate(results):
 
-            refinement.magnetic(*args)
+            self.sc._Sx[b] = Sx
+            self.sc._Sy[b] = Sy
+            self.sc._Sz[b] = Sz
 
-            self.sc._Sx[b] = self.__Sx.copy()
-            self.sc._Sy[b] = self.__Sy.copy()
-            self.sc._Sz[b] = self.__Sz.copy()
+            self.__runs[b] = tuple(stats)
@@ -50,6 +50,15 @@ cdef (double, double, double) interpolated_vector_candidate(double ux,
                                                             double uz,
                                                             double sigma) nogil
 
+cdef (double,
+      double,
+      double) overrelaxation_vector_candidate(double ux,
+                                              double uy,
+                                              double uz,
+                                              double hx,
+                                              double hy,
+                                              double hz) nogil
+
 cdef void replica_exchange(double [::1] H,
                            double [::1] beta,
                            double [::1] sigma) nogil
@@ -99,3 +108,65 @@ cdef void update_moment_cluster(double [:,:,:,::1] p,
                                 Py_ssize_t [::1] clust_ind,
                                 Py_ssize_t n_c,
                                 Py_ssize_t t) nogil
+
+cdef Py_ssize_t kernel_offset(Py_ssize_t i,
+                              Py_ssize_t j,
+                              Py_ssize_t nu,
+                              Py_ssize_t nv,
+                              Py_ssize_t nw,
+                              Py_ssize_t n_atm) nogil
+
+cdef double energy_moment_kernel(double [:,:,:,::1] p,
+                                 double [:,:,:,::1] K,
+                                 double vx,
+                                 double vy,
+                                 double vz,
+                                 double ux,
+                                 double uy,
+                                 double uz,
+                                 Py_ssize_t i,
+                                 Py_ssize_t t) nogil
+
+cdef void update_moment_kernel(double [:,:,:,::1] p,
+                               double [:,:,:,::1] K,
+                               Py_ssize_t nu,
+                               Py_ssize_t nv,
+                               Py_ssize_t nw,
+                               double vx,
+                               double vy,
+                               double vz,
+                               double ux,
+                               double uy,
+                               double uz,
+                               Py_ssize_t i,
+                               Py_ssize_t t) nogil
+
+cdef double energy_moment_cluster_kernel(double [:,:,:,::1] p,
+                                         double [:,:,:,::1] K,
+                                         Py_ssize_t nu,
+                                         Py_ssize_t nv,
+                                         Py_ssize_t nw,
+                                         double [::1] clust_vx,
+                                         double [::1] clust_vy,
+                                         double [::1] clust_vz,
+                                         double [::1] clust_ux,
+                                         double [::1] clust_uy,
+                                         double [::1] clust_uz,
+                                         Py_ssize_t [::1] clust_ind,
+                                         Py_ssize_t n_c,
+                                         Py_ssize_t t) nogil
+
+cdef void update_moment_cluster_kernel(double [:,:,:,::1] p,
+                                       double [:,:,:,::1] K,
+                                       Py_ssize_t nu,
+                                       Py_ssize_t nv,
+                                       Py_ssize_t nw,
+                                       double [::1] clust_vx,
+                                       double [::1] clust_vy,
+                                       double [::1] clust_vz,
+                                       double [::1] clust_ux,
+                                       double [::1] clust_uy,
+                                       double [::1] clust_uz,
+                                       Py_ssize_t [::1] clust_ind,
+                                       Py_ssize_t n_c,
+                                       Py_ssize_t t) nogil
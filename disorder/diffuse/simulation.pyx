@@ -8,7 +8,7 @@ from cython.parallel import prange
 
 cimport cython
 
-from libc.math cimport M_PI, fabs, log, exp, sqrt
+from libc.math cimport M_PI, INFINITY, fabs, log, exp, sqrt
 from libc.math cimport sin, cos, tan
 from libc.math cimport acos, atan, atan2
 from libcpp.vector cimport vector
@@ -29,10 +29,27 @@ cdef extern from '<random>' namespace 'std' nogil:
         uniform_int_distribution(T a, T b)
         T operator()(mt19937 gen)
 
+cdef extern from *:
+    """
+    static thread_local std::mt19937 *thread_gen = NULL;
+
+    static inline void set_generator(std::mt19937 *g) {
+        thread_gen = g;
+    }
+
+    static inline std::mt19937 *get_generator(std::mt19937 *g) {
+        return thread_gen == NULL ? g : thread_gen;
+    }
+    """
+    void set_generator(mt19937 *g) nogil
+    mt19937 *get_generator(mt19937 *g) nogil
+
 cdef mt19937 gen
 
 cdef vector[vector[vector[vector[mt19937]]]] gen_ind
 
+cdef vector[mt19937] gen_temp
+
 cdef uniform_real_distribution[double] dist
 cdef uniform_int_distribution[Py_ssize_t] dist_u
 cdef uniform_int_distribution[Py_ssize_t] dist_v
@@ -58,7 +75,8 @@ cdef void initialize_random(Py_ssize_t nu,
 
     cdef Py_ssize_t i, j, k, a, ind
 
-    global gen, gen_ind, dist, dist_u, dist_v, dist_w, dist_atm, dist_temp
+    global gen, gen_ind, gen_temp
+    global dist, dist_u, dist_v, dist_w, dist_atm, dist_temp
 
     cdef vector[vector[vector[vector[mt19937]]]] u
     cdef vector[vector[vector[mt19937]]] v
@@ -81,6 +99,10 @@ cdef void initialize_random(Py_ssize_t nu,
 
     gen_ind = u
 
+    gen_temp.clear()
+    for ind in range(n_temp):
+        gen_temp.push_back(mt19937(1+seed+nu*nv*nw*n_atm+ind))
+
     gen = mt19937(seed)
 
     dist = uniform_real_distribution[double](0.0,1.0)
@@ -111,7 +133,7 @@ cdef Py_ssize_t sqrt_babylonian(Py_ssize_t n) nogil:
 
 cdef double random_uniform() nogil:
 
-    return dist(gen)
+    return dist(get_generator(&gen)[0])
 
 cdef double random_uniform_parallel(Py_ssize_t i,
                                     Py_ssize_t j,
@@ -132,10 +154,12 @@ cdef (Py_ssize_t,
                                   Py_ssize_t nw,
                                   Py_ssize_t n_atm) nogil:
 
-    cdef Py_ssize_t i = dist_u(gen)
-    cdef Py_ssize_t j = dist_v(gen)
-    cdef Py_ssize_t k = dist_w(gen)
-    cdef Py_ssize_t a = dist_atm(gen)
+    cdef mt19937 *g = get_generator(&gen)
+
+    cdef Py_ssize_t i = dist_u(g[0])
+    cdef Py_ssize_t j = dist_v(g[0])
+    cdef Py_ssize_t k = dist_w(g[0])
+    cdef Py_ssize_t a = dist_atm(g[0])
 
     return i, j, k, a
 
@@ -257,6 +281,83 @@ cdef (double,
 
         return wx, wy, wz
 
+cdef (double,
+      double,
+      double) overrelaxation_vector_candidate(double ux,
+                                              double uy,
+                                              double uz,
+                                              double hx,
+                                              double hy,
+                                              double hz) nogil:
+
+    cdef double h_sq = hx*hx+hy*hy+hz*hz
+
+    if iszero(h_sq):
+
+        return ux, uy, uz
+
+    cdef double factor = 2*(ux*hx+uy*hy+uz*hz)/h_sq
+
+    return factor*hx-ux, factor*hy-uy, factor*hz-uz
+
+cdef (double, double, double) bounded_vector_candidate(double ux,
+                                                       double uy,
+                                                       double uz,
+                                                       double sigma,
+                                                       double rc,
+                                                       double [:,::1] px,
+                                                       double [:,::1] py,
+                                                       double [:,::1] pz,
+                                                       double [:,::1] nx,
+                                                       double [:,::1] ny,
+                                                       double [:,::1] nz,
+                                                       Py_ssize_t a) nogil:
+
+    cdef Py_ssize_t n_pairs = px.shape[1]
+
+    cdef Py_ssize_t p
+
+    cdef double dx, dy, dz, d
+
+    cdef double dmin, dmax, smin, smax, s0, ds, x, y, fract
+
+    dx, dy, dz = random_vector_candidate()
+
+    dmin, dmax = -INFINITY, INFINITY
+
+    for p in range(n_pairs):
+
+        d = ((px[a,p]-ux)*nx[a,p]
+            +(py[a,p]-uy)*ny[a,p]
+            +(pz[a,p]-uz)*nz[a,p])/(dx*nx[a,p]
+                                   +dy*ny[a,p]
+                                   +dz*nz[a,p])
+
+        if d > 0 and dmax > d:
+            dmax = d
+        if d < 0 and dmin < d:
+            dmin = d
+
+    s0 = -(ux*dx+uy*dy+uz*dz)
+
+    ds = sqrt(s0*s0-ux*ux-uy*uy-uz*uz+rc*rc)
+
+    smin, smax = s0-ds, s0+ds
+
+    if dmin < smin:
+        dmin = smin
+    if dmax > smax:
+        dmax = smax
+
+    x = random_uniform()
+    y = dmin/(dmin-dmax)
+
+    fract = sigma/(1.0+sigma)
+
+    d = dmin+(dmax-dmin)*(fract*x+(1.0-fract)*y)
+
+    return d*dx, d*dy, d*dz
+
 cdef void replica_exchange(double [::1] H,
                            double [::1] beta,
                            double [::1] sigma) nogil:
@@ -482,6 +583,186 @@ cdef void update_moment_cluster(double [:,:,:,::1] p,
             p[j,0,1,t] += Q[k,5]*duy
             p[j,1,0,t] += Q[k,5]*dux
 
+cdef Py_ssize_t kernel_offset(Py_ssize_t i,
+                              Py_ssize_t j,
+                              Py_ssize_t nu,
+                              Py_ssize_t nv,
+                              Py_ssize_t nw,
+                              Py_ssize_t n_atm) nogil:
+
+    cdef Py_ssize_t iw = i // n_atm % nw
+    cdef Py_ssize_t iv = i // n_atm // nw % nv
+    cdef Py_ssize_t iu = i // n_atm // nw // nv % nu
+
+    cdef Py_ssize_t jw = j // n_atm % nw
+    cdef Py_ssize_t jv = j // n_atm // nw % nv
+    cdef Py_ssize_t ju = j // n_atm // nw // nv % nu
+
+    return (jw-iw+nw) % nw+nw*((jv-iv+nv) % nv+nv*((ju-iu+nu) % nu))
+
+cdef double energy_moment_kernel(double [:,:,:,::1] p,
+                                 double [:,:,:,::1] K,
+                                 double vx,
+                                 double vy,
+                                 double vz,
+                                 double ux,
+                                 double uy,
+                                 double uz,
+                                 Py_ssize_t i,
+                                 Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t n_atm = K.shape[0]
+
+    cdef Py_ssize_t a = i % n_atm
+
+    cdef double dx = vx-ux
+    cdef double dy = vy-uy
+    cdef double dz = vz-uz
+
+    cdef double px = p[i,0,0,t]+p[i,0,1,t]+p[i,0,2,t]
+    cdef double py = p[i,1,0,t]+p[i,1,1,t]+p[i,1,2,t]
+    cdef double pz = p[i,2,0,t]+p[i,2,1,t]+p[i,2,2,t]
+
+    cdef double E = 2*px*dx+K[a,a,0,0]*dx*dx+2*K[a,a,0,3]*dy*dz\
+                  + 2*py*dy+K[a,a,0,1]*dy*dy+2*K[a,a,0,4]*dx*dz\
+                  + 2*pz*dz+K[a,a,0,2]*dz*dz+2*K[a,a,0,5]*dx*dy
+
+    return E
+
+cdef void update_moment_kernel(double [:,:,:,::1] p,
+                               double [:,:,:,::1] K,
+                               Py_ssize_t nu,
+                               Py_ssize_t nv,
+                               Py_ssize_t nw,
+                               double vx,
+                               double vy,
+                               double vz,
+                               double ux,
+                               double uy,
+                               double uz,
+                               Py_ssize_t i,
+                               Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t n = p.shape[0]
+
+    cdef Py_ssize_t n_atm = K.shape[0]
+
+    cdef Py_ssize_t a = i % n_atm
+
+    cdef double dx = vx-ux
+    cdef double dy = vy-uy
+    cdef double dz = vz-uz
+
+    cdef Py_ssize_t j, b, m
+
+    for j in prange(n):
+
+        b = j % n_atm
+        m = kernel_offset(i, j, nu, nv, nw, n_atm)
+
+        p[j,0,0,t] += K[a,b,m,0]*dx
+        p[j,1,1,t] += K[a,b,m,1]*dy
+        p[j,2,2,t] += K[a,b,m,2]*dz
+
+        p[j,1,2,t] += K[a,b,m,3]*dz
+        p[j,2,1,t] += K[a,b,m,3]*dy
+
+        p[j,0,2,t] += K[a,b,m,4]*dz
+        p[j,2,0,t] += K[a,b,m,4]*dx
+
+        p[j,0,1,t] += K[a,b,m,5]*dy
+        p[j,1,0,t] += K[a,b,m,5]*dx
+
+cdef double energy_moment_cluster_kernel(double [:,:,:,::1] p,
+                                         double [:,:,:,::1] K,
+                                         Py_ssize_t nu,
+                                         Py_ssize_t nv,
+                                         Py_ssize_t nw,
+                                         double [::1] clust_vx,
+                                         double [::1] clust_vy,
+                                         double [::1] clust_vz,
+                                         double [::1] clust_ux,
+                                         double [::1] clust_uy,
+                                         double [::1] clust_uz,
+                                         Py_ssize_t [::1] clust_ind,
+                                         Py_ssize_t n_c,
+                                         Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t n_atm = K.shape[0]
+
+    cdef double dux, duy, duz
+    cdef double dvx, dvy, dvz
+
+    cdef double px, py, pz
+
+    cdef Py_ssize_t i_c, j_c
+
+    cdef Py_ssize_t i, j, a, b, m
+
+    cdef double Ej, E = 0
+
+    for i_c in range(n_c):
+
+        i = clust_ind[i_c]
+
+        a = i % n_atm
+
+        dux = clust_vx[i_c]-clust_ux[i_c]
+        duy = clust_vy[i_c]-clust_uy[i_c]
+        duz = clust_vz[i_c]-clust_uz[i_c]
+
+        px = p[i,0,0,t]+p[i,0,1,t]+p[i,0,2,t]
+        py = p[i,1,0,t]+p[i,1,1,t]+p[i,1,2,t]
+        pz = p[i,2,0,t]+p[i,2,1,t]+p[i,2,2,t]
+
+        E += 2*(px*dux+py*duy+pz*duz)
+
+        for j_c in range(i_c,n_c):
+
+            j = clust_ind[j_c]
+
+            b = j % n_atm
+            m = kernel_offset(i, j, nu, nv, nw, n_atm)
+
+            dvx = clust_vx[j_c]-clust_ux[j_c]
+            dvy = clust_vy[j_c]-clust_uy[j_c]
+            dvz = clust_vz[j_c]-clust_uz[j_c]
+
+            Ej = K[a,b,m,0]*dux*dvx+K[a,b,m,5]*dux*dvy+K[a,b,m,4]*dux*dvz\
+               + K[a,b,m,5]*duy*dvx+K[a,b,m,1]*duy*dvy+K[a,b,m,3]*duy*dvz\
+               + K[a,b,m,4]*duz*dvx+K[a,b,m,3]*duz*dvy+K[a,b,m,2]*duz*dvz
+
+            if i_c == j_c:
+                E += Ej
+            else:
+                E += 2*Ej
+
+    return E
+
+cdef void update_moment_cluster_kernel(double [:,:,:,::1] p,
+                                       double [:,:,:,::1] K,
+                                       Py_ssize_t nu,
+                                       Py_ssize_t nv,
+                                       Py_ssize_t nw,
+                                       double [::1] clust_vx,
+                                       double [::1] clust_vy,
+                                       double [::1] clust_vz,
+                                       double [::1] clust_ux,
+                                       double [::1] clust_uy,
+                                       double [::1] clust_uz,
+                                       Py_ssize_t [::1] clust_ind,
+                                       Py_ssize_t n_c,
+                                       Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t i_c
+
+    for i_c in range(n_c):
+
+        update_moment_kernel(p, K, nu, nv, nw,
+                             clust_vx[i_c], clust_vy[i_c], clust_vz[i_c],
+                             clust_ux[i_c], clust_uy[i_c], clust_uz[i_c],
+                             clust_ind[i_c], t)
+
 def dipole_dipole_interaction_energy(double [:,:,:,:,::1] Sx,
                                      double [:,:,:,:,::1] Sy,
                                      double [:,:,:,:,::1] Sz,
@@ -662,6 +943,52 @@ def dipole_dipole_interaction_potential(double [:,:,:,:,::1] Sx,
 
     return p_np
 
+def dipole_dipole_kernel_potential(double [:,:,:,:,::1] Sx,
+                                   double [:,:,:,:,::1] Sy,
+                                   double [:,:,:,:,::1] Sz,
+                                   double [:,:,:,::1] K):
+
+    cdef Py_ssize_t nu = Sx.shape[0]
+    cdef Py_ssize_t nv = Sx.shape[1]
+    cdef Py_ssize_t nw = Sx.shape[2]
+    cdef Py_ssize_t n_atm = Sx.shape[3]
+    cdef Py_ssize_t n_temp = Sx.shape[4]
+
+    cdef Py_ssize_t n = nu*nv*nw*n_atm
+
+    k, l = np.array([0,1,2,1,0,0]), np.array([0,1,2,2,2,1])
+
+    K_np = np.moveaxis(np.asarray(K).reshape(n_atm,n_atm,nu,nv,nw,6), -1, 2)
+
+    Kkl = np.zeros((n_atm,n_atm,3,3,nu,nv,nw))
+
+    Kkl[:,:,k,l,...] = K_np
+    Kkl[:,:,l,k,...] = K_np
+
+    S = np.stack((Sx,Sy,Sz), axis=-1)
+
+    K_k = np.fft.fftn(Kkl, axes=(4,5,6)).conj()
+    S_k = np.fft.fftn(S, axes=(0,1,2))
+
+    p_k = np.einsum('abklxyz,xyzbtl->xyzaklt', K_k, S_k)
+
+    p_np = np.fft.ifftn(p_k, axes=(0,1,2)).real
+
+    return np.ascontiguousarray(p_np.reshape(n,3,3,n_temp))
+
+def dipole_dipole_kernel_energy(double [:,:,:,:,::1] Sx,
+                                double [:,:,:,:,::1] Sy,
+                                double [:,:,:,:,::1] Sz,
+                                double [:,:,:,::1] K):
+
+    cdef Py_ssize_t n_temp = Sx.shape[4]
+
+    p = dipole_dipole_kernel_potential(Sx, Sy, Sz, K)
+
+    S = np.stack((Sx,Sy,Sz), axis=-2).reshape(-1,3,1,n_temp)
+
+    return S*p
+
 def magnetic_energy(double [:,:,:,:,::1] Sx,
                     double [:,:,:,:,::1] Sy,
                     double [:,:,:,:,::1] Sz,
@@ -747,6 +1074,122 @@ def magnetic_energy(double [:,:,:,:,::1] Sx,
 
     return e_np
 
+def magnetic_energy_reduced(double [:,:,:,:,::1] Sx,
+                            double [:,:,:,:,::1] Sy,
+                            double [:,:,:,:,::1] Sz,
+                            double [:,:,::1] J,
+                            double [:,:,::1] A,
+                            double [:,:,::1] g,
+                            double [::1] B,
+                            long [:,::1] atm_ind,
+                            long [:,::1] img_i,
+                            long [:,::1] img_j,
+                            long [:,::1] img_k,
+                            long [:,::1] pair_ind,
+                            bint [:,::1] pair_trans,
+                            partial=None):
+
+    cdef Py_ssize_t nu = Sx.shape[0]
+    cdef Py_ssize_t nv = Sx.shape[1]
+    cdef Py_ssize_t nw = Sx.shape[2]
+    cdef Py_ssize_t n_atm = Sx.shape[3]
+    cdef Py_ssize_t n_temp = Sx.shape[4]
+
+    cdef Py_ssize_t n_pairs = atm_ind.shape[1]
+    cdef Py_ssize_t n_types = J.shape[0]
+
+    cdef bint by_pair = partial == 'pair'
+    cdef bint by_site = partial == 'site'
+
+    if not (partial is None or by_pair or by_site):
+        raise ValueError('partial must be None, \'pair\' or \'site\'')
+
+    cdef Py_ssize_t i, j, k, a, t, p, q, r
+
+    cdef Py_ssize_t i_, j_, k_, a_
+
+    cdef Py_ssize_t c_ex, c_an = 0, c_fd = 0
+
+    cdef bint f
+
+    if by_site:
+        e_np = np.zeros((nu*nv*nw*n_atm,1,n_temp))
+    elif by_pair:
+        e_np = np.zeros((nu,n_types+2,n_temp))
+    else:
+        e_np = np.zeros((nu,1,n_temp))
+
+    cdef double [:,:,::1] e = e_np
+
+    cdef double ux, uy, uz, vx, vy, vz
+
+    cdef double Bx = B[0]
+    cdef double By = B[1]
+    cdef double Bz = B[2]
+
+    if by_pair:
+        c_an, c_fd = n_types, n_types+1
+
+    for i in prange(nu, nogil=True):
+        for j in range(nv):
+            for k in range(nw):
+                for a in range(n_atm):
+
+                    if by_site:
+                        r = a+n_atm*(k+nw*(j+nv*i))
+                    else:
+                        r = i
+
+                    for t in range(n_temp):
+
+                        ux = Sx[i,j,k,a,t]
+                        uy = Sy[i,j,k,a,t]
+                        uz = Sz[i,j,k,a,t]
+
+                        for p in range(n_pairs):
+
+                            i_ = (i+img_i[a,p]+nu)%nu
+                            j_ = (j+img_j[a,p]+nv)%nv
+                            k_ = (k+img_k[a,p]+nw)%nw
+                            a_ = atm_ind[a,p]
+
+                            vx = Sx[i_,j_,k_,a_,t]
+                            vy = Sy[i_,j_,k_,a_,t]
+                            vz = Sz[i_,j_,k_,a_,t]
+
+                            q = pair_ind[a,p]
+                            f = pair_trans[a,p]
+
+                            c_ex = q if by_pair else 0
+
+                            if (f == 1):
+                                e[r,c_ex,t] -= 0.5\
+                                    *(ux*(J[q,0,0]*vx+J[q,1,0]*vy+J[q,2,0]*vz)\
+                                    + uy*(J[q,0,1]*vx+J[q,1,1]*vy+J[q,2,1]*vz)\
+                                    + uz*(J[q,0,2]*vx+J[q,1,2]*vy+J[q,2,2]*vz))
+                            else:
+                                e[r,c_ex,t] -= 0.5\
+                                    *(ux*(J[q,0,0]*vx+J[q,0,1]*vy+J[q,0,2]*vz)\
+                                    + uy*(J[q,1,0]*vx+J[q,1,1]*vy+J[q,1,2]*vz)\
+                                    + uz*(J[q,2,0]*vx+J[q,2,1]*vy+J[q,2,2]*vz))
+
+                        e[r,c_an,t] -= \
+                            ux*(A[a,0,0]*ux+A[a,0,1]*uy+A[a,0,2]*uz)\
+                          + uy*(A[a,1,0]*ux+A[a,1,1]*uy+A[a,1,2]*uz)\
+                          + uz*(A[a,2,0]*ux+A[a,2,1]*uy+A[a,2,2]*uz)
+
+                        e[r,c_fd,t] -= \
+                            Bx*(g[a,0,0]*ux+g[a,0,1]*uy+g[a,0,2]*uz)\
+                          + By*(g[a,1,0]*ux+g[a,1,1]*uy+g[a,1,2]*uz)\
+                          + Bz*(g[a,2,0]*ux+g[a,2,1]*uy+g[a,2,2]*uz)
+
+    if by_site:
+        return e_np.reshape(nu,nv,nw,n_atm,n_temp)
+    elif by_pair:
+        return e_np.sum(axis=0)
+    else:
+        return e_np.sum(axis=(0,1))
+
 def structural_energy(double [:,:,:,:,::1] S,
                       double [:,:,:,:,::1] Sx,
                       double [:,:,:,:,::1] Sy,
@@ -785,10 +1228,120 @@ def structural_energy(double [:,:,:,:,::1] S,
 
     cdef double u, v, ux, uy, uz, vx, vy, vz
 
-    for i in range(nu):
+    for i in range(nu):
+        for j in range(nv):
+            for k in range(nw):
+                for a in range(n_atm):
+                    for t in range(n_temp):
+
+                        u = S[i,j,k,a,t]
+
+                        ux = Sx[i,j,k,a,t]
+                        uy = Sy[i,j,k,a,t]
+                        uz = Sz[i,j,k,a,t]
+
+                        for p in range(n_pairs):
+
+                            i_ = (i+img_i[a,p]+nu)%nu
+                            j_ = (j+img_j[a,p]+nv)%nv
+                            k_ = (k+img_k[a,p]+nw)%nw
+                            a_ = atm_ind[a,p]
+
+                            v = S[i_,j_,k_,a_,t]
+
+                            vx = Sx[i_,j_,k_,a_,t]
+                            vy = Sy[i_,j_,k_,a_,t]
+                            vz = Sz[i_,j_,k_,a_,t]
+
+                            q = pair_ind[a,p]
+
+                            e[i,j,k,a,p,t] = -0.5*J[q]*u*v
+
+                            dUx = rx[a,p]+(vx-ux)
+                            dUy = ry[a,p]+(vy-uy)
+                            dUz = rz[a,p]+(vz-uz)
+
+                            if u > 0 and v > 0:
+                                eta = epsilon[0,q]
+                            elif u < 0 and v < 0:
+                                eta = epsilon[1,q]
+                            else:
+                                eta = epsilon[2,q]
+
+                            dr = sqrt(dUx*dUx+dUy*dUy+dUz*dUz)-r[a,p]*(1.0+eta)
+
+                            e[i,j,k,a,n_pairs+p,t] = 0.5*K[q]*dr*dr
+
+                        e[i,j,k,a,2*n_pairs,t] = -h[a]*u
+
+    return e_np
+
+def structural_energy_reduced(double [:,:,:,:,::1] S,
+                              double [:,:,:,:,::1] Sx,
+                              double [:,:,:,:,::1] Sy,
+                              double [:,:,:,:,::1] Sz,
+                              double [::1] J,
+                              double [::1] h,
+                              double [::1] K,
+                              double [:,::1] epsilon,
+                              double [:,::1] rx,
+                              double [:,::1] ry,
+                              double [:,::1] rz,
+                              double [:,::1] r,
+                              long [:,::1] atm_ind,
+                              long [:,::1] img_i,
+                              long [:,::1] img_j,
+                              long [:,::1] img_k,
+                              long [:,::1] pair_ind,
+                              partial=None):
+
+    cdef Py_ssize_t nu = S.shape[0]
+    cdef Py_ssize_t nv = S.shape[1]
+    cdef Py_ssize_t nw = S.shape[2]
+    cdef Py_ssize_t n_atm = S.shape[3]
+    cdef Py_ssize_t n_temp = S.shape[4]
+
+    cdef Py_ssize_t n_pairs = atm_ind.shape[1]
+    cdef Py_ssize_t n_types = J.shape[0]
+
+    cdef bint by_pair = partial == 'pair'
+    cdef bint by_site = partial == 'site'
+
+    if not (partial is None or by_pair or by_site):
+        raise ValueError('partial must be None, \'pair\' or \'site\'')
+
+    cdef Py_ssize_t i, j, k, a, t, p, q, s
+
+    cdef Py_ssize_t i_, j_, k_, a_
+
+    cdef Py_ssize_t c_occ, c_disp, c_fd = 0
+
+    if by_site:
+        e_np = np.zeros((nu*nv*nw*n_atm,1,n_temp))
+    elif by_pair:
+        e_np = np.zeros((nu,n_types*2+1,n_temp))
+    else:
+        e_np = np.zeros((nu,1,n_temp))
+
+    cdef double [:,:,::1] e = e_np
+
+    cdef double dUx, dUy, dUz, dr, eta
+
+    cdef double u, v, ux, uy, uz, vx, vy, vz
+
+    if by_pair:
+        c_fd = 2*n_types
+
+    for i in prange(nu, nogil=True):
         for j in range(nv):
             for k in range(nw):
                 for a in range(n_atm):
+
+                    if by_site:
+                        s = a+n_atm*(k+nw*(j+nv*i))
+                    else:
+                        s = i
+
                     for t in range(n_temp):
 
                         u = S[i,j,k,a,t]
@@ -812,7 +1365,10 @@ def structural_energy(double [:,:,:,:,::1] S,
 
                             q = pair_ind[a,p]
 
-                            e[i,j,k,a,p,t] = -0.5*J[q]*u*v
+                            c_occ = q if by_pair else 0
+                            c_disp = n_types+q if by_pair else 0
+
+                            e[s,c_occ,t] -= 0.5*J[q]*u*v
 
                             dUx = rx[a,p]+(vx-ux)
                             dUy = ry[a,p]+(vy-uy)
@@ -827,11 +1383,16 @@ def structural_energy(double [:,:,:,:,::1] S,
 
                             dr = sqrt(dUx*dUx+dUy*dUy+dUz*dUz)-r[a,p]*(1.0+eta)
 
-                            e[i,j,k,a,n_pairs+p,t] = 0.5*K[q]*dr*dr
+                            e[s,c_disp,t] += 0.5*K[q]*dr*dr
 
-                        e[i,j,k,a,2*n_pairs,t] = -h[a]*u
+                        e[s,c_fd,t] -= h[a]*u
 
-    return e_np
+    if by_site:
+        return e_np.reshape(nu,nv,nw,n_atm,n_temp)
+    elif by_pair:
+        return e_np.sum(axis=0)
+    else:
+        return e_np.sum(axis=(0,1))
 
 cdef (double, bint) annealing_vector(double [:,:,:,:,::1] Sx,
                                      double [:,:,:,:,::1] Sy,
@@ -848,7 +1409,7 @@ cdef (double, bint) annealing_vector(double [:,:,:,:,::1] Sx,
                                      Py_ssize_t j,
                                      Py_ssize_t k,
                                      Py_ssize_t a,
-                                     Py_ssize_t t):
+                                     Py_ssize_t t) nogil:
 
     cdef bint flip = False
 
@@ -878,7 +1439,7 @@ cdef (double, bint) annealing_scalar(double [:,:,:,:,::1] S,
                                      Py_ssize_t j,
                                      Py_ssize_t k,
                                      Py_ssize_t a,
-                                     Py_ssize_t t):
+                                     Py_ssize_t t) nogil:
 
     cdef bint flip = False
 
@@ -918,7 +1479,7 @@ cdef double magnetic(double [:,:,:,:,::1] Sx,
                      Py_ssize_t j,
                      Py_ssize_t k,
                      Py_ssize_t a,
-                     Py_ssize_t t):
+                     Py_ssize_t t) nogil:
 
     cdef Py_ssize_t nu = Sx.shape[0]
     cdef Py_ssize_t nv = Sx.shape[1]
@@ -942,7 +1503,7 @@ cdef double magnetic(double [:,:,:,:,::1] Sx,
     cdef double By = B[1]
     cdef double Bz = B[2]
 
-    for p in prange(n_pairs, nogil=True):
+    for p in prange(n_pairs):
 
         i_ = (i+img_i[a,p]+nu)%nu
         j_ = (j+img_j[a,p]+nv)%nv
@@ -1009,7 +1570,7 @@ cdef double structural(double [:,:,:,:,::1] S,
                        Py_ssize_t j,
                        Py_ssize_t k,
                        Py_ssize_t a,
-                       Py_ssize_t t):
+                       Py_ssize_t t) nogil:
 
     cdef Py_ssize_t nu = S.shape[0]
     cdef Py_ssize_t nv = S.shape[1]
@@ -1029,7 +1590,7 @@ cdef double structural(double [:,:,:,:,::1] S,
 
     cdef double r0, R0, dr, dR, e0, E0, dux, duy, duz, dUx, dUy, dUz
 
-    for p in prange(n_pairs, nogil=True):
+    for p in prange(n_pairs):
 
         i_ = (i+img_i[a,p]+nu)%nu
         j_ = (j+img_j[a,p]+nv)%nv
@@ -1080,6 +1641,92 @@ cdef double structural(double [:,:,:,:,::1] S,
 
     return E
 
+cdef (double, double, double) magnetic_field(double [:,:,:,:,::1] Sx,
+                                             double [:,:,:,:,::1] Sy,
+                                             double [:,:,:,:,::1] Sz,
+                                             double [:,:,::1] J,
+                                             double [:,:,::1] g,
+                                             double [::1] B,
+                                             long [:,::1] atm_ind,
+                                             long [:,::1] img_i,
+                                             long [:,::1] img_j,
+                                             long [:,::1] img_k,
+                                             long [:,::1] pair_ind,
+                                             bint [:,::1] pair_trans,
+                                             Py_ssize_t i,
+                                             Py_ssize_t j,
+                                             Py_ssize_t k,
+                                             Py_ssize_t a,
+                                             Py_ssize_t t) nogil:
+
+    cdef Py_ssize_t nu = Sx.shape[0]
+    cdef Py_ssize_t nv = Sx.shape[1]
+    cdef Py_ssize_t nw = Sx.shape[2]
+
+    cdef Py_ssize_t n_pairs = atm_ind.shape[1]
+
+    cdef Py_ssize_t i_, j_, k_, a_, p, q
+
+    cdef double wx, wy, wz
+
+    cdef double Bx = B[0]
+    cdef double By = B[1]
+    cdef double Bz = B[2]
+
+    cdef double hx = g[a,0,0]*Bx+g[a,1,0]*By+g[a,2,0]*Bz
+    cdef double hy = g[a,0,1]*Bx+g[a,1,1]*By+g[a,2,1]*Bz
+    cdef double hz = g[a,0,2]*Bx+g[a,1,2]*By+g[a,2,2]*Bz
+
+    for p in range(n_pairs):
+
+        i_ = (i+img_i[a,p]+nu)%nu
+        j_ = (j+img_j[a,p]+nv)%nv
+        k_ = (k+img_k[a,p]+nw)%nw
+        a_ = atm_ind[a,p]
+
+        q = pair_ind[a,p]
+
+        wx, wy, wz = Sx[i_,j_,k_,a_,t], Sy[i_,j_,k_,a_,t], Sz[i_,j_,k_,a_,t]
+
+        if (pair_trans[a,p] == 1):
+            hx += J[q,0,0]*wx+J[q,1,0]*wy+J[q,2,0]*wz
+            hy += J[q,0,1]*wx+J[q,1,1]*wy+J[q,2,1]*wz
+            hz += J[q,0,2]*wx+J[q,1,2]*wy+J[q,2,2]*wz
+        else:
+            hx += J[q,0,0]*wx+J[q,0,1]*wy+J[q,0,2]*wz
+            hy += J[q,1,0]*wx+J[q,1,1]*wy+J[q,1,2]*wz
+            hz += J[q,2,0]*wx+J[q,2,1]*wy+J[q,2,2]*wz
+
+    return hx, hy, hz
+
+cdef Py_ssize_t [:,::1] sublattices(Py_ssize_t nu,
+                                     Py_ssize_t nv,
+                                     Py_ssize_t nw,
+                                     Py_ssize_t n_atm,
+                                     long [:,::1] img_i,
+                                     long [:,::1] img_j,
+                                     long [:,::1] img_k):
+
+    periods = []
+
+    for n_cell, img in zip((nu,nv,nw), (img_i,img_j,img_k)):
+
+        reach = np.abs(np.asarray(img)).max(initial=0)+1
+
+        periods.append(next((d for d in range(reach, n_cell+1) \
+                             if n_cell % d == 0), n_cell))
+
+    pu, pv, pw = periods
+
+    i, j, k, a = np.unravel_index(np.arange(nu*nv*nw*n_atm),
+                                  (nu,nv,nw,n_atm))
+
+    colour = a+n_atm*(k % pw+pw*(j % pv+pv*(i % pu)))
+
+    ind = np.argsort(colour, kind='stable')
+
+    return ind.reshape(n_atm*pu*pv*pw,-1).astype(np.intp)
+
 def heisenberg(double [:,:,:,:,::1] Sx,
                double [:,:,:,:,::1] Sy,
                double [:,:,:,:,::1] Sz,
@@ -1087,7 +1734,7 @@ def heisenberg(double [:,:,:,:,::1] Sx,
                double [:,:,::1] A,
                double [:,:,::1] g,
                double [::1] B,
-               double [:,::1] Q,
+               double [:,:,:,::1] K,
                long [:,::1] atm_ind,
                long [:,::1] img_i,
                long [:,::1] img_j,
@@ -1096,7 +1743,11 @@ def heisenberg(double [:,:,:,:,::1] Sx,
                bint [:,::1] pair_trans,
                double [::1] T_range,
                double kB,
-               Py_ssize_t N):
+               Py_ssize_t N,
+               bint parallel=False,
+               Py_ssize_t n_over=0,
+               observer=None,
+               Py_ssize_t interval=1):
 
     cdef Py_ssize_t nu = Sx.shape[0]
     cdef Py_ssize_t nv = Sx.shape[1]
@@ -1111,37 +1762,28 @@ def heisenberg(double [:,:,:,:,::1] Sx,
 
     cdef Py_ssize_t i_ind
 
-    cdef bint long_range = np.any(Q)
-    cdef bint flip
+    cdef bint long_range = np.any(K)
+    cdef bint flip, over
+
+    cdef bint observe = observer is not None
 
     cdef Py_ssize_t n_pairs = atm_ind.shape[1]
 
     cdef double E
 
-    cdef double [::1] H = np.zeros(n_temp)
-
-    cdef double [:,:,:,:,:,::1] e = magnetic_energy(Sx, Sy, Sz, J, A, g, B,
-                                                    atm_ind, img_i,
-                                                    img_j, img_k,
-                                                    pair_ind, pair_trans)
-
-    for i in range(nu):
-        for j in range(nv):
-            for k in range(nw):
-                for a in range(n_atm):
-                    for p in range(n_pairs+2):
-                        for t in range(n_temp):
-                            H[t] += e[i,j,k,a,p,t]
-
-    cdef double [:,:,:,::1] V = dipole_dipole_interaction_energy(Sx, Sy, Sz, Q)
+    cdef double [::1] H = magnetic_energy_reduced(Sx, Sy, Sz, J, A, g, B,
+                                                  atm_ind, img_i, img_j, img_k,
+                                                  pair_ind, pair_trans)
 
-    cdef double [:,:,:,::1] U = dipole_dipole_interaction_potential(Sx,
-                                                                    Sy,
-                                                                    Sz, Q)
+    cdef double [:,:,:,::1] V, U
 
     n = nu*nv*nw*n_atm
 
     if long_range:
+
+        V = dipole_dipole_kernel_energy(Sx, Sy, Sz, K)
+        U = dipole_dipole_kernel_potential(Sx, Sy, Sz, K)
+
         for i_ind in range(n):
             for t in range(n_temp):
                 H[t] += V[i_ind,0,0,t]+V[i_ind,0,1,t]+V[i_ind,0,2,t]\
@@ -1150,17 +1792,208 @@ def heisenberg(double [:,:,:,:,::1] Sx,
 
     cdef double ux, uy, uz
     cdef double vx, vy, vz
+    cdef double hx, hy, hz
 
     cdef double [::1] sigma = np.full(n_temp, 1.)
 
     cdef double [::1] count = np.zeros(n_temp)
     cdef double [::1] total = np.zeros(n_temp)
 
+    cdef double [::1] count_over = np.zeros(n_temp)
+    cdef double [::1] total_over = np.zeros(n_temp)
+
     cdef double rate, factor
 
     cdef double [::1] beta = 1/(kB*np.copy(T_range))
 
-    for _ in range(N):
+    cdef Py_ssize_t [:,::1] sub
+
+    cdef Py_ssize_t c, s, n_sub, m_sub
+
+    cdef double [:,::1] dH, acc
+
+    if parallel and not long_range:
+
+        sub = sublattices(nu, nv, nw, n_atm, img_i, img_j, img_k)
+
+        n_sub, m_sub = sub.shape[0], sub.shape[1]
+
+        dH = np.zeros((m_sub,n_temp))
+        acc = np.zeros((m_sub,n_temp))
+
+        for sweep in range(N*(1+n_over)):
+
+            over = sweep % (1+n_over) > 0
+
+            for c in range(n_sub):
+
+                for s in prange(m_sub, nogil=True):
+
+                    i_ind = sub[c,s]
+
+                    a = i_ind % n_atm
+                    k = i_ind // n_atm % nw
+                    j = i_ind // n_atm // nw % nv
+                    i = i_ind // n_atm // nw // nv
+
+                    set_generator(&gen_ind[i][j][k][a])
+
+                    for t in range(n_temp):
+
+                        dH[s,t], acc[s,t] = 0, 0
+
+                        ux = Sx[i,j,k,a,t]
+                        uy = Sy[i,j,k,a,t]
+                        uz = Sz[i,j,k,a,t]
+
+                        if over:
+
+                            hx, hy, hz = magnetic_field(Sx, Sy, Sz, J, g, B,
+                                                        atm_ind, img_i,
+                                                        img_j, img_k,
+                                                        pair_ind, pair_trans,
+                                                        i, j, k, a, t)
+
+                            vx, vy, vz = overrelaxation_vector_candidate(ux,
+                                                                         uy,
+                                                                         uz,
+                                                                         hx,
+                                                                         hy,
+                                                                         hz)
+
+                        else:
+
+                            vx, vy, vz = gaussian_vector_candidate(ux, uy, uz,
+                                                                   sigma[t])
+
+                        E = magnetic(Sx, Sy, Sz, vx, vy, vz, ux, uy, uz,
+                                     J, A, g, B, atm_ind, img_i, img_j, img_k,
+                                     pair_ind, pair_trans, i, j, k, a, t)
+
+                        if (random_uniform() < alpha(E, beta[t])):
+
+                            Sx[i,j,k,a,t] = vx
+                            Sy[i,j,k,a,t] = vy
+                            Sz[i,j,k,a,t] = vz
+
+                            dH[s,t], acc[s,t] = E, 1
+
+                    set_generator(NULL)
+
+                for t in range(n_temp):
+
+                    for s in range(m_sub):
+
+                        H[t] += dH[s,t]
+
+                        if over:
+                            count_over[t] += acc[s,t]
+                        else:
+                            count[t] += acc[s,t]
+
+                    if over:
+                        total_over[t] += m_sub
+                    else:
+                        total[t] += m_sub
+
+                    rate = count[t]/total[t]
+
+                    if (not over and rate > 0.0 and rate < 1.0):
+                        factor = rate/(1.0-rate)
+                        sigma[t] *= factor
+
+                        if (sigma[t] < 0.01): sigma[t] = 0.01
+                        if (sigma[t] > 10): sigma[t] = 10
+
+                replica_exchange(H, beta, sigma)
+
+            if observe and (sweep+1) % (interval*(1+n_over)) == 0:
+                observer(np.copy(H), 1/(kB*np.copy(beta)))
+
+        return np.copy(H), 1/(kB*np.copy(beta))
+
+    elif parallel:
+
+        for sweep in range(N*(1+n_over)):
+
+            over = sweep % (1+n_over) > 0
+
+            for t in prange(n_temp, nogil=True):
+
+                set_generator(&gen_temp[t])
+
+                for s in range(n):
+
+                    i, j, k, a = random_original(nu, nv, nw, n_atm)
+
+                    ux = Sx[i,j,k,a,t]
+                    uy = Sy[i,j,k,a,t]
+                    uz = Sz[i,j,k,a,t]
+
+                    if over:
+
+                        hx, hy, hz = magnetic_field(Sx, Sy, Sz, J, g, B,
+                                                    atm_ind, img_i,
+                                                    img_j, img_k,
+                                                    pair_ind, pair_trans,
+                                                    i, j, k, a, t)
+
+                        vx, vy, vz = overrelaxation_vector_candidate(ux, uy,
+                                                                     uz, hx,
+                                                                     hy, hz)
+
+                    else:
+
+                        vx, vy, vz = gaussian_vector_candidate(ux, uy, uz,
+                                                               sigma[t])
+
+                    E = magnetic(Sx, Sy, Sz, vx, vy, vz, ux, uy, uz,
+                                 J, A, g, B, atm_ind, img_i, img_j, img_k,
+                                 pair_ind, pair_trans, i, j, k, a, t)
+
+                    i_ind = a+n_atm*(k+nw*(j+nv*i))
+
+                    E = E+energy_moment_kernel(U, K, vx, vy, vz,
+                                               ux, uy, uz, i_ind, t)
+
+                    if over:
+
+                        rate, flip = annealing_vector(Sx, Sy, Sz,
+                                                      vx, vy, vz, H, E, beta,
+                                                      count_over, total_over,
+                                                      i, j, k, a, t)
+
+                    else:
+
+                        rate, flip = annealing_vector(Sx, Sy, Sz,
+                                                      vx, vy, vz, H, E, beta,
+                                                      count, total,
+                                                      i, j, k, a, t)
+
+                    if flip:
+
+                        update_moment_kernel(U, K, nu, nv, nw,
+                                             vx, vy, vz, ux, uy, uz, i_ind, t)
+
+                    if (not over and rate > 0.0 and rate < 1.0):
+                        factor = rate/(1.0-rate)
+                        sigma[t] *= factor
+
+                        if (sigma[t] < 0.01): sigma[t] = 0.01
+                        if (sigma[t] > 10): sigma[t] = 10
+
+                set_generator(NULL)
+
+            replica_exchange(H, beta, sigma)
+
+            if observe and (sweep+1) % (interval*(1+n_over)) == 0:
+                observer(np.copy(H), 1/(kB*np.copy(beta)))
+
+        return np.copy(H), 1/(kB*np.copy(beta))
+
+    for sweep in range(N*(1+n_over)):
+
+        over = sweep % (1+n_over) > 0
 
         for _ in range(n):
 
@@ -1170,7 +2003,20 @@ def heisenberg(double [:,:,:,:,::1] Sx,
 
                 ux, uy, uz = Sx[i,j,k,a,t], Sy[i,j,k,a,t], Sz[i,j,k,a,t]
 
-                vx, vy, vz = gaussian_vector_candidate(ux, uy, uz, sigma[t])
+                if over:
+
+                    hx, hy, hz = magnetic_field(Sx, Sy, Sz, J, g, B,
+                                                atm_ind, img_i, img_j, img_k,
+                                                pair_ind, pair_trans,
+                                                i, j, k, a, t)
+
+                    vx, vy, vz = overrelaxation_vector_candidate(ux, uy, uz,
+                                                                 hx, hy, hz)
+
+                else:
+
+                    vx, vy, vz = gaussian_vector_candidate(ux, uy, uz,
+                                                           sigma[t])
 
                 E = magnetic(Sx, Sy, Sz, vx, vy, vz, ux, uy, uz, J, A, g, B,
                              atm_ind, img_i, img_j, img_k,
@@ -1180,18 +2026,27 @@ def heisenberg(double [:,:,:,:,::1] Sx,
 
                     i_ind = a+n_atm*(k+nw*(j+nv*i))
 
-                    E += energy_moment(U, Q, vx, vy, vz,
-                                       ux, uy, uz, i_ind, t)
+                    E += energy_moment_kernel(U, K, vx, vy, vz,
+                                              ux, uy, uz, i_ind, t)
+
+                if over:
+
+                    rate, flip = annealing_vector(Sx, Sy, Sz, vx, vy, vz, H, E,
+                                                  beta, count_over, total_over,
+                                                  i, j, k, a, t)
+
+                else:
 
-                rate, flip = annealing_vector(Sx, Sy, Sz, vx, vy, vz, H, E,
-                                              beta, count, total,
-                                              i, j, k, a, t)
+                    rate, flip = annealing_vector(Sx, Sy, Sz, vx, vy, vz, H, E,
+                                                  beta, count, total,
+                                                  i, j, k, a, t)
 
                 if long_range and flip:
 
-                    update_moment(U, Q, vx, vy, vz, ux, uy, uz, i_ind, t)
+                    update_moment_kernel(U, K, nu, nv, nw,
+                                         vx, vy, vz, ux, uy, uz, i_ind, t)
 
-                if (rate > 0.0 and rate < 1.0):
+                if (not over and rate > 0.0 and rate < 1.0):
                     factor = rate/(1.0-rate)
                     sigma[t] *= factor
 
@@ -1200,6 +2055,9 @@ def heisenberg(double [:,:,:,:,::1] Sx,
 
             replica_exchange(H, beta, sigma)
 
+        if observe and (sweep+1) % (interval*(1+n_over)) == 0:
+            observer(np.copy(H), 1/(kB*np.copy(beta)))
+
     return np.copy(H), 1/(kB*np.copy(beta))
 
 def size_effect(double [:,:,:,:,::1] S,
@@ -1221,7 +2079,10 @@ def size_effect(double [:,:,:,:,::1] S,
                 long [:,::1] pair_ind,
                 double [::1] T_range,
                 double kB,
-                Py_ssize_t N):
+                Py_ssize_t N,
+                bint parallel=False,
+                observer=None,
+                Py_ssize_t interval=1):
 
     cdef Py_ssize_t nu = S.shape[0]
     cdef Py_ssize_t nv = S.shape[1]
@@ -1239,7 +2100,9 @@ def size_effect(double [:,:,:,:,::1] S,
     cdef bint occupational = np.any(J)
     cdef bint displacive = np.any(K)
 
-    cdef bint flip
+    cdef bint flip, chemical
+
+    cdef bint observe = observer is not None
 
     cdef double p_chem, p_rate
     if occupational and displacive:
@@ -1253,20 +2116,10 @@ def size_effect(double [:,:,:,:,::1] S,
 
     cdef double E
 
-    cdef double [::1] H = np.zeros(n_temp)
-
-    cdef double [:,:,:,:,:,::1] e = structural_energy(S, Sx, Sy, Sz, J, h, K,
-                                                      epsilon, rx, ry, rz,
-                                                      r, atm_ind, img_i, img_j,
-                                                      img_k, pair_ind)
-
-    for i in range(nu):
-        for j in range(nv):
-            for k in range(nw):
-                for a in range(n_atm):
-                    for p in range(n_pairs*2+1):
-                        for t in range(n_temp):
-                            H[t] += e[i,j,k,a,p,t]
+    cdef double [::1] H = structural_energy_reduced(S, Sx, Sy, Sz, J, h, K,
+                                                    epsilon, rx, ry, rz, r,
+                                                    atm_ind, img_i, img_j,
+                                                    img_k, pair_ind)
 
     cdef double [::1] rc = np.zeros(n_atm)
 
@@ -1295,12 +2148,6 @@ def size_effect(double [:,:,:,:,::1] S,
     cdef double ux, uy, uz
     cdef double vx, vy, vz
 
-    cdef double dx, dy, dz, d
-
-    cdef double dmin, dmax, rmin, rmax, smin, smax, s0, ds, x, y, fract
-
-    rmin, rmax = float('-inf'), float('inf')
-
     cdef double [::1] sigma = np.full(n_temp, 1.)
 
     cdef double [::1] count_occ = np.zeros(n_temp)
@@ -1313,72 +2160,156 @@ def size_effect(double [:,:,:,:,::1] S,
 
     cdef double [::1] beta = 1/(kB*np.copy(T_range))
 
-    for _ in range(N):
+    cdef Py_ssize_t [:,::1] sub
 
-        for _ in range(n):
+    cdef Py_ssize_t c, s, n_sub, m_sub
 
-            i, j, k, a = random_original(nu, nv, nw, n_atm)
+    cdef double [:,::1] dH, acc_occ, acc_disp, trial_occ
 
-            for t in range(n_temp):
+    if parallel:
 
-                u = S[i,j,k,a,t]
+        sub = sublattices(nu, nv, nw, n_atm, img_i, img_j, img_k)
 
-                ux, uy, uz = Sx[i,j,k,a,t], Sy[i,j,k,a,t], Sz[i,j,k,a,t]
+        n_sub, m_sub = sub.shape[0], sub.shape[1]
 
-                v, vx, vy, vz = u, ux, uy, uz
+        dH = np.zeros((m_sub,n_temp))
 
-                p_rate = random_uniform()
+        acc_occ = np.zeros((m_sub,n_temp))
+        acc_disp = np.zeros((m_sub,n_temp))
 
-                if p_rate < p_chem:
-                    chemical = True
-                else:
-                    chemical = False
+        trial_occ = np.zeros((m_sub,n_temp))
 
-                if chemical:
+        for sweep in range(N):
 
-                    v = ising_scalar_candidate(u)
+            for c in range(n_sub):
 
-                else:
+                for s in prange(m_sub, nogil=True):
 
-                    #dx, dy, dz = gaussian_vector_candidate(ux, uy, uz,
-                    #                                       sigma[t])
+                    i_ind = sub[c,s]
+
+                    a = i_ind % n_atm
+                    k = i_ind // n_atm % nw
+                    j = i_ind // n_atm // nw % nv
+                    i = i_ind // n_atm // nw // nv
+
+                    set_generator(&gen_ind[i][j][k][a])
+
+                    for t in range(n_temp):
+
+                        dH[s,t], acc_occ[s,t], acc_disp[s,t] = 0, 0, 0
 
-                    dx, dy, dz = random_vector_candidate()
+                        u = S[i,j,k,a,t]
+
+                        ux = Sx[i,j,k,a,t]
+                        uy = Sy[i,j,k,a,t]
+                        uz = Sz[i,j,k,a,t]
+
+                        v, vx, vy, vz = u, ux, uy, uz
+
+                        chemical = random_uniform() < p_chem
+
+                        if chemical:
+
+                            v = ising_scalar_candidate(u)
+
+                        else:
+
+                            vx, vy, vz = bounded_vector_candidate(ux, uy, uz,
+                                                                  sigma[t],
+                                                                  rc_max,
+                                                                  px, py, pz,
+                                                                  nx, ny, nz,
+                                                                  a)
+
+                        trial_occ[s,t] = chemical
+
+                        E = structural(S, Sx, Sy, Sz, u, v, vx, vy, vz,
+                                       ux, uy, uz, J, h, K, epsilon, chemical,
+                                       rx, ry, rz, r, atm_ind,
+                                       img_i, img_j, img_k, pair_ind,
+                                       i, j, k, a, t)
+
+                        if (random_uniform() < alpha(E, beta[t])):
+
+                            if chemical:
+
+                                S[i,j,k,a,t] = v
+
+                                acc_occ[s,t] = 1
+
+                            else:
+
+                                Sx[i,j,k,a,t] = vx
+                                Sy[i,j,k,a,t] = vy
+                                Sz[i,j,k,a,t] = vz
+
+                                acc_disp[s,t] = 1
+
+                            dH[s,t] = E
+
+                    set_generator(NULL)
+
+                for t in range(n_temp):
+
+                    for s in range(m_sub):
+
+                        H[t] += dH[s,t]
+
+                        count_occ[t] += acc_occ[s,t]
+                        count_disp[t] += acc_disp[s,t]
+
+                        total_occ[t] += trial_occ[s,t]
+                        total_disp[t] += 1-trial_occ[s,t]
+
+                    if (total_disp[t] > 0):
+
+                        rate = count_disp[t]/total_disp[t]
+
+                        if (rate > 0.0 and rate < 1.0):
+                            factor = rate/(1.0-rate)
+                            sigma[t] *= factor
+
+                            if (sigma[t] < 0.01): sigma[t] = 0.01
+                            if (sigma[t] > 10): sigma[t] = 10
 
-                    dmin, dmax = rmin, rmax
+                replica_exchange(H, beta, sigma)
 
-                    for p in range(n_pairs):
+            if observe and (sweep+1) % interval == 0:
+                observer(np.copy(H), 1/(kB*np.copy(beta)))
 
-                        d = ((px[a,p]-ux)*nx[a,p]
-                            +(py[a,p]-uy)*ny[a,p]
-                            +(pz[a,p]-uz)*nz[a,p])/(dx*nx[a,p]
-                                                   +dy*ny[a,p]
-                                                   +dz*nz[a,p])
+        return np.copy(H), 1/(kB*np.copy(beta))
 
-                        if d > 0 and dmax > d:
-                            dmax = d
-                        if d < 0 and dmin < d:
-                            dmin = d
+    for sweep in range(N):
 
-                    s0 = -(ux*dx+uy*dy+uz*dz)
+        for _ in range(n):
+
+            i, j, k, a = random_original(nu, nv, nw, n_atm)
+
+            for t in range(n_temp):
+
+                u = S[i,j,k,a,t]
+
+                ux, uy, uz = Sx[i,j,k,a,t], Sy[i,j,k,a,t], Sz[i,j,k,a,t]
+
+                v, vx, vy, vz = u, ux, uy, uz
 
-                    ds = sqrt(s0*s0-ux*ux-uy*uy-uz*uz+rc_max*rc_max)
+                p_rate = random_uniform()
 
-                    smin, smax = s0-ds, s0+ds
+                chemical = p_rate < p_chem
 
-                    if dmin < smin:
-                        dmin = smin
-                    if dmax > smax:
-                        dmax = smax
+                if chemical:
 
-                    x = random_uniform()
-                    y = dmin/(dmin-dmax)
+                    v = ising_scalar_candidate(u)
 
-                    fract = sigma[t]/(1.0+sigma[t])
+                else:
 
-                    d = dmin+(dmax-dmin)*(fract*x+(1.0-fract)*y)
+                    #dx, dy, dz = gaussian_vector_candidate(ux, uy, uz,
+                    #                                       sigma[t])
 
-                    vx, vy, vz = d*dx, d*dy, d*dz
+                    vx, vy, vz = bounded_vector_candidate(ux, uy, uz,
+                                                          sigma[t], rc_max,
+                                                          px, py, pz,
+                                                          nx, ny, nz, a)
 
                 E = structural(S, Sx, Sy, Sz, u, v, vx, vy, vz, ux, uy, uz,
                                J, h, K, epsilon, chemical, rx, ry, rz, r,
@@ -1406,6 +2337,9 @@ def size_effect(double [:,:,:,:,::1] S,
 
             replica_exchange(H, beta, sigma)
 
+        if observe and (sweep+1) % interval == 0:
+            observer(np.copy(H), 1/(kB*np.copy(beta)))
+
     return np.copy(H), 1/(kB*np.copy(beta))
 
 # ---
@@ -1776,7 +2710,7 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
                        double [:,::,::1] A,
                        double [:,::,::1] g,
                        double [::1] B,
-                       double [:,::1] Q,
+                       double [:,:,:,::1] K,
                        long [:,::1] atm_ind,
                        long [:,::1] img_i,
                        long [:,::1] img_j,
@@ -1786,7 +2720,9 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
                        bint [:,::1] pair_trans,
                        double [::1] T_range,
                        double kB,
-                       Py_ssize_t N):
+                       Py_ssize_t N,
+                       observer=None,
+                       Py_ssize_t interval=1):
 
     cdef Py_ssize_t nu = Sx.shape[0]
     cdef Py_ssize_t nv = Sx.shape[1]
@@ -1803,37 +2739,26 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
 
     cdef Py_ssize_t i_ind
 
-    cdef bint long_range = np.any(Q)
+    cdef bint long_range = np.any(K)
     cdef bint flip
 
     cdef Py_ssize_t n_pairs = atm_ind.shape[1]
 
     cdef double E
 
-    cdef double [::1] H = np.zeros(n_temp)
-
-    cdef double [:,:,:,:,:,::1] e = magnetic_energy(Sx, Sy, Sz, J, A, g, B,
-                                                    atm_ind, img_i,
-                                                    img_j, img_k,
-                                                    pair_ind, pair_trans)
-
-    for i in range(nu):
-        for j in range(nv):
-            for k in range(nw):
-                for a in range(n_atm):
-                    for p in range(n_pairs+2):
-                        for t in range(n_temp):
-                            H[t] += e[i,j,k,a,p,t]
-
-    cdef double [:,:,:,::1] V = dipole_dipole_interaction_energy(Sx, Sy, Sz, Q)
+    cdef double [::1] H = magnetic_energy_reduced(Sx, Sy, Sz, J, A, g, B,
+                                                  atm_ind, img_i, img_j, img_k,
+                                                  pair_ind, pair_trans)
 
-    cdef double [:,:,:,::1] U = dipole_dipole_interaction_potential(Sx,
-                                                                    Sy,
-                                                                    Sz, Q)
+    cdef double [:,:,:,::1] V, U
 
     n = nu*nv*nw*n_atm
 
     if long_range:
+
+        V = dipole_dipole_kernel_energy(Sx, Sy, Sz, K)
+        U = dipole_dipole_kernel_potential(Sx, Sy, Sz, K)
+
         for i_ind in range(n):
             for t in range(n_temp):
                 H[t] += V[i_ind,0,0,t]+V[i_ind,0,1,t]+V[i_ind,0,2,t]\
@@ -1894,7 +2819,9 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
 
     cdef double [::1] beta = 1/(kB*np.copy(T_range))
 
-    for _ in range(N):
+    cdef bint observe = observer is not None
+
+    for sweep in range(N):
 
         for _ in range(n):
 
@@ -1970,10 +2897,11 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
 
                     i_ind = a+n_atm*(k+nw*(j+nv*i))
 
-                    E += energy_moment_cluster(U, Q,
-                                               clust_vx, clust_vy, clust_vz,
-                                               clust_ux, clust_uy, clust_uz,
-                                               clust_ind, n_c, t)
+                    E += energy_moment_cluster_kernel(U, K, nu, nv, nw,
+                                                      clust_vx, clust_vy,
+                                                      clust_vz, clust_ux,
+                                                      clust_uy, clust_uz,
+                                                      clust_ind, n_c, t)
 
                 rate, flip = annealing_cluster(Sx, Sy, Sz,
                                                clust_vx, clust_vy, clust_vz,
@@ -1987,10 +2915,10 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
 
                 if long_range and flip:
 
-                    update_moment_cluster(U, Q,
-                                          clust_vx, clust_vy, clust_vz,
-                                          clust_ux, clust_uy, clust_uz,
-                                          clust_ind, n_c, t)
+                    update_moment_cluster_kernel(U, K, nu, nv, nw,
+                                                 clust_vx, clust_vy, clust_vz,
+                                                 clust_ux, clust_uy, clust_uz,
+                                                 clust_ind, n_c, t)
 
                 # if (rate > 0.0 and rate < 1.0):
                 #     factor = rate/(1.0-rate)
@@ -2008,4 +2936,7 @@ def heisenberg_cluster(double [:,:,:,:,::1] Sx,
 
             replica_exchange(H, beta, sigma)
 
+        if observe and (sweep+1) % interval == 0:
+            observer(np.copy(H), 1/(kB*np.copy(beta)))
+
     return np.copy(H), 1/(kB*np.copy(beta))
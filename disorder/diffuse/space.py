@@ -1,5 +1,10 @@
 #!/usr/bin/env python
 
+import inspect
+import functools
+
+from collections import OrderedDict
+
 import numpy as np
 
 from disorder.material import crystal
@@ -100,7 +105,7 @@ def real(ux, uy, uz, ix, iy, iz, atm):
 
     return rx, ry, rz, ions
 
-def factor(nu, nv, nw):
+def factor(nu, nv, nw, separable=False):
     """
     Phase factor for discrete Fourier Transform.
 
@@ -109,11 +114,16 @@ def factor(nu, nv, nw):
     nu, nv, nw : int
         Number of grid points :math:`N_1`, :math:`N_2`, :math:`N_3` along the
         :math:`a`, :math:`b`, and :math:`c`-axis of the supercell.
+    separable : bool, optional
+        Return the per-axis tables instead of their full outer product.
+        Default is ``False``.
 
     Returns
     -------
     pf : 1d array
-        Spatial vector in Cartesian coordinates.
+        Phase factor. Array has a flattened shape of size
+        ``(nu*nv*nw)**2`` or, if separable, the concatenated per-axis tables
+        of size ``nu**2+nv**2+nw**2``.
 
     """
 
@@ -125,6 +135,12 @@ def factor(nu, nv, nw):
     rv = np.arange(nv)
     rw = np.arange(nw)
 
+    if separable:
+
+        return np.exp(1j*np.concatenate((np.kron(ku,ru),
+                                         np.kron(kv,rv),
+                                         np.kron(kw,rw))))
+
     k_dot_r = np.kron(ku,ru)[:,np.newaxis,np.newaxis]+\
               np.kron(kv,rv)[:,np.newaxis]+\
               np.kron(kw,rw)
@@ -482,6 +498,192 @@ def condition(H, K, L, nu=1, nv=1, nw=1, centering=None):
 
     return H[cond], K[cond], L[cond], cond
 
+def _span(bound):
+    """
+    Span of packed integer coordinates within a bound.
+
+    """
+
+    span = 2*bound+1
+
+    if span**3 > np.iinfo(np.int64).max:
+        raise ValueError('coordinates exceed packing bound')
+
+    return span
+
+def _pack(coordinate, bound):
+    """
+    Pack integer coordinates into keys ordered lexicographically.
+
+    """
+
+    span = _span(bound)
+
+    a, b, c = np.asarray(coordinate, dtype=np.int64)+bound
+
+    return (a*span+b)*span+c
+
+def _unpack(key, bound):
+    """
+    Unpack keys into integer coordinates.
+
+    """
+
+    span = _span(bound)
+
+    key, c = np.divmod(key, span)
+    a, b = np.divmod(key, span)
+
+    return np.stack((a,b,c))-bound
+
+def _least(rotations, coordinate, bound, N=None, chunk=2**15):
+    """
+    Packed key of the least image of coordinates under rotation matrices.
+
+    Images are compared with :math:`L`, :math:`K`, and :math:`H` in turn.
+    Images are scaled and rounded to integers if scale factors are given.
+    Coordinates are processed in chunks that remain in cache across
+    rotations.
+
+    """
+
+    span = _span(bound)
+
+    n = coordinate.shape[1]
+
+    key = np.empty(n, dtype=np.int64)
+
+    for start in range(0, n, chunk):
+
+        x = coordinate[:,start:start+chunk]
+
+        least = None
+
+        for rotation in rotations:
+
+            packed = None
+
+            for row in (2, 1, 0):
+
+                terms = [value*y for value, y in zip(rotation[row], x)
+                         if value != 0]
+
+                image = functools.reduce(np.add, terms)
+
+                if N is not None:
+                    image = np.round(image*N[row]).astype(np.int64)
+
+                if packed is None:
+                    packed = image+bound
+                else:
+                    packed *= span
+                    packed += image+bound
+
+            if least is None:
+                least = packed
+            else:
+                np.minimum(least, packed, out=least)
+
+        key[start:start+chunk] = least
+
+    return key
+
+def _orbits(coordinate, rotations):
+    """
+    Orbits of integer coordinates under symmetry operators.
+
+    The representative of each orbit is its least image with :math:`L`,
+    :math:`K`, and :math:`H` compared in turn. Orbits are ordered by the
+    :math:`H`, :math:`K`, and :math:`L` of their representative. Each orbit
+    is indexed by its first point in the same order.
+
+    Parameters
+    ----------
+    coordinate : 2d array, int
+        Coordinates with first axis of size 3.
+    rotations : 3d array, int
+        Rotation matrices of symmetry operators.
+
+    Returns
+    -------
+    index : 1d array, int
+        Index of the first point of each orbit.
+    reverses : 1d array, int
+        Orbit of each point.
+
+    """
+
+    bound = np.abs(coordinate).max()*np.abs(rotations).sum(axis=2).max()
+
+    key = _least(rotations, coordinate, bound)
+
+    key = _pack(_unpack(key, bound)[::-1], bound)
+
+    _, reverses = np.unique(key, return_inverse=True)
+
+    order = np.argsort(_pack(coordinate, bound), kind='stable')
+
+    _, first = np.unique(reverses[order], return_index=True)
+
+    return order[first], reverses
+
+def _compact(reverses, n):
+
+    if n <= np.iinfo(np.int32).max:
+        return reverses.astype(np.int32)
+
+    return reverses
+
+_cache = OrderedDict()
+
+_cache_nbytes = 2**28
+
+def _nbytes(values):
+
+    return sum(value.nbytes for value in values \
+               if isinstance(value, np.ndarray))
+
+def _cached(function):
+    """
+    Cache symmetry reductions by extents, bins, supercell, and Laue class.
+
+    The cache holds at most ``_cache_nbytes`` bytes of arrays. Larger results
+    are not cached. Each call receives copies of the cached arrays.
+
+    """
+
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        key = [function.__name__]
+        for value in bound.arguments.values():
+            if value is None or isinstance(value, str):
+                key.append(value)
+            else:
+                key.append(tuple(np.asarray(value, dtype=float).flatten()))
+        key = tuple(key)
+
+        if key in _cache:
+            _cache.move_to_end(key)
+        else:
+            values = function(*bound.args, **bound.kwargs)
+            if _nbytes(values) > _cache_nbytes:
+                return values
+            _cache[key] = values
+            while sum(map(_nbytes, _cache.values())) > _cache_nbytes:
+                _cache.popitem(last=False)
+
+        return tuple(np.copy(value) if isinstance(value, np.ndarray) \
+                     else value for value in _cache[key])
+
+    return wrapper
+
+@_cached
 def mapping(h_range, k_range, l_range, nh, nk, nl,
             nu, nv, nw, W=np.eye(3), laue=None):
     """
@@ -553,50 +755,16 @@ def mapping(h_range, k_range, l_range, nh, nk, nl,
 
     symops = symmetry.inverse(symmetry.laue(laue))
 
-    total = []
-
-    coordinate = np.stack((H,K,L))
-
-    cosymmetries, coindices, coinverses = np.unique(coordinate,
-                                                    axis=1,
-                                                    return_index=True,
-                                                    return_inverse=True)
-
-    for op in symops:
-
-        transformed = symmetry.evaluate([op], cosymmetries, translate=False)
-        total.append(transformed)
-
-    index = np.arange(coordinate.shape[1])
-
-    total = np.vstack(total)
+    rotations = symmetry.seitz(symops)[0].astype(int)
 
-    for i in range(cosymmetries.shape[1]):
+    index, reverses = _orbits(np.stack((H,K,L)), rotations)
 
-        total[:,:,i] = total[np.lexsort(total[:,:,i].T),:,i]
-
-    total = np.vstack(total)
-
-    _, indices, inverses = np.unique(total,
-                                     axis=1,
-                                     return_index=True,
-                                     return_inverse=True)
-
-    reverses = np.arange(indices.shape[0])
-
-    h = h[coindices][indices]
-    k = k[coindices][indices]
-    l = l[coindices][indices]
-
-    H = H[coindices][indices]
-    K = K[coindices][indices]
-    L = L[coindices][indices]
-
-    index = index[coindices][indices]
-    reverses = reverses[inverses][coinverses]
+    h, k, l, H, K, L = h[index], k[index], l[index], \
+                       H[index], K[index], L[index]
 
     return h, k, l, H, K, L, index, reverses, symops
 
+@_cached
 def reduced(h_range, k_range, l_range, nh, nk, nl,
             nu, nv, nw, W=np.eye(3), laue=None):
     """
@@ -622,7 +790,8 @@ def reduced(h_range, k_range, l_range, nh, nk, nl,
     index : 1d array, int
         Index of reduced data.
     reverses : 1d array, int
-        Mapping of reduced data that reconstructs full volume.
+        Mapping of reduced data that reconstructs full volume. Of 32-bit
+        integers unless the reduced data is larger.
     symops : 1d array, str
         Symmetry operations correspoding to Laue class.
     Nu, Nv, Nw : int
@@ -700,58 +869,47 @@ def reduced(h_range, k_range, l_range, nh, nk, nl,
 
         index = np.arange(nh*nk*nl)
 
-        return index, index, np.array([u'x,y,z']), Nu, Nv, Nw
+        reverses = _compact(index, index.size)
+
+        return index, reverses, np.array([u'x,y,z']), Nu, Nv, Nw
 
     symops = np.array(symmetry.laue(laue))
 
     symops = symmetry.inverse(symops)
 
-    coordinate = np.stack((H,K,L)).T
-    n = coordinate.shape[0]
+    coordinate = np.stack((H,K,L))
 
     del H, K, L
 
-    coordinate = np.stack((coordinate,-coordinate)).T
+    bound = np.abs(coordinate).max()
 
-    sort = np.lexsort(coordinate, axis=1)[:,0]
-    pair = coordinate.reshape(3,2*n)[:,sort+2*np.arange(n)].T
-    index = np.arange(n)
+    sign = np.where(_pack(-coordinate[::-1], bound) < \
+                    _pack(coordinate[::-1], bound), -1, 1)
 
-    # del coordinate, sort
+    _, coindices, coinverses = symmetry.unique((coordinate*sign).T)
 
-    _, coindices, coinverses = symmetry.unique(pair)
+    del coordinate
 
-    coordinate = np.stack((h,k,l)).T
-    coordinate = np.stack((coordinate,-coordinate)).T
-    coordinate = coordinate.reshape(3,2*n)[:,sort+2*np.arange(n)]
-
-    h_, k_, l_ = coordinate[:,coindices]
-    n = h_.shape[0]
-
-    # del cosymmetries
+    hkl = np.stack((h,k,l))[:,coindices]*sign[coindices]
 
     sym, n_symops = symmetry.laue_id(symops)
 
-    ops = np.zeros((3,n,n_symops), dtype=int)
-
-    for i in range(n_symops):
+    rotations = [np.stack(symmetry.miller(*np.eye(3), sym, i))
+                 for i in range(n_symops)]
 
-        h, k, l = symmetry.miller(h_, k_, l_, sym, i)
+    N = np.array([Nu,Nv,Nw])
 
-        ops[0,:,i] = np.round(h*Nu).astype(int)
-        ops[1,:,i] = np.round(k*Nv).astype(int)
-        ops[2,:,i] = np.round(l*Nw).astype(int)
+    bound = int(np.ceil(np.abs(hkl).max()*N.max()*2))+1
 
-    sort = np.lexsort(ops, axis=1)[:,0]
-    total = ops.reshape(3,n_symops*n)[:,sort+n_symops*np.arange(n)].T
+    key = _least(rotations, hkl, bound, N)
 
-    del ops, h, k, l
+    total = _unpack(key, bound)[::-1].T
 
-    _, indices, inverses = symmetry.unique(total)
+    _, indices, inverses = symmetry.unique(np.ascontiguousarray(total))
 
     reverses = np.arange(indices.shape[0])
 
-    index = index[coindices][indices]
-    reverses = reverses[inverses][coinverses]
+    index = np.arange(nh*nk*nl)[coindices][indices]
+    reverses = _compact(reverses[inverses][coinverses], index.size)
 
     return index, reverses, symops, Nu, Nv, Nw
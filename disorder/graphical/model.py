@@ -278,7 +278,11 @@ class Model:
 
     def load_data(self, fname):
 
-        if fname.endswith('.nxs') or fname.endswith('.h5'):
+        if isinstance(fname, experimental.Dataset):
+            signal, sigma_sq = fname.read()
+            h_range, k_range, l_range = fname.extents
+            nh, nk, nl = fname.bins
+        elif fname.endswith('.nxs') or fname.endswith('.h5'):
             signal, sigma_sq, \
             h_range, k_range, l_range, \
             nh, nk, nl = experimental.data(fname)
@@ -392,6 +396,10 @@ class Model:
         return np.ma.masked_less_equal(np.ma.masked_invalid(array, copy=False),
                                        0, copy=False)
 
+    def preprocessing(self):
+
+        return experimental.Pipeline()
+
     def crop(self, array, h_slice, k_slice, l_slice):
 
         return experimental.crop(array, h_slice, k_slice, l_slice)
@@ -465,7 +473,7 @@ class Model:
 
         phase_factor = scattering.phase(Qx, Qy, Qz, ux, uy, uz)
 
-        space_factor = space.factor(nu, nv, nw)
+        space_factor = space.factor(nu, nv, nw, separable=True)
 
         return phase_factor, space_factor
 
@@ -516,29 +524,25 @@ class Model:
 
         a_filt = np.zeros(mask.size, dtype=float)
         b_filt = np.zeros(mask.size, dtype=float)
-        c_filt = np.zeros(mask.size, dtype=float)
-        d_filt = np.zeros(mask.size, dtype=float)
-        e_filt = np.zeros(mask.size, dtype=float)
-        f_filt = np.zeros(mask.size, dtype=float)
-        g_filt = np.zeros(mask.size, dtype=float)
-        h_filt = np.zeros(mask.size, dtype=float)
-        i_filt = np.zeros(mask.size, dtype=float)
 
-        return a_filt, b_filt, c_filt, \
-               d_filt, e_filt, f_filt, \
-               g_filt, h_filt, i_filt
+        return a_filt, b_filt
 
-    def blurring(self, intensity, sigma):
+    def blurring(self, intensity, sigma, recursive=False):
 
-        return filters.blurring(intensity, sigma)
+        return filters.blurring(intensity, sigma, recursive)
 
-    def gaussian(self, mask, sigma):
+    def gaussian(self, mask, sigma, recursive=False):
 
-        v_inv = filters.gaussian(mask, sigma)
+        v_inv = filters.gaussian(mask, sigma, recursive)
 
         boxes = filters.boxblur(sigma, 3)
 
-        return v_inv, boxes
+        if recursive:
+            coeffs = filters.recursion(sigma)
+        else:
+            coeffs = np.zeros((0,13))
+
+        return v_inv, boxes, coeffs
 
     def random_moments(self, nu, nv, nw, n_atm, moment, fixed):
 
@@ -943,71 +947,80 @@ class Model:
 
         return I_calc
 
-    def magnetic_intensity_3d(self, fname, run, occupancy,
+    def magnetic_intensity_3d(self, fname, runs, occupancy,
                               U11, U22, U33, U23, U13, U12, ux, uy, uz, atm,
                               h_range, k_range, l_range, indices, symop,
                               T, B, R, D, twins, variants, nh, nk, nl,
                               nu, nv, nw, Nu, Nv, Nw, g, mask):
 
-        Sx, Sy, Sz = self.load_magnetic(fname, run)
+        spins = [self.load_magnetic(fname, run) for run in range(runs)]
 
-        n_atm = np.size(Sx) // (nu*nv*nw)
+        Sx, Sy, Sz = np.stack(spins, axis=1)
 
-        Sx = Sx.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
-        Sy = Sy.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
-        Sz = Sz.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
+        n_atm = Sx.shape[1] // (nu*nv*nw)
+
+        Sx = Sx.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
+        Sy = Sy.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
+        Sz = Sz.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
 
-        I_calc = monocrystal.magnetic(Sx, Sy, Sz, occupancy,
-                                      U11, U22, U33, U23, U13, U12,
-                                      ux, uy, uz, atm,
-                                      h_range, k_range, l_range, indices,
-                                      symop, T, B, R, D, twins, variants,
-                                      nh, nk, nl, nu, nv, nw, Nu, Nv, Nw, g)
+        I_calc, _ = monocrystal.magnetic(Sx, Sy, Sz, occupancy,
+                                         U11, U22, U33, U23, U13, U12,
+                                         ux, uy, uz, atm,
+                                         h_range, k_range, l_range, indices,
+                                         symop, T, B, R, D, twins, variants,
+                                         nh, nk, nl, nu, nv, nw, Nu, Nv, Nw,
+                                         g)
 
         return I_calc
 
-    def occupational_intensity_3d(self, fname, run, occupancy,
+    def occupational_intensity_3d(self, fname, runs, occupancy,
                                   U11, U22, U33, U23, U13, U12, ux, uy, uz,
                                   atm, h_range, k_range, l_range, indices,
                                   symop, T, B, R, D, twins, variants,
                                   nh, nk, nl, nu, nv, nw, Nu, Nv, Nw, mask):
 
-        A_r = self.load_occupational(fname, run)
+        A_r = np.stack([self.load_occupational(fname, run)
+                        for run in range(runs)])
 
-        n_atm = np.size(A_r) // (nu*nv*nw)
+        n_atm = A_r.shape[1] // (nu*nv*nw)
 
-        A_r = A_r.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
+        A_r = A_r.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
 
-        I_calc = monocrystal.occupational(A_r, occupancy,
-                                          U11, U22, U33, U23, U13, U12,
-                                          ux, uy, uz, atm,
-                                          h_range, k_range, l_range, indices,
-                                          symop, T, B, R, D, twins, variants,
-                                          nh, nk, nl, nu, nv, nw, Nu, Nv, Nw)
+        I_calc, _ = monocrystal.occupational(A_r, occupancy,
+                                             U11, U22, U33, U23, U13, U12,
+                                             ux, uy, uz, atm,
+                                             h_range, k_range, l_range,
+                                             indices, symop, T, B, R, D,
+                                             twins, variants, nh, nk, nl,
+                                             nu, nv, nw, Nu, Nv, Nw)
 
         return I_calc
 
-    def displacive_intensity_3d(self, fname, run, coeffs, occupancy,
+    def displacive_intensity_3d(self, fname, runs, coeffs, occupancy,
                                 ux, uy, uz, atm, h_range, k_range, l_range,
                                 indices, symop, T, B, R, twins, variants,
                                 nh, nk, nl, nu, nv, nw, Nu, Nv, Nw,
                                 p, even, cntr, mask):
 
-        Ux, Uy, Uz = self.load_displacive(fname, run)
+        disps = [self.load_displacive(fname, run) for run in range(runs)]
 
-        n_atm = np.size(Ux) // (nu*nv*nw)
+        Ux, Uy, Uz = np.stack(disps, axis=1)
 
-        Ux = Ux.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
-        Uy = Uy.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
-        Uz = Uz.reshape(nu,nv,nw,n_atm).T[mask].T.flatten()
+        n_atm = Ux.shape[1] // (nu*nv*nw)
 
-        U_r = displacive.products(Ux, Uy, Uz, p)
+        Ux = Ux.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
+        Uy = Uy.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
+        Uz = Uz.reshape(runs,nu,nv,nw,n_atm)[...,mask].reshape(runs,-1)
+
+        U_r = np.stack([displacive.products(*U, p) for U in zip(Ux, Uy, Uz)])
 
-        I_calc = monocrystal.displacive(U_r, coeffs, occupancy, ux, uy, uz,
-                                        atm, h_range, k_range, l_range,
-                                        indices, symop, T, B, R, twins, variants,
-                                        nh, nk, nl, nu, nv, nw, Nu, Nv, Nw,
-                                        p, even, cntr)
+        I_calc, _ = monocrystal.displacive(U_r, coeffs, occupancy,
+                                           ux, uy, uz, atm,
+                                           h_range, k_range, l_range,
+                                           indices, symop, T, B, R,
+                                           twins, variants, nh, nk, nl,
+                                           nu, nv, nw, Nu, Nv, Nw,
+                                           p, even, cntr)
 
         return I_calc
 
@@ -1038,10 +1051,9 @@ class Model:
                             prod_x_cand, prod_y_cand, prod_z_cand,
                             space_factor, factors, moment, I_calc, I_expt,
                             inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                            a_filt, b_filt, c_filt,
-                            d_filt, e_filt, f_filt,
-                            g_filt, h_filt, i_filt,
-                            boxes, i_dft, inverses, i_mask, i_unmask,
+                            a_filt, b_filt,
+                            boxes, coeffs_filt,
+                            i_dft, inverses, i_mask, i_unmask,
                             acc_moves, acc_temps, rej_moves, rej_temps, chi_sq,
                             energy, temperature, scale, level, constant, fixed,
                             heisenberg, nh, nk, nl, nu, nv, nw, n_atm, n, N):
@@ -1058,10 +1070,9 @@ class Model:
                             prod_x_cand, prod_y_cand, prod_z_cand,
                             space_factor, factors, moment, I_calc, I_expt,
                             inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                            a_filt, b_filt, c_filt,
-                            d_filt, e_filt, f_filt,
-                            g_filt, h_filt, i_filt,
-                            boxes, i_dft, inverses, i_mask, i_unmask,
+                            a_filt, b_filt,
+                            boxes, coeffs_filt,
+                            i_dft, inverses, i_mask, i_unmask,
                             acc_moves, acc_temps, rej_moves, rej_temps, chi_sq,
                             energy, temperature, scale, level, constant, fixed,
                             heisenberg, nh, nk, nl, nu, nv, nw, n_atm, n, N)
@@ -1072,10 +1083,9 @@ class Model:
                                 space_factor, factors, occupancy,
                                 I_calc, I_expt, inv_sigma_sq,
                                 I_raw, I_flat, I_ref, v_inv,
-                                a_filt, b_filt, c_filt,
-                                d_filt, e_filt, f_filt,
-                                g_filt, h_filt, i_filt,
-                                boxes, i_dft, inverses, i_mask, i_unmask,
+                                a_filt, b_filt,
+                                boxes, coeffs_filt,
+                                i_dft, inverses, i_mask, i_unmask,
                                 acc_moves, acc_temps, rej_moves, rej_temps,
                                 chi_sq, energy, temperature,
                                 scale, level, constant,
@@ -1087,10 +1097,9 @@ class Model:
                                 space_factor, factors, occupancy,
                                 I_calc, I_expt, inv_sigma_sq,
                                 I_raw, I_flat, I_ref, v_inv,
-                                a_filt, b_filt, c_filt,
-                                d_filt, e_filt, f_filt,
-                                g_filt, h_filt, i_filt,
-                                boxes, i_dft, inverses, i_mask, i_unmask,
+                                a_filt, b_filt,
+                                boxes, coeffs_filt,
+                                i_dft, inverses, i_mask, i_unmask,
                                 acc_moves, acc_temps, rej_moves, rej_temps,
                                 chi_sq, energy, temperature,
                                 scale, level, constant,
@@ -1107,10 +1116,9 @@ class Model:
                               coeffs, Q_k, Lxx, Lyy, Lzz, Lyz, Lxz, Lxy,
                               I_calc, I_expt, inv_sigma_sq,
                               I_raw, I_flat, I_ref, v_inv,
-                              a_filt, b_filt, c_filt,
-                              d_filt, e_filt, f_filt,
-                              g_filt, h_filt, i_filt,
-                              bragg, even, boxes, i_dft, inverses, i_mask,
+                              a_filt, b_filt,
+                              bragg, even, boxes, coeffs_filt,
+                              i_dft, inverses, i_mask,
                               i_unmask, acc_moves, acc_temps, rej_moves,
                               rej_temps, chi_sq, energy, temperature,
                               scale, level, constant,
@@ -1128,10 +1136,9 @@ class Model:
                               coeffs, Q_k, Lxx, Lyy, Lzz, Lyz, Lxz, Lxy,
                               I_calc, I_expt, inv_sigma_sq,
                               I_raw, I_flat, I_ref, v_inv,
-                              a_filt, b_filt, c_filt,
-                              d_filt, e_filt, f_filt,
-                              g_filt, h_filt, i_filt,
-                              bragg, even, boxes, i_dft, inverses, i_mask,
+                              a_filt, b_filt,
+                              bragg, even, boxes, coeffs_filt,
+                              i_dft, inverses, i_mask,
                               i_unmask, acc_moves, acc_temps, rej_moves,
                               rej_temps, chi_sq, energy, temperature,
                               scale, level, constant, fixed,
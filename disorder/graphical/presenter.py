@@ -269,6 +269,7 @@ class Presenter:
             if (self.view.get_experiment_table_row_count() > 0):
                 self.load_data_thread('{}-intensity.npz'.format(fname), None)
                 signal, error_sq =self.model.load_region_of_interest(fname)
+                self.key_m = self.pipeline_m.source((signal, error_sq))
                 self.signal_m = self.model.mask_array(signal)
                 self.error_sq_m = self.model.mask_array(error_sq)
                 self.view.format_experiment_table()
@@ -1376,18 +1377,15 @@ class Presenter:
 
     def rebin_thread(self, data, callback):
 
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        signal = self.signal_m.data
+        error_sq = self.error_sq_m.data
 
         nh, nk, nl, min_h, min_k, min_l, max_h, max_k, max_l = data
 
         binsize = [nh, nk, nl]
 
-        self.signal_m = self.model.rebin(signal, binsize)
-        self.error_sq_m = self.model.rebin(error_sq, binsize)
-
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        self.key_m, (signal, error_sq) = \
+            self.pipeline_m.rebin(self.key_m, (signal, error_sq), binsize)
 
         self.signal_m = self.model.mask_array(signal)
         self.error_sq_m = self.model.mask_array(error_sq)
@@ -1426,8 +1424,8 @@ class Presenter:
 
     def crop_thread(self, data, h_range, k_range, l_range, callback):
 
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        signal = self.signal_m.data
+        error_sq = self.error_sq_m.data
 
         nh, nk, nl, min_h, min_k, min_l, max_h, max_k, max_l = data
 
@@ -1443,11 +1441,9 @@ class Presenter:
         k_slice = [ik_min, ik_max+1]
         l_slice = [il_min, il_max+1]
 
-        self.signal_m = self.model.crop(signal, h_slice, k_slice, l_slice)
-        self.error_sq_m = self.model.crop(error_sq, h_slice, k_slice, l_slice)
-
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        self.key_m, (signal, error_sq) = \
+            self.pipeline_m.crop(self.key_m, (signal, error_sq),
+                                 h_slice, k_slice, l_slice)
 
         self.signal_m = self.model.mask_array(signal)
         self.error_sq_m = self.model.mask_array(error_sq)
@@ -1645,6 +1641,8 @@ class Presenter:
         self.signal_m = self.signal_raw_m.copy()
         self.error_sq_m = self.error_sq_raw_m.copy()
 
+        self.key_m = self.key_raw_m
+
         nh, nk, nl = self.nh_raw_m, self.nk_raw_m, self.nl_raw_m
 
         min_h, max_h = self.h_range_raw_m
@@ -1671,8 +1669,8 @@ class Presenter:
 
     def cropbin(self, h_range, k_range, l_range, binsize):
 
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        signal = self.signal_raw_m.data
+        error_sq = self.error_sq_raw_m.data
 
         nh_raw, nk_raw, nl_raw = self.nh_raw_m, self.nk_raw_m, self.nl_raw_m
 
@@ -1702,14 +1700,14 @@ class Presenter:
         k_slice = [ik_min, ik_max+1]
         l_slice = [il_min, il_max+1]
 
-        self.signal_m = self.model.crop(signal, h_slice, k_slice, l_slice)
-        self.error_sq_m = self.model.crop(error_sq, h_slice, k_slice, l_slice)
+        key, data = self.pipeline_m.crop(self.key_raw_m, (signal, error_sq),
+                                         h_slice, k_slice, l_slice)
 
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        self.key_m, (signal, error_sq) = \
+            self.pipeline_m.rebin(key, data, binsize)
 
-        self.signal_m = self.model.rebin(signal, binsize)
-        self.error_sq_m = self.model.rebin(error_sq, binsize)
+        self.signal_m = self.model.mask_array(signal)
+        self.error_sq_m = self.model.mask_array(error_sq)
 
     def reset_data_h(self):
 
@@ -1721,9 +1719,6 @@ class Presenter:
 
         self.view.clear_experiment_table()
 
-        self.signal_m = self.signal_raw_m.copy()
-        self.error_sq_m = self.error_sq_raw_m.copy()
-
         nh = self.nh_raw_m
 
         min_h, max_h = self.h_range_raw_m
@@ -1765,9 +1760,6 @@ class Presenter:
 
         self.view.clear_experiment_table()
 
-        self.signal_m = self.signal_raw_m.copy()
-        self.error_sq_m = self.error_sq_raw_m.copy()
-
         nk = self.nk_raw_m
 
         min_k, max_k = self.k_range_raw_m
@@ -1809,9 +1801,6 @@ class Presenter:
 
         self.view.clear_experiment_table()
 
-        self.signal_m = self.signal_raw_m.copy()
-        self.error_sq_m = self.error_sq_raw_m.copy()
-
         nl = self.nl_raw_m
 
         min_l, max_l = self.l_range_raw_m
@@ -1845,8 +1834,8 @@ class Presenter:
 
     def punch_thread(self, callback):
 
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        signal = self.signal_m.data
+        error_sq = self.error_sq_m.data
 
         dh, nh, min_h, max_h = self.view.get_experiment_binning_h()
         dk, nk, min_k, max_k = self.view.get_experiment_binning_k()
@@ -1864,14 +1853,11 @@ class Presenter:
         outlier = self.view.get_outlier()
         punch = self.view.get_punch()
 
-        self.model.punch(signal, radius_h, radius_k, radius_l,
-                         h_range, k_range, l_range, centering, outlier, punch)
-
-        self.signal_m = signal
-        self.error_sq_m = error_sq
-
-        signal = self.signal_m
-        error_sq = self.error_sq_m
+        self.key_m, (signal, error_sq) = \
+            self.pipeline_m.punch(self.key_m, (signal, error_sq),
+                                  radius_h, radius_k, radius_l,
+                                  h_range, k_range, l_range,
+                                  centering, outlier, punch, errors=False)
 
         self.signal_m = self.model.mask_array(signal)
         self.error_sq_m = self.model.mask_array(error_sq)
@@ -1895,9 +1881,6 @@ class Presenter:
 
         self.view.enable_cropbin_signals(False)
 
-        self.signal_m = self.signal_raw_m.copy()
-        self.error_sq_m = self.error_sq_raw_m.copy()
-
         dh, nh, min_h, max_h = self.view.get_experiment_binning_h()
         dk, nk, min_k, max_k = self.view.get_experiment_binning_k()
         dl, nl, min_l, max_l = self.view.get_experiment_binning_l()
@@ -1980,6 +1963,11 @@ class Presenter:
         self.signal_raw_m = self.signal_m.copy()
         self.error_sq_raw_m = self.error_sq_m.copy()
 
+        self.pipeline_m = self.model.preprocessing()
+
+        self.key_raw_m = self.pipeline_m.source((signal, error_sq))
+        self.key_m = self.key_raw_m
+
         self.h_range_raw_m = h_range.copy()
         self.k_range_raw_m = k_range.copy()
         self.l_range_raw_m = l_range.copy()
@@ -2299,9 +2287,7 @@ class Presenter:
 
         filt_arrays = self.model.initialize_filter(mask)
 
-        self.a_filt, self.b_filt, self.c_filt, \
-        self.d_filt, self.e_filt, self.f_filt, \
-        self.g_filt, self.h_filt, self.i_filt = filt_arrays
+        self.a_filt, self.b_filt = filt_arrays
 
         self.refinement_m = self.model.mask_array(self.I_obs)
 
@@ -2631,9 +2617,9 @@ class Presenter:
 
         mask = self.mask
 
-        v_inv, boxes = self.model.gaussian(mask, sigma)
+        v_inv, boxes, coeffs_filt = self.model.gaussian(mask, sigma)
 
-        self.v_inv, self.boxes = v_inv, boxes
+        self.v_inv, self.boxes, self.coeffs_filt = v_inv, boxes, coeffs_filt
 
     def stop_refinement(self):
 
@@ -2677,11 +2663,9 @@ class Presenter:
 
         I_raw, I_flat, I_ref = self.I_raw, self.I_flat, self.I_ref
 
-        v_inv, boxes = self.v_inv, self.boxes
+        v_inv, boxes, coeffs_filt = self.v_inv, self.boxes, self.coeffs_filt
 
-        a_filt, b_filt, c_filt = self.a_filt, self.b_filt, self.c_filt
-        d_filt, e_filt, f_filt = self.d_filt, self.e_filt, self.f_filt
-        g_filt, h_filt, i_filt = self.g_filt, self.h_filt, self.i_filt
+        a_filt, b_filt = self.a_filt, self.b_filt
 
         i_dft, inverses = self.i_dft, self.inverses
         i_mask, i_unmask = self.i_mask, self.i_unmask
@@ -2744,10 +2728,9 @@ class Presenter:
                 prod_x_cand, prod_y_cand, prod_z_cand,
                 space_factor, magnetic_factors, mu,
                 I_calc, I_expt, inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                a_filt, b_filt, c_filt,
-                d_filt, e_filt, f_filt,
-                g_filt, h_filt, i_filt,
-                boxes, i_dft, inverses, i_mask, i_unmask,
+                a_filt, b_filt,
+                boxes, coeffs_filt,
+                i_dft, inverses, i_mask, i_unmask,
                 acc_moves, acc_temps, rej_moves, rej_temps,
                 chi_sq, energy, temperature, scale, level, constant,
                 fixed_mag, heisenberg, nh, nk, nl, nu, nv, nw, n_atm, n, N)
@@ -2773,10 +2756,9 @@ class Presenter:
                 prod, prod_orig, prod_cand,
                 space_factor, factors, occupancy,
                 I_calc, I_expt, inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                a_filt, b_filt, c_filt,
-                d_filt, e_filt, f_filt,
-                g_filt, h_filt, i_filt,
-                boxes, i_dft, inverses, i_mask, i_unmask,
+                a_filt, b_filt,
+                boxes, coeffs_filt,
+                i_dft, inverses, i_mask, i_unmask,
                 acc_moves, acc_temps, rej_moves, rej_temps,
                 chi_sq, energy, temperature, scale, level, constant, fixed_occ,
                 nh, nk, nl, nu, nv, nw, n_atm, n, N)
@@ -2826,10 +2808,9 @@ class Presenter:
                 prod_cand, prod_nuc_cand, space_factor, factors,
                 coeffs, Q_k, Lxx, Lyy, Lzz, Lyz, Lxz, Lxy,
                 I_calc, I_expt, inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                a_filt, b_filt, c_filt,
-                d_filt, e_filt, f_filt,
-                g_filt, h_filt, i_filt,
-                bragg, even, boxes, i_dft, inverses, i_mask, i_unmask,
+                a_filt, b_filt,
+                bragg, even, boxes, coeffs_filt,
+                i_dft, inverses, i_mask, i_unmask,
                 acc_moves, acc_temps, rej_moves, rej_temps,
                 chi_sq, energy, temperature, scale, level, constant,
                 fixed_dis, isotropic, p, nh, nk, nl, nu, nv, nw, n_atm, n, N)
@@ -4108,54 +4089,52 @@ class Presenter:
 
                 coeffs, even, cntr = self.model.displacive_parameters(p, cent)
 
-            for run in range(runs):
+            if self.view.get_disorder_mag_recalc_3d():
 
-                if self.view.get_disorder_mag_recalc_3d():
+                I_calc = self.model.magnetic_intensity_3d(
+                             fname, runs, occupancy,
+                             U11, U22, U33, U23, U13, U12, ux, uy, uz, ion,
+                             h_range, k_range, l_range, indices, symop,
+                             T, B, R, D, twins, variants, nh, nk, nl,
+                             nu, nv, nw, Nu, Nv, Nw, g, mask)
 
-                    I_calc = self.model.magnetic_intensity_3d(
-                                 fname, run, occupancy,
-                                 U11, U22, U33, U23, U13, U12, ux, uy, uz, ion,
-                                 h_range, k_range, l_range, indices, symop,
-                                 T, B, R, D, twins, variants, nh, nk, nl,
-                                 nu, nv, nw, Nu, Nv, Nw, g, mask)
+                self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
 
-                    self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
+            elif self.view.get_disorder_occ_recalc_3d():
 
-                elif self.view.get_disorder_occ_recalc_3d():
-
-                    I_calc = self.model.occupational_intensity_3d(
-                                 fname, run, occupancy,
-                                 U11, U22, U33, U23, U13, U12, ux, uy, uz, atm,
-                                 h_range, k_range, l_range, indices, symop,
-                                 T, B, R, D, twins, variants, nh, nk, nl,
-                                 nu, nv, nw, Nu, Nv, Nw, mask)
+                I_calc = self.model.occupational_intensity_3d(
+                             fname, runs, occupancy,
+                             U11, U22, U33, U23, U13, U12, ux, uy, uz, atm,
+                             h_range, k_range, l_range, indices, symop,
+                             T, B, R, D, twins, variants, nh, nk, nl,
+                             nu, nv, nw, Nu, Nv, Nw, mask)
 
-                    self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
+                self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
 
-                elif self.view.get_disorder_dis_recalc_3d():
+            elif self.view.get_disorder_dis_recalc_3d():
 
-                    I_calc = self.model.displacive_intensity_3d(
-                                 fname, run, coeffs, occupancy, ux, uy, uz,
-                                 atm, h_range, k_range, l_range, indices,
-                                 symop, T, B, R, twins, variants, nh, nk, nl,
-                                 nu, nv, nw, Nu, Nv, Nw, p, even, cntr, mask)
+                I_calc = self.model.displacive_intensity_3d(
+                             fname, runs, coeffs, occupancy, ux, uy, uz,
+                             atm, h_range, k_range, l_range, indices,
+                             symop, T, B, R, twins, variants, nh, nk, nl,
+                             nu, nv, nw, Nu, Nv, Nw, p, even, cntr, mask)
 
-                    self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
+                self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
 
-                elif self.view.get_disorder_struct_recalc_3d():
+            elif self.view.get_disorder_struct_recalc_3d():
 
-                    I_calc = self.model.structural_intensity_3d(
-                                occupancy, U11, U22, U33, U23, U13, U12,
-                                ux, uy, uz, atm,
-                                h_range, k_range, l_range, indices, symop,
-                                T, B, R, D, twins, variants, nh, nk, nl,
-                                nu, nv, nw, Nu, Nv, Nw, cntr, mask)
+                I_calc = self.model.structural_intensity_3d(
+                            occupancy, U11, U22, U33, U23, U13, U12,
+                            ux, uy, uz, atm,
+                            h_range, k_range, l_range, indices, symop,
+                            T, B, R, D, twins, variants, nh, nk, nl,
+                            nu, nv, nw, Nu, Nv, Nw, cntr, mask)
 
-                    self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
+                self.intensity[:,:,:] += I_calc[inverses].reshape(nh,nk,nl)
 
-                self.intensity /= runs*len(operators)
+            self.intensity /= len(operators)
 
-                self.recalculation_3d_blur()
+            self.recalculation_3d_blur()
 
             return laue
 
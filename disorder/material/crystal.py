@@ -265,19 +265,25 @@ def unitcell(folder, filename, tol=1e-2):
         symbol = symbols[i]
         mag_symop = mag_symops[i]
 
-        for symop, parity in zip(symops, parities):
+        positions = symmetry.evaluate(symops, [x,y,z])
 
-            transformed = symmetry.evaluate([symop], [x,y,z]).flatten()
+        mag_ops = [symmetry.generate_mag([symop], mag_symop, parity)
+                   for symop, parity in zip(symops, parities)]
 
-            mag_op = symmetry.generate_mag([symop], mag_symop, parity)
+        moments = symmetry.evaluate_mag(mag_ops, [Mx,My,Mz])
 
-            mom = symmetry.evaluate_mag([mag_op], [Mx,My,Mz]).flatten()
+        if adp_type == 'ani':
+            disps = np.array(symmetry.evaluate_disp(symops, [U11,U22,U33,
+                                                             U23,U13,U12]))
+            disps = disps.reshape(6,-1).T
+        else:
+            disps = np.full((len(symops),1), Uiso)
 
-            if adp_type == 'ani':
-                disp = symmetry.evaluate_disp([symop], [U11,U22,U33,
-                                                        U23,U13,U12])
-            else:
-                disp = [Uiso]
+        for j, symop in enumerate(symops):
+
+            transformed, mag_op = positions[j], mag_ops[j]
+
+            mom, disp = moments[j], disps[j]
 
             transformed = [tf+(tf < 0)-(tf >= 1) for tf in transformed]
 
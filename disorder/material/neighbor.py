@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from disorder.material import crystal
+
+def offsets(nu, nv, nw):
+    """
+    Lattice offsets between cells within half of the supercell.
+
+    Each pair of cells within half of the supercell along each dimension is
+    separated by exactly one offset up to sign.
+
+    Parameters
+    ----------
+    nu, nv, nw : int
+        Supercell size.
+
+    Returns
+    -------
+    s : 2d array, int
+        Offsets with last axis of size 3. First offset is zero.
+
+    """
+
+    mu, mv, mw = (nu+1)//2, (nv+1)//2, (nw+1)//2
+
+    su, sv, sw = np.meshgrid(np.arange(mu),
+                             np.arange(1-mv,mv),
+                             np.arange(1-mw,mw), indexing='ij')
+
+    su, sv, sw = su.flatten(), sv.flatten(), sw.flatten()
+
+    mask = (su > 0) | (sv > 0) | ((sv == 0) & (sw >= 0))
+
+    return np.stack((su[mask],sv[mask],sw[mask])).T
+
+def cells(s, nu, nv, nw):
+    """
+    Pairs of cells separated by a lattice offset.
+
+    Parameters
+    ----------
+    s : 1d array, int
+        Lattice offset.
+    nu, nv, nw : int
+        Supercell size.
+
+    Returns
+    -------
+    i_lat, j_lat : 1d array, int
+        Cell pairs with the first index less than or equal to the second.
+
+    """
+
+    c_uvw = np.arange(nu*nv*nw)
+
+    cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+
+    d_uvw = np.ravel_multi_index((np.mod(cu+s[0], nu),
+                                  np.mod(cv+s[1], nv),
+                                  np.mod(cw+s[2], nw)), (nu,nv,nw))
+
+    return np.minimum(c_uvw, d_uvw), np.maximum(c_uvw, d_uvw)
+
+def lattice(nu, nv, nw):
+    """
+    Pairs of distinct cells within half of the supercell.
+
+    Parameters
+    ----------
+    nu, nv, nw : int
+        Supercell size.
+
+    Returns
+    -------
+    i_lat, j_lat : 1d array, int
+        Cell pairs with the first index less than the second sorted
+        lexicographically.
+
+    """
+
+    pairs = [np.stack(cells(s, nu, nv, nw)) for s in offsets(nu, nv, nw)[1:]]
+
+    i_lat, j_lat = np.concatenate([np.zeros((2,0), dtype=int)]+pairs, axis=1)
+
+    sort = np.lexsort((j_lat,i_lat))
+
+    return i_lat[sort], j_lat[sort]
+
+def atoms(i_lat, j_lat, n_atm):
+    """
+    Atom pairs between pairs of cells.
+
+    Pairs within the same cell include each pair of distinct atoms once.
+
+    Parameters
+    ----------
+    i_lat, j_lat : 1d array, int
+        Cell pairs.
+    n_atm : int
+        Number of unit cell atoms.
+
+    Returns
+    -------
+    i, j : 1d array, int
+        Atom pairs.
+
+    """
+
+    if np.array_equal(i_lat, j_lat):
+        i_atm, j_atm = np.triu_indices(n_atm, k=1)
+    else:
+        i_atm, j_atm = np.unravel_index(np.arange(n_atm**2), (n_atm,n_atm))
+
+    i = (i_lat[:,np.newaxis]*n_atm+i_atm).flatten()
+    j = (j_lat[:,np.newaxis]*n_atm+j_atm).flatten()
+
+    return i, j
+
+def separation(rx, ry, rz, i, j, nu, nv, nw, A):
+    """
+    Separation vectors of atom pairs within half of the supercell.
+
+    Parameters
+    ----------
+    rx, ry, rz : 1d array
+        Atomic positions.
+    i, j : 1d array, int
+        Atom pairs.
+    nu, nv, nw : int
+        Supercell size.
+    A : 2d array, 3x3
+        Real space crystal axis to Cartesian transformation matrix.
+
+    Returns
+    -------
+    dx, dy, dz : 1d array
+        Separation distance vector.
+
+    """
+
+    mu, mv, mw = (nu+1)//2, (nv+1)//2, (nw+1)//2
+
+    dx = rx[j]-rx[i]
+    dy = ry[j]-ry[i]
+    dz = rz[j]-rz[i]
+
+    du, dv, dw = crystal.transform(dx, dy, dz, np.linalg.inv(A))
+
+    du[du < -mu] += nu
+    dv[dv < -mv] += nv
+    dw[dw < -mw] += nw
+
+    du[du > mu] -= nu
+    dv[dv > mv] -= nv
+    dw[dw > mw] -= nw
+
+    return crystal.transform(du, dv, dw, A)
+
+def bounds(rx, ry, rz, nu, nv, nw, A):
+    """
+    Bounds of separation distances of atom pairs separated by each offset.
+
+    Atoms may be displaced from their cells. The bounds follow from the
+    range of displacements within the cells of the supercell.
+
+    Parameters
+    ----------
+    rx, ry, rz : 1d array
+        Atomic positions.
+    nu, nv, nw : int
+        Supercell size.
+    A : 2d array, 3x3
+        Real space crystal axis to Cartesian transformation matrix.
+
+    Returns
+    -------
+    lower, upper : 1d array
+        Lower and upper bounds of distance for each offset.
+
+    """
+
+    n_uvw = nu*nv*nw
+    n_atm = rx.size // n_uvw
+
+    mu, mv, mw = (nu+1)//2, (nv+1)//2, (nw+1)//2
+
+    u, v, w = crystal.transform(rx, ry, rz, np.linalg.inv(A))
+
+    cu, cv, cw = np.unravel_index(np.arange(rx.size) // n_atm, (nu,nv,nw))
+
+    e = np.stack((u-cu,v-cv,w-cw))
+
+    e_min, e_max = e.min(axis=1), e.max(axis=1)
+
+    e_frac = e_max-e_min
+
+    e_cart = 2*np.sqrt((np.dot(A, e-((e_min+e_max)/2)[:,np.newaxis])**2)\
+                       .sum(axis=0)).max()
+
+    s = offsets(nu, nv, nw)
+
+    n = np.array([nu,nv,nw])
+    m = np.array([mu,mv,mw])
+
+    c = np.stack(np.meshgrid(*[np.arange(-1,2)]*3, indexing='ij'))
+
+    t = s[:,:,np.newaxis]+n[:,np.newaxis]*c.reshape(3,27)
+
+    mask = (np.abs(t) <= (m+e_frac)[:,np.newaxis]).all(axis=1)
+
+    d = np.sqrt((np.einsum('ij,njk->nik', A, t)**2).sum(axis=1))
+
+    lower = np.where(mask, d, np.inf).min(axis=1)-e_cart
+    upper = np.where(mask, d, -np.inf).max(axis=1)+e_cart
+
+    return lower, upper
+
+def pairs(rx, ry, rz, nu, nv, nw, A, fract=1.0):
+    """
+    Atom pairs within half of the supercell.
+
+    Pairs of cells are enumerated by their lattice offset. Offsets that
+    cannot contain a pair within the radial cutoff are skipped so that cost
+    scales with the number of neighbors.
+
+    Parameters
+    ----------
+    rx, ry, rz : 1d array
+        Atomic positions.
+    nu, nv, nw : int
+        Supercell size.
+    A : 2d array, 3x3
+        Real space crystal axis to Cartesian transformation matrix.
+    fract : float, optional
+        Fraction of longest distance for radial cutoff. Default is ``1.0``.
+
+    Returns
+    -------
+    dx, dy, dz : 1d array
+        Separation distance vector.
+    i, j : 1d array, int
+        Atom pairs.
+
+    """
+
+    n_atm = rx.size // (nu*nv*nw)
+
+    s = offsets(nu, nv, nw)
+
+    keep = np.arange(s.shape[0])
+
+    cutoff = np.inf
+
+    if fract < 1:
+
+        lower, upper = bounds(rx, ry, rz, nu, nv, nw, A)
+
+        longest = 0
+
+        for k in np.argsort(-upper):
+
+            if upper[k] < longest:
+                break
+
+            i, j = atoms(*cells(s[k], nu, nv, nw), n_atm)
+
+            if i.size > 0:
+                dx, dy, dz = separation(rx, ry, rz, i, j, nu, nv, nw, A)
+                longest = max(longest, np.sqrt(dx**2+dy**2+dz**2).max())
+
+        cutoff = longest*fract
+
+        keep = keep[lower <= cutoff]
+
+    pairs = [(np.array([]),)*3+(np.array([], dtype=int),)*2]
+
+    for k in keep:
+
+        i, j = atoms(*cells(s[k], nu, nv, nw), n_atm)
+
+        dx, dy, dz = separation(rx, ry, rz, i, j, nu, nv, nw, A)
+
+        mask = np.sqrt(dx**2+dy**2+dz**2) <= cutoff
+
+        pairs.append((dx[mask], dy[mask], dz[mask], i[mask], j[mask]))
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*pairs))
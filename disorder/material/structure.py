@@ -87,13 +87,7 @@ def factor(u, v, w, atms, occupancy, U11, U22, U33, U23, U13, U12,
 
     coordinate = [h,k,l]
 
-    total = []
-    for symop in symops:
-
-        transformed = symmetry.evaluate([symop], coordinate, translate=False)
-        total.append(transformed)
-
-    total = np.vstack(total)
+    total = symmetry.evaluate(symops, coordinate, translate=False)
 
     for i in range(n_hkl):
 
@@ -221,13 +215,7 @@ def factor_magnetic(mu1, mu2, mu3, kvecs, u, v, w, atms, occupancy,
 
     symops = np.unique(symmetry.inverse(symops))
 
-    total = []
-    for symop in symops:
-
-        transformed = symmetry.evaluate([symop], coordinate, translate=False)
-        total.append(transformed)
-
-    total = np.vstack(total)
+    total = symmetry.evaluate(symops, coordinate, translate=False)
 
     for i in range(n_hkl):
 
@@ -969,9 +957,11 @@ class UnitCell:
 
         operators = self.__op[ind]
 
-        for i, operator in enumerate(operators):
-            uvw = symmetry.evaluate([operator], [u[i], v[i], w[i]])
-            u[i], v[i], w[i] = np.mod(uvw, 1).flatten()
+        W, w_ = symmetry.seitz(operators)
+
+        uvw = np.einsum('nij,jn->in', W, [u,v,w])+w_.T
+
+        u[...], v[...], w[...] = np.mod(uvw, 1)
 
         self.__u[ind], self.__v[ind], self.__w[ind] = u, v, w
 
@@ -1193,10 +1183,16 @@ class UnitCell:
 
         operators = self.__op[ind]
 
-        for i, operator in enumerate(operators):
-            disp = [U11[i], U22[i], U33[i], U23[i], U13[i], U12[i]]
-            disp = symmetry.evaluate_disp([operator], disp)
-            U11[i], U22[i], U33[i], U23[i], U13[i], U12[i] = disp
+        W, _ = symmetry.seitz(operators)
+
+        U = np.array([[U11,U12,U13],
+                      [U12,U22,U23],
+                      [U13,U23,U33]])
+
+        U = np.einsum('nij,jkn,nlk->iln', W, U, W)
+
+        U11[...], U22[...], U33[...] = U[0,0], U[1,1], U[2,2]
+        U23[...], U13[...], U12[...] = U[1,2], U[0,2], U[0,1]
 
         self.__U11[ind] = U11
         self.__U22[ind] = U22
@@ -1325,10 +1321,11 @@ class UnitCell:
 
         operators = self.__mag_op[ind]
 
-        for i, operator in enumerate(operators):
-            mag = [mu1[i], mu2[i], mu3[i]]
-            mag = symmetry.evaluate_mag([operator], mag)
-            mu1[i], mu2[i], mu3[i] = np.array(mag).flatten()
+        W, _ = symmetry.seitz(operators, magnetic=True)
+
+        mu = np.einsum('nij,jn->in', W, [mu1,mu2,mu3])
+
+        mu1[...], mu2[...], mu3[...] = mu
 
         self.__mu1[ind] = mu1
         self.__mu2[ind] = mu2
@@ -2336,6 +2333,41 @@ class SuperCell(UnitCell):
 
         return np.mean(data, axis=0), np.std(data, axis=0)**2
 
+    def __tiled(self, sample, trans, indices, inverses, bins,
+                      memory=None, out=None):
+
+        if out is None:
+            out = np.empty(bins), np.empty(bins)
+
+        flat = [y.reshape(-1) for y in out]
+
+        if memory is None:
+            for x, y in zip(sample(*trans), flat):
+                np.take(x, inverses, out=y, mode='clip')
+            return out
+
+        # intensity, variance, and their positions take 24 bytes per point
+        n_points = max(int(memory) // 24, 1)
+
+        for start in range(0, indices.size, n_points):
+
+            tile = slice(start, start+n_points)
+
+            for x, y in zip(sample(*trans, tile=tile), flat):
+                y[indices[tile]] = x
+
+        # reduced points are their own representatives and stay unchanged
+        for start in range(0, inverses.size, n_points):
+
+            slab = slice(start, start+n_points)
+
+            pos = indices[inverses[slab]]
+
+            for y in flat:
+                y[slab] = y[pos]
+
+        return out
+
     def spin_correlations_1d(self, fract, tol, average=False):
         """
         Spherically-averaged spin correlations.
@@ -2650,7 +2682,8 @@ class SuperCell(UnitCell):
 
         return (*data, dx, dy, dz, pairs)
 
-    def magnetic_powder_intensity(self, extents, bins):
+    def magnetic_powder_intensity(self, extents, bins, width=None,
+                                  r_max=None):
         """
         Calculate magnetic powder intensity.
 
@@ -2660,6 +2693,12 @@ class SuperCell(UnitCell):
             Reciprocal space extents.
         bins : int
             Number of bins.
+        width : float, optional
+            Bin width of the pair distance histogram. Default is ``None``,
+            which sums over all pairs exactly.
+        r_max : float, optional
+            Distance cutoff of the pair distance histogram. Default is
+            ``None``, which includes every pair of the averaging box.
 
         Returns
         -------
@@ -2689,13 +2728,14 @@ class SuperCell(UnitCell):
 
             args = Sx, Sy, Sz, occ, *U, *coords, ions, Q, A, D, *dims, g
 
-            intensity.append(powder.magnetic(*args))
+            intensity.append(powder.magnetic(*args, width=width,
+                                             r_max=r_max))
 
         return self.__statistics(intensity)
 
-    def magnetic_single_crystal_intensity(self, extents, bins, W, laue=None):
+    def magnetic_single_crystal_sampler(self, extents, bins, W, laue=None):
         """
-        Calculate magnetic single crystal intensity.
+        Prepare magnetic single crystal intensity of single configurations.
 
         Parameters
         ----------
@@ -2710,8 +2750,18 @@ class SuperCell(UnitCell):
 
         Returns
         -------
-        I : 1d array
-            Magnetic scattering intensity.
+        transform : function
+            Transforms of the flattened moment components ``Sx``, ``Sy``, and
+            ``Sz``. Components of several runs stacked along the first axis
+            give the mean and variance of the intensity over runs.
+        sample : function
+            Magnetic scattering intensity of the symmetry-reduced points from
+            the transforms. The optional ``tile`` slice or indices select a
+            subset of the reduced points.
+        indices : 1d array
+            Positions of the reduced points in the full grid.
+        inverses : 1d array
+            Indices that expand the reduced points to the full grid.
 
         """
 
@@ -2739,26 +2789,28 @@ class SuperCell(UnitCell):
 
         symop = symmetry.laue_id(ops)
 
-        trans = *extents, indices, symop, W, B, R, D, T, wgts, *bins
+        geom = symop, W, B, R, D, T, wgts, *bins
 
-        intensity = []
+        def transform(Sx, Sy, Sz):
 
-        for Sx, Sy, Sz in zip(self._Sx, self._Sy, self._Sz):
+            return tuple(monocrystal.reciprocal([Sx,Sy,Sz], *dims, len(ions)))
 
-            spins = Sx, Sy, Sz
+        def sample(Sx_k, Sy_k, Sz_k, tile=slice(None)):
 
-            args = *spins, occ, *U, *coords, ions, *trans, *dims, *points, g
+            spins = Sx_k, Sy_k, Sz_k
 
-            intensity.append(monocrystal.magnetic(*args))
+            trans = *extents, indices[tile], *geom
 
-        I, sigma_sq = self.__statistics(intensity)
+            args = *spins, occ, *U, *coords, ions, *trans, *dims, *points, g
 
-        return I[inverses].reshape(*bins), sigma_sq[inverses].reshape(*bins)
+            return monocrystal.magnetic(*args)
 
-    def occupational_single_crystal_intensity(self, extents, bins,
-                                                    W, laue=None):
+        return transform, sample, indices, inverses
+
+    def magnetic_single_crystal_intensity(self, extents, bins, W, laue=None,
+                                          memory=None, out=None):
         """
-        Calculate occupational single crystal intensity.
+        Calculate magnetic single crystal intensity.
 
         Parameters
         ----------
@@ -2770,11 +2822,62 @@ class SuperCell(UnitCell):
             Projection matrix.
         laue : str, optional
             Laue symmetry.
+        memory : int, optional
+            Memory budget in bytes of the tiles of reduced points evaluated at
+            once and of the slabs of their expansion to the full grid. Default
+            is ``None``, which evaluates all points at once.
+        out : 2-tuple of 3d arrays, optional
+            Preallocated contiguous intensity and variance, for example
+            memory-mapped arrays. Default is ``None``, which allocates them.
 
         Returns
         -------
         I : 1d array
-            Occupational scattering intensity.
+            Magnetic scattering intensity.
+
+        """
+
+        args = extents, bins, W, laue
+
+        transform, sample, *mapping = \
+            self.magnetic_single_crystal_sampler(*args)
+
+        spins = np.stack(self._Sx), np.stack(self._Sy), np.stack(self._Sz)
+
+        trans = transform(*spins)
+
+        return self.__tiled(sample, trans, *mapping, bins, memory, out)
+
+    def occupational_single_crystal_sampler(self, extents, bins,
+                                                  W, laue=None):
+        """
+        Prepare occupational single crystal intensity of single configurations.
+
+        Parameters
+        ----------
+        extents : list of lists, float
+            Reciprocal space extents.
+        bins : list, int
+            Number of bins.
+        W : 2d array
+            Projection matrix.
+        laue : str, optional
+            Laue symmetry.
+
+        Returns
+        -------
+        transform : function
+            Transform of the flattened relative occupancy parameters ``A_r``.
+            Parameters of several runs stacked along the first axis give the
+            mean and variance of the intensity over runs.
+        sample : function
+            Occupational scattering intensity of the symmetry-reduced points
+            from the transform. The optional ``tile`` slice or indices select
+            a subset of the reduced points.
+        indices : 1d array
+            Positions of the reduced points in the full grid.
+        inverses : 1d array
+            Indices that expand the reduced points to the full grid.
 
         """
 
@@ -2800,24 +2903,27 @@ class SuperCell(UnitCell):
 
         symop = symmetry.laue_id(ops)
 
-        trans = *extents, indices, symop, W, B, R, D, T, wgts, *bins
+        geom = symop, W, B, R, D, T, wgts, *bins
 
-        intensity = []
+        def transform(A_r):
 
-        for A_r in self._A_r:
+            return monocrystal.reciprocal(A_r, *dims, len(atms)),
 
-            args = A_r, occ, *U, *coords, atms, *trans, *dims, *points
+        def sample(A_k, tile=slice(None)):
 
-            intensity.append(monocrystal.occupational(*args))
+            trans = *extents, indices[tile], *geom
 
-        I, sigma_sq = self.__statistics(intensity)
+            args = A_k, occ, *U, *coords, atms, *trans, *dims, *points
 
-        return I[inverses].reshape(*bins), sigma_sq[inverses].reshape(*bins)
+            return monocrystal.occupational(*args)
 
-    def displacive_single_crystal_intensity(self, extents, bins, W, laue=None,
-                                            order=2, centering='P'):
+        return transform, sample, indices, inverses
+
+    def occupational_single_crystal_intensity(self, extents, bins,
+                                                    W, laue=None,
+                                                    memory=None, out=None):
         """
-        Calculate displacive single crystal intensity.
+        Calculate occupational single crystal intensity.
 
         Parameters
         ----------
@@ -2829,11 +2935,61 @@ class SuperCell(UnitCell):
             Projection matrix.
         laue : str, optional
             Laue symmetry.
+        memory : int, optional
+            Memory budget in bytes of the tiles of reduced points evaluated at
+            once and of the slabs of their expansion to the full grid. Default
+            is ``None``, which evaluates all points at once.
+        out : 2-tuple of 3d arrays, optional
+            Preallocated contiguous intensity and variance, for example
+            memory-mapped arrays. Default is ``None``, which allocates them.
 
         Returns
         -------
         I : 1d array
-            Displacive scattering intensity.
+            Occupational scattering intensity.
+
+        """
+
+        args = extents, bins, W, laue
+
+        transform, sample, *mapping = \
+            self.occupational_single_crystal_sampler(*args)
+
+        trans = transform(np.stack(self._A_r))
+
+        return self.__tiled(sample, trans, *mapping, bins, memory, out)
+
+    def displacive_single_crystal_sampler(self, extents, bins, W, laue=None,
+                                          order=2, centering='P'):
+        """
+        Prepare displacive single crystal intensity of single configurations.
+
+        Parameters
+        ----------
+        extents : list of lists, float
+            Reciprocal space extents.
+        bins : list, int
+            Number of bins.
+        W : 2d array
+            Projection matrix.
+        laue : str, optional
+            Laue symmetry.
+
+        Returns
+        -------
+        transform : function
+            Transform of the displacement products of the flattened
+            displacement components ``Ux``, ``Uy``, and ``Uz``. Components of
+            several runs stacked along the first axis give the mean and
+            variance of the intensity over runs.
+        sample : function
+            Displacive scattering intensity of the symmetry-reduced points
+            from the transform. The optional ``tile`` slice or indices select
+            a subset of the reduced points.
+        indices : 1d array
+            Positions of the reduced points in the full grid.
+        inverses : 1d array
+            Indices that expand the reduced points to the full grid.
 
         """
 
@@ -2857,8 +3013,6 @@ class SuperCell(UnitCell):
 
         disp = order, even, centering
 
-        even, odd = displacive.indices(order)
-
         W = np.array(W).astype(float)
 
         args = *extents, *bins, *dims, W, laue
@@ -2867,25 +3021,73 @@ class SuperCell(UnitCell):
 
         symop = symmetry.laue_id(ops)
 
-        trans = *extents, indices, symop, W, B, R, T, wgts, *bins
+        geom = symop, W, B, R, T, wgts, *bins
 
-        intensity = []
+        def transform(Ux, Uy, Uz):
 
-        for Ux, Uy, Uz in zip(self._Ux, self._Uy, self._Uz):
+            if np.ndim(Ux) > 1:
+                U_r = np.stack([displacive.products(*U, order)
+                                for U in zip(Ux, Uy, Uz)])
+            else:
+                U_r = displacive.products(Ux, Uy, Uz, order)
+
+            return monocrystal.reciprocal(U_r, *dims, len(atms)),
 
-            U_r = displacive.products(Ux, Uy, Uz, order)
+        def sample(U_k, tile=slice(None)):
 
-            expans = U_r, coeffs
+            expans = U_k, coeffs
+
+            trans = *extents, indices[tile], *geom
 
             args = *expans, occ, *coords, atms, *trans, *dims, *points, *disp
 
-            intensity.append(monocrystal.displacive(*args))
+            return monocrystal.displacive(*args)
+
+        return transform, sample, indices, inverses
+
+    def displacive_single_crystal_intensity(self, extents, bins, W, laue=None,
+                                            order=2, centering='P',
+                                            memory=None, out=None):
+        """
+        Calculate displacive single crystal intensity.
+
+        Parameters
+        ----------
+        extents : list of lists, float
+            Reciprocal space extents.
+        bins : list, int
+            Number of bins.
+        W : 2d array
+            Projection matrix.
+        laue : str, optional
+            Laue symmetry.
+        memory : int, optional
+            Memory budget in bytes of the tiles of reduced points evaluated at
+            once and of the slabs of their expansion to the full grid. Default
+            is ``None``, which evaluates all points at once.
+        out : 2-tuple of 3d arrays, optional
+            Preallocated contiguous intensity and variance, for example
+            memory-mapped arrays. Default is ``None``, which allocates them.
+
+        Returns
+        -------
+        I : 1d array
+            Displacive scattering intensity.
+
+        """
+
+        args = extents, bins, W, laue, order, centering
+
+        transform, sample, *mapping = \
+            self.displacive_single_crystal_sampler(*args)
+
+        disps = np.stack(self._Ux), np.stack(self._Uy), np.stack(self._Uz)
 
-        I, sigma_sq = self.__statistics(intensity)
+        trans = transform(*disps)
 
-        return I[inverses].reshape(*bins), sigma_sq[inverses].reshape(*bins)
+        return self.__tiled(sample, trans, *mapping, bins, memory, out)
 
-    def single_crystal_intensity_blur(self, I, sigma):
+    def single_crystal_intensity_blur(self, I, sigma, recursive=False):
         """
         Perform an approximate Gaussian blur to the intensity dataset.
 
@@ -2895,6 +3097,9 @@ class SuperCell(UnitCell):
             Intensity data.
         sigma : 3-tuple, float or float
             Blur width in voxels.
+        recursive : bool, optional
+            Use the recursive filter instead of successive box filters.
+            Default is ``False``.
 
         Returns
         -------
@@ -2905,7 +3110,7 @@ class SuperCell(UnitCell):
 
         sigma = np.asarray(sigma)
 
-        return filters.blurring(I, sigma)
+        return filters.blurring(I, sigma, recursive)
 
     def save_intensity_3d(self, filename, I, extents, W=np.eye(3)):
         """
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import re
+import functools
 
 import numpy as np
 
@@ -551,6 +552,70 @@ def unique(data):
 
     return u.view(data_type).reshape(uni_size, data_size), ind, inv
 
+@functools.lru_cache(maxsize=None)
+def _parse(operator, variables):
+    """
+    Rotation matrix and translation vector of one symmetry operator.
+    Components beyond the third, such as time reversal, are ignored.
+
+    """
+
+    code = compile('['+operator+']', '<string>', 'eval')
+
+    def value(vector):
+        return np.array(eval(code, {}, dict(zip(variables, vector)))[:3],
+                        dtype=float)
+
+    w = value([0,0,0])
+
+    W = np.stack([value(vector)-w for vector in np.eye(3)], axis=1)
+
+    return np.round(W), w
+
+@functools.lru_cache(maxsize=64)
+def _group(operators, variables):
+    """
+    Rotation matrices and translation vectors of symmetry operators.
+
+    """
+
+    W, w = zip(*[_parse(operator, variables) for operator in operators])
+
+    W, w = np.array(W), np.array(w)
+
+    W.flags.writeable = False
+    w.flags.writeable = False
+
+    return W, w
+
+def seitz(operators, magnetic=False):
+    """
+    Seitz matrix representation of symmetry operators.
+
+    Each operator is parsed once and the representation of each list of
+    operators is cached.
+
+    Parameters
+    ----------
+    operators : list, str
+        Symmetry operators.
+    magnetic : bool, optional
+        Magnetic symmetry operators of moments :math:`m_x`, :math:`m_y`, and
+        :math:`m_z`. The default is ``False``.
+
+    Returns
+    -------
+    W : 3d array
+        Rotation matrices. First axis is of the operators.
+    w : 2d array
+        Translation vectors. First axis is of the operators.
+
+    """
+
+    variables = ('mx','my','mz') if magnetic else ('x','y','z')
+
+    return _group(tuple(str(operator) for operator in operators), variables)
+
 def evaluate(operators, coordinates, translate=True):
     """
     Evaluate symmetry operators.
@@ -571,9 +636,16 @@ def evaluate(operators, coordinates, translate=True):
 
     """
 
-    code = evaluate_op(operators, translate=translate)
+    W, w = seitz(operators)
+
+    coordinates = np.asarray(coordinates, dtype=float)
+
+    transformed = np.einsum('nij,j...->ni...', W, coordinates)
 
-    return evaluate_code(code, coordinates)
+    if translate:
+        transformed += w.reshape(w.shape+(1,)*(coordinates.ndim-1))
+
+    return transformed
 
 def evaluate_op(operators, translate=True):
     """
@@ -646,13 +718,7 @@ def generate_mag(operator, symmform, parity):
 
     """
 
-    code = evaluate_op(operator, translate=False)
-
-    W_0 = evaluate_code(code, [1,0,0])
-    W_1 = evaluate_code(code, [0,1,0])
-    W_2 = evaluate_code(code, [0,0,1])
-
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3).T
+    W = seitz(operator)[0][0]
 
     M = (parity*np.linalg.det(W)*W).astype(int)
 
@@ -693,13 +759,11 @@ def evaluate_mag(operator, moments):
 
     """
 
-    operators = str([[op] for op in operator])
+    W, _ = seitz(operator, magnetic=True)
 
-    mx, my, mz = moments
-
-    operators = operators.replace("'","")
+    moments = np.asarray(moments, dtype=float)
 
-    return np.array(eval(operators))
+    return np.einsum('nij,j...->ni...', W, moments)
 
 def evaluate_disp(operator, displacements):
     """
@@ -708,14 +772,15 @@ def evaluate_disp(operator, displacements):
     Parameters
     ----------
     operator : list, str
-        Symmetry operator.
+        Symmetry operators.
     displacement : 6-list
         Atomic displacement parameters to transform.
 
     Returns
     -------
     transformed : list
-        Transformed atomic displacement parameters.
+        Transformed atomic displacement parameters. Last axis is of the
+        operators if there is more than one.
 
     """
 
@@ -725,15 +790,14 @@ def evaluate_disp(operator, displacements):
                   [U12,U22,U23],
                   [U13,U23,U33]])
 
-    code = evaluate_op(operator, translate=False)
+    W, _ = seitz(operator)
 
-    W_0 = evaluate_code(code, [1,0,0])
-    W_1 = evaluate_code(code, [0,1,0])
-    W_2 = evaluate_code(code, [0,0,1])
+    Up = np.einsum('nij,jk...,nlk->nil...', W, U, W)
 
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3).T
-
-    Up = np.dot(np.dot(W,U),W.T)
+    if len(operator) == 1:
+        Up = Up[0]
+    else:
+        Up = np.moveaxis(Up, 0, -1)
 
     return Up[0,0], Up[1,1], Up[2,2], Up[1,2], Up[0,2], Up[0,1]
 
@@ -755,17 +819,7 @@ def reverse(symops):
 
     n = len(symops)
 
-    w = evaluate(symops, [0,0,0], translate=True)
-
-    w = w.reshape(n,3)
-
-    code = evaluate_op(symops, translate=False)
-
-    W_0 = evaluate_code(code, [1,0,0])
-    W_1 = evaluate_code(code, [0,1,0])
-    W_2 = evaluate_code(code, [0,0,1])
-
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3,n).T
+    W, w = seitz(symops)
 
     W_inv = np.linalg.inv(W).round()
 
@@ -812,13 +866,7 @@ def inverse(symops):
 
     n = len(symops)
 
-    code = evaluate_op(symops, translate=False)
-
-    W_0 = evaluate_code(code, [1,0,0])
-    W_1 = evaluate_code(code, [0,1,0])
-    W_2 = evaluate_code(code, [0,0,1])
-
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3,n).T
+    W, _ = seitz(symops)
 
     W_inv = np.linalg.inv(W).round()
 
@@ -861,27 +909,10 @@ def binary(symop0, symop1):
 
     """
 
-    n0, n1 = len(symop0), len(symop1)
-
-    w0 = evaluate(symop0, [0,0,0], translate=True)
-    w1 = evaluate(symop1, [0,0,0], translate=True)
-
-    w0 = w0.reshape(n0,3)
-    w1 = w1.reshape(n1,3)
+    n0 = len(symop0)
 
-    code0 = evaluate_op(symop0, translate=False)
-    code1 = evaluate_op(symop1, translate=False)
-
-    W0_0 = evaluate_code(code0, [1,0,0])
-    W0_1 = evaluate_code(code0, [0,1,0])
-    W0_2 = evaluate_code(code0, [0,0,1])
-
-    W1_0 = evaluate_code(code1, [1,0,0])
-    W1_1 = evaluate_code(code1, [0,1,0])
-    W1_2 = evaluate_code(code1, [0,0,1])
-
-    W0 = np.hstack((W0_0,W0_1,W0_2)).T.reshape(3,3,n0).T
-    W1 = np.hstack((W1_0,W1_1,W1_2)).T.reshape(3,3,n1).T
+    W0, w0 = seitz(symop0)
+    W1, w1 = seitz(symop1)
 
     W = np.einsum('ijk,ikl->ijl', W0, W1).round()
     w = np.einsum('ijk,ik->ij', W0, w1)+w0
@@ -954,19 +985,11 @@ def classification(symops):
 
     n = len(symops)
 
-    code = evaluate_op(symops, translate=False)
-
-    W_0 = evaluate_code(code, [1,0,0])
-    W_1 = evaluate_code(code, [0,1,0])
-    W_2 = evaluate_code(code, [0,0,1])
-
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3,n).T
+    W, w = seitz(symops)
 
     W_det = np.linalg.det(W)
     W_tr = np.trace(W, axis1=1, axis2=2)
 
-    w = evaluate(symops, [0,0,0], translate=True)
-
     w_symop_ord = np.zeros((n,3))
 
     rotation, k = [], []
@@ -1043,11 +1066,7 @@ def absence(symops, h, k, l):
 
     absent = np.full((len(symops),m), False)
 
-    W_0 = evaluate(symops, [1,0,0], translate=False)
-    W_1 = evaluate(symops, [0,1,0], translate=False)
-    W_2 = evaluate(symops, [0,0,1], translate=False)
-
-    W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3,n).T
+    W, _ = seitz(symops)
 
     rotation, k, wg = classification(symops)
 
@@ -1126,15 +1145,9 @@ def site(symops, coordinates, A, tol=1e-1):
 
         w0 = np.array([nu,nv,nw])
 
-        w1 = evaluate([symop], [0,0,0], translate=True).flatten()
-
-        code = evaluate_op([symop], translate=False)
+        W1, w1 = seitz([symop])
 
-        W1_0 = evaluate_code(code, [1,0,0])
-        W1_1 = evaluate_code(code, [0,1,0])
-        W1_2 = evaluate_code(code, [0,0,1])
-
-        W1 = np.hstack((W1_0,W1_1,W1_2)).T.reshape(3,3).T
+        W1, w1 = W1[0], w1[0]
 
         up, vp, wp = np.dot(W1, [u,v,w])+w1+w0
 
@@ -1187,15 +1200,9 @@ def site(symops, coordinates, A, tol=1e-1):
 
         op_0 = operators[i]
 
-        code0 = evaluate_op([op_0], translate=False)
-
-        W0_0 = evaluate_code(code0, [1,0,0])
-        W0_1 = evaluate_code(code0, [0,1,0])
-        W0_2 = evaluate_code(code0, [0,0,1])
+        W0, w0 = seitz([op_0])
 
-        W0 = np.hstack((W0_0,W0_1,W0_2)).T.reshape(3,3).T
-
-        w0 = evaluate([op_0], [0,0,0], translate=True)
+        W0, w0 = W0[0], w0[0]
 
         Gc = G.copy()
         G.add(op_0)
@@ -1203,15 +1210,9 @@ def site(symops, coordinates, A, tol=1e-1):
         for op_1 in Gc:
             if (op_0 != op_1):
 
-                code1 = evaluate_op([op_1], translate=False)
-
-                W1_0 = evaluate_code(code1, [1,0,0])
-                W1_1 = evaluate_code(code1, [0,1,0])
-                W1_2 = evaluate_code(code1, [0,0,1])
+                W1, w1 = seitz([op_1])
 
-                W1 = np.hstack((W1_0,W1_1,W1_2)).T.reshape(3,3).T
-
-                w1 = evaluate([op_1], [0,0,0], translate=True)
+                W1, w1 = W1[0], w1[0]
 
                 W = np.dot(W0, W1)
                 w = np.dot(W0, w1.flatten())+w0.flatten()
@@ -1229,15 +1230,7 @@ def site(symops, coordinates, A, tol=1e-1):
         rotation, k, wg = classification([op])
         rot.append(rotation)
 
-        code = evaluate_op([op], translate=False)
-
-        W_0 = evaluate_code(code, [1,0,0])
-        W_1 = evaluate_code(code, [0,1,0])
-        W_2 = evaluate_code(code, [0,0,1])
-
-        W = np.hstack((W_0,W_1,W_2)).T.reshape(3,3,n).T
-
-        w = evaluate([op], [0,0,0], translate=True)
+        W, w = seitz([op])
 
         T += W
         t += w
@@ -147,6 +147,26 @@ class test_c_simulation(unittest.TestCase):
         self.assertAlmostEqual(uy, vy)
         self.assertAlmostEqual(uz, vz)
 
+    def test_overrelaxation_vector_candidate(self):
+
+        ux, uy, uz = simulation.random_vector_candidate()
+        hx, hy, hz = simulation.random_vector_candidate()
+
+        vx, vy, vz = simulation.overrelaxation_vector_candidate(ux, uy, uz,
+                                                                2*hx,
+                                                                2*hy,
+                                                                2*hz)
+
+        self.assertAlmostEqual(vx**2+vy**2+vz**2, 1.0)
+        self.assertAlmostEqual(vx*hx+vy*hy+vz*hz, ux*hx+uy*hy+uz*hz)
+
+        vx, vy, vz = simulation.overrelaxation_vector_candidate(ux, uy, uz,
+                                                                0, 0, 0)
+
+        self.assertAlmostEqual(ux, vx)
+        self.assertAlmostEqual(uy, vy)
+        self.assertAlmostEqual(uz, vz)
+
     def test_energy_moment(self):
 
         n, m = 10, 3
@@ -394,3 +414,70 @@ class test_c_simulation(unittest.TestCase):
                                          ox, oy, oz, j, n_c, t)
 
         np.testing.assert_array_almost_equal(p, q)
+
+    def test_update_moment_kernel(self):
+
+        nu, nv, nw, n_atm = 2, 3, 4, 3
+
+        n_uvw = nu*nv*nw
+
+        n, m = n_uvw*n_atm, 2
+
+        c_uvw, a_atm = np.divmod(np.arange(n), n_atm)
+
+        cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+
+        du = np.mod(cu[np.newaxis,:]-cu[:,np.newaxis], nu)
+        dv = np.mod(cv[np.newaxis,:]-cv[:,np.newaxis], nv)
+        dw = np.mod(cw[np.newaxis,:]-cw[:,np.newaxis], nw)
+
+        d_uvw = np.ravel_multi_index((du,dv,dw), (nu,nv,nw))
+
+        X = np.random.random((n_atm,n_atm,n_uvw,6))
+
+        K = np.zeros((n_atm,n_atm,n_uvw,6))
+
+        K[a_atm[:,np.newaxis],a_atm[np.newaxis,:],d_uvw] = \
+            X[a_atm[:,np.newaxis],a_atm[np.newaxis,:],d_uvw]\
+          + X[a_atm[np.newaxis,:],a_atm[:,np.newaxis],d_uvw.T]
+
+        Qijm = K[a_atm[:,np.newaxis],a_atm[np.newaxis,:],d_uvw]
+
+        Q = np.zeros((n,n,3,3))
+
+        Q[:,:,0,0] = Qijm[:,:,0]
+        Q[:,:,1,1] = Qijm[:,:,1]
+        Q[:,:,2,2] = Qijm[:,:,2]
+        Q[:,:,1,2] = Q[:,:,2,1] = Qijm[:,:,3]
+        Q[:,:,0,2] = Q[:,:,2,0] = Qijm[:,:,4]
+        Q[:,:,0,1] = Q[:,:,1,0] = Qijm[:,:,5]
+
+        ux = np.random.random((n,m))
+        uy = np.random.random((n,m))
+        uz = np.random.random((n,m))
+
+        u = np.column_stack((ux,uy,uz)).reshape(-1,3,m)
+        p = np.einsum('ijkl,jlm->ijklm',Q,u).sum(axis=1)
+
+        i, t = np.random.randint(n), np.random.randint(m)
+
+        E0 = np.einsum('ijk,ijk->...',np.einsum('ijkl,jkm->ilm',Q,u),u)
+
+        ox, oy, oz = ux[i,t].copy(), uy[i,t].copy(), uz[i,t].copy()
+        cx, cy, cz = np.random.random(), np.random.random(), np.random.random()
+
+        ux[i,t], uy[i,t], uz[i,t] = cx, cy, cz
+
+        u = np.column_stack((ux,uy,uz)).reshape(-1,3,m)
+        q = np.einsum('ijkl,jlm->ijklm',Q,u).sum(axis=1)
+
+        E1 = np.einsum('ijk,ijk->...',np.einsum('ijkl,jkm->ilm',Q,u),u)
+
+        E = simulation.energy_moment_kernel(p, K, cx, cy, cz, ox, oy, oz, i, t)
+
+        self.assertAlmostEqual(E, E1-E0)
+
+        simulation.update_moment_kernel(p, K, nu, nv, nw,
+                                        cx, cy, cz, ox, oy, oz, i, t)
+
+        np.testing.assert_array_almost_equal(p, q)
@@ -5,10 +5,11 @@ import numpy as np
 
 import pyvista as pv
 
-from disorder.diffuse import experimental
+from disorder.diffuse import experimental, filters
 
 import os
 import shutil
+import tempfile
 directory = os.path.dirname(os.path.abspath(__file__))
 
 class test_experimental(unittest.TestCase):
@@ -35,6 +36,46 @@ class test_experimental(unittest.TestCase):
         np.testing.assert_array_almost_equal(signal, np.random.random(shape))
         np.testing.assert_array_almost_equal(sigma_sq, np.random.random(shape))
 
+    def test_dataset(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        signal, sigma_sq, \
+        h_range, k_range, l_range, \
+        nh, nk, nl = experimental.data(os.path.join(folder, 'test.nxs'))
+
+        for planes in [None, 1, 4]:
+
+            dataset = experimental.Dataset(os.path.join(folder, 'test.nxs'),
+                                           planes)
+
+            self.assertEqual(dataset.shape, (nh,nk,nl))
+            self.assertEqual(dataset.extents, [h_range,k_range,l_range])
+
+            cropped = dataset.crop([2,11],[1,7],[3,23])
+
+            self.assertEqual(cropped.shape, (9,6,20))
+            self.assertEqual(dataset.shape, (nh,nk,nl))
+
+            tmp_signal = experimental.crop(signal, [2,11],[1,7],[3,23])
+            tmp_sigma_sq = experimental.crop(sigma_sq, [2,11],[1,7],[3,23])
+
+            data_signal, data_sigma_sq = cropped.read()
+
+            np.testing.assert_array_equal(data_signal, tmp_signal)
+            np.testing.assert_array_equal(data_sigma_sq, tmp_sigma_sq)
+
+            for binsize in [[9,6,20], [3,6,20], [9,6,7], [4,5,6]]:
+
+                data_signal, data_sigma_sq = cropped.read(binsize)
+
+                self.assertEqual(data_signal.shape, tuple(binsize))
+
+                np.testing.assert_array_almost_equal(data_signal,
+                    experimental.rebin(tmp_signal, binsize))
+                np.testing.assert_array_almost_equal(data_sigma_sq,
+                    experimental.rebin(tmp_sigma_sq, binsize))
+
     def test_mask(self):
 
         np.random.seed(13)
@@ -107,6 +148,16 @@ class test_experimental(unittest.TestCase):
         np.testing.assert_array_almost_equal(weight.sum(axis=0), 0.6)
         np.testing.assert_array_almost_equal(weight.sum(axis=1), 1.0)
 
+        weight = experimental.weights(200, 67)
+        np.testing.assert_array_almost_equal(weight.sum(axis=0), 67/200)
+        np.testing.assert_array_almost_equal(weight.sum(axis=1), 1.0)
+        self.assertTrue((weight >= 0).all())
+
+        indptr, indices, data = experimental.operator(200, 67)
+        self.assertEqual(indptr.size, 68)
+        self.assertTrue((np.diff(indptr) <= 4).all())
+        np.testing.assert_array_equal(indices, weight.nonzero()[1])
+
     def test_crop(self):
 
         data  = np.random.random((23,24,25))
@@ -123,6 +174,79 @@ class test_experimental(unittest.TestCase):
 
         self.assertAlmostEqual(tmp_data[0,0,0], data[3,4,5])
 
+    def test_pipeline(self):
+
+        np.random.seed(13)
+
+        signal = np.random.random((23,24,25))+0.1
+        error_sq = np.random.random((23,24,25))+0.1
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            pipeline = experimental.Pipeline(directory=tmp)
+
+            key = pipeline.source((signal, error_sq))
+
+            self.assertEqual(key, pipeline.source((signal.copy(), error_sq)))
+
+            crop_key, data = pipeline.crop(key, (signal, error_sq),
+                                           [3,21],[4,20],[5,25])
+
+            rebin_key, data = pipeline.rebin(crop_key, data, [9,8,10])
+
+            tmp_signal = experimental.crop(signal, [3,21],[4,20],[5,25])
+            tmp_signal = experimental.rebin(tmp_signal, [9,8,10])
+
+            np.testing.assert_array_almost_equal(data[0], tmp_signal)
+
+            params = 1, 1, 1, [-4,4], [-4,4], [-5,5]
+
+            tmp_signal = data[0].copy()
+            tmp_signal[4,4,5] = 100
+
+            spiked = tmp_signal, data[1]
+
+            spike_key = pipeline.source(spiked)
+
+            punch_key, punched = pipeline.punch(spike_key, spiked, *params)
+
+            np.testing.assert_array_equal(punched[0],
+                experimental.punch(tmp_signal.copy(), *params))
+
+            self.assertTrue(np.isnan(punched[0][4,4,5]))
+            self.assertEqual(tmp_signal[4,4,5], 100)
+
+            self.assertEqual(len(pipeline), 3)
+            self.assertEqual(len(os.listdir(tmp)), 3)
+
+            other_key, other = pipeline.rebin(crop_key, None, [9,8,10])
+
+            self.assertEqual(other_key, rebin_key)
+            self.assertIs(other[0], data[0])
+
+            pipeline = experimental.Pipeline(capacity=punched[0].nbytes*2,
+                                             directory=tmp)
+
+            other_key, other = pipeline.punch(spike_key, None, *params)
+
+            self.assertEqual(other_key, punch_key)
+            np.testing.assert_array_equal(other[0], punched[0])
+
+            with self.assertRaises(ValueError):
+                other[0][0,0,0] = 0
+
+            with self.assertRaises(ValueError):
+                data[1][0,0,0] = 0
+
+            pipeline.crop(key, (signal, error_sq), [0,23], [0,24], [0,25])
+
+            self.assertTrue(signal.flags.writeable)
+
+            pipeline.rebin(crop_key, None, [9,8,10])
+
+            self.assertEqual(len(pipeline), 1)
+            self.assertEqual(pipeline.size, punched[0].nbytes*2)
+
     def test_factors(self):
 
         fact = np.array([1, 2, 5, 10])
@@ -165,6 +289,27 @@ class test_experimental(unittest.TestCase):
 
         np.testing.assert_array_equal(np.isnan(data[mask]), True)
 
+    def test_punch_overlap(self):
+
+        np.random.seed(13)
+
+        signal = np.random.random((12,13,14))
+        signal[np.random.random(signal.shape) < 0.1] = 5
+
+        centers = np.array([[3,4,5],[4,5,6],[9,9,9],[0,12,13]])
+
+        stencil = np.ones((5,3,5), dtype=np.uint8)
+
+        serial = signal.copy()
+        filters.punch(serial, centers, stencil, 1.5, parallel=False)
+
+        for i, j, k in centers:
+            box = signal[max(i-2,0):i+3,max(j-1,0):j+2,max(k-2,0):k+3]
+            Q3, Q1 = np.nanpercentile(box, 75), np.nanpercentile(box, 25)
+            box[(box >= Q3+1.5*(Q3-Q1)) | (box < Q1-1.5*(Q3-Q1))] = np.nan
+
+        np.testing.assert_array_equal(np.isnan(serial), np.isnan(signal))
+
     def test_outlier(self):
 
         signal = np.random.random((25,26,27))
@@ -229,6 +374,16 @@ class test_experimental(unittest.TestCase):
         self.assertEqual(experimental.reflections(1, 4, 4, centering=cntr), 1)
         self.assertEqual(experimental.reflections(1, 4, 5, centering=cntr), 0)
 
+        h, k, l = np.meshgrid([-1,0,1,2], [-2,0,1], [0,3], indexing='ij')
+
+        allow = experimental.reflections(h, k, l, centering='F')
+
+        self.assertEqual(allow.shape, h.shape)
+        for i, j, m in np.ndindex(h.shape):
+            cond = experimental.reflections(h[i,j,m], k[i,j,m], l[i,j,m],
+                                            centering='F')
+            self.assertEqual(allow[i,j,m], cond)
+
     def test_correlation(self):
 
         folder = os.path.abspath(os.path.join(directory, '..', 'data'))
@@ -17,30 +17,44 @@ class test_filters(unittest.TestCase):
 
         data = 0.5*x+2.5*y-z
 
-        weights = np.full(18, 1/6.).reshape(3,6)
-        tmp_data = filters.rebin0(data, weights)
+        def operator(old, new):
+            indptr = np.arange(0, old+1, old // new)
+            indices = np.arange(old)
+            return indptr, indices, np.full(old, new/old)
+
+        identity = [operator(n, n) for n in data.shape]
+
+        tmp_data = filters.rebin(data, [operator(6, 3), *identity[1:]])
 
         self.assertEqual(tmp_data.shape, (3,14,10))
 
         np.testing.assert_array_almost_equal(np.mean(tmp_data, axis=0),
                                              np.mean(data, axis=0))
 
-        weights = np.full(98, 1/14.).reshape(7,14)
-        tmp_data = filters.rebin1(data, weights)
+        tmp_data = filters.rebin(data, [identity[0], operator(14, 7),
+                                        identity[2]])
 
         self.assertEqual(tmp_data.shape, (6,7,10))
 
         np.testing.assert_array_almost_equal(np.mean(tmp_data, axis=1),
                                              np.mean(data, axis=1))
 
-        weights = np.full(20, 1/10.).reshape(2,10)
-        tmp_data = filters.rebin2(data, weights)
+        tmp_data = filters.rebin(data, [*identity[:2], operator(10, 2)])
 
         self.assertEqual(tmp_data.shape, (6,14,2))
 
         np.testing.assert_array_almost_equal(np.mean(tmp_data, axis=2),
                                              np.mean(data, axis=2))
 
+        operators = [operator(6, 2), operator(14, 7), operator(10, 5)]
+
+        tmp_data, tmp_error = filters.rebin(data, operators, 2*data)
+
+        self.assertEqual(tmp_data.shape, (2,7,5))
+
+        np.testing.assert_array_almost_equal(tmp_data.mean(), data.mean())
+        np.testing.assert_array_almost_equal(tmp_error, 2*tmp_data)
+
     def test_boxblur(self):
 
         sigma, n = 2, 3
@@ -132,6 +146,91 @@ class test_filters(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(w, x, decimal=1)
 
+    def test_recursion(self):
+
+        nh, nk, nl = 16, 27, 36
+
+        v = np.random.random(size=(nh,nk,nl))
+
+        sigma = [2,1,3]
+
+        w = filters.blurring(v, sigma, recursive=True)
+
+        x = ndimage.gaussian_filter(v, sigma, mode='nearest')
+
+        np.testing.assert_array_almost_equal(w, x, decimal=1)
+        self.assertLess(np.abs(w-x).max(), 0.03)
+
+        v = np.full((nh,nk,nl), 2.0)
+
+        w = filters.blurring(v, sigma, recursive=True)
+
+        np.testing.assert_array_almost_equal(w, v)
+
+        coeffs = filters.recursion(sigma)
+
+        self.assertEqual(coeffs.shape, (3,13))
+        np.testing.assert_array_almost_equal(coeffs[:,:4].sum(axis=1), 1)
+
+        coeffs = filters.recursion(0)
+
+        np.testing.assert_array_equal(coeffs[:,:4], [[1,0,0,0]]*3)
+
+        mask = np.random.randint(0, 2, size=(nh,nk,nl), dtype=bool)
+
+        v_inv = filters.gaussian(mask, sigma, recursive=True)
+
+        v = np.ones(mask.shape)
+        v[mask] = 0
+
+        w = filters.boxfilter(v, mask, sigma, v_inv, recursive=True)
+
+        np.testing.assert_array_almost_equal(w, np.ones(mask.shape))
+
+    def test_filtering(self):
+
+        np.random.seed(13)
+
+        nh, nk, nl = 7, 12, 5
+
+        s = np.random.random(nh*nk*nl)
+        v_inv = np.random.random(nh*nk*nl)
+
+        sigma = [2,1,3]
+
+        boxes = filters.boxblur(sigma, 3)
+
+        x = s.reshape(nh,nk,nl)
+        for sizes in boxes.reshape(3,3):
+            for axis, size in enumerate(sizes):
+                if (x.shape[axis]-size <= 0):
+                    size = 0
+                x = ndimage.uniform_filter1d(x, 2*size+1, axis=axis,
+                                             mode='nearest')
+
+        a, b, t = np.zeros(s.size), np.zeros(s.size), np.zeros(s.size)
+
+        coeffs = np.zeros((0,13))
+
+        filters.filtering(t, s, v_inv, boxes, coeffs, a, b, nh, nk, nl)
+
+        np.testing.assert_array_almost_equal(t, x.flatten()*v_inv)
+
+        coeffs = filters.recursion(sigma)
+
+        y = filters.smooth(s, sigma, (nh,nk,nl), recursive=True)
+
+        filters.filtering(t, s, v_inv, boxes, coeffs, a, b, nh, nk, nl)
+
+        np.testing.assert_array_almost_equal(t, y*v_inv)
+
+        u = s.copy()
+
+        filters.gauss(t, u, boxes, a, b, nh, nk, nl)
+
+        np.testing.assert_array_equal(u, s)
+        np.testing.assert_array_almost_equal(t, x.flatten())
+
     def test_median(self):
 
         a = np.random.random((13,14,15))
@@ -146,5 +245,23 @@ class test_filters(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(b, c)
 
+    def test_median_deviation(self):
+
+        a = np.random.random((9,8,7))
+        a[1,2,3] = a[4,5,6]
+
+        def deviation(window):
+            return np.median(np.abs(window-np.median(window)))
+
+        for size in [3,5]:
+
+            b = ndimage.median_filter(a, size=size, mode='nearest')
+            c = ndimage.generic_filter(a, deviation, size=size, mode='nearest')
+
+            d, e = filters.median_deviation(a, size)
+
+            np.testing.assert_array_equal(b, d)
+            np.testing.assert_array_almost_equal(c, e)
+
 if __name__ == '__main__':
     unittest.main()
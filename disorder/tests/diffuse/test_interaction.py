@@ -507,6 +507,62 @@ class test_interaction(unittest.TestCase):
         E = np.sqrt(np.sum(E**2, axis=1))
         np.testing.assert_array_almost_equal(E, 2.93226, 1)
 
+    def test_dipole_dipole_kernel(self):
+
+        a, b, c, alpha, beta, gamma = 5, 6, 7, np.pi/2, np.pi/2, 2*np.pi/3
+
+        inv_constants = crystal.reciprocal(a, b, c, alpha, beta, gamma)
+
+        A = crystal.cartesian(a, b, c, alpha, beta, gamma)
+        R = crystal.cartesian_rotation(a, b, c, alpha, beta, gamma)
+        B = crystal.cartesian(*inv_constants)
+
+        nu, nv, nw, n_atm = 4, 2, 6, 2
+
+        n = nu*nv*nw*n_atm
+
+        atm = np.array(['',''])
+
+        u = np.array([0.2,0.3])
+        v = np.array([0.5,0.4])
+        w = np.array([0.7,0.2])
+
+        Rx, Ry, Rz = space.cell(nu, nv, nw, A)
+
+        ux, uy, uz = crystal.transform(u, v, w, A)
+
+        rx, ry, rz, atms = space.real(ux, uy, uz, Rx, Ry, Rz, atm)
+
+        i, j = np.triu_indices(n)
+
+        Qijm = np.zeros((n,n,6))
+
+        Qijm[i,j,:] = interaction.dipole_dipole_matrix(rx, ry, rz,
+                                                        nu, nv, nw,
+                                                        n_atm, A, B, R)
+
+        Qijm[j,i,:] = Qijm[i,j,:]
+
+        Kijkl = interaction.dipole_dipole_kernel(rx, ry, rz,
+                                                 nu, nv, nw,
+                                                 n_atm, A, B, R)
+
+        self.assertEqual(Kijkl.shape, (n_atm,n_atm,nu*nv*nw,6))
+
+        c_uvw, a_atm = np.divmod(np.arange(n), n_atm)
+
+        cu, cv, cw = np.unravel_index(c_uvw, (nu,nv,nw))
+
+        du = np.mod(cu[np.newaxis,:]-cu[:,np.newaxis], nu)
+        dv = np.mod(cv[np.newaxis,:]-cv[:,np.newaxis], nv)
+        dw = np.mod(cw[np.newaxis,:]-cw[:,np.newaxis], nw)
+
+        d_uvw = np.ravel_multi_index((du,dv,dw), (nu,nv,nw))
+
+        Kijm = Kijkl[a_atm[:,np.newaxis],a_atm[np.newaxis,:],d_uvw]
+
+        np.testing.assert_array_almost_equal(Kijm, Qijm)
+
     def test_pairs(self):
 
         folder = os.path.abspath(os.path.join(directory, '..', 'data'))
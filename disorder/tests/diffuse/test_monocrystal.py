@@ -392,5 +392,150 @@ class test_transform(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(I, I_ref)
 
+    def test_runs(self):
+
+        a, b, c, alpha, beta, gamma = 5, 6, 7, np.pi/2, np.pi/3, np.pi/4
+
+        inv_constants = crystal.reciprocal(a, b, c, alpha, beta, gamma)
+
+        a_, b_, c_, alpha_, beta_, gamma_ = inv_constants
+
+        h_range, nh = [-1,1], 9
+        k_range, nk = [0,2], 11
+        l_range, nl = [-1,0], 5
+
+        nu, nv, nw, n_atm = 2, 5, 4, 2
+
+        u = np.array([0.2,0.1])
+        v = np.array([0.3,0.4])
+        w = np.array([0.4,0.5])
+
+        atm = np.array(['Fe','Mn'])
+        ion = np.array(['Fe3+','Mn3+'])
+        occupancy = np.array([0.75,0.5])
+        g = np.array([2.,2.])
+
+        U11 = np.array([0.5,0.3])
+        U22 = np.array([0.6,0.4])
+        U33 = np.array([0.4,0.6])
+        U23 = np.array([0.05,-0.03])
+        U13 = np.array([-0.04,0.02])
+        U12 = np.array([0.03,-0.02])
+
+        U = np.array([U11,U22,U33,U23,U13,U12])
+
+        twins = np.eye(3).reshape(1,3,3)
+        variants = np.array([1.0])
+        W = np.eye(3)
+
+        A = crystal.cartesian(a, b, c, alpha, beta, gamma)
+        B = crystal.cartesian(a_, b_, c_, alpha_, beta_, gamma_)
+        R = crystal.cartesian_rotation(a, b, c, alpha, beta, gamma)
+        D = crystal.cartesian_displacement(a, b, c, alpha, beta, gamma)
+
+        ux, uy, uz = crystal.transform(u, v, w, A)
+
+        reduced_params = space.reduced(h_range, k_range, l_range,
+                                       nh, nk, nl, nu, nv, nw, W, 'mmm')
+
+        indices, reverses, symops, Nu, Nv, Nw = reduced_params
+
+        symop = symmetry.laue_id(symops)
+
+        trans = h_range, k_range, l_range, indices, symop, W, B, R, D, \
+                twins, variants, nh, nk, nl, nu, nv, nw, Nu, Nv, Nw
+
+        S = [magnetic.spin(nu, nv, nw, n_atm) for _ in range(3)]
+
+        I = [monocrystal.magnetic(*spins, occupancy, *U, ux, uy, uz, ion,
+                                  *trans, g) for spins in S]
+
+        I_mean, sigma_sq = monocrystal.magnetic(*np.stack(S, axis=1),
+                                                occupancy, *U, ux, uy, uz,
+                                                ion, *trans, g)
+
+        np.testing.assert_array_almost_equal(I_mean, np.mean(I, axis=0))
+        np.testing.assert_array_almost_equal(sigma_sq, np.var(I, axis=0))
+
+        S_k = monocrystal.reciprocal(np.stack(S, axis=1), nu, nv, nw, n_atm)
+
+        I_k, _ = monocrystal.magnetic(*S_k, occupancy, *U, ux, uy, uz, ion,
+                                      *trans, g)
+
+        np.testing.assert_array_equal(I_k, I_mean)
+
+        A_r = [occupational.composition(nu, nv, nw, n_atm, value=occupancy)
+               for _ in range(3)]
+
+        I = [monocrystal.occupational(A, occupancy, *U, ux, uy, uz, atm,
+                                      *trans) for A in A_r]
+
+        I_mean, sigma_sq = monocrystal.occupational(np.stack(A_r), occupancy,
+                                                    *U, ux, uy, uz, atm,
+                                                    *trans)
+
+        np.testing.assert_array_almost_equal(I_mean, np.mean(I, axis=0))
+        np.testing.assert_array_almost_equal(sigma_sq, np.var(I, axis=0))
+
+        p = 2
+
+        coeffs = displacive.coefficients(p)
+
+        even, odd = displacive.indices(p)
+
+        U_r = [displacive.products(*displacive.expansion(nu, nv, nw, n_atm,
+                                                         value=U), p)
+               for _ in range(3)]
+
+        trans = h_range, k_range, l_range, indices, symop, W, B, R, \
+                twins, variants, nh, nk, nl, nu, nv, nw, Nu, Nv, Nw
+
+        disp = p, even, 1
+
+        I = [monocrystal.displacive(V, coeffs, occupancy, ux, uy, uz, atm,
+                                    *trans, *disp) for V in U_r]
+
+        I_mean, sigma_sq = monocrystal.displacive(np.stack(U_r), coeffs,
+                                                  occupancy, ux, uy, uz, atm,
+                                                  *trans, *disp)
+
+        np.testing.assert_array_almost_equal(I_mean, np.mean(I, axis=0))
+        np.testing.assert_array_almost_equal(sigma_sq, np.var(I, axis=0))
+
+        U_k = monocrystal.reciprocal(np.stack(U_r), nu, nv, nw, n_atm)
+
+        I_k, _ = monocrystal.displacive(U_k, coeffs, occupancy, ux, uy, uz,
+                                        atm, *trans, *disp)
+
+        np.testing.assert_array_equal(I_k, I_mean)
+
+    def test_idft(self):
+
+        nu, nv, nw, n_atm = 2, 3, 4, 2
+
+        Fu, Fv, Fw = 3, 2, 1
+
+        Nu, Nv, Nw = nu*Fu, nv*Fv, nw*Fw
+
+        X = np.random.random((2,nu,nv,nw,n_atm))
+
+        X_k = monocrystal.idft_many(X)
+
+        np.testing.assert_array_almost_equal(monocrystal.idft(X[1]), X_k[1])
+
+        U = np.tile(X, (1,Fu,Fv,Fw,1))
+
+        U_k = np.fft.ifftn(U, axes=(1,2,3))
+
+        H, K, L = np.meshgrid(np.arange(Nu), np.arange(Nv), np.arange(Nw),
+                              indexing='ij')
+
+        mask = (H % Fu == 0) & (K % Fv == 0) & (L % Fw == 0)
+
+        np.testing.assert_array_almost_equal(U_k[:,~mask], 0)
+
+        np.testing.assert_array_almost_equal(U_k[:,mask],
+                                             X_k.reshape(2,-1,n_atm))
+
 if __name__ == '__main__':
     unittest.main()
@@ -97,6 +97,13 @@ class test_powder(unittest.TestCase):
 
         self.assertLess(np.sqrt(np.mean((I/I_ref-1)**2)), 0.05)
 
+        I_hist = powder.magnetic(Sx, Sy, Sz, occupancy,
+                                 U11, U22, U33, U23, U13, U12,
+                                 rx, ry, rz, atms, Q, A, D, nu, nv, nw, g,
+                                 width=0.001)
+
+        np.testing.assert_allclose(I_hist, I, atol=1e-3*np.abs(I).max())
+
     def test_occupational(self):
 
         np.random.seed(13)
@@ -186,6 +193,13 @@ class test_powder(unittest.TestCase):
 
         self.assertLess(np.sqrt(np.mean((I_diff/I_ref-1)**2)), 0.05)
 
+        I_hist = powder.occupational(A_r, occupancy,
+                                     U11, U22, U33, U23, U13, U12,
+                                     rx, ry, rz, atms, Q, A, D, nu, nv, nw,
+                                     width=0.001)
+
+        np.testing.assert_allclose(I_hist, I, atol=1e-3*np.abs(I).max())
+
     def test_displacive(self):
 
         np.random.seed(13)
@@ -297,5 +311,57 @@ class test_powder(unittest.TestCase):
 
         self.assertLess(np.sqrt(np.mean((I_diff/I_ref-1)**2)), 0.1)
 
+        I_hist = powder.displacive(Ux, Uy, Uz, occupancy,
+                                   rx, ry, rz, atms, Q, A, D, nu, nv, nw, 3,
+                                   width=0.001)
+
+        np.testing.assert_allclose(I_hist, I, atol=1e-3*np.abs(I).max())
+
+    def test_histogram(self):
+
+        np.random.seed(13)
+
+        a, b, c, alpha, beta, gamma = 5, 6, 7, np.pi/2, np.pi/3, np.pi/4
+
+        nu, nv, nw, n_atm = 8, 8, 8, 2
+
+        u = np.array([0.2,0.1])
+        v = np.array([0.3,0.4])
+        w = np.array([0.4,0.5])
+
+        atm = np.array(['Fe','Mn'])
+
+        A = crystal.cartesian(a, b, c, alpha, beta, gamma)
+
+        ux, uy, uz = crystal.transform(u, v, w, A)
+
+        ix, iy, iz = space.cell(nu, nv, nw, A)
+
+        rx, ry, rz, atms = space.real(ux, uy, uz, ix, iy, iz, atm)
+
+        A_r = occupational.composition(nu, nv, nw, n_atm, value=0.5)
+
+        width, r_max = 0.001, 12
+
+        args = rx, ry, rz, A_r, A_r, A_r, A, nu, nv, nw, n_atm, width
+
+        r, weights = powder.histogram(*args)
+
+        r_cut, weights_cut = powder.histogram(*args, r_max=r_max)
+
+        self.assertTrue(r_cut.max() < r_max+width)
+
+        mask = r < r_max-width
+
+        np.testing.assert_array_almost_equal(r_cut[r_cut < r_max-width],
+                                             r[mask])
+        np.testing.assert_allclose(weights_cut[...,r_cut < r_max-width],
+                                   weights[...,mask])
+
+        r_box, weights_box = powder.histogram(*args, r_max=1e3)
+
+        np.testing.assert_array_equal(r_box, r)
+        np.testing.assert_allclose(weights_box, weights)
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 import io
 import os
 import sys
+import threading
 
 import unittest
 import numpy as np
@@ -54,6 +55,41 @@ class test_refinement(unittest.TestCase):
                          ''.join(['id: {}\n'.format(i_thread) \
                                   for i_thread in range(int(num_threads))]))
 
+    def test_set_seed(self):
+
+        A = np.random.random(1024)
+
+        def sample(seed, n=32):
+            refinement.set_seed(seed)
+            return [refinement.original_scalar(A)[1] for _ in range(n)]
+
+        np.testing.assert_array_equal(sample(1), sample(1))
+        self.assertNotEqual(sample(1), sample(2))
+
+        results = {}
+
+        def worker(seed):
+            results[seed] = sample(seed)
+
+        pool = [threading.Thread(target=worker, args=(seed,)) \
+                for seed in range(4)]
+        for thread in pool: thread.start()
+        for thread in pool: thread.join()
+
+        for seed in range(4):
+            np.testing.assert_array_equal(results[seed], sample(seed))
+
+        def unseeded(thread):
+            results[thread] = [refinement.original_scalar(A)[1] \
+                               for _ in range(32)]
+
+        pool = [threading.Thread(target=unseeded, args=(thread,)) \
+                for thread in ['a', 'b']]
+        for thread in pool: thread.start()
+        for thread in pool: thread.join()
+
+        self.assertNotEqual(results['a'], results['b'])
+
     def test_original_scalar(self):
 
         A = np.random.random(16)
@@ -395,6 +431,66 @@ class test_refinement(unittest.TestCase):
 
         self.assertAlmostEqual(chi_sq, np.sum((2*y_fit+3-y_obs)**2/e**2), 3)
 
+    def test_moment_chi_square(self):
+
+        n = 101
+
+        x = np.linspace(-3,3,n)
+
+        y_fit = 5*np.exp(-0.5*x**2)
+        y_obs = 2*y_fit+0.01*(2*np.random.random(n)-1)+3
+
+        e = np.sqrt(y_obs)
+        weight = 1/e**2
+
+        i_unmask = np.arange(1,2*n,2)
+
+        y_flat = np.zeros(2*n)
+        y_flat[i_unmask] = y_fit
+
+        moments = refinement.experimental_moments(y_obs, weight)
+
+        sum_weight, sum_expt = moments
+
+        self.assertAlmostEqual(sum_weight, np.sum(weight))
+        self.assertAlmostEqual(sum_expt, np.sum(weight*y_obs))
+
+        y_calc = np.zeros(n)
+
+        chi_sq, scale, level = refinement.moment_chi_square(y_flat,
+                                                            y_calc,
+                                                            y_obs,
+                                                            weight,
+                                                            i_unmask,
+                                                            *moments)
+
+        np.testing.assert_array_equal(y_calc, y_fit)
+
+        ref = refinement.reduced_chi_square(y_fit, y_obs, weight)
+
+        self.assertAlmostEqual(chi_sq, ref[0], 6)
+        self.assertAlmostEqual(scale, ref[1])
+        self.assertAlmostEqual(level, ref[2])
+
+        y_obs = 2*y_fit+1e3+1e-6*(2*np.random.random(n)-1)
+        weight = np.full(n, 1e2)
+
+        moments = refinement.experimental_moments(y_obs, weight)
+
+        chi_sq, scale, level = refinement.moment_chi_square(y_flat,
+                                                            y_calc,
+                                                            y_obs,
+                                                            weight,
+                                                            i_unmask,
+                                                            *moments)
+
+        ref = refinement.reduced_chi_square(y_fit, y_obs, weight)
+
+        exact = np.sum(weight*(scale*y_fit+level-y_obs)**2)
+
+        self.assertAlmostEqual(chi_sq/exact, 1, 6)
+        self.assertAlmostEqual(ref[0]/exact, 1, 6)
+
     def test_products(self):
 
         Vx, Vy, Vz = 1.2, 2.3, 1.75
@@ -614,6 +710,23 @@ class test_refinement(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(A_k_cand, A_k[j::n_atm]*n_uvw)
 
+        space_factor = space.factor(nu, nv, nw, separable=True)
+
+        self.assertEqual(space_factor.size, nu**2+nv**2+nw**2)
+
+        A_r_orig, A_k_orig = A_r[i].copy(), A_k_cand.copy()
+
+        A_r_cand = np.random.random()
+
+        refinement.update_composition(A_k_cand, A_r_cand, A_k_orig, A_r_orig,
+                                      space_factor, i, nu, nv, nw, n_atm)
+
+        A_r[i] = A_r_cand
+
+        A_k = np.fft.ifftn(A_r.reshape(nu,nv,nw,n_atm), axes=(0,1,2)).flatten()
+
+        np.testing.assert_array_almost_equal(A_k_cand, A_k[j::n_atm]*n_uvw)
+
     def test_update_composition_molecule(self):
 
         nu, nv, nw, n_atm = 2, 3, 4, 3
@@ -704,6 +817,22 @@ class test_refinement(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(U_k_cand, U_k[j::n_atm]*n_uvw)
 
+        space_factor = space.factor(nu, nv, nw, separable=True)
+
+        U_r_orig, U_k_orig = U_r[i+n*np.arange(n_prod)], U_k_cand.copy()
+
+        U_r_cand = np.random.random(n_prod)
+
+        refinement.update_expansion(U_k_cand, U_r_cand, U_k_orig, U_r_orig,
+                                    space_factor, i, nu, nv, nw, n_atm)
+
+        U_r[i+n*np.arange(n_prod)] = U_r_cand
+
+        U_k = np.fft.ifftn(U_r.reshape(n_prod,nu,nv,nw,n_atm), axes=(1,2,3))
+        U_k = U_k.flatten()
+
+        np.testing.assert_array_almost_equal(U_k_cand, U_k[j::n_atm]*n_uvw)
+
     def test_update_expansion_molecule(self):
 
         nu, nv, nw, n_atm = 2, 3, 4, 3
@@ -1740,17 +1869,11 @@ class test_refinement(unittest.TestCase):
 
         a_filt = np.zeros(mask.size, dtype=float)
         b_filt = np.zeros(mask.size, dtype=float)
-        c_filt = np.zeros(mask.size, dtype=float)
-        d_filt = np.zeros(mask.size, dtype=float)
-        e_filt = np.zeros(mask.size, dtype=float)
-        f_filt = np.zeros(mask.size, dtype=float)
-        g_filt = np.zeros(mask.size, dtype=float)
-        h_filt = np.zeros(mask.size, dtype=float)
-        i_filt = np.zeros(mask.size, dtype=float)
 
         v_inv = filters.gaussian(mask, sigma)
 
         boxes = filters.boxblur(sigma, 3)
+        coeffs_filt = np.zeros((0,13))
 
         acc_moves, acc_temps, rej_moves, rej_temps = [], [], [], [],
         energy, scale, level, chi_sq, temperature = [], [], [], [np.inf], [100]
@@ -1774,10 +1897,9 @@ class test_refinement(unittest.TestCase):
                             prod_x_cand, prod_y_cand, prod_z_cand,
                             space_factor, factors, moment, I_calc, I_expt,
                             inv_sigma_sq, I_raw, I_flat, I_ref, v_inv,
-                            a_filt, b_filt, c_filt,
-                            d_filt, e_filt, f_filt,
-                            g_filt, h_filt, i_filt,
-                            boxes, i_dft, inverses, i_mask, i_unmask,
+                            a_filt, b_filt,
+                            boxes, coeffs_filt,
+                            i_dft, inverses, i_mask, i_unmask,
                             acc_moves, acc_temps, rej_moves, rej_temps, chi_sq,
                             energy, temperature, scale, level, constant, fixed,
                             heisenberg, nh, nk, nl, nu, nv, nw, n_atm, n, N)
@@ -1897,17 +2019,11 @@ class test_refinement(unittest.TestCase):
 
         a_filt = np.zeros(mask.size, dtype=float)
         b_filt = np.zeros(mask.size, dtype=float)
-        c_filt = np.zeros(mask.size, dtype=float)
-        d_filt = np.zeros(mask.size, dtype=float)
-        e_filt = np.zeros(mask.size, dtype=float)
-        f_filt = np.zeros(mask.size, dtype=float)
-        g_filt = np.zeros(mask.size, dtype=float)
-        h_filt = np.zeros(mask.size, dtype=float)
-        i_filt = np.zeros(mask.size, dtype=float)
 
         v_inv = filters.gaussian(mask, sigma)
 
         boxes = filters.boxblur(sigma, 3)
+        coeffs_filt = np.zeros((0,13))
 
         acc_moves, acc_temps, rej_moves, rej_temps = [], [], [], [],
         energy, scale, level, chi_sq, temperature = [], [], [], [np.inf], [100]
@@ -1925,14 +2041,13 @@ class test_refinement(unittest.TestCase):
                                 space_factor, factors, occupancy,
                                 I_calc, I_expt, inv_sigma_sq,
                                 I_raw, I_flat, I_ref, v_inv,
-                                a_filt, b_filt, c_filt,
-                                d_filt, e_filt, f_filt,
-                                g_filt, h_filt, i_filt,
-                                boxes, i_dft, inverses, i_mask, i_unmask,
+                                a_filt, b_filt,
+                                boxes, coeffs_filt,
+                                i_dft, inverses, i_mask, i_unmask,
                                 acc_moves, acc_temps, rej_moves, rej_temps,
                                 chi_sq, energy, temperature, scale, level,
                                 constant, fixed, nh, nk, nl,
-                                nu, nv, nw, n_atm, n, N)
+                                nu, nv, nw, n_atm, n, N, 10)
 
         I_ref = occupational.intensity(A_k, i_dft, factors)
 
@@ -2086,17 +2201,11 @@ class test_refinement(unittest.TestCase):
 
         a_filt = np.zeros(mask.size, dtype=float)
         b_filt = np.zeros(mask.size, dtype=float)
-        c_filt = np.zeros(mask.size, dtype=float)
-        d_filt = np.zeros(mask.size, dtype=float)
-        e_filt = np.zeros(mask.size, dtype=float)
-        f_filt = np.zeros(mask.size, dtype=float)
-        g_filt = np.zeros(mask.size, dtype=float)
-        h_filt = np.zeros(mask.size, dtype=float)
-        i_filt = np.zeros(mask.size, dtype=float)
 
         v_inv = filters.gaussian(mask, sigma)
 
         boxes = filters.boxblur(sigma, 3)
+        coeffs_filt = np.zeros((0,13))
 
         acc_moves, acc_temps, rej_moves, rej_temps = [], [], [], [],
         energy, scale, level, chi_sq, temperature = [], [], [], [np.inf], [10]
@@ -2119,10 +2228,9 @@ class test_refinement(unittest.TestCase):
                               coeffs, Q_k, Lxx, Lyy, Lzz, Lyz, Lxz, Lxy,
                               I_calc, I_expt, inv_sigma_sq,
                               I_raw, I_flat, I_ref, v_inv,
-                              a_filt, b_filt, c_filt,
-                              d_filt, e_filt, f_filt,
-                              g_filt, h_filt, i_filt,
-                              bragg, even, boxes, i_dft, inverses, i_mask,
+                              a_filt, b_filt,
+                              bragg, even, boxes, coeffs_filt,
+                              i_dft, inverses, i_mask,
                               i_unmask, acc_moves, acc_temps, rej_moves,
                               rej_temps, chi_sq, energy, temperature, scale,
                               level, constant, fixed, isotropic, p, nh, nk, nl,
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 
+import os
+import tempfile
 import unittest
+
+import h5py
 import numpy as np
 
 from disorder.material import crystal
+from disorder.material.structure import SuperCell
 from disorder.diffuse import space, scattering
 
+directory = os.path.dirname(os.path.abspath(__file__))
+
 class test_scattering(unittest.TestCase):
 
     def test_length(self):
@@ -109,5 +116,194 @@ class test_scattering(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(phase_factor, 1+0j)
 
+    def test_magnetic_refinement(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        cwd = os.getcwd()
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            os.chdir(tmp)
+
+            filename = os.path.join(tmp, 'data.nxs')
+
+            np.random.seed(13)
+
+            with h5py.File(filename, 'w') as f:
+                data = f.create_group('disorder/data')
+                data['signal'] = np.random.random((5,5,5))
+                data['errors_squared'] = np.random.random((5,5,5))+0.1
+                data['h'] = np.linspace(-2,2,6)
+                data['k'] = np.linspace(-2,2,6)
+                data['l'] = np.linspace(-2,2,6)
+
+            sc = SuperCell(os.path.join(folder, 'MnO.mcif'), 2, 2, 2)
+
+            ref = scattering.Refinement(sc, filename)
+
+            spins = []
+
+            for workers in [2, 3]:
+
+                np.random.seed(13)
+
+                ref.initialize_refinement(1, 0.1)
+                ref.magnetic_refinement(1, [1,1,1], batch=3, workers=workers,
+                                        threads=1, seed=0)
+
+                spins.append([sc._Sx, sc._Sy, sc._Sz])
+
+            for seed in [None, None]:
+
+                sc._Sx, sc._Sy, sc._Sz = [[np.copy(S_b) for S_b in S]
+                                          for S in spins[0]]
+
+                ref.magnetic_refinement(1, [1,1,1], batch=3, threads=1,
+                                        seed=seed, reset=False)
+
+                spins.append([sc._Sx, sc._Sy, sc._Sz])
+
+            chi_sq = []
+
+            for recheck in [0, 4]:
+
+                np.random.seed(13)
+
+                ref.initialize_refinement(1, 0.1)
+                ref.magnetic_refinement(2, [1,1,1], recheck=recheck, seed=0)
+
+                chi_sq.append(ref.get_statistics()[0])
+
+            os.chdir(cwd)
+
+        np.testing.assert_array_equal(spins[0], spins[1])
+
+        self.assertFalse(np.array_equal(spins[2], spins[3]))
+
+        np.testing.assert_allclose(chi_sq[0], chi_sq[1], rtol=1e-9)
+
+    def test_interaction_cache(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        sc = SuperCell(os.path.join(folder, 'copper.cif'), 4, 4, 4)
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            sim = scattering.Simulation(sc, cache=tmp)
+
+            self.assertEqual(os.listdir(tmp), [])
+
+            Qijkl = sim.get_dipole_dipole_matrix()
+            Kijkl = sim.get_dipole_dipole_kernel()
+
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+            sim = scattering.Simulation(sc, cache=tmp)
+
+            Q, K = sim.get_dipole_dipole_matrix(), sim.get_dipole_dipole_kernel()
+
+            np.testing.assert_array_equal(Q, Qijkl)
+            np.testing.assert_array_equal(K, Kijkl)
+
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+            sc.set_super_cell_extents(4, 4, 2)
+
+            sim = scattering.Simulation(sc, cache=tmp)
+
+            Kijkl = sim.get_dipole_dipole_kernel()
+
+            self.assertEqual(Kijkl.shape[2], 4*4*2)
+            self.assertEqual(len(os.listdir(tmp)), 3)
+
+            version = scattering._ewald_format
+
+            try:
+
+                scattering._ewald_format = version+1
+
+                sim = scattering.Simulation(sc, cache=tmp)
+
+                sim.get_dipole_dipole_kernel()
+
+                self.assertEqual(len(os.listdir(tmp)), 4)
+
+            finally:
+
+                scattering._ewald_format = version
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            home = os.environ.get('XDG_CACHE_HOME')
+
+            try:
+
+                os.environ['XDG_CACHE_HOME'] = tmp
+
+                sim = scattering.Simulation(sc)
+
+                sim.get_dipole_dipole_kernel()
+
+                self.assertEqual(os.listdir(tmp), [])
+
+                sim = scattering.Simulation(sc, cache=True)
+
+                sim.get_dipole_dipole_kernel()
+
+                cache = os.path.join(tmp, 'rmc-discord')
+
+                self.assertEqual(len(os.listdir(cache)), 1)
+
+            finally:
+
+                if home is None:
+                    del os.environ['XDG_CACHE_HOME']
+                else:
+                    os.environ['XDG_CACHE_HOME'] = home
+
+    def test_intensity_sampling(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        sc = SuperCell(os.path.join(folder, 'copper.cif'), 4, 4, 4)
+
+        sim = scattering.Simulation(sc, cache=None)
+
+        J = sim.get_magnetic_exchange_interaction_matrices()
+        J[0] = -np.eye(3)
+        sim.set_magnetic_exchange_interaction_matrices(J)
+
+        extents, bins, W = [[-2,2],[-2,2],[-2,2]], [9,9,9], np.eye(3)
+
+        sim.initialize_sampling(extents, bins, W, interval=2)
+
+        sim.magnetic_simulation(2)
+
+        I, sigma_sq, n = sim.get_sampled_intensity()
+
+        I_ref, _ = sc.magnetic_single_crystal_intensity(extents, bins, W)
+
+        self.assertEqual(n, 1)
+        np.testing.assert_array_almost_equal(I, I_ref)
+        np.testing.assert_array_almost_equal(sigma_sq, 0)
+
+        sim.magnetic_simulation(4)
+
+        I, sigma_sq, n = sim.get_sampled_intensity()
+
+        self.assertEqual(n, 3)
+        self.assertEqual(I.shape, tuple(bins))
+        self.assertTrue((sigma_sq >= 0).all())
+
+        sim.initialize_sampling(extents, bins, W, interval=2)
+
+        sim.magnetic_simulation(4, n_over=2)
+
+        I, sigma_sq, n = sim.get_sampled_intensity()
+
+        self.assertEqual(n, 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -143,6 +143,52 @@ class test_simulation(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(p, p0)
 
+    def test_dipole_dipole_kernel_potential(self):
+
+        nu, nv, nw, n_atm = 2, 4, 6, 2
+
+        M = 2
+
+        Sx = np.random.random((nu,nv,nw,n_atm,M))
+        Sy = np.random.random((nu,nv,nw,n_atm,M))
+        Sz = np.random.random((nu,nv,nw,n_atm,M))
+
+        u = np.array([0.2,0.3])
+        v = np.array([0.5,0.4])
+        w = np.array([0.7,0.2])
+
+        atm = np.array(['',''])
+
+        a, b, c, alpha, beta, gamma = 5, 6, 7, np.pi/2, np.pi/2, 2*np.pi/3
+
+        A = crystal.cartesian(a, b, c, alpha, beta, gamma)
+        B = crystal.cartesian(*crystal.reciprocal(a, b, c, alpha, beta, gamma))
+        R = crystal.cartesian_rotation(a, b, c, alpha, beta, gamma)
+
+        Rx, Ry, Rz = space.cell(nu, nv, nw, A)
+
+        ux, uy, uz = crystal.transform(u, v, w, A)
+
+        rx, ry, rz, atms = space.real(ux, uy, uz, Rx, Ry, Rz, atm)
+
+        Q = interaction.dipole_dipole_matrix(rx, ry, rz,
+                                             nu, nv, nw,
+                                             n_atm, A, B, R)
+
+        K = interaction.dipole_dipole_kernel(rx, ry, rz,
+                                             nu, nv, nw,
+                                             n_atm, A, B, R)
+
+        p0 = simulation.dipole_dipole_interaction_potential(Sx, Sy, Sz, Q)
+        p = simulation.dipole_dipole_kernel_potential(Sx, Sy, Sz, K)
+
+        np.testing.assert_array_almost_equal(p, p0)
+
+        e0 = simulation.dipole_dipole_interaction_energy(Sx, Sy, Sz, Q)
+        e = simulation.dipole_dipole_kernel_energy(Sx, Sy, Sz, K)
+
+        np.testing.assert_array_almost_equal(e, e0)
+
     def test_magnetic_energy(self):
 
         nu, nv, nw = 3, 4, 5
@@ -234,6 +280,20 @@ class test_simulation(unittest.TestCase):
         self.assertAlmostEqual(E[...,1].sum(), -(0.5*Jy*n_pair+Ky+By*gy)*n)
         self.assertAlmostEqual(E[...,2].sum(), -(0.5*Jz*n_pair+Kz+Bz*gz)*n)
 
+        args = Sx, Sy, Sz, J, K, g, B, atm_ind, img_i, img_j, img_k, \
+               pair_ind, pair_trans
+
+        E_tot = simulation.magnetic_energy_reduced(*args)
+        E_site = simulation.magnetic_energy_reduced(*args, 'site')
+        E_pair = simulation.magnetic_energy_reduced(*args, 'pair')
+
+        np.testing.assert_array_almost_equal(E_tot, E.sum(axis=(0,1,2,3,4)))
+        np.testing.assert_array_almost_equal(E_site, E.sum(axis=4))
+        E_field = E[...,-2:,:].sum(axis=(0,1,2,3))
+
+        np.testing.assert_array_almost_equal(E_pair[-2:], E_field)
+        np.testing.assert_array_almost_equal(E_pair.sum(axis=0), E_tot)
+
     def test_structural_energy(self):
 
         nu, nv, nw = 3, 4, 5
@@ -329,6 +389,20 @@ class test_simulation(unittest.TestCase):
         self.assertAlmostEqual(E[...,2].sum(),
                                -(0.5*(J0-K0*(r*eta0)**2)*n_pair-H0)*n)
 
+        args = sigma, Ux, Uy, Uz, J, H, K, eta, dx, dy, dz, d, atm_ind, \
+               img_i, img_j, img_k, pair_ind
+
+        E_tot = simulation.structural_energy_reduced(*args)
+        E_site = simulation.structural_energy_reduced(*args, 'site')
+        E_pair = simulation.structural_energy_reduced(*args, 'pair')
+
+        np.testing.assert_array_almost_equal(E_tot, E.sum(axis=(0,1,2,3,4)))
+        np.testing.assert_array_almost_equal(E_site, E.sum(axis=4))
+        E_field = E[...,-1,:].sum(axis=(0,1,2,3))
+
+        np.testing.assert_array_almost_equal(E_pair[-1], E_field)
+        np.testing.assert_array_almost_equal(E_pair.sum(axis=0), E_tot)
+
     def test_heisenberg(self):
 
         np.random.seed(13)
@@ -398,14 +472,18 @@ class test_simulation(unittest.TestCase):
 
         B[:] = Bx, By, Bz
 
-        n = nu*nv*nw*n_atm
-
-        Q = np.random.random((n*(n+1)//2,6))
-
         ix, iy, iz = space.cell(nu, nv, nw, A)
 
         rx, ry, rz, ion = space.real(ux, uy, uz, ix, iy, iz, atm)
 
+        inv_constants = crystal.reciprocal(a, b, c, alpha, beta, gamma)
+
+        R = crystal.cartesian_rotation(a, b, c, alpha, beta, gamma)
+        D = crystal.cartesian(*inv_constants)
+
+        Q = interaction.dipole_dipole_kernel(rx, ry, rz, nu, nv, nw,
+                                             n_atm, A, D, R)*a**3
+
         M, N = 6, 15
 
         T0, T1 = 10, 25
@@ -429,12 +507,64 @@ class test_simulation(unittest.TestCase):
                                            img_i, img_j, img_k,
                                            pair_ind, pair_trans)
 
-        V_ref = simulation.dipole_dipole_interaction_energy(Sx, Sy, Sz, Q)
+        V_ref = simulation.dipole_dipole_kernel_energy(Sx, Sy, Sz, Q)
 
         E0 = E_ref.sum(axis=(0,1,2,3,4))+V_ref.sum(axis=(0,1,2))
 
         np.testing.assert_array_almost_equal(E, E0)
 
+        E, T_range = simulation.heisenberg(Sx, Sy, Sz, J, K, g, B, Q, atm_ind,
+                                           img_i, img_j, img_k, pair_ind,
+                                           pair_trans, T_range, kB, N, True)
+
+        E_ref = simulation.magnetic_energy(Sx, Sy, Sz, J, K, g, B, atm_ind,
+                                           img_i, img_j, img_k,
+                                           pair_ind, pair_trans)
+
+        V_ref = simulation.dipole_dipole_kernel_energy(Sx, Sy, Sz, Q)
+
+        E0 = E_ref.sum(axis=(0,1,2,3,4))+V_ref.sum(axis=(0,1,2))
+
+        np.testing.assert_array_almost_equal(E, E0)
+
+        Q = np.zeros_like(Q)
+
+        E, T_range = simulation.heisenberg(Sx, Sy, Sz, J, K, g, B, Q, atm_ind,
+                                           img_i, img_j, img_k, pair_ind,
+                                           pair_trans, T_range, kB, N, True)
+
+        E_ref = simulation.magnetic_energy(Sx, Sy, Sz, J, K, g, B, atm_ind,
+                                           img_i, img_j, img_k,
+                                           pair_ind, pair_trans)
+
+        E0 = E_ref.sum(axis=(0,1,2,3,4))
+
+        np.testing.assert_array_almost_equal(E, E0)
+
+        E, T_range = simulation.heisenberg(Sx, Sy, Sz, J, K, g, B, Q, atm_ind,
+                                           img_i, img_j, img_k, pair_ind,
+                                           pair_trans, T_range, kB, N, False, 2)
+
+        E_ref = simulation.magnetic_energy(Sx, Sy, Sz, J, K, g, B, atm_ind,
+                                           img_i, img_j, img_k,
+                                           pair_ind, pair_trans)
+
+        E0 = E_ref.sum(axis=(0,1,2,3,4))
+
+        np.testing.assert_array_almost_equal(E, E0)
+
+        E, T_range = simulation.heisenberg(Sx, Sy, Sz, J, K, g, B, Q, atm_ind,
+                                           img_i, img_j, img_k, pair_ind,
+                                           pair_trans, T_range, kB, N, True, 2)
+
+        E_ref = simulation.magnetic_energy(Sx, Sy, Sz, J, K, g, B, atm_ind,
+                                           img_i, img_j, img_k,
+                                           pair_ind, pair_trans)
+
+        E0 = E_ref.sum(axis=(0,1,2,3,4))
+
+        np.testing.assert_array_almost_equal(E, E0)
+
     def test_size_effect(self):
 
         np.random.seed(13)
@@ -534,6 +664,19 @@ class test_simulation(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(E, E0)
 
+        E, T_range = simulation.size_effect(sigma, Ux, Uy, Uz, J, H, K, eta,
+                                            dx, dy, dz, d, atm_ind,
+                                            img_i, img_j, img_k, pair_ind,
+                                            T_range, kB, N, True)
+
+        E_ref = simulation.structural_energy(sigma, Ux, Uy, Uz, J, H, K, eta,
+                                             dx, dy, dz, d, atm_ind,
+                                             img_i, img_j, img_k, pair_ind)
+
+        E0 = E_ref.sum(axis=(0,1,2,3,4))
+
+        np.testing.assert_array_almost_equal(E, E0)
+
     def test_heisenberg_cluster(self):
 
         np.random.seed(13)
@@ -603,14 +746,18 @@ class test_simulation(unittest.TestCase):
 
         B[:] = Bx, By, Bz
 
-        n = nu*nv*nw*n_atm
-
-        Q = np.random.random((n*(n+1)//2,6))*0
-
         ix, iy, iz = space.cell(nu, nv, nw, A)
 
         rx, ry, rz, ion = space.real(ux, uy, uz, ix, iy, iz, atm)
 
+        inv_constants = crystal.reciprocal(a, b, c, alpha, beta, gamma)
+
+        R = crystal.cartesian_rotation(a, b, c, alpha, beta, gamma)
+        D = crystal.cartesian(*inv_constants)
+
+        Q = interaction.dipole_dipole_kernel(rx, ry, rz, nu, nv, nw,
+                                             n_atm, A, D, R)*a**3
+
         M, N = 2, 15
 
         T0, T1 = 10, 25
@@ -636,7 +783,7 @@ class test_simulation(unittest.TestCase):
                                            img_i, img_j, img_k,
                                            pair_ind, pair_trans)
 
-        V_ref = simulation.dipole_dipole_interaction_energy(Sx, Sy, Sz, Q)
+        V_ref = simulation.dipole_dipole_kernel_energy(Sx, Sy, Sz, Q)
 
         E0 = E_ref.sum(axis=(0,1,2,3,4))+V_ref.sum(axis=(0,1,2))
 
@@ -132,6 +132,13 @@ class test_space(unittest.TestCase):
 
         self.assertAlmostEqual(phase_factor[ri+nu*ki,rj+nv*kj,rk+nw*kk], value)
 
+        pf_u, pf_v, pf_w = np.split(space.factor(nu, nv, nw, separable=True),
+                                    [nu**2,nu**2+nv**2])
+
+        separable_factor = np.einsum('i,j,k->ijk', pf_u, pf_v, pf_w)
+
+        np.testing.assert_array_almost_equal(separable_factor, phase_factor)
+
     def test_unit(self):
 
         theta = 2*np.pi*np.random.rand((10))
@@ -864,5 +871,65 @@ class test_space(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(data[index][reverses], data)
 
+    def test_cached(self):
+
+        h_range, nh = [-2,2], 17
+        k_range, nk = [-2,2], 17
+        l_range, nl = [-3,3], 25
+
+        nu, nv, nw = 2, 2, 3
+
+        W = np.array([[1,-1,0],[1,1,0],[0,0,1]])
+
+        mapping_params = space.mapping(h_range, k_range, l_range,
+                                       nh, nk, nl, nu, nv, nw, W, '4/mmm')
+
+        h, k, l, H, K, L, index, reverses, symops = mapping_params
+
+        np.testing.assert_array_equal(H, H[reverses][index])
+        np.testing.assert_array_equal(index[reverses][index], index)
+
+        h[:], index[:] = 0, 0
+
+        cached_params = space.mapping(h_range, k_range, l_range,
+                                      nh, nk, nl, nu, nv, nw, W, '4/mmm')
+
+        self.assertFalse(np.allclose(cached_params[0], 0))
+        np.testing.assert_array_equal(cached_params[6][cached_params[7]] \
+                                      [cached_params[6]], cached_params[6])
+
+        reduced_params = space.reduced(h_range, k_range, l_range,
+                                       nh, nk, nl, nu, nv, nw, W, '4/mmm')
+
+        cached_params = space.reduced(h_range, k_range, l_range,
+                                      nh, nk, nl, nu, nv, nw, W, '4/mmm')
+
+        for params, cached in zip(reduced_params, cached_params):
+            np.testing.assert_array_equal(params, cached)
+
+        self.assertEqual(np.unique(reduced_params[1]).size,
+                         reduced_params[0].size)
+
+        self.assertEqual(reduced_params[1].dtype, np.int32)
+
+        nbytes = space._cache_nbytes
+
+        try:
+
+            space._cache.clear()
+            space._cache_nbytes = reduced_params[0].nbytes
+
+            params = space.reduced(h_range, k_range, l_range,
+                                   nh, nk, nl, nu, nv, nw, W, '4/mmm')
+
+            self.assertEqual(len(space._cache), 0)
+
+            for param, cached in zip(params, cached_params):
+                np.testing.assert_array_equal(param, cached)
+
+        finally:
+
+            space._cache_nbytes = nbytes
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import unittest
+import numpy as np
+
+from disorder.material import crystal, neighbor
+from disorder.diffuse import space
+
+class test_neighbor(unittest.TestCase):
+
+    def test_offsets(self):
+
+        for nu, nv, nw in [(3,4,8),(1,2,5),(6,6,1)]:
+
+            s = neighbor.offsets(nu, nv, nw)
+
+            np.testing.assert_array_equal(s[0], [0,0,0])
+
+            mu, mv, mw = (nu+1)//2, (nv+1)//2, (nw+1)//2
+
+            self.assertEqual(s.shape[0], ((2*mu-1)*(2*mv-1)*(2*mw-1)+1)//2)
+
+            t = np.mod(np.concatenate((s,-s[1:])), [nu,nv,nw])
+
+            self.assertEqual(np.unique(t, axis=0).shape[0], 2*s.shape[0]-1)
+
+    def test_cells(self):
+
+        nu, nv, nw = 3, 4, 5
+
+        n_uvw = nu*nv*nw
+
+        pairs = [np.stack(neighbor.cells(s, nu, nv, nw))
+                 for s in neighbor.offsets(nu, nv, nw)[1:]]
+
+        i_lat, j_lat = np.concatenate(pairs, axis=1)
+
+        self.assertTrue((i_lat < j_lat).all())
+
+        k = i_lat*n_uvw+j_lat
+
+        self.assertEqual(np.unique(k).size, k.size)
+        self.assertEqual(k.size, n_uvw*(n_uvw-1)//2-n_uvw*(nu*nw)//2)
+
+        i_lat, j_lat = neighbor.lattice(nu, nv, nw)
+
+        np.testing.assert_array_equal(i_lat*n_uvw+j_lat, np.sort(k))
+
+    def test_pairs(self):
+
+        a, b, c, alpha, beta, gamma = 5, 6, 7, np.pi/2, np.pi/3, np.pi/4
+
+        A = crystal.cartesian(a, b, c, alpha, beta, gamma)
+
+        nu, nv, nw = 3, 4, 5
+
+        Rx, Ry, Rz = space.cell(nu, nv, nw, A)
+
+        atm = np.array(['Fe','Co','Ni'])
+        u = np.array([0.0,0.2,0.25])
+        v = np.array([0.01,0.31,0.1])
+        w = np.array([0.1,0.4,0.62])
+
+        ux, uy, uz = crystal.transform(u, v, w, A)
+
+        rx, ry, rz, atms = space.real(ux, uy, uz, Rx, Ry, Rz, atm)
+
+        np.random.seed(13)
+
+        rx += np.random.normal(scale=0.2, size=rx.size)
+        ry += np.random.normal(scale=0.2, size=ry.size)
+        rz += np.random.normal(scale=0.2, size=rz.size)
+
+        dx, dy, dz, i, j = neighbor.pairs(rx, ry, rz, nu, nv, nw, A)
+
+        d = np.sqrt(dx**2+dy**2+dz**2)
+
+        np.testing.assert_array_almost_equal(
+            (dx, dy, dz), neighbor.separation(rx, ry, rz, i, j, nu, nv, nw, A))
+
+        lower, upper = neighbor.bounds(rx, ry, rz, nu, nv, nw, A)
+
+        self.assertTrue((lower <= upper).all())
+
+        for fract in [0.1, 0.25, 0.5]:
+
+            data = neighbor.pairs(rx, ry, rz, nu, nv, nw, A, fract)
+
+            mask = d <= d.max()*fract
+
+            self.assertEqual(data[3].size, mask.sum())
+
+            np.testing.assert_array_equal(np.sort(data[3]*rx.size+data[4]),
+                                          np.sort(i[mask]*rx.size+j[mask]))
+
+if __name__ == '__main__':
+    unittest.main()
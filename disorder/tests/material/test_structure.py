@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import unittest
+import tracemalloc
 import numpy as np
 
 from disorder.material import structure, crystal
@@ -548,5 +549,77 @@ class test_structure(unittest.TestCase):
 
         os.remove(folder+'/test.h5')
 
+    def test_single_crystal_intensity(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        sc = structure.SuperCell(os.path.join(folder, 'copper.cif'), 3, 3, 3)
+
+        np.random.seed(13)
+
+        for _ in range(2):
+            sc.randomize_magnetic_moments()
+            sc.randomize_site_occupancies()
+            sc.randomize_atomic_displacements()
+
+        extents, bins, W = [[-2,2],[-2,2],[-3,3]], [9,11,13], np.eye(3)
+
+        for kind in ['magnetic', 'occupational', 'displacive']:
+
+            intensity = getattr(sc, kind+'_single_crystal_intensity')
+
+            I, sigma_sq = intensity(extents, bins, W, 'm-3m')
+
+            self.assertEqual(I.shape, tuple(bins))
+
+            for memory in [16, 1000]:
+
+                out = np.zeros(bins), np.zeros(bins)
+
+                data = intensity(extents, bins, W, 'm-3m', memory=memory,
+                                 out=out)
+
+                self.assertIs(data, out)
+
+                np.testing.assert_array_equal(data[0], I)
+                np.testing.assert_array_equal(data[1], sigma_sq)
+
+    def test_single_crystal_intensity_memory(self):
+
+        folder = os.path.abspath(os.path.join(directory, '..', 'data'))
+
+        sc = structure.SuperCell(os.path.join(folder, 'Cu3Au.cif'), 4, 4, 4)
+
+        np.random.seed(13)
+
+        sc.randomize_site_occupancies()
+
+        extents, bins, W = [[-4,4],[-4,4],[-4,4]], [41,41,41], np.eye(3)
+
+        sampler = sc.occupational_single_crystal_sampler(extents, bins, W)
+
+        *_, indices, inverses = sampler
+
+        I, sigma_sq = sc.occupational_single_crystal_intensity(extents, bins,
+                                                               W)
+
+        memory = 2**16
+
+        out = np.empty(bins), np.empty(bins)
+
+        tracemalloc.start()
+
+        sc.occupational_single_crystal_intensity(extents, bins, W,
+                                                 memory=memory, out=out)
+
+        _, peak = tracemalloc.get_traced_memory()
+
+        tracemalloc.stop()
+
+        self.assertLess(peak, indices.nbytes+inverses.nbytes+4*memory)
+
+        np.testing.assert_array_equal(out[0], I)
+        np.testing.assert_array_equal(out[1], sigma_sq)
+
 if __name__ == '__main__':
     unittest.main()
@@ -172,6 +172,36 @@ class test_symmetry(unittest.TestCase):
         np.testing.assert_array_equal(ind, [1,5,0,6])
         np.testing.assert_array_equal(inv, [2,0,2,0,2,1,3,3])
 
+    def test_seitz(self):
+
+        operators = [u'x,y,z', u'-y+1/2,x-y,z-1/2', u'-x+1/4,z,y+3/4,-1']
+
+        W, w = symmetry.seitz(operators)
+
+        np.testing.assert_array_equal(W[0], np.eye(3))
+        np.testing.assert_array_equal(W[1], [[0,-1,0],[1,-1,0],[0,0,1]])
+        np.testing.assert_array_equal(W[2], [[-1,0,0],[0,0,1],[0,1,0]])
+
+        np.testing.assert_array_almost_equal(w, [[0,0,0],
+                                                 [0.5,0,-0.5],
+                                                 [0.25,0,0.75]])
+
+        self.assertIs(symmetry.seitz(operators)[0], W)
+        self.assertFalse(W.flags.writeable)
+
+        W, w = symmetry.seitz([u'-my,mx-my,mz'], magnetic=True)
+
+        np.testing.assert_array_equal(W[0], [[0,-1,0],[1,-1,0],[0,0,1]])
+        np.testing.assert_array_equal(w[0], [0,0,0])
+
+        u, v, w = np.random.random((3,10))
+
+        transformed = symmetry.evaluate(operators, [u,v,w])
+        np.testing.assert_array_almost_equal(transformed[1],
+                                             [-v+0.5,u-v,w-0.5])
+        np.testing.assert_array_almost_equal(transformed[2],
+                                             [-u+0.25,w,v+0.75])
+
     def test_evaluate(self):
 
         operator = [u'-y+1/2,x-y,z-1/2']
@@ -7,6 +7,7 @@ from scipy import ndimage
 
 from disorder.diffuse import filters
 
+import time
 import pstats, cProfile
 
 class test_filters(unittest.TestCase):
@@ -37,6 +38,30 @@ class test_filters(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(w, x, decimal=1)
 
+    def test_recursion(self):
+
+        nh, nk, nl = 200, 200, 60
+
+        v = np.random.random(size=(nh,nk,nl))
+
+        timings = []
+
+        for sigma in [1,2,4,8,16]:
+
+            start = time.time()
+            filters.blurring(v, sigma)
+            box = time.time()-start
+
+            start = time.time()
+            filters.blurring(v, sigma, recursive=True)
+            recursive = time.time()-start
+
+            timings.append((sigma, box, recursive))
+
+        for sigma, box, recursive in timings:
+            print('sigma: {} box: {:.3f} s recursive: {:.3f} s'.format(
+                  sigma, box, recursive))
+
     def test_median(self):
 
         a = np.random.random((121,241,31))
@@ -51,5 +76,10 @@ class test_filters(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(b, c)
 
+        b = ndimage.median_filter(a, size=9, mode='nearest')
+        c, _ = filters.median_deviation(a, 9)
+
+        np.testing.assert_array_almost_equal(b, c)
+
 if __name__ == '__main__':
     unittest.main()
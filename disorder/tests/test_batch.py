@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from disorder import batch
+from disorder.material.structure import SuperCell
+
+directory = os.path.dirname(os.path.abspath(__file__))
+
+class test_batch(unittest.TestCase):
+
+    def test_load(self):
+
+        folder = os.path.join(directory, 'data')
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            filename = os.path.join(tmp, 'job.json')
+
+            with open(filename, 'w') as f:
+                json.dump({'cif': os.path.join(folder, 'copper.cif'),
+                           'output': 'copper.h5'}, f)
+
+            job = batch.load(filename)
+
+            self.assertEqual(job['name'], 'job')
+            self.assertEqual(job['output'], os.path.join(tmp, 'copper.h5'))
+            self.assertEqual(job['supercell'], [1,1,1])
+
+            with open(filename, 'w') as f:
+                json.dump({'cif': 'copper.cif', 'output': 'copper.h5',
+                           'data': 'data.nxs', 'refinement': {},
+                           'simulation': {}}, f)
+
+            with self.assertRaises(ValueError):
+                batch.load(filename)
+
+    def test_execute(self):
+
+        folder = os.path.join(directory, 'data')
+
+        extents, bins = [[-2,2],[-2,2],[-2,2]], [5,5,5]
+
+        W = np.eye(3).tolist()
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            filename = os.path.join(tmp, 'job.json')
+
+            with open(filename, 'w') as f:
+                json.dump({'cif': os.path.join(folder, 'copper.cif'),
+                           'supercell': [2,2,2],
+                           'output': 'copper.h5',
+                           'cache': 'cache',
+                           'simulation': {'type': 'magnetic',
+                                          'cycles': 2,
+                                          'temperature': [1,1],
+                                          'exchange': [-1],
+                                          'sampling': {'extents': extents,
+                                                       'bins': bins,
+                                                       'W': W}},
+                           'intensity': [{'type': 'magnetic',
+                                          'extents': extents,
+                                          'bins': bins,
+                                          'memory': 1000}]}, f)
+
+            cwd = os.getcwd()
+
+            batch.execute(batch.load(filename))
+
+            self.assertEqual(os.getcwd(), cwd)
+
+            with h5py.File(os.path.join(tmp, 'copper.h5'), 'r') as f:
+
+                group = f['disorder/batch']
+
+                self.assertEqual(json.loads(group.attrs['job'])['name'], 'job')
+                self.assertTrue(group.attrs['elapsed'] > 0)
+
+                I = group['intensity/0/I'][...]
+                self.assertEqual(I.shape, tuple(bins))
+
+                H = group['simulation/H'][...]
+                self.assertEqual(H.shape, (1,))
+
+                sample = group['simulation/sampled/magnetic']
+                self.assertEqual(sample['I'].shape, tuple(bins))
+                self.assertEqual(sample.attrs['n'], 2)
+
+    def test_refinement(self):
+
+        folder = os.path.join(directory, 'data')
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            np.random.seed(13)
+
+            with h5py.File(os.path.join(tmp, 'data.nxs'), 'w') as f:
+                data = f.create_group('disorder/data')
+                data['signal'] = np.random.random((8,8,8))+0.1
+                data['errors_squared'] = np.random.random((8,8,8))+0.1
+                data['h'] = np.linspace(-2,2,9)
+                data['k'] = np.linspace(-2,2,9)
+                data['l'] = np.linspace(-2,2,9)
+
+            filename = os.path.join(tmp, 'job.json')
+
+            schedule = [{'cycles': 1, 'sigma': [1,1,1]},
+                        {'cycles': 2, 'sigma': [0.5,0.5,0.5]}]
+
+            with open(filename, 'w') as f:
+                json.dump({'cif': os.path.join(folder, 'CuMnO2.mcif'),
+                           'supercell': [2,2,2],
+                           'output': 'CuMnO2.h5',
+                           'data': 'data.nxs',
+                           'crop': [[-1.75,1.75],[-1.75,1.75],[-1.75,1.75]],
+                           'rebin': [4,4,4],
+                           'punch': {'radii': [1,1,1]},
+                           'refinement': {'temperature': 1,
+                                          'constant': 0.1,
+                                          'batch': 2,
+                                          'schedule': schedule}}, f)
+
+            cwd = os.getcwd()
+
+            batch.execute(batch.load(filename))
+
+            self.assertEqual(os.getcwd(), cwd)
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             ['CuMnO2.h5', 'data.nxs', 'job.json'])
+
+            with h5py.File(os.path.join(tmp, 'CuMnO2.h5'), 'r') as f:
+
+                signal = f['disorder/refinement/signal'][...]
+
+                self.assertEqual(signal.shape, (4,4,4))
+                self.assertTrue(np.isnan(signal).any())
+
+                group = f['disorder/batch/refinement']
+
+                chi_sq = group['chi_sq'][...]
+                temperature = group['temperature'][...]
+
+        sc = SuperCell(os.path.join(folder, 'CuMnO2.mcif'), 2, 2, 2)
+
+        n = sc.get_number_atoms_per_super_cell()
+
+        self.assertEqual(chi_sq.shape, (2,n*3))
+        self.assertTrue(np.isfinite(chi_sq).all())
+
+        self.assertFalse(np.array_equal(chi_sq[0], chi_sq[1]))
+
+        np.testing.assert_array_less(temperature[:,n:], temperature[:,n-1:-1])
+
+if __name__ == '__main__':
+    unittest.main()
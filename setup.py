@@ -112,6 +112,7 @@ setup(
     entry_points={
         'console_scripts': [
             'rmc-discord=disorder.application:run',
+            'rmc-discord-batch=disorder.batch:run',
         ],
     },
     package_data={